@@ -17,7 +17,6 @@ https://blog.naver.com/zacra
 import KIS_Common as Common
 
 
-import requests
 import json
 
 
@@ -25,8 +24,10 @@ from datetime import datetime
 from pytz import timezone
 
 import pprint
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import math
 import time
+import os
 
 
 import pandas as pd
@@ -37,7 +38,6 @@ from pykrx import stock
 
 #거래량 상위 종목 리스트 얻기
 def GetTopVolumeStockList():
-    time.sleep(0.2)
 
 
     now_time = datetime.now(timezone('Asia/Seoul'))
@@ -70,7 +70,7 @@ def GetTopVolumeStockList():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -98,7 +98,6 @@ def GetTopVolumeStockList():
 
 #등락률 상위 종목 리스트 얻기
 def GetTopRateStockList():
-    time.sleep(0.2)
 
 
     now_time = datetime.now(timezone('Asia/Seoul'))
@@ -135,7 +134,7 @@ def GetTopRateStockList():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -169,10 +168,6 @@ def GetTopRateStockList():
 #마켓 상태..이로움님 코드
 def MarketStatus(stock_code = '069500'):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
 
 
@@ -192,7 +187,7 @@ def MarketStatus(stock_code = '069500'):
         "FID_INPUT_ISCD": stock_code                          # stock_code: 무조건 주식코드 입력이 필요해서 입력이 없을 경우 KODEX 200의 코드(069500)를 기본으로 사용
     }
 
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
         output1 = res.json()['output1']
@@ -213,11 +208,6 @@ def MarketStatus(stock_code = '069500'):
 
 #오늘 개장일인지 조회! (휴장일이면 'N'을 리턴!)
 def IsTodayOpenCheck():
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
     now_time = datetime.now(timezone('Asia/Seoul'))
     formattedDate = now_time.strftime("%Y%m%d")
     pprint.pprint(formattedDate)
@@ -240,7 +230,7 @@ def IsTodayOpenCheck():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -422,8 +412,7 @@ def IsMarketOpen():
 
                     #마켓이 열린 시간내에 가짜주문이 유효하다면 장이 열렸으니 더이상 이 시간내에 또 체크할 필요가 없다.
                     CheckDict['CheckTody'] = strNow
-                    with open(file_path, 'w') as outfile:
-                        json.dump(CheckDict, outfile)
+                    Common.SaveJsonAtomic(file_path, CheckDict)
 
 
                     print("Market is Open!!!!")
@@ -446,14 +435,15 @@ def IsMarketOpen():
 #price_pricision 호가 단위에 맞게 변형해준다. 지정가 매매시 사용
 def PriceAdjust(price, stock_code):
     
-    NowPrice = GetCurrentPrice(stock_code)
+    #현재가, 시장 구분, 호가 단위 모두 시세 조회 1번으로 처리!
+    data = GetQuoteSnapshot(stock_code)
+    NowPrice = int(data['stck_prpr'])
 
     price = int(price)
 
-    data = GetCurrentStatus(stock_code)
-    if data['StockMarket'] == 'ETF' or price <= NowPrice:
+    if data['rprs_mrkt_kor_name'] == 'ETF' or price <= NowPrice:
         
-        hoga = GetHoga(stock_code)
+        hoga = int(data['aspr_unit'])
 
         adjust_price = math.floor(price / hoga) * hoga
         
@@ -493,10 +483,6 @@ def GetBalance():
     else:
 
             
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
         PATH = "uapi/domestic-stock/v1/trading/inquire-balance"
         URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -529,7 +515,7 @@ def GetBalance():
         }
 
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
         #pprint.pprint(res.json())
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -576,10 +562,6 @@ def GetBalance():
 #나의 계좌 잔고!
 def GetBalanceIRP():
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/domestic-stock/v1/trading/pension/inquire-balance"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -613,7 +595,7 @@ def GetBalanceIRP():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -679,10 +661,6 @@ def GetMyStockList():
 
 
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
         # 헤더 설정
         headers = {"Content-Type":"application/json", 
                 "authorization": f"Bearer {Common.GetToken(Common.GetNowDist())}",
@@ -708,7 +686,7 @@ def GetMyStockList():
 
 
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
         
         if res.headers['tr_cont'] == "M" or res.headers['tr_cont'] == "F":
             tr_cont = "N"
@@ -791,12 +769,23 @@ def GetMyStockList():
 
 ############################################################################################################################################################
 
-#국내 주식현재가 시세
-def GetCurrentPrice(stock_code):
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
+#현재가 시세(inquire-price) 캐시! 현재가/호가단위/시총 등이 모두 같은 API라 짧은 시간 안의 재조회는 1번 받은 걸 같이 쓴다
+QUOTE_CACHE_SEC = 1.5
+QUOTE_BATCH_WORKERS = int(os.getenv("QUOTE_BATCH_WORKERS", "4"))   #GetCurrentPriceBatch 동시 요청 수
+QuoteCacheDict = dict()   #(계좌 구분, 종목코드) -> (조회 시각, 시세 정보)
+
+
+#국내 주식 현재가 시세 정보 전체(output)를 리턴! 실패하면 에러 코드를 리턴
+#cache_sec=0 으로 넘기면 캐시를 무시하고 새로 조회한다
+def GetQuoteSnapshot(stock_code, cache_sec = None):
+
+    if cache_sec is None:
+        cache_sec = QUOTE_CACHE_SEC
+
+    cache_key = (Common.GetNowDist(), stock_code)
+    cached = QuoteCacheDict.get(cache_key)
+    if cached is not None and time.time() - cached[0] < cache_sec:
+        return cached[1]
 
     PATH = "uapi/domestic-stock/v1/quotations/inquire-price"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -814,57 +803,189 @@ def GetCurrentPrice(stock_code):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
-        return int(res.json()['output']['stck_prpr'])
+        result = res.json()['output']
+        QuoteCacheDict[cache_key] = (time.time(), result)
+        return result
     else:
         print("Error Code : " + str(res.status_code) + " | " + res.text)
         return res.json()["msg_cd"]
 
 
+#국내 주식현재가 시세
+def GetCurrentPrice(stock_code):
+
+    result = GetQuoteSnapshot(stock_code)
+
+    if isinstance(result, dict):
+        return int(result['stck_prpr'])
+    else:
+        return result
+
+
+#여러 종목 현재가를 동시에 조회! 종목마다 1번씩만 조회하고 한투 호출은 공용 속도 제한을 같이 쓴다
+#리턴은 {종목코드: 현재가} (넘긴 순서 유지, 실패한 종목은 GetCurrentPrice 처럼 에러 코드)
+#계좌 구분은 호출한 시점의 것을 쓰니 조회하는 동안 SetChangeMode 하지 말 것!
+def GetCurrentPriceBatch(stock_code_list, cache_sec = None):
+
+    PriceDict = dict()
+    CodeList = list(dict.fromkeys(stock_code_list))   #중복 종목은 1번만
+
+    def GetPriceOne(stock_code):
+        result = GetQuoteSnapshot(stock_code, cache_sec)
+        if isinstance(result, dict):
+            return int(result['stck_prpr'])
+        return result
+
+    if len(CodeList) > 0:
+        with ThreadPoolExecutor(max_workers=max(1, min(QUOTE_BATCH_WORKERS, len(CodeList)))) as executor:
+
+            FutureDict = dict()
+            for stock_code in CodeList:
+                FutureDict[executor.submit(GetPriceOne, stock_code)] = stock_code
+
+            for future in as_completed(FutureDict):
+                stock_code = FutureDict[future]
+                try:
+                    PriceDict[stock_code] = future.result()
+                except Exception as e:
+                    print(stock_code, "현재가 조회 실패:", e)
+                    PriceDict[stock_code] = None
+
+    return {stock_code: PriceDict.get(stock_code) for stock_code in CodeList}
+
+
 #국내 주식 호가 단위!
 def GetHoga(stock_code):
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
-    PATH = "uapi/domestic-stock/v1/quotations/inquire-price"
-    URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
+    result = GetQuoteSnapshot(stock_code)
 
-    # 헤더 설정
-    headers = {"Content-Type":"application/json", 
-            "authorization": f"Bearer {Common.GetToken(Common.GetNowDist())}",
-            "appKey":Common.GetAppKey(Common.GetNowDist()),
-            "appSecret":Common.GetAppSecret(Common.GetNowDist()),
-            "tr_id":"FHKST01010100"}
+    if isinstance(result, dict):
+        return int(result['aspr_unit'])
+    else:
+        return result
 
-    params = {
-        "FID_COND_MRKT_DIV_CODE":"J",
-        "FID_INPUT_ISCD": stock_code
+
+
+
+############################################################################################################################################################
+#종목 정보(이름, 시장, ETF 여부) 로컬 캐시! 이름 같은 정보는 거의 안 바뀌니 파일에 저장해 두고 오래(30일) 쓴다
+STOCK_META_PATH = os.getenv("STOCK_META_PATH", "./KR_StockMeta.json")
+STOCK_META_TTL_SEC = 30 * 24 * 60 * 60
+
+StockMetaDict = None   #종목코드 -> {'StockName','StockMarket','IsETF','UpdatedAt'}
+
+
+#캐시 파일을 읽어서 메모리에 올린다! (처음 1번만)
+def LoadStockMeta():
+    global StockMetaDict
+
+    if StockMetaDict is None:
+        StockMetaDict = dict()
+        try:
+            with open(STOCK_META_PATH, 'r', encoding='utf-8') as json_file:
+                StockMetaDict = json.load(json_file)
+        except Exception as e:
+            print("Exception by First")
+
+    return StockMetaDict
+
+
+#메모리의 종목 정보를 파일로 저장! 임시 파일에 쓰고 교체한다
+def SaveStockMeta():
+    if StockMetaDict is None:
+        return
+    try:
+        tmp_path = STOCK_META_PATH + "." + str(os.getpid()) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as outfile:
+            json.dump(StockMetaDict, outfile, ensure_ascii=False)
+        os.replace(tmp_path, STOCK_META_PATH)
+    except Exception as e:
+        print("StockMeta 저장 실패:", e)
+
+
+#종목 정보 1개를 메모리에 넣는다
+def SetStockMeta(stock_code, stock_name, stock_market = ""):
+    LoadStockMeta()[stock_code] = {
+        'StockName': stock_name,
+        'StockMarket': stock_market,
+        'IsETF': 'Y' if stock_market == "ETF" else 'N',
+        'UpdatedAt': int(time.time())
     }
 
-    # 호출
-    res = requests.get(URL, headers=headers, params=params)
-    #pprint.pprint(res.json())
 
-    if res.status_code == 200 and res.json()["rt_cd"] == '0':
-        return int(res.json()['output']['aspr_unit'])
-    else:
-        print("Error Code : " + str(res.status_code) + " | " + res.text)
-        return res.json()["msg_cd"]
+#종목 정보를 리턴! 캐시에 없거나 오래됐으면 한투에서 받아와 저장한다. 못 구하면 None
+def GetStockMeta(stock_code):
+
+    meta = LoadStockMeta().get(stock_code)
+    if meta is not None and time.time() - meta.get('UpdatedAt', 0) < STOCK_META_TTL_SEC:
+        return meta
+
+    stock_name = GetStockNameRemote(stock_code)
+
+    #조회에 실패했다면 예전에 저장한 정보라도 쓴다
+    if stock_name is None:
+        return meta
+
+    stock_market = ""
+    data = GetQuoteSnapshot(stock_code)
+    if isinstance(data, dict):
+        stock_market = data.get('rprs_mrkt_kor_name', "")
+
+    SetStockMeta(stock_code, stock_name, stock_market)
+    SaveStockMeta()
+
+    return StockMetaDict[stock_code]
+
+
+#여러 종목 정보를 한번에 채워둔다! pykrx로 코스피/코스닥/ETF 이름 목록을 통째로 받고 그래도 없는 종목만 한투로 조회
+#종목 리스트를 넘기면 그 중에 캐시에 없는(오래된) 종목이 있을 때만 목록을 받는다
+def WarmStockMeta(stock_code_list = None):
 
+    LoadStockMeta()
 
+    if stock_code_list is not None:
+        now_ts = time.time()
+        MissList = [stock_code for stock_code in stock_code_list
+                    if StockMetaDict.get(stock_code) is None or now_ts - StockMetaDict[stock_code].get('UpdatedAt', 0) >= STOCK_META_TTL_SEC]
+        if len(MissList) == 0:
+            return
 
+    try:
+        for market in ["KOSPI", "KOSDAQ"]:
+            for ticker in stock.get_market_ticker_list(market=market):
+                SetStockMeta(ticker, stock.get_market_ticker_name(ticker), market)
+
+        for ticker in stock.get_etf_ticker_list():
+            SetStockMeta(ticker, stock.get_etf_ticker_name(ticker), "ETF")
+
+    except Exception as e:
+        print("pykrx 종목 목록 조회 실패:", e)
+
+    SaveStockMeta()
 
-#국내 주식 이름 
+    if stock_code_list is not None:
+        for stock_code in stock_code_list:
+            GetStockMeta(stock_code)
+
+
+
+#국내 주식 이름 (캐시 우선!) 못 구하면 종목코드를 그대로 리턴
 def GetStockName(stock_code):
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
+
+    meta = GetStockMeta(stock_code)
+
+    if meta is not None:
+        return meta['StockName']
+    else:
+        return stock_code
+
+
+#국내 주식 이름을 한투에서 직접 조회! 실패하면 None
+def GetStockNameRemote(stock_code):
 
     PATH = "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -887,14 +1008,14 @@ def GetStockName(stock_code):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
         return res.json()['output1']['hts_kor_isnm']
     else:
         print("Error Code : " + str(res.status_code) + " | " + res.text)
-        return res.json()["msg_cd"]
+        return None
 
 
 
@@ -904,33 +1025,10 @@ def GetStockName(stock_code):
 #퀀트 투자를 위한 함수!    
 #국내 주식 시총, PER, PBR, EPS, PBS 구해서 리턴하기!
 def GetCurrentStatus(stock_code):
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
-
-    PATH = "uapi/domestic-stock/v1/quotations/inquire-price"
-    URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
 
-    # 헤더 설정
-    headers = {"Content-Type":"application/json", 
-            "authorization": f"Bearer {Common.GetToken(Common.GetNowDist())}",
-            "appKey":Common.GetAppKey(Common.GetNowDist()),
-            "appSecret":Common.GetAppSecret(Common.GetNowDist()),
-            "tr_id":"FHKST01010100"}
+    result = GetQuoteSnapshot(stock_code)
 
-    params = {
-        "FID_COND_MRKT_DIV_CODE":"J",
-        "FID_INPUT_ISCD": stock_code
-    }
-
-    # 호출
-    res = requests.get(URL, headers=headers, params=params)
-    #pprint.pprint(res.json())
-
-    if res.status_code == 200 and res.json()["rt_cd"] == '0':
-        
-        result = res.json()['output']
+    if isinstance(result, dict):
         
         #pprint.pprint(result)
 
@@ -979,8 +1077,7 @@ def GetCurrentStatus(stock_code):
         
         return stockDataDict
     else:
-        print("Error Code : " + str(res.status_code) + " | " + res.text)
-        return res.json()["msg_cd"]
+        return result
     
     
 
@@ -1007,10 +1104,6 @@ def MakeBuyMarketOrder(stockcode, amt, adjustAmt = False):
     else:
             
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
         TrId = "TTTC0012U"
         if Common.GetNowDist() == "VIRTUAL":
             TrId = "VTTC0012U"
@@ -1036,7 +1129,7 @@ def MakeBuyMarketOrder(stockcode, amt, adjustAmt = False):
             "custtype":"P",
             "hashkey" : Common.GetHashKey(data)
         }
-        res = requests.post(URL, headers=headers, data=json.dumps(data))
+        res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1074,10 +1167,6 @@ def MakeSellMarketOrder(stockcode, amt):
         return MakeSellMarketOrderIRP(stockcode, amt)
     else:
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
         TrId = "TTTC0011U"
         if Common.GetNowDist() == "VIRTUAL":
@@ -1105,7 +1194,7 @@ def MakeSellMarketOrder(stockcode, amt):
             "custtype":"P",
             "hashkey" : Common.GetHashKey(data)
         }
-        res = requests.post(URL, headers=headers, data=json.dumps(data))
+        res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1148,10 +1237,6 @@ def MakeBuyLimitOrder(stockcode, amt, price, adjustAmt = False, ErrLog = "NO"):
         return MakeBuyLimitOrderIRP(stockcode, amt, price)
     else:
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
 
         TrId = "TTTC0012U"
@@ -1179,7 +1264,7 @@ def MakeBuyLimitOrder(stockcode, amt, price, adjustAmt = False, ErrLog = "NO"):
             "custtype":"P",
             "hashkey" : Common.GetHashKey(data)
         }
-        res = requests.post(URL, headers=headers, data=json.dumps(data))
+        res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1208,11 +1293,6 @@ def MakeBuyLimitOrder(stockcode, amt, price, adjustAmt = False, ErrLog = "NO"):
 #지정가 매도하기!
 def MakeSellLimitOrder(stockcode, amt, price, ErrLog="YES"):
 
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
 
 
@@ -1247,7 +1327,7 @@ def MakeSellLimitOrder(stockcode, amt, price, ErrLog="YES"):
             "custtype":"P",
             "hashkey" : Common.GetHashKey(data)
         }
-        res = requests.post(URL, headers=headers, data=json.dumps(data))
+        res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
         
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1292,11 +1372,6 @@ def MakeBuyMarketOrderIRP(stockcode, amt):
 
     print("현재 동작하지 않음")
     return None
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTC0502U"
 
@@ -1326,7 +1401,7 @@ def MakeBuyMarketOrderIRP(stockcode, amt):
         "custtype":"P",
         "hashkey" : Common.GetHashKey(data)
     }
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1354,11 +1429,6 @@ def MakeSellMarketOrderIRP(stockcode, amt):
     print("현재 동작하지 않음")
     return None
 
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
 
     TrId = "TTTC0502U"
@@ -1389,7 +1459,7 @@ def MakeSellMarketOrderIRP(stockcode, amt):
         "custtype":"P",
         "hashkey" : Common.GetHashKey(data)
     }
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1418,10 +1488,6 @@ def MakeBuyLimitOrderIRP(stockcode, amt, price, ErrLog="YES"):
     print("현재 동작하지 않음")
     return None
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTC0502U"
 
@@ -1451,7 +1517,7 @@ def MakeBuyLimitOrderIRP(stockcode, amt, price, ErrLog="YES"):
         "custtype":"P",
         "hashkey" : Common.GetHashKey(data)
     }
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1479,10 +1545,6 @@ def MakeSellLimitOrderIRP(stockcode, amt, price, ErrLog="YES"):
     print("현재 동작하지 않음")
     return None
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTC0502U"
 
@@ -1512,7 +1574,7 @@ def MakeSellLimitOrderIRP(stockcode, amt, price, ErrLog="YES"):
         "custtype":"P",
         "hashkey" : Common.GetHashKey(data)
     }
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1555,10 +1617,6 @@ def SellAllStockIRP():
 #매수 가능한지 체크 하기!
 def CheckPossibleBuyInfo(stockcode, price, type):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/domestic-stock/v1/trading/inquire-psbl-order"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -1592,7 +1650,7 @@ def CheckPossibleBuyInfo(stockcode, price, type):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1649,10 +1707,6 @@ def AdjustPossibleAmt(stockcode, amt ,type):
 def CheckPossibleBuyInfoIRP(stockcode, price, type):
     
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/domestic-stock/v1/trading/pension/inquire-psbl-order"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -1685,7 +1739,7 @@ def CheckPossibleBuyInfoIRP(stockcode, price, type):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1715,10 +1769,6 @@ def CheckPossibleBuyInfoIRP(stockcode, price, type):
 #주문 리스트를 얻어온다! 종목 코드, side는 ALL or BUY or SELL, 상태는 OPEN or CLOSE
 def GetOrderList(stockcode = "", side = "ALL", status = "ALL", limit = 5):
     
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTC0081R"
     if Common.GetNowDist() == "VIRTUAL":
@@ -1774,7 +1824,7 @@ def GetOrderList(stockcode = "", side = "ALL", status = "ALL", limit = 5):
         "hashkey" : Common.GetHashKey(params)
     }
 
-    res = requests.get(URL, headers=headers, params=params) 
+    res = Common.KisGet(URL, headers=headers, params=params) 
     #pprint.pprint(res.json())
     
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -1891,10 +1941,6 @@ def CancelModifyOrder(stockcode, order_num1 , order_num2 , order_amt , order_pri
         return CancelModifyOrderIRP(stockcode, order_num1 , order_num2 , order_amt , order_price, mode,order_type, order_dist)
     else:
             
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
 
         TrId = "TTTC0013U"
@@ -1938,7 +1984,7 @@ def CancelModifyOrder(stockcode, order_num1 , order_num2 , order_amt , order_pri
             "hashkey" : Common.GetHashKey(data)
         }
 
-        res = requests.post(URL, headers=headers, data=json.dumps(data))
+        res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
         
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1966,10 +2012,6 @@ def CancelModifyOrder(stockcode, order_num1 , order_num2 , order_amt , order_pri
 def CancelModifyOrderIRP(stockcode, order_num1 , order_num2 , order_amt , order_price, mode = "CANCEL" ,order_type = "LIMIT", order_dist = "NONE"):
 
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
 
     order_dist = "02"
@@ -2014,7 +2056,7 @@ def CancelModifyOrderIRP(stockcode, order_num1 , order_num2 , order_amt , order_
         "custtype":"P",
         "hashkey" : Common.GetHashKey(data)
     }
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -2051,11 +2093,6 @@ def CancelAllOrders(stockcode = "", side = "ALL"):
 
 #시장가 주문 정보를 읽어서 체결 평균가를 리턴! 에러나 못가져오면 현재가를 리턴!
 def GetMarketOrderPrice(stockcode,ResultOrder):
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     OrderList = GetOrderList(stockcode)
     
@@ -2081,11 +2118,6 @@ def GetMarketOrderPrice(stockcode,ResultOrder):
 #p_code -> D:일, W:주, M:월, Y:년
 def GetOhlcv(stock_code,p_code, adj_ok = "1"):
 
-    time.sleep(0.2)
-
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -2114,7 +2146,7 @@ def GetOhlcv(stock_code,p_code, adj_ok = "1"):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -2198,10 +2230,6 @@ def GetOhlcvNew(stock_code,p_code,get_count, adj_ok = "1"):
 
     while DataLoad:
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
         print("...Data.Length..", len(OhlcvList), "-->", get_count)
         if len(OhlcvList) >= get_count:
@@ -2228,7 +2256,7 @@ def GetOhlcvNew(stock_code,p_code,get_count, adj_ok = "1"):
         }
   
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
 
         
 
@@ -2349,10 +2377,6 @@ def GetOhlcvMinute(stock_code, MinSt = '1T'):
 
     while DataLoad:
 
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
         print("get.data...", len(OhlcvList))
         #print("...Data.Length..", len(OhlcvList), "-->", get_count)
@@ -2379,7 +2403,7 @@ def GetOhlcvMinute(stock_code, MinSt = '1T'):
         }
   
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
 
         #pprint.pprint(res.json())
         
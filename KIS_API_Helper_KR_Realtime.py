@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+'''
+
+국내 주식 실시간 체결가(H0STCNT0) 웹소켓 구독!
+
+REST 현재가 조회는 조회하는 순간의 가격만 보이지만, 웹소켓으로 체결이 날 때마다 가격을 받아서
+종목별 현재가와 장중 고가/저가를 메모리에 들고 있다가 같은 프로세스의 다른 코드(스탑트레이더 등)에 넘겨준다.
+
+사용법
+    import KIS_API_Helper_KR_Realtime as RealtimeKR
+
+    RealtimeKR.AddPriceListener(OnTick)        #OnTick(stock_code, PriceInfo) 체결마다 호출 (웹소켓 스레드에서 호출되니 오래 걸리는 일은 하지 말 것!)
+    RealtimeKR.StartRealtime("REAL")
+    RealtimeKR.Subscribe("005930")
+    RealtimeKR.GetRealtimePrice("005930")       #최근 체결가 (없거나 오래됐으면 None)
+
+websocket-client 패키지가 필요합니다 (pip install websocket-client)
+테스트할 때는 KIS_KR_Realtime_StandIn.py 로 로컬 가짜 서버를 띄우고 KIS_WS_URL 을 그쪽으로 잡으면 됩니다.
+
+'''
+import KIS_Common as Common
+
+import json
+import os
+import time
+import threading
+
+try:
+    import websocket
+except ImportError:
+    websocket = None   #설치 안 되어 있으면 StartRealtime 에서 알려준다
+
+
+KIS_WS_URL = os.getenv("KIS_WS_URL", "")                                  #비워두면 실계좌/모의계좌 기본 주소 사용
+KIS_WS_APPROVAL_KEY = os.getenv("KIS_WS_APPROVAL_KEY", "")                #로컬 가짜 서버 테스트용! 넣어두면 접속키 발급을 건너뛴다
+KIS_WS_APPROVAL_KEY_TTL_SEC = float(os.getenv("KIS_WS_APPROVAL_KEY_TTL_SEC", "72000"))   #접속키는 24시간 유효라 20시간 지나면 새로 받는다
+KIS_WS_RECONNECT_SEC = float(os.getenv("KIS_WS_RECONNECT_SEC", "3"))     #끊겼을 때 다시 접속하기 전 대기(초)
+KIS_WS_MAX_SUBSCRIBE = int(os.getenv("KIS_WS_MAX_SUBSCRIBE", "40"))       #한투는 세션 1개당 실시간 등록이 41건까지라 여유를 둔다
+
+KIS_WS_URL_REAL = "ws://ops.koreainvestment.com:21000"
+KIS_WS_URL_VIRTUAL = "ws://ops.koreainvestment.com:31000"
+
+TR_ID_EXECUTION = "H0STCNT0"    #국내주식 실시간 체결가
+
+#H0STCNT0 체결 데이터의 필드 위치 (^ 로 구분)
+FIELD_CODE = 0      #종목코드
+FIELD_TIME = 1      #체결시간 HHMMSS
+FIELD_PRICE = 2     #현재가
+FIELD_OPEN = 7      #시가
+FIELD_HIGH = 8      #고가
+FIELD_LOW = 9       #저가
+FIELD_VOLUME = 13   #누적 거래량
+
+
+RealtimeLock = threading.Lock()
+RealtimePriceDict = dict()      #종목코드 -> {'Price','Open','High','Low','Volume','Time','UpdatedAt'}
+RealtimeListenerList = list()   #체결마다 호출할 함수들
+SubscribedCodeList = list()     #구독중인 종목코드 (다시 접속하면 그대로 재등록)
+
+RealtimeApp = None
+RealtimeThread = None
+RealtimeDist = "REAL"
+IsRealtimeRunning = False
+IsRealtimeConnected = False
+ApprovalKeyDict = dict()        #계좌 구분 -> (웹소켓 접속키, 발급 시각)
+ApprovalKeyLock = threading.Lock()
+
+
+
+#웹소켓 접속키(approval_key)를 발급 받는다! 받은 키는 KIS_WS_APPROVAL_KEY_TTL_SEC 동안 재사용하고 그 뒤엔 새로 받는다
+def GetApprovalKey(dist = "REAL"):
+
+    if KIS_WS_APPROVAL_KEY != "":
+        return KIS_WS_APPROVAL_KEY
+
+    with ApprovalKeyLock:
+        KeyInfo = ApprovalKeyDict.get(dist)
+        if KeyInfo is not None and time.time() - KeyInfo[1] < KIS_WS_APPROVAL_KEY_TTL_SEC:
+            return KeyInfo[0]
+
+    headers = {"content-type":"application/json"}
+    body = {
+        "grant_type":"client_credentials",
+        "appkey":Common.GetAppKey(dist),
+        "secretkey":Common.GetAppSecret(dist)
+        }
+
+    PATH = "oauth2/Approval"
+    URL = f"{Common.GetUrlBase(dist)}/{PATH}"
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(body), dist=dist, rate_class=None)
+
+    if res.status_code == 200 and "approval_key" in res.json():
+        approval_key = res.json()["approval_key"]
+        with ApprovalKeyLock:
+            ApprovalKeyDict[dist] = (approval_key, time.time())
+        return approval_key
+    else:
+        print("Get Approval Key fail!\nYou have to restart your app!!!")
+        print("Error Code : " + str(res.status_code) + " | " + res.text)
+        return None
+
+
+#들고 있는 접속키를 버린다! 다음 GetApprovalKey 에서 새로 발급 받는다
+def ResetApprovalKey(dist = "REAL"):
+    with ApprovalKeyLock:
+        ApprovalKeyDict.pop(dist, None)
+
+
+#등록 거절 메시지가 접속키 문제(만료/무효)인지 여부
+def IsApprovalKeyRejected(body):
+    return "APPROVAL" in str(body.get('msg1', '')).upper()
+
+
+#접속할 웹소켓 주소를 리턴!
+def GetRealtimeUrl(dist = "REAL"):
+    if KIS_WS_URL != "":
+        return KIS_WS_URL
+    if dist == "VIRTUAL":
+        return KIS_WS_URL_VIRTUAL
+    return KIS_WS_URL_REAL
+
+
+#실시간 등록(tr_type "1") / 해제(tr_type "2") 메시지를 만든다
+def MakeSubscribeMessage(approval_key, stock_code, tr_type = "1"):
+    return json.dumps({
+        "header": {
+            "approval_key": approval_key,
+            "custtype": "P",
+            "tr_type": tr_type,
+            "content-type": "utf-8"
+        },
+        "body": {
+            "input": {
+                "tr_id": TR_ID_EXECUTION,
+                "tr_key": stock_code
+            }
+        }
+    })
+
+
+#체결 데이터 문자열을 파싱해서 체결 정보 리스트를 리턴! 체결 데이터가 아니면 빈 리스트
+#형식: 0|H0STCNT0|건수|필드^필드^...  (건수가 2 이상이면 필드들이 이어서 붙어온다)
+def ParseExecutionData(raw):
+
+    parts = raw.split('|')
+    if len(parts) < 4 or parts[0] != '0' or parts[1] != TR_ID_EXECUTION:
+        return list()
+
+    try:
+        cnt = max(1, int(parts[2]))
+    except ValueError:
+        cnt = 1
+
+    fields = parts[3].split('^')
+    size = len(fields) // cnt
+
+    TickList = list()
+    for i in range(cnt):
+        rec = fields[i * size:(i + 1) * size]
+        try:
+            TickList.append({
+                'StockCode': rec[FIELD_CODE],
+                'Time': rec[FIELD_TIME],
+                'Price': int(rec[FIELD_PRICE]),
+                'Open': int(rec[FIELD_OPEN]),
+                'High': int(rec[FIELD_HIGH]),
+                'Low': int(rec[FIELD_LOW]),
+                'Volume': int(rec[FIELD_VOLUME]) if len(rec) > FIELD_VOLUME else 0
+            })
+        except (IndexError, ValueError) as e:
+            print("실시간 체결 데이터 파싱 실패:", e, rec[:FIELD_VOLUME + 1])
+
+    return TickList
+
+
+#체결 1건을 메모리에 반영하고 리스너들에게 넘겨준다
+def PublishTick(Tick):
+
+    stock_code = Tick['StockCode']
+
+    with RealtimeLock:
+        PriceInfo = RealtimePriceDict.get(stock_code)
+        if PriceInfo is None:
+            PriceInfo = dict()
+            RealtimePriceDict[stock_code] = PriceInfo
+
+        PriceInfo['Price'] = Tick['Price']
+        PriceInfo['Open'] = Tick['Open']
+        #장중 고가/저가는 서버 값을 쓰되 체결가를 한번 더 반영 (값이 비어서 오는 경우 대비)
+        PriceInfo['High'] = max(Tick['High'], Tick['Price'])
+        PriceInfo['Low'] = min(Tick['Low'], Tick['Price']) if Tick['Low'] > 0 else Tick['Price']
+        PriceInfo['Volume'] = Tick['Volume']
+        PriceInfo['Time'] = Tick['Time']
+        PriceInfo['UpdatedAt'] = time.time()
+
+        Snapshot = dict(PriceInfo)
+        ListenerList = list(RealtimeListenerList)
+
+    for Listener in ListenerList:
+        try:
+            Listener(stock_code, Snapshot)
+        except Exception as e:
+            print("실시간 리스너 오류:", e)
+
+
+def OnRealtimeOpen(ws):
+    global IsRealtimeConnected
+
+    IsRealtimeConnected = True
+    print("실시간 웹소켓 접속 완료")
+
+    approval_key = GetApprovalKey(RealtimeDist)
+    if approval_key is None:
+        ws.close()   #접속키를 못 받았으면 잠시 뒤 다시 접속하면서 다시 받는다
+        return
+
+    with RealtimeLock:
+        CodeList = list(SubscribedCodeList)
+    for stock_code in CodeList:
+        ws.send(MakeSubscribeMessage(approval_key, stock_code, "1"))
+
+
+def OnRealtimeMessage(ws, raw):
+
+    if not raw:
+        return
+
+    #체결 데이터는 0 (암호화된 건 1: 체결통보용이라 여기선 안 쓴다)
+    if raw[0] == '0':
+        for Tick in ParseExecutionData(raw):
+            PublishTick(Tick)
+        return
+    elif raw[0] == '1':
+        return
+
+    try:
+        data = json.loads(raw)
+    except Exception:
+        print("실시간 메시지 해석 실패:", raw[:100])
+        return
+
+    tr_id = data.get('header', {}).get('tr_id')
+
+    #서버가 살아있는지 확인하는 PINGPONG 은 그대로 돌려보내야 연결이 유지된다
+    if tr_id == "PINGPONG":
+        ws.send(raw)
+        return
+
+    body = data.get('body', {})
+    if body.get('rt_cd') not in (None, '0'):
+        print("실시간 등록 실패:", data.get('header', {}).get('tr_key'), body.get('msg1'))
+
+        #접속키가 만료/무효라 거절된 거면 키를 새로 받아서 다시 접속한다 (다시 접속하면 OnRealtimeOpen 에서 전체 재등록)
+        if IsApprovalKeyRejected(body) and KIS_WS_APPROVAL_KEY == "":
+            ResetApprovalKey(RealtimeDist)
+            ws.close()
+
+
+def OnRealtimeError(ws, error):
+    print("실시간 웹소켓 오류:", error)
+
+
+def OnRealtimeClose(ws, close_status_code, close_msg):
+    global IsRealtimeConnected
+    IsRealtimeConnected = False
+    print("실시간 웹소켓 연결 종료:", close_status_code, close_msg)
+
+
+#끊기면 다시 접속하면서 계속 돈다 (백그라운드 스레드)
+def RealtimeLoop():
+    global RealtimeApp
+
+    while IsRealtimeRunning:
+        try:
+            RealtimeApp = websocket.WebSocketApp(GetRealtimeUrl(RealtimeDist),
+                                                 on_open=OnRealtimeOpen,
+                                                 on_message=OnRealtimeMessage,
+                                                 on_error=OnRealtimeError,
+                                                 on_close=OnRealtimeClose)
+            RealtimeApp.run_forever()
+        except Exception as e:
+            print("실시간 웹소켓 루프 오류:", e)
+
+        if IsRealtimeRunning:
+            time.sleep(KIS_WS_RECONNECT_SEC)
+
+
+#실시간 시세 수신 시작! 이미 돌고 있으면 아무것도 안 한다. 시작했으면 True
+def StartRealtime(dist = "REAL"):
+    global RealtimeThread, RealtimeDist, IsRealtimeRunning
+
+    if websocket is None:
+        print("websocket-client 패키지가 없습니다! pip install websocket-client")
+        return False
+
+    if IsRealtimeRunning:
+        return True
+
+    if GetApprovalKey(dist) is None:
+        return False
+
+    RealtimeDist = dist
+    IsRealtimeRunning = True
+    RealtimeThread = threading.Thread(target=RealtimeLoop, daemon=True)
+    RealtimeThread.start()
+    return True
+
+
+#실시간 시세 수신 종료!
+def StopRealtime():
+    global IsRealtimeRunning
+
+    IsRealtimeRunning = False
+    if RealtimeApp is not None:
+        RealtimeApp.close()
+    if RealtimeThread is not None:
+        RealtimeThread.join(timeout=5)
+
+
+#지금 서버와 연결되어 있는지 여부
+def IsRealtimeAlive():
+    return IsRealtimeRunning and IsRealtimeConnected
+
+
+#종목 실시간 체결가 등록! 등록 한도를 넘으면 False (그 종목은 REST로 조회해야 한다)
+def Subscribe(stock_code):
+
+    with RealtimeLock:
+        if stock_code in SubscribedCodeList:
+            return True
+        if len(SubscribedCodeList) >= KIS_WS_MAX_SUBSCRIBE:
+            return False
+        SubscribedCodeList.append(stock_code)
+
+    if IsRealtimeConnected:
+        try:
+            RealtimeApp.send(MakeSubscribeMessage(GetApprovalKey(RealtimeDist), stock_code, "1"))
+        except Exception as e:
+            print("실시간 등록 전송 실패:", stock_code, e)   #다시 접속할 때 재등록된다
+
+    return True
+
+
+#종목 실시간 체결가 해제!
+def Unsubscribe(stock_code):
+
+    with RealtimeLock:
+        if stock_code not in SubscribedCodeList:
+            return
+        SubscribedCodeList.remove(stock_code)
+        RealtimePriceDict.pop(stock_code, None)
+
+    if IsRealtimeConnected:
+        try:
+            RealtimeApp.send(MakeSubscribeMessage(GetApprovalKey(RealtimeDist), stock_code, "2"))
+        except Exception as e:
+            print("실시간 해제 전송 실패:", stock_code, e)
+
+
+#구독 종목을 넘긴 리스트에 맞춘다! 등록에 성공한(실시간으로 받는) 종목 리스트를 리턴
+def SyncSubscribe(stock_code_list):
+
+    with RealtimeLock:
+        OldCodeList = list(SubscribedCodeList)
+
+    for stock_code in OldCodeList:
+        if stock_code not in stock_code_list:
+            Unsubscribe(stock_code)
+
+    return [stock_code for stock_code in stock_code_list if Subscribe(stock_code)]
+
+
+#체결마다 호출할 함수 등록! Listener(stock_code, PriceInfo)
+def AddPriceListener(Listener):
+    with RealtimeLock:
+        if Listener not in RealtimeListenerList:
+            RealtimeListenerList.append(Listener)
+
+
+def RemovePriceListener(Listener):
+    with RealtimeLock:
+        if Listener in RealtimeListenerList:
+            RealtimeListenerList.remove(Listener)
+
+
+#종목의 실시간 가격 정보 전체(현재가, 장중 고가/저가 등)를 리턴! 없으면 None
+def GetRealtimePriceInfo(stock_code):
+    with RealtimeLock:
+        PriceInfo = RealtimePriceDict.get(stock_code)
+        return dict(PriceInfo) if PriceInfo is not None else None
+
+
+#종목의 최근 체결가를 리턴! 받은 적이 없거나 max_age_sec 보다 오래됐으면 None
+def GetRealtimePrice(stock_code, max_age_sec = None):
+    PriceInfo = GetRealtimePriceInfo(stock_code)
+    if PriceInfo is None:
+        return None
+    if max_age_sec is not None and time.time() - PriceInfo['UpdatedAt'] > max_age_sec:
+        return None
+    return PriceInfo['Price']
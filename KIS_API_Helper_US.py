@@ -17,7 +17,6 @@ https://blog.naver.com/zacra
 
 import KIS_Common as Common
 
-import requests
 import json
 
 
@@ -168,10 +167,6 @@ def PriceAdjust(price):
 #환율 리턴!
 def GetExrt():
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "/uapi/overseas-stock/v1/trading/inquire-present-balance"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -199,7 +194,7 @@ def GetExrt():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -224,7 +219,6 @@ def GetExrt():
 #미국 주식 주간 / 야간 여부를 리턴 하는 함수!
 def GetDayOrNight():
 
-    time.sleep(0.2)
     
     PATH = "uapi/overseas-stock/v1/trading/dayornight"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -240,7 +234,7 @@ def GetDayOrNight():
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
         return res.json()['output']['PSBL_YN']
@@ -254,10 +248,6 @@ def GetDayOrNight():
 #미국 잔고! 달러로 리턴할건지 원화로 리턴할건지!
 def GetBalance(st = "USD"):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/overseas-stock/v1/trading/inquire-present-balance"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -285,7 +275,7 @@ def GetBalance(st = "USD"):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     #pprint.pprint(res.json())
 
 
@@ -452,10 +442,6 @@ def GetMyStockList(st = "USD"):
         #드물지만 보유종목이 아주 많으면 한 번에 못가져 오므로 SeqKey를 이용해 연속조회를 하기 위한 반복 처리 
         while DataLoad:
 
-            time.sleep(0.2)
-            #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-            if Common.GetNowDist() == "VIRTUAL":
-                time.sleep(0.31)
 
                     
             # 헤더 설정
@@ -477,7 +463,7 @@ def GetMyStockList(st = "USD"):
             }
 
             # 호출
-            res = requests.get(URL, headers=headers, params=params)
+            res = Common.KisGet(URL, headers=headers, params=params)
             
             if res.headers['tr_cont'] == "M" or res.headers['tr_cont'] == "F":
                 tr_cont = "N"
@@ -580,10 +566,6 @@ def GetMyStockList(st = "USD"):
 #미국 주식현재가 시세
 def GetCurrentPriceOri(market, stock_code):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/overseas-price/v1/quotations/price"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -604,7 +586,7 @@ def GetCurrentPriceOri(market, stock_code):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
    # pprint.pprint(res.json())
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -617,10 +599,6 @@ def GetCurrentPriceOri(market, stock_code):
 #미국의 나스닥,뉴욕거래소, 아멕스를 뒤져서 있는 증권의 현재가를 가지고 옵니다!
 def GetCurrentPrice(stock_code):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
 
     PATH = "uapi/overseas-price/v1/quotations/price"
@@ -654,16 +632,12 @@ def GetCurrentPrice(stock_code):
         }
 
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
 
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
             if res.json()['output']['last'] == '':
                #print(try_market, " is Failed.. Next market.. ")
-                time.sleep(0.2)
-                #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-                if Common.GetNowDist() == "VIRTUAL":
-                    time.sleep(0.31)
 
                 continue # 다음 시도를 한다!
             else:
@@ -699,10 +673,6 @@ def MakeBuyLimitOrderOri(stockcode, amt, price, market, adjustAmt = False):
         
 
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTT1002U"
     if Common.GetNowDist() == "VIRTUAL":
@@ -733,7 +703,7 @@ def MakeBuyLimitOrderOri(stockcode, amt, price, market, adjustAmt = False):
     }
 
     
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -756,10 +726,6 @@ def MakeBuyLimitOrderOri(stockcode, amt, price, market, adjustAmt = False):
 #미국 지정가 주문하기!
 def MakeSellLimitOrderOri(stockcode, amt, price, market):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTT1006U"
     if Common.GetNowDist() == "VIRTUAL":
@@ -790,7 +756,7 @@ def MakeSellLimitOrderOri(stockcode, amt, price, market):
         "hashkey" : Common.GetHashKey(data)
     }
 
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
     
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -829,10 +795,6 @@ def MakeBuyLimitOrder(stockcode, amt, price ,adjustAmt = False):
 
     
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTT1002U"
     if Common.GetNowDist() == "VIRTUAL":
@@ -864,7 +826,7 @@ def MakeBuyLimitOrder(stockcode, amt, price ,adjustAmt = False):
     }
 
     
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -890,10 +852,6 @@ def MakeBuyLimitOrder(stockcode, amt, price ,adjustAmt = False):
 #미국 지정가 주문하기! 마켓을 모를 경우 자동으로 뒤져서!
 def MakeSellLimitOrder(stockcode, amt, price):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTT1006U"
     if Common.GetNowDist() == "VIRTUAL":
@@ -925,7 +883,7 @@ def MakeSellLimitOrder(stockcode, amt, price):
         "hashkey" : Common.GetHashKey(data)
     }
 
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
     
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -948,10 +906,6 @@ def MakeSellLimitOrder(stockcode, amt, price):
 #미국의 나스닥,뉴욕거래소, 아멕스를 뒤져서 있는 해당 주식의 거래소 코드를 리턴합니다!!
 def GetMarketCodeUS(stock_code, return_ori_market = False):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/overseas-price/v1/quotations/price"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -984,16 +938,12 @@ def GetMarketCodeUS(stock_code, return_ori_market = False):
         }
 
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
 
         if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
             if res.json()['output']['last'] == '':
                 #print(try_market, " is Failed.. Next market.. ")
-                time.sleep(0.2)
-                #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-                if Common.GetNowDist() == "VIRTUAL":
-                    time.sleep(0.31)
 
 
                 continue # 다음 시도를 한다!
@@ -1037,10 +987,6 @@ def SellAllStock():
 #매수 가능한지 체크 하기!
 def CheckPossibleBuyInfo(stockcode, price):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "uapi/overseas-stock/v1/trading/inquire-psamount"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -1071,7 +1017,7 @@ def CheckPossibleBuyInfo(stockcode, price):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1117,10 +1063,6 @@ def AdjustPossibleAmt(stockcode, amt):
 #주문 리스트를 얻어온다! 종목 코드, side는 ALL or BUY or SELL, 상태는 OPEN or CLOSE
 def GetOrderList(stockcode = "", side = "ALL", status = "ALL", limit = 5):
     
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTS3035R"
     if Common.GetNowDist() == "VIRTUAL":
@@ -1182,7 +1124,7 @@ def GetOrderList(stockcode = "", side = "ALL", status = "ALL", limit = 5):
         "hashkey" : Common.GetHashKey(params)
     }
 
-    res = requests.get(URL, headers=headers, params=params) 
+    res = Common.KisGet(URL, headers=headers, params=params) 
     #pprint.pprint(res.json())
     
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -1307,10 +1249,6 @@ def GetOrderList(stockcode = "", side = "ALL", status = "ALL", limit = 5):
 #주문 취소하거나 종료하기
 def CancelModifyOrder(stockcode, order_num , order_amt , order_price, mode = "CANCEL", Errlog="YES"):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     TrId = "TTTT1004U"
     if Common.GetNowDist() == "VIRTUAL":
@@ -1350,7 +1288,7 @@ def CancelModifyOrder(stockcode, order_num , order_amt , order_price, mode = "CA
         "hashkey" : Common.GetHashKey(data)
     }
 
-    res = requests.post(URL, headers=headers, data=json.dumps(data))
+    res = Common.KisPost(URL, headers=headers, data=json.dumps(data))
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
 
@@ -1389,10 +1327,6 @@ def CancelAllOrders(stockcode = "", side = "ALL"):
 #p_code -> D:일, W:주, M:월 
 def GetOhlcv(stock_code, p_code, adj_ok = "1"):
 
-    time.sleep(0.2)
-    #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-    if Common.GetNowDist() == "VIRTUAL":
-        time.sleep(0.31)
 
     PATH = "/uapi/overseas-price/v1/quotations/dailyprice"
     URL = f"{Common.GetUrlBase(Common.GetNowDist())}/{PATH}"
@@ -1423,7 +1357,7 @@ def GetOhlcv(stock_code, p_code, adj_ok = "1"):
     }
 
     # 호출
-    res = requests.get(URL, headers=headers, params=params)
+    res = Common.KisGet(URL, headers=headers, params=params)
     
 
     if res.status_code == 200 and res.json()["rt_cd"] == '0':
@@ -1511,10 +1445,6 @@ def GetOhlcvNew(stock_code, p_code, get_count, adj_ok = "1"):
 
 
     while DataLoad:
-        time.sleep(0.2)
-        #모의계좌는 초당 2건만 허용하게 변경 - 24.04.01
-        if Common.GetNowDist() == "VIRTUAL":
-            time.sleep(0.31)
 
         print("...Data.Length..", len(OhlcvList), "-->", get_count)
         if len(OhlcvList) >= get_count:
@@ -1548,7 +1478,7 @@ def GetOhlcvNew(stock_code, p_code, get_count, adj_ok = "1"):
         }
 
         # 호출
-        res = requests.get(URL, headers=headers, params=params)
+        res = Common.KisGet(URL, headers=headers, params=params)
 
         
 
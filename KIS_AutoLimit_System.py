@@ -154,8 +154,7 @@ for botOrderPath in BotOrderPathList:
                                             print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Done<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                                             #미체결 수량이 없다면 완료!!!
                                             AutoLimitData['IsDone'] = 'Y'
-                                            with open(botOrderPath, 'w') as outfile:
-                                                json.dump(AutoOrderList, outfile)
+                                            Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
                                     break
 
                         except Exception as e:
@@ -180,8 +179,7 @@ for botOrderPath in BotOrderPathList:
                                 print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Done<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                                 #미체결 수량이 없다면 완료!!!
                                 AutoLimitData['IsDone'] = 'Y'
-                                with open(botOrderPath, 'w') as outfile:
-                                    json.dump(AutoOrderList, outfile)
+                                Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
 
 
                         #유효한 주문이 들어간지 체크합니다.
@@ -539,8 +537,7 @@ for botOrderPath in BotOrderPathList:
 
 
 
-                                with open(botOrderPath, 'w') as outfile:
-                                    json.dump(AutoOrderList, outfile)
+                                Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
                     
                     
                     
@@ -549,8 +546,7 @@ for botOrderPath in BotOrderPathList:
                         print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Cancel<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                         #장이 안열렸으면 취소처리!
                         AutoLimitData['IsCancel'] = 'Y'
-                        with open(botOrderPath, 'w') as outfile:
-                            json.dump(AutoOrderList, outfile)
+                        Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
                 #US일 경우
                 else:
                     #장이 열린 경우에만 필요한 처리를 할 수 있어요
@@ -600,8 +596,7 @@ for botOrderPath in BotOrderPathList:
                                             print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Done<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                                             #미체결 수량이 없다면 완료!!!
                                             AutoLimitData['IsDone'] = 'Y'
-                                            with open(botOrderPath, 'w') as outfile:
-                                                json.dump(AutoOrderList, outfile)
+                                            Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
                                     break
 
                         except Exception as e:
@@ -624,8 +619,7 @@ for botOrderPath in BotOrderPathList:
                                 print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Done<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                                 #미체결 수량이 없다면 완료!!!
                                 AutoLimitData['IsDone'] = 'Y'
-                                with open(botOrderPath, 'w') as outfile:
-                                    json.dump(AutoOrderList, outfile)
+                                Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
 
                         #유효한 주문이 들어간지 체크합니다.
                         OrderOk = "OK"
@@ -823,16 +817,14 @@ for botOrderPath in BotOrderPathList:
 
 
 
-                                with open(botOrderPath, 'w') as outfile:
-                                    json.dump(AutoOrderList, outfile)
+                                Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
 
                     #장이 닫혔다면 미국의 모든 주문은 취소되었을 테니 취소 처리를 해줍니다
                     else:
                         print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>Order Cancel<<<<<<<<<<<<<<<<<<<<<<<<<<<<<")
                         #장이 안열렸으면 취소처리!
                         AutoLimitData['IsCancel'] = 'Y'
-                        with open(botOrderPath, 'w') as outfile:
-                            json.dump(AutoOrderList, outfile)
+                        Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
 
            
             #완료가 된 주문이라면 취소가 된 주문이기도 하니 그 처리를 해줍니다!
@@ -840,8 +832,7 @@ for botOrderPath in BotOrderPathList:
                 AutoLimitData['IsCancel'] = 'Y'
 
                 #파일에 저장!
-                with open(botOrderPath, 'w') as outfile:
-                    json.dump(AutoOrderList, outfile)
+                Common.UpdateAutoLimitData(botOrderPath, AutoLimitData)
 
         except Exception as e:
             print("Exception by First")
@@ -851,27 +842,16 @@ for botOrderPath in BotOrderPathList:
 
     ############### 주문 중 오래된 필요 없는 것들을 파일에서 지워주는 로직 입니다 ######################################
     #10일이나 지난 주문은 무조건 삭제처리한다.. 보통 완료처리 되거나 취소처리 된 상태! (주문은 1일동안만 유효하므로..)
-    AutoOrderList = list()
-
-    try:
-        with open(botOrderPath, 'r') as json_file:
-            AutoOrderList = json.load(json_file)
-
-    except Exception as e:
-        print("Exception by First")
-
-    print("---DELETE Logic Start---")
-    for AutoLimitData in AutoOrderList:
-        #print("---")
-       # print(int(AutoLimitData['DelDate']), int(Common.GetNowDateStr(AutoLimitData['Area'],"NONE")))
-        if int(AutoLimitData['DelDate']) < int(Common.GetNowDateStr(AutoLimitData['Area'],"NONE")):
-            AutoOrderList.remove(AutoLimitData)
+    #봇이 주문을 추가하는 중에 끼어들지 않도록 파일 락을 잡고 읽고-지우고-저장한다
+    with Common.StateFileLock(botOrderPath):
 
+        AutoOrderList = Common.LoadJson(botOrderPath, list())
 
-    time.sleep(random.random()*0.01)
+        print("---DELETE Logic Start---")
+        AutoOrderList = [AutoLimitData for AutoLimitData in AutoOrderList
+                         if int(AutoLimitData['DelDate']) >= int(Common.GetNowDateStr(AutoLimitData['Area'],"NONE"))]
 
-    with open(botOrderPath, 'w') as outfile:
-        json.dump(AutoOrderList, outfile)
+        Common.SaveJsonAtomic(botOrderPath, AutoOrderList)
 
     print("---DELETE Logic End---")
 
@@ -28,7 +28,18 @@ import KIS_API_Helper_US as KisUS
 import KIS_API_Helper_KR as KisKR
 
 import time
+import math
 import random
+import threading
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None   #윈도우에서는 프로세스 내부 버킷만 사용
 
 
 import FinanceDataReader as fdr
@@ -203,7 +214,141 @@ def GetUrlBase(dist = "REAL"):
     return stock_info[key]
 
 
-       
+
+
+############################################################################################################################################################
+#한투 API 공용 HTTP 세션! 계좌 구분(REAL/VIRTUAL..)마다 세션 1개를 만들어 두고 같이 쓴다
+#커넥션을 재사용(keep-alive)하므로 매 호출마다 TLS 연결을 새로 맺지 않는다!
+KIS_HTTP_TIMEOUT = (3.05, 10)   #(연결 타임아웃, 응답 타임아웃) 초
+KIS_HTTP_POOL_SIZE = 10
+
+KisSessionDict = dict()
+KisSessionLock = threading.Lock()
+
+
+#해당 계좌 구분의 세션을 리턴! 없으면 만든다
+def GetSession(dist = None):
+    if dist is None or dist == "":
+        dist = NOW_DIST
+
+    with KisSessionLock:
+        session = KisSessionDict.get(dist)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=KIS_HTTP_POOL_SIZE, pool_maxsize=KIS_HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            KisSessionDict[dist] = session
+
+    return session
+
+
+#공용 세션으로 GET 요청! 보내기 전에 호출 속도 제한 토큰을 먼저 받는다
+def KisGet(url, headers = None, params = None, dist = None, timeout = None, rate_class = "API"):
+    if timeout is None:
+        timeout = KIS_HTTP_TIMEOUT
+    if rate_class is not None:
+        AcquireRateLimit(dist, rate_class)
+    return GetSession(dist).get(url, headers=headers, params=params, timeout=timeout)
+
+
+#공용 세션으로 POST 요청! 보내기 전에 호출 속도 제한 토큰을 먼저 받는다
+def KisPost(url, headers = None, data = None, dist = None, timeout = None, rate_class = "API"):
+    if timeout is None:
+        timeout = KIS_HTTP_TIMEOUT
+    if rate_class is not None:
+        AcquireRateLimit(dist, rate_class)
+    return GetSession(dist).post(url, headers=headers, data=data, timeout=timeout)
+
+
+
+############################################################################################################################################################
+#한투 API 호출 속도 제한 (토큰 버킷)!
+#예전처럼 매 호출마다 0.2초(모의는 0.51초)를 무조건 쉬지 않고, 초당 허용 건수만큼 채워지는 토큰을 꺼내 쓰다가 모자랄 때만 기다린다
+#버킷 상태는 락 파일에 저장하므로 같은 계좌를 쓰는 다른 스레드/봇(프로세스)끼리도 한도를 공유한다!
+#실계좌 초당 20건, 모의계좌 초당 2건이 한투 기준이라 실계좌는 약간 여유를 둔다
+KIS_RATE_PER_SEC = {
+    "API": {"REAL": 18.0, "VIRTUAL": 2.0},
+}
+KIS_RATE_LOCK_DIR = os.getenv("KIS_RATE_LOCK_DIR", "/tmp")
+
+KisRateLock = threading.Lock()
+KisRateBucketDict = dict()   #락 파일을 못 쓰는 환경에서 쓰는 프로세스 내부 버킷
+
+
+#계좌 구분/호출 종류에 맞는 초당 허용 건수를 리턴! (REAL2 같은 다계좌도 실계좌 기준)
+def GetRateLimitPerSec(dist, rate_class = "API"):
+    rate_dict = KIS_RATE_PER_SEC.get(rate_class, KIS_RATE_PER_SEC["API"])
+    if dist == "VIRTUAL":
+        return rate_dict["VIRTUAL"]
+    return rate_dict["REAL"]
+
+
+#버킷에서 토큰 1개를 꺼낸다! 꺼냈으면 0, 모자라면 기다려야 하는 시간(초)을 리턴
+def TakeRateToken(dist, rate_class = "API"):
+
+    rate = GetRateLimitPerSec(dist, rate_class)
+    capacity = max(1.0, rate)   #최대 1초 분량까지 몰아서 호출 가능
+    bucket_key = str(dist) + "_" + rate_class
+
+    fd = None
+    try:
+        if fcntl is not None:
+            fd = os.open(os.path.join(KIS_RATE_LOCK_DIR, "kis_rate_" + bucket_key + ".lock"), os.O_RDWR | os.O_CREAT, 0o666)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+    except Exception:
+        if fd is not None:
+            os.close(fd)
+        fd = None
+
+    try:
+        now_ts = time.time()
+        tokens, last_ts = KisRateBucketDict.get(bucket_key, (capacity, now_ts))
+
+        if fd is not None:
+            try:
+                raw = os.pread(fd, 64, 0).decode().split()
+                tokens, last_ts = float(raw[0]), float(raw[1])
+            except Exception:
+                tokens, last_ts = capacity, now_ts
+
+        tokens = min(capacity, tokens + max(0.0, now_ts - last_ts) * rate)
+
+        wait_sec = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            wait_sec = (1.0 - tokens) / rate
+
+        KisRateBucketDict[bucket_key] = (tokens, now_ts)
+
+        if fd is not None:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, ("%.6f %.6f" % (tokens, now_ts)).encode(), 0)
+
+        return wait_sec
+
+    finally:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+#호출 전에 토큰을 받을 때까지 기다린다!
+def AcquireRateLimit(dist = None, rate_class = "API"):
+    if dist is None or dist == "":
+        dist = NOW_DIST
+
+    while True:
+        with KisRateLock:
+            wait_sec = TakeRateToken(dist, rate_class)
+        if wait_sec <= 0:
+            return
+        time.sleep(wait_sec)
+
+############################################################################################################################################################
+
+
 
 #토큰 값을 리퀘스트 해서 실제로 만들어서 파일에 저장하는 함수!! 첫번째 파라미터: "REAL" 실계좌, "VIRTUAL" 모의계좌
 def MakeToken(dist = "REAL"):
@@ -218,7 +363,7 @@ def MakeToken(dist = "REAL"):
 
     PATH = "oauth2/tokenP"
     URL = f"{GetUrlBase(dist)}/{PATH}"
-    res = requests.post(URL, headers=headers, data=json.dumps(body))
+    res = KisPost(URL, headers=headers, data=json.dumps(body), dist=dist, rate_class=None)
     
 
     if res.status_code == 200:
@@ -238,8 +383,15 @@ def MakeToken(dist = "REAL"):
                 pass
         if "access_token_token_expired" in token_resp:
             dataDict["access_token_token_expired"] = str(token_resp["access_token_token_expired"])
-        with open(GetTokenPath(dist), 'w') as outfile:
+
+        #임시 파일에 쓰고 교체해서 다른 봇이 반쯤 써진 파일을 읽지 않도록!
+        token_path = GetTokenPath(dist)
+        tmp_path = token_path + "." + str(os.getpid()) + ".tmp"
+        with open(tmp_path, 'w') as outfile:
             json.dump(dataDict, outfile)   
+        os.replace(tmp_path, token_path)
+
+        _set_token_cache(dist, dataDict)
 
         print("TOKEN : ", my_token)
 
@@ -250,13 +402,35 @@ def MakeToken(dist = "REAL"):
         return "FAIL"
 
 
+############################################################################################################################################################
+#토큰 메모리 캐시! 한번 읽은 토큰은 만료(갱신) 시점 전까지 파일을 다시 읽지 않는다
+TOKEN_SAFETY_SEC = 180   #만료 3분 전부터 갱신
+
+KisTokenCacheDict = dict()   #계좌 구분 -> (토큰 딕셔너리, 갱신해야 하는 시각)
+KisTokenLock = threading.Lock()
+
+
+def _set_token_cache(dist, token_dict):
+    expire_at = _get_token_expire_at(token_dict)
+    if expire_at is None:
+        KisTokenCacheDict.pop(dist, None)
+        return
+    KisTokenCacheDict[dist] = (token_dict, expire_at - TOKEN_SAFETY_SEC)
+
+
 def _clear_token_file(dist = "REAL"):
+    KisTokenCacheDict.pop(dist, None)
     try:
         os.remove(GetTokenPath(dist))
     except Exception:
         pass
 
 
+#토큰 파일과 메모리 캐시를 모두 지운다! 다음 GetToken 호출 때 새로 발급받는다
+def ClearToken(dist = "REAL"):
+    _clear_token_file(dist)
+
+
 def _parse_jwt_exp(token: str):
     try:
         parts = token.split(".")
@@ -274,17 +448,15 @@ def _parse_jwt_exp(token: str):
         return None
 
 
-def _is_token_expired(token_dict):
-    now_ts = int(time.time())
-    # 만료 3분 전부터 갱신
-    safety_sec = 180
+#토큰의 만료 시각(unix time)을 리턴! 알 수 없으면 None
+def _get_token_expire_at(token_dict):
 
     # 1) issued_at + expires_in
     try:
         issued_at = int(token_dict.get("issued_at", 0))
         expires_in = int(token_dict.get("expires_in", 0))
         if issued_at > 0 and expires_in > 0:
-            return now_ts >= (issued_at + expires_in - safety_sec)
+            return issued_at + expires_in
     except Exception:
         pass
 
@@ -293,7 +465,17 @@ def _is_token_expired(token_dict):
     if token:
         exp = _parse_jwt_exp(token)
         if exp is not None:
-            return now_ts >= (exp - safety_sec)
+            return exp
+
+    return None
+
+
+def _is_token_expired(token_dict):
+    now_ts = int(time.time())
+
+    expire_at = _get_token_expire_at(token_dict)
+    if expire_at is not None:
+        return now_ts >= (expire_at - TOKEN_SAFETY_SEC)
 
     # 3) 메타데이터가 없다면 보수적으로 재발급
     return True
@@ -301,13 +483,41 @@ def _is_token_expired(token_dict):
 
 #파일에 저장된 토큰값을 읽는 함수.. 만약 파일이 없다면 MakeToken 함수를 호출한다!
 def GetToken(dist = "REAL"):
+
+    #메모리에 있는 토큰이 아직 유효하면 파일을 읽지 않고 바로 리턴!
+    cached = KisTokenCacheDict.get(dist)
+    if cached is not None and time.time() < cached[1]:
+        return cached[0]['authorization']
+
+    #여러 봇이 동시에 갱신하지 않도록 락 파일을 잡고 처리한다 (한투는 토큰 발급을 1분에 1번으로 제한)
+    with KisTokenLock:
+        lock_fd = None
+        try:
+            if fcntl is not None:
+                lock_fd = os.open(GetTokenPath(dist) + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        except Exception:
+            if lock_fd is not None:
+                os.close(lock_fd)
+            lock_fd = None
+
+        try:
+            return _load_or_make_token(dist)
+        finally:
+            if lock_fd is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                os.close(lock_fd)
+
+
+#락을 잡은 상태에서 토큰 파일을 읽고 없거나 만료되었으면 새로 발급한다!
+def _load_or_make_token(dist = "REAL"):
         
     #빈 딕셔너리를 선언합니다!
     dataDict = dict()
 
     try:
 
-        #이 부분이 파일을 읽어서 딕셔너리에 넣어주는 로직입니다. 
+        #이 부분이 파일을 읽어서 딕셔너리에 넣어주는 로직입니다. 먼저 락을 잡은 다른 봇이 이미 갱신했을 수도 있다!
         with open(GetTokenPath(dist), 'r') as json_file:
             dataDict = json.load(json_file)
         
@@ -320,6 +530,8 @@ def GetToken(dist = "REAL"):
             _clear_token_file(dist)
             return MakeToken(dist)
 
+        _set_token_cache(dist, dataDict)
+
         return dataDict['authorization']
 
     except Exception as e:
@@ -342,7 +554,7 @@ def GetHashKey(datas):
     'appSecret' : GetAppSecret(NOW_DIST),
     }
 
-    res = requests.post(URL, headers=headers, data=json.dumps(datas))
+    res = KisPost(URL, headers=headers, data=json.dumps(datas), dist=NOW_DIST)
 
     if res.status_code == 200 :
         return res.json()["HASH"]
@@ -422,9 +634,161 @@ def GetBalanceKrwTotal():
 
 
 ############################################################################################################################################################
-#OHLCV 값을 가져옴!!
+#OHLCV 로컬 저장소!
+#(지역, 종목코드, 수정주가여부) 별로 파일 1개씩 저장해 두고 다음부터는 저장된 데이터를 먼저 읽은 뒤
+#한투 일봉(최근 100개 정도)을 1번만 받아서 마지막 저장 날짜 이후의 데이터만 이어 붙인다!
+OHLCV_STORE_USE = os.getenv("OHLCV_STORE_USE", "1") == "1"     #0으로 두면 예전처럼 매번 전체 데이터를 받아온다
+OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", "./ohlcv_store")
+OHLCV_STORE_FRESH_SEC = int(os.getenv("OHLCV_STORE_FRESH_SEC", "0"))  #마지막 갱신 후 이 시간(초) 안이면 한투 호출도 생략 (튜닝처럼 연달아 돌릴 때만 켠다. 실봇은 0 = 항상 최신 봉 확인)
+OHLCV_FETCH_MODE = os.getenv("OHLCV_FETCH_MODE", "SERIAL")   #SERIAL: 소스를 순서대로 시도, PARALLEL: 동시에 요청해서 먼저 온 걸 사용
+OHLCV_PARALLEL_TIMEOUT = float(os.getenv("OHLCV_PARALLEL_TIMEOUT", "30"))
+OHLCV_BATCH_WORKERS = int(os.getenv("OHLCV_BATCH_WORKERS", "4"))   #GetOhlcvBatch 동시 요청 수
+OHLCV_STORE_ADJ_TOL = 0.005   #겹치는 구간 종가가 이 비율 이상 다르면 수정주가가 바뀐 것(분할/배당 등)으로 보고 전체를 다시 받는다
+
+
+#저장 파일 경로를 리턴!
+def GetOhlcvStorePath(area, stock_code, adj_ok = "1"):
+    return os.path.join(OHLCV_STORE_DIR, f"{area}_{stock_code}_{adj_ok}.pkl")
+
+
+#저장된 OHLCV를 읽어온다! 없거나 깨졌으면 None
+def LoadOhlcvStore(area, stock_code, adj_ok = "1"):
+    try:
+        df = pd.read_pickle(GetOhlcvStorePath(area, stock_code, adj_ok))
+        if df is None or len(df) == 0:
+            return None
+        return df
+    except Exception:
+        return None
+
+
+#OHLCV를 파일로 저장한다! 임시 파일에 쓴 다음 교체하므로 중간에 죽어도 기존 파일은 깨지지 않는다
+def SaveOhlcvStore(area, stock_code, df, adj_ok = "1"):
+    try:
+        os.makedirs(OHLCV_STORE_DIR, exist_ok=True)
+        store_path = GetOhlcvStorePath(area, stock_code, adj_ok)
+        tmp_path = store_path + "." + str(os.getpid()) + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, store_path)
+    except Exception as e:
+        print("OHLCV 저장 실패:", e)
+
+
+#저장된 데이터에 한투 최신 일봉을 이어 붙여서 리턴! 이어 붙일 수 없는 상황이면 None을 리턴해서 전체를 다시 받게 한다
+def TopUpOhlcvStore(area, stock_code, df_store, adj_ok = "1"):
+
+    if area == "US":
+        df_new = KisUS.GetOhlcv(stock_code,"D",adj_ok)
+    else:
+        df_new = KisKR.GetOhlcv(stock_code,"D",adj_ok)
+
+    if not isinstance(df_new, pd.DataFrame) or len(df_new) == 0:
+        return None
+
+    #겹치는 구간이 없다면 중간에 빠진 데이터가 있는 거니깐 전체를 다시 받는다!
+    overlap = df_store.index.intersection(df_new.index)
+    if len(overlap) == 0:
+        return None
+
+    #저장된 마지막 봉은 장중에 저장된 미완성 봉일 수 있으니 비교에서 뺀다
+    check_dates = overlap[overlap < df_store.index[-1]]
+    if len(check_dates) > 0:
+        old_close = df_store.loc[check_dates, 'close'].astype(float)
+        new_close = df_new.loc[check_dates, 'close'].astype(float)
+        if ((old_close - new_close).abs() / new_close).max() > OHLCV_STORE_ADJ_TOL:
+            print("수정주가 변경 감지! 전체 데이터를 다시 받습니다:", stock_code)
+            return None
+
+    #한투 데이터의 첫 날짜부터는 새 데이터로 덮어쓴다 (미완성 봉 갱신)
+    df = pd.concat([df_store[df_store.index < df_new.index[0]], df_new[df_store.columns.intersection(df_new.columns)]])
+    df['change'] = (df['close'] - df['close'].shift(1)) / df['close'].shift(1)
+
+    return df
+
+
+#OHLCV 값을 가져옴!! 로컬 저장소를 먼저 보고 모자랄 때만 전체 데이터를 받는다!
 def GetOhlcv(area, stock_code, limit = 500, adj_ok = "1"):
 
+    if OHLCV_STORE_USE == False:
+        return GetOhlcvRemote(area, stock_code, limit, adj_ok)
+
+    df_store = LoadOhlcvStore(area, stock_code, adj_ok)
+
+    if df_store is not None and len(df_store) >= limit:
+
+        try:
+            store_age = time.time() - os.path.getmtime(GetOhlcvStorePath(area, stock_code, adj_ok))
+        except Exception:
+            store_age = OHLCV_STORE_FRESH_SEC
+
+        if store_age < OHLCV_STORE_FRESH_SEC:
+            print("OHLCV 저장소 사용:", stock_code, len(df_store))
+            return df_store[-limit:]
+
+        try:
+            df = TopUpOhlcvStore(area, stock_code, df_store, adj_ok)
+        except Exception as e:
+            print("OHLCV 이어 붙이기 실패:", e)
+            df = None
+
+        if df is not None:
+            SaveOhlcvStore(area, stock_code, df, adj_ok)
+            print("OHLCV 저장소 + 신규 데이터:", stock_code, len(df))
+            return df[-limit:]
+
+
+    df = GetOhlcvRemote(area, stock_code, limit, adj_ok)
+
+    #끝까지 다 가져온 경우만 저장해 둔다 (한투 100개만 받아온 실패 케이스는 저장 안함)
+    if isinstance(df, pd.DataFrame) and len(df) >= limit:
+        if df_store is None or len(df) >= len(df_store):
+            SaveOhlcvStore(area, stock_code, df, adj_ok)
+
+    return df
+
+
+
+#여러 종목의 OHLCV를 동시에 가져옴!! 한투 호출은 공용 속도 제한을 같이 쓰므로 한도를 넘지 않는다
+#리턴은 {종목코드: df} 딕셔너리 (넘긴 순서 유지, 실패한 종목은 None)
+#long_format=True 면 stock_code 컬럼을 붙여 하나로 합친 DataFrame을 리턴
+def GetOhlcvBatch(area, stock_code_list, limit = 500, adj_ok = "1", long_format = False):
+
+    OhlcvDict = dict()
+
+    if len(stock_code_list) > 0:
+        with ThreadPoolExecutor(max_workers=max(1, min(OHLCV_BATCH_WORKERS, len(stock_code_list)))) as executor:
+
+            FutureDict = dict()
+            for stock_code in stock_code_list:
+                FutureDict[executor.submit(GetOhlcv, area, stock_code, limit, adj_ok)] = stock_code
+
+            for future in as_completed(FutureDict):
+                stock_code = FutureDict[future]
+                try:
+                    OhlcvDict[stock_code] = future.result()
+                except Exception as e:
+                    print(stock_code, "OHLCV 가져오기 실패:", e)
+                    OhlcvDict[stock_code] = None
+
+    OhlcvDict = {stock_code: OhlcvDict.get(stock_code) for stock_code in stock_code_list}
+
+    if long_format == True:
+        df_list = [df.assign(stock_code=stock_code) for stock_code, df in OhlcvDict.items() if isinstance(df, pd.DataFrame)]
+        if len(df_list) == 0:
+            return pd.DataFrame()
+        return pd.concat(df_list)
+
+    return OhlcvDict
+
+
+
+#OHLCV 값을 원격(한투/FDR/네이버/야후)에서 전부 가져옴!!
+#OHLCV_FETCH_MODE 가 PARALLEL 이면 여러 소스를 동시에 요청해서 가장 먼저 온 정상 데이터를 쓴다
+def GetOhlcvRemote(area, stock_code, limit = 500, adj_ok = "1"):
+
+    if OHLCV_FETCH_MODE == "PARALLEL":
+        return GetOhlcvParallel(area, stock_code, limit, adj_ok)
+
     Adjlimit = limit * 1.7 #주말을 감안하면 5개를 가져오려면 적어도 7개는 뒤져야 된다. 1.4가 이상적이지만 혹시 모를 연속 공휴일 있을지 모르므로 1.7로 보정해준다
 
     df = None
@@ -604,6 +968,87 @@ def GetOhlcv(area, stock_code, limit = 500, adj_ok = "1"):
 
 
 
+#OHLCV를 여러 소스에서 동시에 가져옴!!
+#한투 데이터와 1,2순위 외부 소스(한국: FDR/네이버, 미국: 야후/FDR)를 스레드로 동시에 요청하고
+#가장 먼저 도착한 정상 데이터를 쓴 뒤 기존처럼 한투 데이터로 최신 날짜를 보충한다. 나머지 결과는 버린다
+def GetOhlcvParallel(area, stock_code, limit = 500, adj_ok = "1"):
+
+    Adjlimit = limit * 1.7 #주말을 감안하면 5개를 가져오려면 적어도 7개는 뒤져야 된다. 1.4가 이상적이지만 혹시 모를 연속 공휴일 있을지 모르므로 1.7로 보정해준다
+
+    if area == "US":
+        KisHelper = KisUS
+        SourceList = [("Yfinance", GetOhlcv2), ("FDR", GetOhlcv1)]
+    else:
+        KisHelper = KisKR
+        SourceList = [("FDR", GetOhlcv1), ("web.DataReader", GetOhlcv2)]
+
+    df = None
+    df_kis = None
+
+    executor = ThreadPoolExecutor(max_workers=len(SourceList) + 1)
+
+    try:
+        kis_future = executor.submit(KisHelper.GetOhlcv, stock_code, "D", adj_ok)
+
+        SourceFutureDict = dict()
+        for source_name, source_func in SourceList:
+            SourceFutureDict[executor.submit(source_func, area, stock_code, Adjlimit, adj_ok)] = source_name
+
+        try:
+            for future in as_completed(SourceFutureDict, timeout=OHLCV_PARALLEL_TIMEOUT):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(SourceFutureDict[future], "실패:", e)
+                    continue
+
+                if isinstance(result, pd.DataFrame) and len(result) > 0:
+                    df = result
+                    print(SourceFutureDict[future], "데이터 먼저 도착! 마지막 날짜:", df.index[-1])
+                    break
+        except FuturesTimeoutError:
+            print("외부 소스 응답 시간 초과!")
+
+        try:
+            df_kis = kis_future.result(timeout=OHLCV_PARALLEL_TIMEOUT)
+            if not isinstance(df_kis, pd.DataFrame) or len(df_kis) == 0:
+                df_kis = None
+        except Exception as e:
+            print("한투 데이터 실패:", e)
+            df_kis = None
+
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+    if df is None:
+        print("----Last try----")
+        try:
+            df = KisHelper.GetOhlcvNew(stock_code,"D",limit,adj_ok)
+            if df is None or len(df) == 0:
+                df = None
+        except Exception as e:
+            print("Last Failed...",e)
+            df = None
+
+        if df is None:
+            print("모두 실패하여 맨 처음 가져온 100개 데이터만 리턴!")
+            return df_kis
+
+    elif df_kis is not None:
+        print("한투 데이터 마지막 날짜:", df_kis.index[-1])
+        if pd.to_datetime(df_kis.index[-1]) > pd.to_datetime(df.index[-1]):
+            # 한투 데이터에서 외부 소스 마지막 날짜 이후의 데이터만 추출해서 합치기
+            df = pd.concat([df, df_kis[df_kis.index > df.index[-1]]])
+            print("신규 데이터 누락으로 인해 한투 데이터 추가 완료!")
+
+    print("---", len(df))
+    return df[-limit:]
+
+
+
+
+
 #한국 주식은 KRX 정보데이터시스템에서 가져온다. 그런데 미국주식 크롤링의 경우 investing.com 에서 가져오는데 안전하게 2초 정도 쉬어야 한다!
 # https://financedata.github.io/posts/finance-data-reader-users-guide.html
 def GetOhlcv1(area, stock_code, limit = 500, adj_ok = "1"):
@@ -926,6 +1371,101 @@ def AutoLimitDoAgain(botname, area, stock_code, target_price, do_amt, stock_type
             
 
 
+############################################################################################################################################################
+#봇 상태 파일(JSON) 저장!
+#예전처럼 open(path,'w') 로 바로 덮어쓰면 쓰는 도중 죽었을 때(OOM 등) 파일이 반쯤 잘린 채로 남는다
+#임시 파일에 쓰고 fsync 한 뒤 이름을 바꿔(rename) 교체하니 파일은 항상 예전 내용이나 새 내용 둘 중 하나다!
+#여러 번 바뀌는 상태는 MarkStateDirty 로 모아두었다가 FlushState 에서 파일마다 1번만 저장한다
+
+StateDirtyDict = dict()   #파일 경로 -> 저장할 데이터 (FlushState 때 저장)
+StateDirtyLock = threading.Lock()
+
+
+#JSON 파일을 원자적으로 저장! (임시 파일 + fsync + rename)
+def SaveJsonAtomic(file_path, data):
+
+    tmp_path = file_path + "." + str(os.getpid()) + "_" + str(threading.get_ident()) + ".tmp"
+    try:
+        with open(tmp_path, 'w') as outfile:
+            json.dump(data, outfile)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(tmp_path, file_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    #이름 바꾼 것까지 디스크에 남도록 폴더도 fsync (윈도우는 안 되니 건너뜀)
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+#JSON 파일 읽기! 없거나 깨졌으면 default 를 리턴
+def LoadJson(file_path, default = None):
+    try:
+        with open(file_path, 'r') as json_file:
+            return json.load(json_file)
+    except Exception as e:
+        return default
+
+
+#파일을 읽고-고치고-쓰는 동안 다른 봇(프로세스)이 끼어들지 못하게 잡는 락! with StateFileLock(path): ...
+#파일 자체는 rename 으로 바뀌니 옆에 .lock 파일을 따로 만들어 잡는다
+class StateFileLock:
+
+    def __init__(self, file_path):
+        self.lock_path = file_path + ".lock"
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        return False
+
+
+#저장할 상태를 표시만 해둔다! 같은 파일을 여러 번 표시해도 FlushState 때 마지막 데이터로 1번만 저장
+def MarkStateDirty(file_path, data):
+    with StateDirtyLock:
+        StateDirtyDict[file_path] = data
+
+
+#표시해 둔 상태 파일들을 모두 저장한다! (실패한 파일은 남겨뒀다가 다음에 다시)
+def FlushState():
+    with StateDirtyLock:
+        DirtyList = list(StateDirtyDict.items())
+        StateDirtyDict.clear()
+
+    for file_path, data in DirtyList:
+        try:
+            SaveJsonAtomic(file_path, data)
+        except Exception as e:
+            print("상태 파일 저장 실패:", file_path, e)
+            with StateDirtyLock:
+                StateDirtyDict.setdefault(file_path, data)
+
+
+#스크립트가 끝날 때(예외로 끝나도) 남은 상태를 저장한다
+atexit.register(FlushState)
+
+
+
 #자동 주문 데이터를 각 봇 파일에 저장을 하는 함수!
 def SaveAutoLimitDoAgainData(AutoLimitData):
 
@@ -933,21 +1473,15 @@ def SaveAutoLimitDoAgainData(AutoLimitData):
     #파일 경로입니다.
     auto_order_file_path = "/var/autobot/" + AutoLimitData['Area'] + "_" + AutoLimitData['NowDist'] + "_" + AutoLimitData['BotName'] + "AutoOrderList.json"
 
-    #이렇게 랜덤하게 쉬어줘야 혹시나 있을 중복 파일 접근 방지!
-    time.sleep(random.random()*0.1)
-    
-    #자동 주문 리스트 읽기!
-    AutoOrderList = list()
-    try:
-        with open(auto_order_file_path, 'r') as json_file:
-            AutoOrderList = json.load(json_file)
-    except Exception as e:
-        print("Exception by First")
+    #파일 락을 잡고 읽고-추가하고-저장한다! (예전엔 랜덤하게 쉬어서 중복 접근을 피했다)
+    with StateFileLock(auto_order_file_path):
 
-    #!!!! 넘어온 데이터를 리스트에 추가하고 저장하기!!!!
-    AutoOrderList.append(AutoLimitData)
-    with open(auto_order_file_path, 'w') as outfile:
-        json.dump(AutoOrderList, outfile)
+        #자동 주문 리스트 읽기!
+        AutoOrderList = LoadJson(auto_order_file_path, list())
+
+        #!!!! 넘어온 데이터를 리스트에 추가하고 저장하기!!!!
+        AutoOrderList.append(AutoLimitData)
+        SaveJsonAtomic(auto_order_file_path, AutoOrderList)
 
 
 
@@ -955,33 +1489,28 @@ def SaveAutoLimitDoAgainData(AutoLimitData):
 
     #봇마다 고유한 경로(자동주문리스트 파일의 경로)를 1개씩 저장해 둔다
     #이를 for문 돌면 전체 모든 봇의 자동주문 리스트에 접근해서 처리할 수 있다
-    time.sleep(random.random()*0.1)
     bot_path_file_path = "/var/autobot/BotOrderListPath.json"
-    BotOrderPathList = list()
-    try:
-        with open(bot_path_file_path, 'r') as json_file:
-            BotOrderPathList = json.load(json_file)
 
-    except Exception as e:
-        print("Exception by First")
+    with StateFileLock(bot_path_file_path):
 
+        BotOrderPathList = LoadJson(bot_path_file_path, list())
+
+        #읽어와서 중복되지 않은 것만 등록한다! 현재 저 파일에 없다면 추가해준다!!
+        if auto_order_file_path not in BotOrderPathList:
+            BotOrderPathList.append(auto_order_file_path)
+            SaveJsonAtomic(bot_path_file_path, BotOrderPathList)
 
 
-    #읽어와서 중복되지 않은 것만 등록한다!
-    IsAlreadyIn = False
-    for botOrderPath in BotOrderPathList:
-        if botOrderPath == auto_order_file_path:
-            IsAlreadyIn = True
-            break
 
-    #현재 저 파일에 없다면 추가해준다!!
-    if IsAlreadyIn == False:
-        BotOrderPathList.append(auto_order_file_path)
 
-        with open(bot_path_file_path, 'w') as outfile:
-            json.dump(BotOrderPathList, outfile)
 
+#봇 자동 주문 파일에서 같은 Id 주문 1건만 넘어온 데이터로 바꿔 저장한다! (락을 잡고 다시 읽어서 그 사이 추가된 주문은 그대로 둔다)
+def UpdateAutoLimitData(bot_order_path, AutoLimitData):
 
+    with StateFileLock(bot_order_path):
+        AutoOrderList = LoadJson(bot_order_path, list())
+        AutoOrderList = [AutoLimitData if OrderData.get('Id') == AutoLimitData['Id'] else OrderData for OrderData in AutoOrderList]
+        SaveJsonAtomic(bot_order_path, AutoOrderList)
 
 
 
@@ -1096,10 +1625,10 @@ def DelAutoLimitOrder(AutoOrderId):
        
 
                     ##########실제로 리스트에서 제거#######
-                    AutoOrderList.remove(AutoLimitData)
-
-                    with open(botOrderPath, 'w') as outfile:
-                        json.dump(AutoOrderList, outfile)
+                    #락을 잡고 파일을 다시 읽어서 이 주문만 뺀다 (그 사이 다른 봇이 추가한 주문이 날아가지 않게)
+                    with StateFileLock(botOrderPath):
+                        AutoOrderList = [OrderData for OrderData in LoadJson(botOrderPath, AutoOrderList) if OrderData.get('Id') != AutoOrderId]
+                        SaveJsonAtomic(botOrderPath, AutoOrderList)
 
                     IsFindOrder = True
 
@@ -1208,13 +1737,13 @@ def GetRSI(ohlcv,period,st):
 def GetBB(ohlcv,period,st,uni = 2.0):
     dic_bb = dict()
 
-    ohlcv = ohlcv[::-1]
-    ohlcv = ohlcv.shift(st + 1)
-    close = ohlcv["close"].iloc[::-1]
+    #전체 봉을 뒤집고 shift 하지 않고 st 기준 period개 구간만 잘라서 계산한다
+    lo, hi = GetBBWindow(len(ohlcv), period, st)
+    close = ohlcv["close"].iloc[lo:hi]
 
     unit = uni
-    bb_center=numpy.mean(close[len(close)-period:len(close)])
-    band1=unit*numpy.std(close[len(close)-period:len(close)])
+    bb_center=numpy.mean(close)
+    band1=unit*numpy.std(close)
 
     dic_bb['ma'] = float(bb_center)
     dic_bb['upper'] = float(bb_center + band1)
@@ -1223,6 +1752,16 @@ def GetBB(ohlcv,period,st,uni = 2.0):
     return dic_bb
 
 
+#볼린저 밴드 계산 구간 [lo, hi) 를 리턴! (예전 방식: 뒤집어서 shift(st + 1) 한 종가의 마지막 period개, 봉이 모자라면 있는 만큼)
+def GetBBWindow(length, period, st):
+    start = length - period
+    if start < 0:
+        start = max(length + start, 0)
+    lo = max(start + st + 1, 0)
+    hi = min(length + st + 1, length)
+    return lo, max(lo, hi)
+
+
 
 
 
@@ -1233,44 +1772,44 @@ def GetIC(ohlcv,st):
     close_prices = ohlcv['close']
     low_prices = ohlcv['low']
 
-
-    nine_period_high =  ohlcv['high'].shift(-2-st).rolling(window=9).max()
-    nine_period_low = ohlcv['low'].shift(-2-st).rolling(window=9).min()
-    ohlcv['conversion'] = (nine_period_high + nine_period_low) /2
+    #넘어온 ohlcv에 컬럼을 추가하지 않고 지역 변수로만 계산한다!
+    nine_period_high =  high_prices.shift(-2-st).rolling(window=9).max()
+    nine_period_low = low_prices.shift(-2-st).rolling(window=9).min()
+    conversion = (nine_period_high + nine_period_low) /2
     
     period26_high = high_prices.shift(-2-st).rolling(window=26).max()
     period26_low = low_prices.shift(-2-st).rolling(window=26).min()
-    ohlcv['base'] = (period26_high + period26_low) / 2
+    base = (period26_high + period26_low) / 2
     
-    ohlcv['sunhang_span_a'] = ((ohlcv['conversion'] + ohlcv['base']) / 2).shift(26)
+    sunhang_span_a = ((conversion + base) / 2).shift(26)
     
     
     period52_high = high_prices.shift(-2-st).rolling(window=52).max()
     period52_low = low_prices.shift(-2-st).rolling(window=52).min()
-    ohlcv['sunhang_span_b'] = ((period52_high + period52_low) / 2).shift(26)
+    sunhang_span_b = ((period52_high + period52_low) / 2).shift(26)
     
     
-    ohlcv['huhang_span'] = close_prices.shift(-26)
+    huhang_span = close_prices.shift(-26)
 
 
-    nine_period_high_real =  ohlcv['high'].rolling(window=9).max()
-    nine_period_low_real = ohlcv['low'].rolling(window=9).min()
-    ohlcv['conversion'] = (nine_period_high_real + nine_period_low_real) /2
+    nine_period_high_real =  high_prices.rolling(window=9).max()
+    nine_period_low_real = low_prices.rolling(window=9).min()
+    conversion = (nine_period_high_real + nine_period_low_real) /2
     
     period26_high_real = high_prices.rolling(window=26).max()
     period26_low_real = low_prices.rolling(window=26).min()
-    ohlcv['base'] = (period26_high_real + period26_low_real) / 2
+    base = (period26_high_real + period26_low_real) / 2
     
 
 
     
     dic_ic = dict()
 
-    dic_ic['conversion'] = ohlcv['conversion'].iloc[st]
-    dic_ic['base'] = ohlcv['base'].iloc[st]
-    dic_ic['huhang_span'] = ohlcv['huhang_span'].iloc[-27]
-    dic_ic['sunhang_span_a'] = ohlcv['sunhang_span_a'].iloc[-1]
-    dic_ic['sunhang_span_b'] = ohlcv['sunhang_span_b'].iloc[-1]
+    dic_ic['conversion'] = conversion.iloc[st]
+    dic_ic['base'] = base.iloc[st]
+    dic_ic['huhang_span'] = huhang_span.iloc[-27]
+    dic_ic['sunhang_span_a'] = sunhang_span_a.iloc[-1]
+    dic_ic['sunhang_span_b'] = sunhang_span_b.iloc[-1]
 
 
   
@@ -1284,15 +1823,16 @@ def GetIC(ohlcv,st):
 def GetMACD(ohlcv,st):
     macd_short, macd_long, macd_signal=12,26,9
 
-    ohlcv["MACD_short"]=ohlcv["close"].ewm(span=macd_short).mean()
-    ohlcv["MACD_long"]=ohlcv["close"].ewm(span=macd_long).mean()
-    ohlcv["MACD"]=ohlcv["MACD_short"] - ohlcv["MACD_long"]
-    ohlcv["MACD_signal"]=ohlcv["MACD"].ewm(span=macd_signal).mean() 
+    #넘어온 ohlcv에 컬럼을 추가하지 않는다!
+    MACD_short=ohlcv["close"].ewm(span=macd_short).mean()
+    MACD_long=ohlcv["close"].ewm(span=macd_long).mean()
+    MACD=MACD_short - MACD_long
+    MACD_signal=MACD.ewm(span=macd_signal).mean() 
 
     dic_macd = dict()
     
-    dic_macd['macd'] = ohlcv["MACD"].iloc[st]
-    dic_macd['macd_siginal'] = ohlcv["MACD_signal"].iloc[st]
+    dic_macd['macd'] = MACD.iloc[st]
+    dic_macd['macd_siginal'] = MACD_signal.iloc[st]
     dic_macd['ocl'] = dic_macd['macd'] - dic_macd['macd_siginal']
 
     return dic_macd
@@ -1314,3 +1854,643 @@ def GetStoch(ohlcv,period,st):
 
     return dic_stoch
 
+
+
+
+############################################################################################################################################################
+#증분 지표 엔진!
+#위의 GetMA/GetRSI/GetBB/GetMACD/GetStoch/GetIC 는 부를 때마다 넘어온 봉 전체로 롤링/EWM 을 다시 계산한다.
+#IndicatorState 는 종목/봉 종류(일봉, 분봉..)마다 하나씩 두고 새 봉이 들어오면 롤링합, EWM 상태, 덱만 갱신한다 (봉당 O(1)).
+#지표 값은 봉마다 리스트로 쌓아 두므로 st(-1 현재봉, -2 전봉 ...)를 여러 개 물어봐도 다시 계산하지 않는다.
+#처음 물어보는 지표/기간만 그때 한번 가지고 있는 봉 전체로 채운다.
+#
+#  df = GetOhlcv("KR", stock_code, 200)
+#  IndiState = GetIndicatorState(stock_code, "D", df)  #틱마다 불러도 새로 들어온 봉 / 바뀐 마지막 봉만 반영한다
+#  ma5_before = IndiState.GetMA(5, -2)
+#  rsi = IndiState.GetRSI(14, -1)
+#
+#값은 위 함수들과 같은 방식(pandas rolling/ewm 과 같은 계산 순서)으로 구한다.
+#단 EWM(RSI, MACD)은 처음 받은 봉부터 이어서 계산하므로 df 길이가 다르면 아주 작은 오차가 날 수 있다.
+
+#롤링 평균 - pandas rolling(period, min_periods).mean() 과 같은 보정합 방식 (빠지는 값을 먼저 빼고 새 값을 더한다)
+class _RollingMean:
+    def __init__(self, src, period, min_periods = None):
+        self.Src = src
+        self.Period = period
+        self.MinPeriods = period if min_periods is None else min_periods
+        self.Values = list()
+        self.Nobs = 0
+        self.Sum = 0.0
+        self.NegCnt = 0
+        self.CompAdd = 0.0
+        self.CompRemove = 0.0
+        self.SameCnt = 0
+        self.PrevValue = float("nan")
+        self.PrevState = None
+
+    def _Add(self, val):
+        if val == val:
+            self.Nobs += 1
+            y = val - self.CompAdd
+            t = self.Sum + y
+            self.CompAdd = t - self.Sum - y
+            self.Sum = t
+            if math.copysign(1.0, val) < 0:
+                self.NegCnt += 1
+            if val == self.PrevValue:
+                self.SameCnt += 1
+            else:
+                self.SameCnt = 1
+            self.PrevValue = val
+
+    def _Remove(self, val):
+        if val == val:
+            self.Nobs -= 1
+            y = -val - self.CompRemove
+            t = self.Sum + y
+            self.CompRemove = t - self.Sum - y
+            self.Sum = t
+            if math.copysign(1.0, val) < 0:
+                self.NegCnt -= 1
+
+    def Push(self, i):
+        self.PrevState = (self.Nobs, self.Sum, self.NegCnt, self.CompAdd, self.CompRemove, self.SameCnt, self.PrevValue)
+
+        if i >= self.Period:
+            self._Remove(self.Src[i - self.Period])
+        self._Add(self.Src[i])
+
+        result = float("nan")
+        if self.Nobs >= self.MinPeriods and self.Nobs > 0:
+            result = self.Sum / self.Nobs
+            if self.SameCnt >= self.Nobs:
+                result = self.PrevValue
+            elif self.NegCnt == 0 and result < 0:
+                result = 0.0
+            elif self.NegCnt == self.Nobs and result > 0:
+                result = 0.0
+
+        self.Values.append(result)
+        return result
+
+    #마지막 봉을 되돌린다 (봉이 바뀌어서 다시 넣을 때)
+    def Pop(self, i):
+        (self.Nobs, self.Sum, self.NegCnt, self.CompAdd, self.CompRemove, self.SameCnt, self.PrevValue) = self.PrevState
+        self.Values.pop()
+
+
+#EWM 평균 - pandas ewm(com/span, adjust=True, min_periods).mean() 과 같은 점화식
+class _Ewm:
+    def __init__(self, com, min_periods = 0):
+        alpha = 1.0 / (1.0 + com)
+        self.Factor = 1.0 - alpha
+        self.MinPeriods = max(int(min_periods), 1)
+        self.Values = list()
+        self.Weighted = None
+        self.OldWt = 1.0
+        self.Nobs = 0
+        self.PrevState = None
+
+    def Push(self, cur):
+        self.PrevState = (self.Weighted, self.OldWt, self.Nobs)
+
+        is_observation = (cur == cur)
+
+        if self.Weighted is None:
+            self.Weighted = cur
+            self.OldWt = 1.0
+            self.Nobs = int(is_observation)
+        else:
+            self.Nobs += int(is_observation)
+            weighted = self.Weighted
+            if weighted == weighted:
+                self.OldWt *= self.Factor
+                if is_observation:
+                    if weighted != cur:
+                        weighted = self.OldWt * weighted + cur
+                        weighted /= (self.OldWt + 1.0)
+                    self.OldWt += 1.0
+                self.Weighted = weighted
+            elif is_observation:
+                self.Weighted = cur
+
+        result = self.Weighted if self.Nobs >= self.MinPeriods else float("nan")
+        self.Values.append(result)
+        return result
+
+    def Pop(self, i = None):
+        (self.Weighted, self.OldWt, self.Nobs) = self.PrevState
+        self.Values.pop()
+
+
+#롤링 최대/최소 - 단조 덱 (덱에는 봉 인덱스를 넣는다)
+class _RollingExtreme:
+    def __init__(self, src, period, min_periods, is_max):
+        self.Src = src
+        self.Period = period
+        self.MinPeriods = min_periods
+        self.IsMax = is_max
+        self.Deque = deque()
+        self.Values = list()
+
+    def _Append(self, i):
+        x = self.Src[i]
+        while self.Deque:
+            last = self.Src[self.Deque[-1]]
+            if (self.IsMax and last <= x) or (not self.IsMax and last >= x):
+                self.Deque.pop()
+            else:
+                break
+        self.Deque.append(i)
+        if self.Deque[0] <= i - self.Period:
+            self.Deque.popleft()
+
+    def Push(self, i):
+        self._Append(i)
+        result = float("nan")
+        if min(i + 1, self.Period) >= self.MinPeriods:
+            result = self.Src[self.Deque[0]]
+        self.Values.append(result)
+        return result
+
+    #덱은 되돌릴 수 없으니 직전 봉까지의 구간(period개)으로 다시 만든다
+    def Pop(self, i):
+        self.Values.pop()
+        self.Deque = deque()
+        for j in range(max(0, i - self.Period), i):
+            self._Append(j)
+
+
+#0으로 나누면 pandas 처럼 inf / nan 이 되게
+def _SafeDiv(a, b):
+    if b == 0:
+        if a != a or a == 0:
+            return float("nan")
+        return math.copysign(float("inf"), a) * math.copysign(1.0, b)
+    return a / b
+
+
+#GetRSI 와 같은 계산: 상승/하락폭을 각각 com=period-1 EWM 으로 평균
+class _Rsi:
+    def __init__(self, src, period):
+        self.Src = src
+        self.Gain = _Ewm(period - 1, period)
+        self.Loss = _Ewm(period - 1, period)
+        self.Values = list()
+
+    def Push(self, i):
+        delta = self.Src[i] - self.Src[i - 1] if i > 0 else float("nan")
+        up = delta
+        down = delta
+        if delta == delta:
+            up = delta if delta > 0 else 0.0
+            down = abs(delta) if delta < 0 else 0.0
+
+        gain = self.Gain.Push(up)
+        loss = self.Loss.Push(down)
+
+        result = float("nan")
+        if gain == gain and loss == loss:
+            RS = _SafeDiv(gain, loss)
+            result = 100 - (100 / (1 + RS))
+        self.Values.append(result)
+        return result
+
+    def Pop(self, i):
+        self.Gain.Pop()
+        self.Loss.Pop()
+        self.Values.pop()
+
+
+#GetMACD 와 같은 계산: 12/26 EWM 차이 + 그 9 EWM
+class _Macd:
+    def __init__(self, src):
+        self.Src = src
+        self.Short = _Ewm((12 - 1) / 2.0)
+        self.Long = _Ewm((26 - 1) / 2.0)
+        self.Signal = _Ewm((9 - 1) / 2.0)
+        self.Macd = list()
+
+    def Push(self, i):
+        macd = self.Short.Push(self.Src[i]) - self.Long.Push(self.Src[i])
+        self.Macd.append(macd)
+        self.Signal.Push(macd)
+
+    def Pop(self, i):
+        self.Short.Pop()
+        self.Long.Pop()
+        self.Signal.Pop()
+        self.Macd.pop()
+
+
+#GetStoch 와 같은 계산: period 최고/최저 (min_periods=1) 로 fast_k, 그 3개 평균이 slow_d
+class _Stoch:
+    def __init__(self, high, low, close, period):
+        self.Close = close
+        self.High = _RollingExtreme(high, period, 1, True)
+        self.Low = _RollingExtreme(low, period, 1, False)
+        self.FastK = list()
+        self.SlowD = _RollingMean(self.FastK, 3, 1)
+
+    def Push(self, i):
+        ndays_high = self.High.Push(i)
+        ndays_low = self.Low.Push(i)
+        self.FastK.append(_SafeDiv(self.Close[i] - ndays_low, ndays_high - ndays_low) * 100)
+        self.SlowD.Push(i)
+
+    def Pop(self, i):
+        self.SlowD.Pop(i)
+        self.FastK.pop()
+        self.High.Pop(i)
+        self.Low.Pop(i)
+
+
+#GetIC 와 같은 계산: 9/26/52 구간 (최고+최저)/2
+class _Ichimoku:
+    def __init__(self, high, low):
+        self.Extremes = [(_RollingExtreme(high, p, p, True), _RollingExtreme(low, p, p, False)) for p in (9, 26, 52)]
+        self.Mid = [list(), list(), list()]   #전환선(9), 기준선(26), 52 중간값
+
+    def Push(self, i):
+        for k, (hi, lo) in enumerate(self.Extremes):
+            self.Mid[k].append((hi.Push(i) + lo.Push(i)) / 2)
+
+    def Pop(self, i):
+        for k, (hi, lo) in enumerate(self.Extremes):
+            hi.Pop(i)
+            lo.Pop(i)
+            self.Mid[k].pop()
+
+
+class IndicatorState:
+
+    def __init__(self, ohlcv = None):
+        self.Index = list()
+        self.Open = list()
+        self.High = list()
+        self.Low = list()
+        self.Close = list()
+        self.Volume = list()
+        self.IndicatorDict = dict()
+        self.Lock = threading.Lock()
+
+        if ohlcv is not None:
+            self.Update(ohlcv)
+
+    #봉 1개 추가! 만들어 둔 지표들도 그 봉만큼 갱신한다
+    def AddBar(self, ts, open_price, high_price, low_price, close_price, volume = float("nan")):
+        self.Index.append(ts)
+        self.Open.append(float(open_price))
+        self.High.append(float(high_price))
+        self.Low.append(float(low_price))
+        self.Close.append(float(close_price))
+        self.Volume.append(float(volume))
+
+        i = len(self.Close) - 1
+        for indicator in self.IndicatorDict.values():
+            indicator.Push(i)
+
+    #마지막 봉 제거 (장중에 현재봉이 바뀌면 빼고 다시 넣는다)
+    def PopBar(self):
+        i = len(self.Close) - 1
+        for indicator in self.IndicatorDict.values():
+            indicator.Pop(i)
+
+        self.Index.pop()
+        self.Open.pop()
+        self.High.pop()
+        self.Low.pop()
+        self.Close.pop()
+        self.Volume.pop()
+
+    def Clear(self):
+        self.Index.clear()
+        self.Open.clear()
+        self.High.clear()
+        self.Low.clear()
+        self.Close.clear()
+        self.Volume.clear()
+        self.IndicatorDict = dict()
+
+    def _AddRows(self, ohlcv):
+        if len(ohlcv) == 0:
+            return
+        volume = ohlcv["volume"].to_numpy(dtype=float) if "volume" in ohlcv.columns else [float("nan")] * len(ohlcv)
+        for ts, o, h, l, c, v in zip(ohlcv.index, ohlcv["open"].to_numpy(dtype=float), ohlcv["high"].to_numpy(dtype=float),
+                                     ohlcv["low"].to_numpy(dtype=float), ohlcv["close"].to_numpy(dtype=float), volume):
+            self.AddBar(ts, o, h, l, c, v)
+
+    #GetOhlcv 로 받은 df 와 맞춘다! 새로 생긴 봉만 추가하고 마지막 봉이 바뀌었으면 교체한다
+    #과거 봉이 달라졌으면(수정주가 반영 등) 처음부터 다시 만든다
+    def Update(self, ohlcv):
+        with self.Lock:
+            if len(ohlcv) == 0:
+                return self
+
+            if len(self.Index) == 0:
+                self._AddRows(ohlcv)
+                return self
+
+            last_ts = self.Index[-1]
+            pos = int(ohlcv.index.searchsorted(last_ts))
+
+            IsSame = pos < len(ohlcv) and ohlcv.index[pos] == last_ts
+            #겹치는 과거 봉(마지막 봉 앞)의 종가가 전부 같아야 이어서 갱신한다 (날짜는 겹치는 구간의 처음/끝만 본다)
+            overlap = min(pos, len(self.Index) - 1)
+            if IsSame and overlap > 0:
+                IsSame = (ohlcv.index[pos - overlap] == self.Index[-1 - overlap] and ohlcv.index[pos - 1] == self.Index[-2]
+                          and numpy.array_equal(ohlcv["close"].to_numpy(dtype=float)[pos - overlap:pos],
+                                                numpy.array(self.Close[-1 - overlap:-1]), equal_nan=True))
+
+            if not IsSame:
+                keys = list(self.IndicatorDict.keys())
+                self.Clear()
+                self._AddRows(ohlcv)
+                for key in keys:
+                    self._GetIndicator(key)
+                return self
+
+            self.PopBar()
+            self._AddRows(ohlcv.iloc[pos:])
+            return self
+
+    def _MakeIndicator(self, key):
+        kind = key[0]
+        if kind == "ma":
+            return _RollingMean(self.Close, key[1])
+        if kind == "rsi":
+            return _Rsi(self.Close, key[1])
+        if kind == "macd":
+            return _Macd(self.Close)
+        if kind == "stoch":
+            return _Stoch(self.High, self.Low, self.Close, key[1])
+        if kind == "ic":
+            return _Ichimoku(self.High, self.Low)
+        raise KeyError(key)
+
+    #처음 찾는 지표면 만들어서 가지고 있는 봉으로 한번 채운다
+    def _GetIndicator(self, key):
+        indicator = self.IndicatorDict.get(key)
+        if indicator is None:
+            indicator = self._MakeIndicator(key)
+            for i in range(len(self.Close)):
+                indicator.Push(i)
+            self.IndicatorDict[key] = indicator
+        return indicator
+
+    #이동평균선 (GetMA 와 같음)
+    def GetMA(self, period, st):
+        with self.Lock:
+            return float(self._GetIndicator(("ma", period)).Values[st])
+
+    #RSI (GetRSI 와 같음)
+    def GetRSI(self, period, st):
+        with self.Lock:
+            return float(self._GetIndicator(("rsi", period)).Values[st])
+
+    #볼린저 밴드 (GetBB 와 같음) - st 기준 period개만 보고 계산
+    def GetBB(self, period, st, uni = 2.0):
+        with self.Lock:
+            lo, hi = GetBBWindow(len(self.Close), period, st)
+            close = numpy.array(self.Close[lo:hi])
+
+        dic_bb = dict()
+        bb_center = numpy.nanmean(close) if len(close) > 0 else float("nan")
+        band1 = uni * numpy.nanstd(close) if len(close) > 0 else float("nan")
+
+        dic_bb['ma'] = float(bb_center)
+        dic_bb['upper'] = float(bb_center + band1)
+        dic_bb['lower'] = float(bb_center - band1)
+
+        return dic_bb
+
+    #MACD 12,26,9 (GetMACD 와 같음)
+    def GetMACD(self, st):
+        with self.Lock:
+            indicator = self._GetIndicator(("macd",))
+            dic_macd = dict()
+            dic_macd['macd'] = indicator.Macd[st]
+            dic_macd['macd_siginal'] = indicator.Signal.Values[st]
+            dic_macd['ocl'] = dic_macd['macd'] - dic_macd['macd_siginal']
+            return dic_macd
+
+    #스토캐스틱 (GetStoch 와 같음)
+    def GetStoch(self, period, st):
+        with self.Lock:
+            indicator = self._GetIndicator(("stoch", period))
+            dic_stoch = dict()
+            dic_stoch['fast_k'] = indicator.FastK[st]
+            dic_stoch['slow_d'] = indicator.SlowD.Values[st]
+            return dic_stoch
+
+    #일목 균형표 (GetIC 와 같음)
+    def GetIC(self, st):
+        with self.Lock:
+            indicator = self._GetIndicator(("ic",))
+            length = len(self.Close)
+            nan = float("nan")
+
+            dic_ic = dict()
+            dic_ic['conversion'] = indicator.Mid[0][st]
+            dic_ic['base'] = indicator.Mid[1][st]
+
+            if length < 27:
+                raise IndexError("GetIC needs at least 27 bars")
+            dic_ic['huhang_span'] = self.Close[-1]
+
+            #선행스팬: 26봉 전 기준, st 만큼 밀린 구간 (GetIC 의 shift(-2-st) ... shift(26))
+            base_pos = length - 27
+            end_pos = length - 25 + st
+
+            def _Mid(k, window):
+                if base_pos < window - 1 or end_pos < 0 or end_pos > length - 1:
+                    return nan
+                return indicator.Mid[k][end_pos]
+
+            dic_ic['sunhang_span_a'] = (_Mid(0, 9) + _Mid(1, 26)) / 2
+            dic_ic['sunhang_span_b'] = _Mid(2, 52)
+
+            return dic_ic
+
+
+IndicatorStateDict = dict()
+IndicatorStateLock = threading.Lock()
+
+
+#종목/봉 종류별 IndicatorState 를 리턴! ohlcv를 넘기면 그 df 에 맞춰 갱신까지 한다
+def GetIndicatorState(stock_code, timeframe = "D", ohlcv = None):
+    key = (stock_code, timeframe)
+    with IndicatorStateLock:
+        IndiState = IndicatorStateDict.get(key)
+        if IndiState is None:
+            IndiState = IndicatorState()
+            IndicatorStateDict[key] = IndiState
+
+    if ohlcv is not None:
+        IndiState.Update(ohlcv)
+
+    return IndiState
+
+
+
+############################################################################################################################################################
+#여러 지표를 한번에 구한다! spec 은 (지표, 파라미터..., 기준 날짜(st) 리스트) 튜플의 리스트
+#  [("ma",5,[-1,-2]), ("ma",20,[-1,-2]), ("rsi",14,[-1]), ("bb",20,2.0,[-1]), ("macd",[-1]), ("stoch",14,[-1]), ("ic",[-1])]
+#리턴: {("ma",5): {-1: 값, -2: 값}, ("ma",20): {...}, ("rsi",14): {-1: 값}, ("bb",20,2.0): {-1: {'ma','upper','lower'}},
+#       ("macd",): {-1: {'macd','macd_siginal','ocl'}}, ("stoch",14): {-1: {'fast_k','slow_d'}}, ("ic",): {-1: GetIC 와 같은 dict}}
+#
+#GetMA/GetRSI.. 를 따로 부를 때처럼 지표마다 전체 Series 를 새로 만들지 않는다.
+#MA 는 종가 누적합 1번으로 모든 기간/날짜를, RSI 는 diff 1번, MACD 는 EWM 1번을 같이 쓰고
+#BB/스토캐스틱/일목은 해당 구간만 잘라서 계산한다. 넘어온 ohlcv 는 건드리지 않는다!
+#(MA/스토캐스틱은 계산 순서가 달라 GetMA/GetStoch 와 소수점 끝자리 오차가 날 수 있음, 구간이 모자라면 nan)
+def ComputeIndicators(ohlcv, spec):
+
+    close_s = ohlcv["close"]
+    close = close_s.to_numpy(dtype=float)
+    length = len(close)
+    nan = float("nan")
+
+    cache = dict()
+
+    def _Pos(st):
+        pos = st if st >= 0 else length + st
+        if pos < 0 or pos >= length:
+            raise IndexError("st out of range: " + str(st))
+        return pos
+
+    def _Array(col):
+        if col not in cache:
+            cache[col] = ohlcv[col].to_numpy(dtype=float)
+        return cache[col]
+
+    #MA 용 종가 누적합 (자리수 손실을 줄이려고 마지막 종가를 빼고 누적), nan 개수도 같이 누적
+    def _MA(period, st):
+        if "cumsum" not in cache:
+            is_nan = numpy.isnan(close)
+            ref = 0.0
+            if length > 0 and not is_nan[-1]:
+                ref = close[-1]
+            cumsum = numpy.concatenate(([0.0], numpy.cumsum(numpy.where(is_nan, 0.0, close - ref))))
+            nan_cnt = numpy.concatenate(([0], numpy.cumsum(is_nan)))
+            cache["cumsum"] = (ref, cumsum, nan_cnt)
+
+        ref, cumsum, nan_cnt = cache["cumsum"]
+        pos = _Pos(st)
+        start = pos - period + 1
+        if start < 0 or nan_cnt[pos + 1] - nan_cnt[start] > 0:
+            return nan
+        return float(ref + (cumsum[pos + 1] - cumsum[start]) / period)
+
+    #RSI - GetRSI 와 같은 계산, 상승/하락폭은 한번만 만든다
+    def _RSI(period, st):
+        if "updown" not in cache:
+            delta = close_s.diff()
+            cache["updown"] = (delta.clip(lower=0), delta.clip(upper=0).abs())
+
+        key = ("rsi", period)
+        if key not in cache:
+            up, down = cache["updown"]
+            _gain = up.ewm(com=(period - 1), min_periods=period).mean()
+            _loss = down.ewm(com=(period - 1), min_periods=period).mean()
+            RS = _gain / _loss
+            cache[key] = (100 - (100 / (1 + RS))).to_numpy(dtype=float)
+
+        return float(cache[key][_Pos(st)])
+
+    def _BB(period, uni, st):
+        lo, hi = GetBBWindow(length, period, st)
+        window = close_s.iloc[lo:hi]
+        bb_center = numpy.mean(window)
+        band1 = uni * numpy.std(window)
+        return {'ma': float(bb_center), 'upper': float(bb_center + band1), 'lower': float(bb_center - band1)}
+
+    def _MACD(st):
+        if "macd" not in cache:
+            MACD = close_s.ewm(span=12).mean() - close_s.ewm(span=26).mean()
+            MACD_signal = MACD.ewm(span=9).mean()
+            cache["macd"] = (MACD.to_numpy(dtype=float), MACD_signal.to_numpy(dtype=float))
+
+        MACD, MACD_signal = cache["macd"]
+        pos = _Pos(st)
+        dic_macd = dict()
+        dic_macd['macd'] = float(MACD[pos])
+        dic_macd['macd_siginal'] = float(MACD_signal[pos])
+        dic_macd['ocl'] = dic_macd['macd'] - dic_macd['macd_siginal']
+        return dic_macd
+
+    #스토캐스틱 - period 최고/최저는 있는 만큼(min_periods=1), slow_d 는 fast_k 3개 평균
+    def _Stoch(period, st):
+        high = _Array("high")
+        low = _Array("low")
+
+        def _FastK(pos):
+            s = max(0, pos - period + 1)
+            ndays_high = numpy.nanmax(high[s:pos + 1])
+            ndays_low = numpy.nanmin(low[s:pos + 1])
+            return _SafeDiv(close[pos] - ndays_low, ndays_high - ndays_low) * 100
+
+        pos = _Pos(st)
+        fast_k_list = [_FastK(p) for p in range(max(0, pos - 2), pos + 1)]
+        valid = [v for v in fast_k_list if v == v]
+
+        dic_stoch = dict()
+        dic_stoch['fast_k'] = fast_k_list[-1]
+        dic_stoch['slow_d'] = sum(valid) / len(valid) if len(valid) > 0 else nan
+        return dic_stoch
+
+    #일목 - GetIC 와 같은 구간을 잘라서 (최고+최저)/2
+    def _IC(st):
+        high = _Array("high")
+        low = _Array("low")
+
+        def _Mid(end_pos, window):
+            if end_pos - window + 1 < 0 or end_pos > length - 1:
+                return nan
+            return float((high[end_pos - window + 1:end_pos + 1].max() + low[end_pos - window + 1:end_pos + 1].min()) / 2)
+
+        pos = _Pos(st)
+        base_pos = length - 27
+        end_pos = length - 25 + st
+
+        def _Span(window):
+            if base_pos < window - 1 or end_pos < 0:
+                return nan
+            return _Mid(end_pos, window)
+
+        dic_ic = dict()
+        dic_ic['conversion'] = _Mid(pos, 9)
+        dic_ic['base'] = _Mid(pos, 26)
+        dic_ic['huhang_span'] = float(close[-1]) if length >= 27 else nan
+        dic_ic['sunhang_span_a'] = (_Span(9) + _Span(26)) / 2
+        dic_ic['sunhang_span_b'] = _Span(52)
+        return dic_ic
+
+    result = dict()
+
+    for item in spec:
+        kind = str(item[0]).lower()
+        st_list = item[-1]
+        if isinstance(st_list, int):
+            st_list = [st_list]
+        params = tuple(item[1:-1])
+
+        values = dict()
+        for st in st_list:
+            if kind == "ma":
+                values[st] = _MA(params[0], st)
+            elif kind == "rsi":
+                values[st] = _RSI(params[0], st)
+            elif kind == "bb":
+                values[st] = _BB(params[0], params[1] if len(params) > 1 else 2.0, st)
+            elif kind == "macd":
+                values[st] = _MACD(st)
+            elif kind == "stoch":
+                values[st] = _Stoch(params[0], st)
+            elif kind == "ic":
+                values[st] = _IC(st)
+            else:
+                raise KeyError("unknown indicator: " + str(item[0]))
+
+        result[(kind,) + params] = values
+
+    return result
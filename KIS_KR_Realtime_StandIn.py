@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+'''
+
+한투 실시간 웹소켓(H0STCNT0 체결가)을 흉내내는 로컬 가짜 서버!
+장이 닫혀 있을 때나 실계좌 없이 KIS_API_Helper_KR_Realtime / 스탑트레이더를 테스트할 때 쓴다.
+별도 패키지 없이 파이썬 기본 모듈만 사용합니다.
+
+단독 실행
+    python KIS_KR_Realtime_StandIn.py
+    (다른 창에서) KIS_WS_URL=ws://127.0.0.1:21000 KIS_WS_APPROVAL_KEY=test python ...
+
+코드 안에서
+    import KIS_KR_Realtime_StandIn as StandIn
+    server = StandIn.StandInServer(port=0, tick_sec=None)   #tick_sec=None 이면 자동 체결 없이 PushTick 으로만 보낸다
+    server.Start()
+    url = server.GetUrl()
+    server.PushTick("005930", 70000)
+
+'''
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import base64
+import hashlib
+
+from datetime import datetime
+
+
+STANDIN_HOST = os.getenv("KIS_WS_STANDIN_HOST", "127.0.0.1")
+STANDIN_PORT = int(os.getenv("KIS_WS_STANDIN_PORT", "21000"))
+STANDIN_TICK_SEC = float(os.getenv("KIS_WS_STANDIN_TICK_SEC", "0.5"))       #자동 체결 주기(초), 0 이면 자동 체결 없음
+STANDIN_PINGPONG_SEC = float(os.getenv("KIS_WS_STANDIN_PINGPONG_SEC", "10"))
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+H0STCNT0_FIELD_CNT = 46   #실제 체결 데이터와 같은 필드 수로 만든다
+
+
+#H0STCNT0 체결 레코드(^로 구분된 46개 필드)를 만든다! 현재가/시가/고가/저가/누적거래량 외에는 0
+def MakeExecutionRecord(stock_code, price, open_price, high, low, volume):
+    fields = ["0"] * H0STCNT0_FIELD_CNT
+    fields[0] = stock_code
+    fields[1] = datetime.now().strftime("%H%M%S")
+    fields[2] = str(int(price))
+    fields[7] = str(int(open_price))
+    fields[8] = str(int(high))
+    fields[9] = str(int(low))
+    fields[13] = str(int(volume))
+    return "^".join(fields)
+
+
+#웹소켓 텍스트 프레임 1개를 만든다 (서버 -> 클라이언트는 마스킹 안 함)
+def EncodeFrame(text, opcode = 0x1):
+    payload = text.encode('utf-8') if isinstance(text, str) else text
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    return header + payload
+
+
+def RecvExact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("closed")
+        data += chunk
+    return data
+
+
+#클라이언트 프레임 1개를 읽어서 (opcode, payload) 리턴
+def DecodeFrame(conn):
+    b1, b2 = RecvExact(conn, 2)
+    opcode = b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", RecvExact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", RecvExact(conn, 8))[0]
+    mask = RecvExact(conn, 4) if b2 & 0x80 else b"\x00\x00\x00\x00"
+    payload = bytearray(RecvExact(conn, length))
+    for i in range(length):
+        payload[i] ^= mask[i % 4]
+    return opcode, bytes(payload)
+
+
+class StandInServer:
+
+    def __init__(self, host = STANDIN_HOST, port = STANDIN_PORT, tick_sec = STANDIN_TICK_SEC, pingpong_sec = STANDIN_PINGPONG_SEC):
+        self.host = host
+        self.port = port
+        self.tick_sec = tick_sec if tick_sec else None
+        self.pingpong_sec = pingpong_sec
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()   #여러 스레드가 같은 소켓에 프레임을 섞어 쓰지 않게
+        self.clients = dict()      #소켓 -> 구독 종목코드 set
+        self.prices = dict()       #종목코드 -> {'Price','Open','High','Low','Volume'}
+        self.running = False
+        self.sock = None
+
+    def GetUrl(self):
+        return "ws://" + self.host + ":" + str(self.port)
+
+    def Start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.port = self.sock.getsockname()[1]   #port=0 이면 빈 포트를 받는다
+        self.sock.listen(8)
+        self.running = True
+        threading.Thread(target=self.AcceptLoop, daemon=True).start()
+        threading.Thread(target=self.PushLoop, daemon=True).start()
+        print("StandIn 실시간 서버 시작:", self.GetUrl())
+
+    def Stop(self):
+        self.running = False
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+        with self.lock:
+            conns = list(self.clients.keys())
+            self.clients.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    #모든 클라이언트 연결을 끊는다 (재접속 테스트용)
+    def DropClients(self):
+        with self.lock:
+            conns = list(self.clients.keys())
+            self.clients.clear()
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except Exception:
+                pass
+
+    def AcceptLoop(self):
+        while self.running:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.ClientLoop, args=(conn,), daemon=True).start()
+
+    def Handshake(self, conn):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("closed")
+            request += chunk
+
+        key = ""
+        for line in request.decode('latin-1').split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      "Sec-WebSocket-Accept: " + accept + "\r\n\r\n").encode())
+
+    def Send(self, conn, text, opcode = 0x1):
+        try:
+            with self.send_lock:
+                conn.sendall(EncodeFrame(text, opcode))
+        except Exception:
+            with self.lock:
+                self.clients.pop(conn, None)
+
+    def ClientLoop(self, conn):
+        try:
+            self.Handshake(conn)
+            with self.lock:
+                self.clients[conn] = set()
+
+            while self.running:
+                opcode, payload = DecodeFrame(conn)
+
+                if opcode == 0x8:   #close
+                    self.Send(conn, payload, 0x8)
+                    break
+                elif opcode == 0x9: #ping
+                    self.Send(conn, payload, 0xA)
+                    continue
+                elif opcode != 0x1:
+                    continue
+
+                self.OnMessage(conn, payload.decode('utf-8'))
+
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.clients.pop(conn, None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    #등록/해제 요청 처리 (PINGPONG 응답은 그냥 무시)
+    def OnMessage(self, conn, text):
+        try:
+            data = json.loads(text)
+        except Exception:
+            return
+
+        header = data.get('header', {})
+        if header.get('tr_id') == "PINGPONG":
+            return
+
+        tr_input = data.get('body', {}).get('input', {})
+        tr_id = tr_input.get('tr_id')
+        stock_code = tr_input.get('tr_key')
+        tr_type = header.get('tr_type', "1")
+
+        with self.lock:
+            if conn not in self.clients:
+                return
+            if tr_type == "1":
+                self.clients[conn].add(stock_code)
+                msg1 = "SUBSCRIBE SUCCESS"
+            else:
+                self.clients[conn].discard(stock_code)
+                msg1 = "UNSUBSCRIBE SUCCESS"
+
+        self.Send(conn, json.dumps({
+            "header": {"tr_id": tr_id, "tr_key": stock_code, "encrypt": "N"},
+            "body": {"rt_cd": "0", "msg_cd": "OPSP0000", "msg1": msg1}
+        }))
+
+    #체결 1건을 그 종목을 구독한 클라이언트 모두에게 보낸다
+    def PushTick(self, stock_code, price, volume = 1):
+        with self.lock:
+            info = self.prices.get(stock_code)
+            if info is None:
+                info = {'Price': price, 'Open': price, 'High': price, 'Low': price, 'Volume': 0}
+                self.prices[stock_code] = info
+            info['Price'] = price
+            info['High'] = max(info['High'], price)
+            info['Low'] = min(info['Low'], price)
+            info['Volume'] += volume
+            record = MakeExecutionRecord(stock_code, price, info['Open'], info['High'], info['Low'], info['Volume'])
+            targets = [conn for conn, codes in self.clients.items() if stock_code in codes]
+
+        raw = "0|H0STCNT0|001|" + record
+        for conn in targets:
+            self.Send(conn, raw)
+
+    #자동 체결(랜덤워크)과 PINGPONG 을 주기적으로 보낸다
+    def PushLoop(self):
+        last_ping = time.time()
+        while self.running:
+            time.sleep(self.tick_sec if self.tick_sec else 0.2)
+
+            if self.tick_sec:
+                with self.lock:
+                    codes = set()
+                    for code_set in self.clients.values():
+                        codes |= code_set
+                for stock_code in codes:
+                    base = self.prices.get(stock_code, {}).get('Price', 10000)
+                    self.PushTick(stock_code, max(1, int(base * (1 + random.uniform(-0.003, 0.003)))))
+
+            if time.time() - last_ping >= self.pingpong_sec:
+                last_ping = time.time()
+                ping = json.dumps({"header": {"tr_id": "PINGPONG", "datetime": datetime.now().strftime("%Y%m%d%H%M%S")}})
+                with self.lock:
+                    conns = list(self.clients.keys())
+                for conn in conns:
+                    self.Send(conn, ping)
+
+
+
+if __name__ == "__main__":
+    server = StandInServer()
+    server.Start()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        server.Stop()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+'''
+
+스탑트레이더(KIS_KR_StopTrader / KIS_KR_StopTrader_System) 주문 저장소!
+
+예전에는 주문 전체를 JSON 리스트 파일 1개로 들고 있어서 주문 추가/취소/트레일링 최고가 갱신 때마다
+파일 전체를 락 걸고 다시 썼는데, SQLite(WAL 모드) 테이블로 바꿔서
+    - 주문 ID / (종목코드, 주문 타입) 인덱스로 바로 찾고
+    - 주문 1건 단위로 추가/수정/삭제하고 (트랜잭션이라 중간에 죽어도 파일이 깨지지 않는다)
+    - 읽기는 쓰는 중에도 막히지 않는다 (WAL)
+처음 열 때 예전 JSON 파일이 있으면 한 번 옮겨 담고 파일 이름을 .migrated 로 바꿔둔다.
+
+주문 데이터는 예전 JSON 과 같은 딕셔너리 그대로 data 컬럼에 넣고, 찾을 때 쓰는 값만 컬럼으로 따로 둔다.
+주문 ID는 계좌마다 따로 만들어지니 (주문 ID, 계좌) 로 주문 1건을 구분한다.
+
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None   #윈도우에서는 예전 파일 락 없이 읽는다
+
+
+STOP_ORDER_DB_PATH = os.getenv("STOP_ORDER_DB_PATH", "/var/autobot/KIS_KR_StopTrader_AutoOrder.db")
+STOP_ORDER_JSON_PATH = os.getenv("STOP_ORDER_JSON_PATH", "/var/autobot/KIS_KR_StopTrader_AutoOrderList.json")   #예전 JSON 파일 (옮겨 담기용)
+STOP_ORDER_DB_TIMEOUT = float(os.getenv("STOP_ORDER_DB_TIMEOUT", "10"))   #다른 프로세스가 쓰는 중일 때 기다리는 최대 시간(초)
+
+StoreLocal = threading.local()   #스레드마다 연결 1개
+StoreInitLock = threading.Lock()
+IsStoreReady = False
+
+
+
+#DB 연결을 리턴! 처음이면 테이블을 만들고 예전 JSON 을 옮겨 담는다
+def GetConnection():
+    global IsStoreReady
+
+    conn = getattr(StoreLocal, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(STOP_ORDER_DB_PATH, timeout=STOP_ORDER_DB_TIMEOUT, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")   #커밋이 끝나면 디스크에 남아있다 (트레일링 최고가 포함)
+        StoreLocal.conn = conn
+
+    if not IsStoreReady:
+        with StoreInitLock:
+            if not IsStoreReady:
+                InitStore(conn)
+                IsStoreReady = True
+
+    return conn
+
+
+#주문 테이블! 같은 주문 ID가 다른 계좌에 있을 수 있어서 (주문 ID, 계좌) 가 키
+STOP_ORDER_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS {table} (
+                            order_id TEXT NOT NULL,
+                            account_type TEXT NOT NULL,
+                            stock_code TEXT NOT NULL,
+                            order_type TEXT NOT NULL,
+                            data TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            updated_at REAL NOT NULL,
+                            PRIMARY KEY (order_id, account_type))'''
+
+
+def InitStore(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(STOP_ORDER_TABLE_SQL.format(table="stop_order"))
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stop_order_code_type ON stop_order (stock_code, order_type)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stop_order_account ON stop_order (account_type)")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    MigrateJsonFile(conn)
+
+
+#예전 JSON 주문 리스트 파일이 남아 있으면 DB로 옮겨 담는다
+#이미 같은 (주문 ID, 계좌) 주문이 있거나 주문 ID가 없어서 못 옮긴 주문은 하나하나 출력한다 (원본은 .migrated 파일에 그대로 남는다)
+#DB 쓰기 락을 잡은 상태에서 하니 여러 봇이 동시에 열어도 1번만 옮겨진다
+def MigrateJsonFile(conn):
+
+    if not os.path.exists(STOP_ORDER_JSON_PATH):
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not os.path.exists(STOP_ORDER_JSON_PATH):
+            conn.execute("ROLLBACK")
+            return
+
+        with open(STOP_ORDER_JSON_PATH, 'r') as json_file:
+            if fcntl is not None:
+                fcntl.flock(json_file, fcntl.LOCK_EX)
+            OrderList = json.load(json_file)
+
+        now_ts = time.time()
+        SkipList = list()
+        for order in OrderList:
+            if 'OrderId' not in order:
+                SkipList.append(("주문 ID 없음", order))
+                continue
+            cur = conn.execute("INSERT OR IGNORE INTO stop_order VALUES (?,?,?,?,?,?,?)",
+                               (order['OrderId'], order.get('AccountType', 'REAL'), order['stock_code'], order['OrderType'],
+                                json.dumps(order), now_ts, now_ts))
+            if cur.rowcount == 0:
+                SkipList.append(("이미 있는 주문", order))
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print("예전 스탑 주문 옮겨 담기 실패:", e)
+        return
+
+    try:
+        os.replace(STOP_ORDER_JSON_PATH, STOP_ORDER_JSON_PATH + ".migrated")
+    except OSError:
+        pass
+    print("예전 스탑 주문", len(OrderList) - len(SkipList), "건을 DB로 옮겼습니다:", STOP_ORDER_DB_PATH)
+    for reason, order in SkipList:
+        print("옮기지 못한 예전 스탑 주문 (" + reason + "):", json.dumps(order, ensure_ascii=False))
+    if len(SkipList) > 0:
+        print("옮기지 못한 주문", len(SkipList), "건은 원본에 남아 있습니다:", STOP_ORDER_JSON_PATH + ".migrated")
+
+
+def RowsToOrders(rows):
+    return [json.loads(row[0]) for row in rows]
+
+
+#주문 1건 추가!
+def AddOrder(order):
+    now_ts = time.time()
+    GetConnection().execute("INSERT INTO stop_order VALUES (?,?,?,?,?,?,?)",
+                            (order['OrderId'], order.get('AccountType', 'REAL'), order['stock_code'], order['OrderType'],
+                             json.dumps(order), now_ts, now_ts))
+
+
+#주문 ID로 주문 찾기! account_type을 넘기면 그 계좌 주문만. 없으면 None
+def GetOrder(order_id, account_type = None):
+    sql = "SELECT data FROM stop_order WHERE order_id = ?"
+    params = [order_id]
+    if account_type is not None:
+        sql += " AND account_type = ?"
+        params.append(account_type)
+
+    rows = GetConnection().execute(sql, params).fetchall()
+    return json.loads(rows[0][0]) if len(rows) > 0 else None
+
+
+#조건에 맞는 주문 리스트! None 으로 넘긴 조건은 안 본다 (등록 순서)
+def GetOrders(stock_code = None, order_type = None, account_type = None):
+    sql = "SELECT data FROM stop_order WHERE 1=1"
+    params = list()
+    if stock_code is not None:
+        sql += " AND stock_code = ?"
+        params.append(stock_code)
+    if order_type is not None:
+        sql += " AND order_type = ?"
+        params.append(order_type)
+    if account_type is not None:
+        sql += " AND account_type = ?"
+        params.append(account_type)
+    sql += " ORDER BY created_at, rowid"
+
+    return RowsToOrders(GetConnection().execute(sql, params).fetchall())
+
+
+#전체 주문 리스트 (모든 계좌)
+def GetAllOrders():
+    return GetOrders()
+
+
+#주문 여러 건의 일부 값만 한 트랜잭션으로 바꾼다! UpdateList = [(주문 ID, 계좌, {키: 값}), ...]
+#계좌를 None 으로 넘기면 계좌 상관없이 그 주문 ID 전부. 그 사이 지워진 주문은 건너뛴다. 바꾼 주문 수를 리턴
+def UpdateOrdersFields(UpdateList):
+
+    if len(UpdateList) == 0:
+        return 0
+
+    conn = GetConnection()
+    now_ts = time.time()
+    updated = 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for order_id, account_type, fields in UpdateList:
+            sql = "SELECT rowid, data FROM stop_order WHERE order_id = ?"
+            params = [order_id]
+            if account_type is not None:
+                sql += " AND account_type = ?"
+                params.append(account_type)
+
+            for rowid, data in conn.execute(sql, params).fetchall():
+                order = json.loads(data)
+                order.update(fields)
+                conn.execute("UPDATE stop_order SET data = ?, updated_at = ? WHERE rowid = ?", (json.dumps(order), now_ts, rowid))
+                updated += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return updated
+
+
+#주문 1건의 일부 값만 바꾼다! 바꿨으면 True
+def UpdateOrderFields(order_id, fields, account_type = None):
+    return UpdateOrdersFields([(order_id, account_type, fields)]) > 0
+
+
+#주문 ID로 삭제! account_type을 넘기면 그 계좌 주문일 때만. 지웠으면 True
+def DeleteOrder(order_id, account_type = None):
+    sql = "DELETE FROM stop_order WHERE order_id = ?"
+    params = [order_id]
+    if account_type is not None:
+        sql += " AND account_type = ?"
+        params.append(account_type)
+
+    return GetConnection().execute(sql, params).rowcount > 0
+
+
+#조건에 맞는 주문을 모두 삭제하고 지운 주문 리스트를 리턴! (order_type "All" 이나 None 이면 타입 상관없이)
+def DeleteOrders(stock_code = None, order_type = None, account_type = None):
+
+    if order_type == "All":
+        order_type = None
+
+    conn = GetConnection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        OrderList = GetOrders(stock_code, order_type, account_type)
+        for order in OrderList:
+            conn.execute("DELETE FROM stop_order WHERE order_id = ? AND account_type = ?", (order['OrderId'], order.get('AccountType', 'REAL')))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return OrderList
+
+
+#다른 연결(다른 봇/프로세스)이 주문을 바꾸면 값이 달라진다! 다시 읽을지 판단할 때 쓴다
+def GetDataVersion():
+    return GetConnection().execute("PRAGMA data_version").fetchone()[0]
@@ -19,11 +19,9 @@ FAQ로 해결 안되는 기술적인 문제는 클래스101 강의의 댓글이
 import KIS_Common as Common
 import KIS_API_Helper_KR as KisKR
 import time
-import random
-import json
 import line_alert
-import fcntl
 import datetime
+import KIS_KR_StopOrderStore as StopOrderStore
 
 DIST = "한국주식"
 
@@ -35,18 +33,7 @@ IsMarketOpen = KisKR.IsMarketOpen()
 #최소 주문 수량 (주식은 1주 단위)
 minimumVolume = 1
 
-auto_order_file_path = "/var/autobot/KIS_KR_StopTrader_AutoOrderList.json"
-time.sleep(random.random()*0.1)
-
-#자동 주문 리스트 읽기!
-AutoOrderList = list()
-try:
-    with open(auto_order_file_path, 'r') as json_file:
-        fcntl.flock(json_file, fcntl.LOCK_EX)  # 파일 락 설정
-        AutoOrderList = json.load(json_file)
-        fcntl.flock(json_file, fcntl.LOCK_UN)  # 파일 락 해제
-except Exception as e:
-    print("Exception by First")
+#스탑 주문은 KIS_KR_StopOrderStore (SQLite) 에 1건씩 저장한다! 예전 JSON 파일은 처음 열 때 옮겨 담는다
 
 # 주문 ID 생성 함수
 def generate_order_id(order_type, stock_code):
@@ -68,28 +55,20 @@ def generate_order_id(order_type, stock_code):
 
 # 주문 ID로 주문 정보 찾기
 def GetOrderById(order_id):
-    global AutoOrderList
     DIST = Common.GetNowDist()
     
-    for order in AutoOrderList:
-        if order['OrderId'] == order_id and order.get('AccountType') == DIST:
-            return order
-    return None
+    return StopOrderStore.GetOrder(order_id, DIST)
 
 # 종목코드와 주문유형으로 주문 정보 찾기
 def GetOrderByTickerAndType(stock_code, order_type):
-    global AutoOrderList
     DIST = Common.GetNowDist()
     
-    for order in AutoOrderList:
-        if order['stock_code'] == stock_code and order['OrderType'] == order_type and order.get('AccountType') == DIST:
-            return order
-    return None
+    OrderList = StopOrderStore.GetOrders(stock_code, order_type, DIST)
+    return OrderList[0] if len(OrderList) > 0 else None
 
 # 전체 주문 리스트 반환
 def GetAllOrders():
-    global AutoOrderList
-    return AutoOrderList
+    return StopOrderStore.GetAllOrders()
 
 # 주문 취소 함수
 def CancelOrderById(order_id):
@@ -102,32 +81,16 @@ def CancelOrderById(order_id):
     Returns:
         bool: 취소 성공 여부
     """
-    global AutoOrderList
     DIST = Common.GetNowDist()
     
     try:
-        # 주문 리스트에서 해당 ID를 가진 주문 찾기
-        order_to_remove = None
-        for order in AutoOrderList:
-            if order.get('OrderId') == order_id and order.get('AccountType') == DIST:
-                order_to_remove = order
-                break
-        
-        if order_to_remove is None:
+        # 해당 ID를 가진 현재 계좌 주문을 저장소에서 삭제
+        if StopOrderStore.DeleteOrder(order_id, DIST) == False:
             msg = DIST + f" 주문 ID {order_id}를 찾을 수 없습니다."
             print(msg)
             line_alert.SendMessage(msg)
             return False
         
-        # 주문을 리스트에서 완전히 제거
-        AutoOrderList.remove(order_to_remove)
-        
-        # 파일에 저장
-        with open(auto_order_file_path, 'w') as outfile:
-            fcntl.flock(outfile, fcntl.LOCK_EX)
-            json.dump(AutoOrderList, outfile)
-            fcntl.flock(outfile, fcntl.LOCK_UN)
-        
         msg = DIST + f" 주문 ID {order_id}가 성공적으로 취소되었습니다."
         print(msg)
         line_alert.SendMessage(msg)
@@ -152,7 +115,6 @@ def CancelOrderByTicker(stock_code, order_type="All", with_limit_orders=False):
     Returns:
         int: 취소된 주문 개수
     """
-    global AutoOrderList
     DIST = Common.GetNowDist()
     
     try:
@@ -160,12 +122,8 @@ def CancelOrderByTicker(stock_code, order_type="All", with_limit_orders=False):
             # 실제 거래소의 해당 종목 주문 취소
             KisKR.CancelAllOrders(stock_code)
         
-        # 해당 종목의 주문 찾기 (주문 유형 필터링)
-        orders_to_remove = []
-        for order in AutoOrderList:
-            if order.get('stock_code') == stock_code and order.get('AccountType') == DIST:
-                if order_type == "All" or order.get('OrderType') == order_type:
-                    orders_to_remove.append(order)
+        # 해당 종목의 주문을 저장소에서 삭제 (주문 유형 필터링)
+        orders_to_remove = StopOrderStore.DeleteOrders(stock_code, order_type, DIST)
         
         if not orders_to_remove:
             order_type_msg = "모든" if order_type == "All" else order_type
@@ -174,16 +132,6 @@ def CancelOrderByTicker(stock_code, order_type="All", with_limit_orders=False):
             #line_alert.SendMessage(msg)
             return 0
         
-        # 주문들을 리스트에서 완전히 제거
-        for order in orders_to_remove:
-            AutoOrderList.remove(order)
-        
-        # 파일에 저장
-        with open(auto_order_file_path, 'w') as outfile:
-            fcntl.flock(outfile, fcntl.LOCK_EX)
-            json.dump(AutoOrderList, outfile)
-            fcntl.flock(outfile, fcntl.LOCK_UN)
-        
         canceled_count = len(orders_to_remove)
         order_type_msg = "모든" if order_type == "All" else order_type
         msg = DIST + f" 종목 {stock_code}의 {order_type_msg} 주문 {canceled_count}개가 성공적으로 취소되었습니다."
@@ -203,7 +151,6 @@ def CancelOrderByTicker(stock_code, order_type="All", with_limit_orders=False):
 
 # 스탑 매수 주문 함수
 def MakeStopBuyOrder(stock_code, order_volume, stop_price, Exclusive=False):
-    global AutoOrderList
     global IsMarketOpen
     
     DIST = Common.GetNowDist()
@@ -218,13 +165,11 @@ def MakeStopBuyOrder(stock_code, order_volume, stop_price, Exclusive=False):
             return None
     
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "StopBuy" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑 매수 주문이 실행 중이라 현재 진행 중인 스탑 매수가 끝날 때 까지 추가 스탑 매수 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "StopBuy", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑 매수 주문이 실행 중이라 현재 진행 중인 스탑 매수가 끝날 때 까지 추가 스탑 매수 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -244,12 +189,8 @@ def MakeStopBuyOrder(stock_code, order_volume, stop_price, Exclusive=False):
     AutoStopData['OrderVolume'] = order_volume
     AutoStopData['StopPrice'] = stop_price
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑 매수 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -263,7 +204,6 @@ def MakeStopBuyOrder(stock_code, order_volume, stop_price, Exclusive=False):
 
 # 스탑 매도 주문 함수
 def MakeStopSellOrder(stock_code, order_volume, stop_price, Exclusive=False, CancelLimitOrders=False):
-    global AutoOrderList
     global IsMarketOpen
 
     DIST = Common.GetNowDist()
@@ -278,13 +218,11 @@ def MakeStopSellOrder(stock_code, order_volume, stop_price, Exclusive=False, Can
             return None
 
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "StopSell" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑 매도 주문이 실행 중이라 현재 진행중인 스탑 매도가 끝날 때 까지 추가 스탑 매도 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "StopSell", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑 매도 주문이 실행 중이라 현재 진행중인 스탑 매도가 끝날 때 까지 추가 스탑 매도 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -305,12 +243,8 @@ def MakeStopSellOrder(stock_code, order_volume, stop_price, Exclusive=False, Can
     AutoStopData['StopPrice'] = stop_price
     AutoStopData['CancelLimitOrders'] = CancelLimitOrders
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑 매도 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -324,7 +258,6 @@ def MakeStopSellOrder(stock_code, order_volume, stop_price, Exclusive=False, Can
 
 # 익절 매도 주문 함수
 def MakeProfitSellOrder(stock_code, order_volume, profit_price, Exclusive=False, CancelLimitOrders=False):
-    global AutoOrderList
     global IsMarketOpen
 
     DIST = Common.GetNowDist()
@@ -339,13 +272,11 @@ def MakeProfitSellOrder(stock_code, order_volume, profit_price, Exclusive=False,
             return None
 
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "ProfitSell" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 익절 매도 주문이 실행 중이라 현재 진행중인 익절 매도가 끝날 때 까지 추가 익절 매도 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "ProfitSell", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 익절 매도 주문이 실행 중이라 현재 진행중인 익절 매도가 끝날 때 까지 추가 익절 매도 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -366,12 +297,8 @@ def MakeProfitSellOrder(stock_code, order_volume, profit_price, Exclusive=False,
     AutoStopData['ProfitPrice'] = profit_price
     AutoStopData['CancelLimitOrders'] = CancelLimitOrders
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 익절 매도 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -385,7 +312,6 @@ def MakeProfitSellOrder(stock_code, order_volume, profit_price, Exclusive=False,
 
 # 트레일링 스탑 매수 주문 함수
 def MakeTrailingStopBuyOrder(stock_code, order_volume, trailing_percent, activation_price=None, Exclusive=False):
-    global AutoOrderList
     global IsMarketOpen
     
     DIST = Common.GetNowDist()
@@ -400,13 +326,11 @@ def MakeTrailingStopBuyOrder(stock_code, order_volume, trailing_percent, activat
             return None
     
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "TrailingStopBuy" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑 매수 주문이 실행 중이라 현재 진행 중인 트레일링 스탑 매수가 끝날 때 까지 추가 트레일링 스탑 매수 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "TrailingStopBuy", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑 매수 주문이 실행 중이라 현재 진행 중인 트레일링 스탑 매수가 끝날 때 까지 추가 트레일링 스탑 매수 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -435,12 +359,8 @@ def MakeTrailingStopBuyOrder(stock_code, order_volume, trailing_percent, activat
         AutoStopData['LowestPrice'] = nowPrice  # 현재가로 시작
         AutoStopData['IsActivated'] = True  # 즉시 활성화
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑 매수 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -456,7 +376,6 @@ def MakeTrailingStopBuyOrder(stock_code, order_volume, trailing_percent, activat
 
 # 트레일링 스탑 매도 주문 함수
 def MakeTrailingStopSellOrder(stock_code, order_volume, trailing_percent, activation_price=None, Exclusive=False, CancelLimitOrders=False):
-    global AutoOrderList
     global IsMarketOpen
 
     DIST = Common.GetNowDist()
@@ -471,13 +390,11 @@ def MakeTrailingStopSellOrder(stock_code, order_volume, trailing_percent, activa
             return None
 
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "TrailingStopSell" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑 매도 주문이 실행 중이라 현재 진행중인 트레일링 스탑 매도가 끝날 때 까지 추가 트레일링 스탑 매도 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "TrailingStopSell", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑 매도 주문이 실행 중이라 현재 진행중인 트레일링 스탑 매도가 끝날 때 까지 추가 트레일링 스탑 매도 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -508,12 +425,8 @@ def MakeTrailingStopSellOrder(stock_code, order_volume, trailing_percent, activa
     
     AutoStopData['CancelLimitOrders'] = CancelLimitOrders
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑 매도 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -529,7 +442,6 @@ def MakeTrailingStopSellOrder(stock_code, order_volume, trailing_percent, activa
 
 # 스탑로스 주문 함수 (해당 티커의 보유수량 전부 정리)
 def MakeStopLoss(stock_code, stop_price, Exclusive=False):
-    global AutoOrderList
     global IsMarketOpen
 
     DIST = Common.GetNowDist()
@@ -544,13 +456,11 @@ def MakeStopLoss(stock_code, stop_price, Exclusive=False):
             return None
 
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "StopLoss" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑로스 주문이 실행 중이라 현재 진행중인 스탑로스가 끝날 때 까지 추가 스탑로스 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "StopLoss", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 스탑로스 주문이 실행 중이라 현재 진행중인 스탑로스가 끝날 때 까지 추가 스탑로스 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -569,12 +479,8 @@ def MakeStopLoss(stock_code, stop_price, Exclusive=False):
     AutoStopData['StopPrice'] = stop_price
     AutoStopData['CancelLimitOrders'] = True  # 자동으로 True 설정
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑로스 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
@@ -588,7 +494,6 @@ def MakeStopLoss(stock_code, stop_price, Exclusive=False):
 
 # 트레일링 스탑로스 주문 함수 (해당 종목의 보유수량 전부 정리)
 def MakeTrailingStopLoss(stock_code, trailing_percent, activation_price=None, Exclusive=False):
-    global AutoOrderList
     global IsMarketOpen
 
     DIST = Common.GetNowDist()
@@ -603,13 +508,11 @@ def MakeTrailingStopLoss(stock_code, trailing_percent, activation_price=None, Ex
             return None
 
     if Exclusive == True:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['OrderType'] == "TrailingStopLoss" and AutoStopData['AccountType'] == DIST:
-                if AutoStopData['stock_code'] == stock_code:
-                    msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑로스 주문이 실행 중이라 현재 진행중인 트레일링 스탑로스가 끝날 때 까지 추가 트레일링 스탑로스 주문은 처리하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    return None
+        if len(StopOrderStore.GetOrders(stock_code, "TrailingStopLoss", DIST)) > 0:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 독점 트레일링 스탑로스 주문이 실행 중이라 현재 진행중인 트레일링 스탑로스가 끝날 때 까지 추가 트레일링 스탑로스 주문은 처리하지 않습니다."
+            print(msg)
+            line_alert.SendMessage(msg)
+            return None
 
     nowPrice = KisKR.GetCurrentPrice(stock_code)
     time.sleep(0.1)
@@ -635,12 +538,8 @@ def MakeTrailingStopLoss(stock_code, trailing_percent, activation_price=None, Ex
         AutoStopData['HighestPrice'] = nowPrice  # 현재가로 시작
         AutoStopData['IsActivated'] = True  # 즉시 활성화
 
-    # 데이터를 리스트에 추가하고 저장
-    AutoOrderList.append(AutoStopData)
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+    # 데이터를 저장소에 추가
+    StopOrderStore.AddOrder(AutoStopData)
 
     msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑로스 주문이 등록되었습니다.\n"
     msg += "주문 ID: " + order_id + "\n"
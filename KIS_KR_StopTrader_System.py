@@ -18,552 +18,802 @@ FAQ로 해결 안되는 기술적인 문제는 클래스101 강의의 댓글이
 # -*- coding: utf-8 -*-
 import KIS_Common as Common
 import KIS_API_Helper_KR as KisKR
+import KIS_API_Helper_KR_Realtime as RealtimeKR
 import time
-import json
-import random
-import fcntl
+import os
+import queue
 import line_alert
+import KIS_KR_StopOrderStore as StopOrderStore
 
-from tendo import singleton 
+from tendo import singleton
 me = singleton.SingleInstance()
 
+#크론으로 1번 돌고 끝나던 스크립트를 계속 떠 있는 데몬으로 바꿨다!
+#주문 리스트를 메모리에 들고 종목코드별로 묶어서, 종목별 현재가가 들어올 때마다 그 종목의 주문만 체크한다
+#현재가 조회는 주문 수가 아니라 종목 수만큼만 한다 (REAL/REAL2/REAL3에 같은 종목 주문이 여러개 있어도 1번)
+#실시간 웹소켓(체결가)을 쓰면 체결이 날 때마다 체크하고, 실시간으로 못 받는 종목만 REST로 조회한다
+
 #장이 열린지 여부 판단을 위한 계좌 정보로 현재 자동매매중인 계좌명 아무거나 넣으면 됩니다.
 Common.SetChangeMode("REAL3") #즉 다계좌 매매로 REAL, REAL2, REAL3 여러개를 자동매매 해도 한개만 여기 넣으면 됨!
+BASE_DIST = Common.GetNowDist()   #장 체크/현재가 조회/실시간 접속에 쓰는 계좌
 
-time.sleep(30.0) #스플릿 트레이더와 중복을 피하기 위해! 30초 대기!
-
+STOP_TRADER_INTERVAL = float(os.getenv("STOP_TRADER_INTERVAL", "1.0"))                  #현재가를 돌려보는 주기(초)
+STOP_TRADER_MARKET_CHECK_SEC = float(os.getenv("STOP_TRADER_MARKET_CHECK_SEC", "60"))   #장 열림 여부를 다시 확인하는 주기(초)
+STOP_TRADER_START_DELAY = float(os.getenv("STOP_TRADER_START_DELAY", "0"))              #예전처럼 크론으로 스플릿 트레이더와 겹쳐 돌린다면 30 정도로!
+STOP_TRADER_ONCE = os.getenv("STOP_TRADER_ONCE", "0") == "1"                            #1이면 예전처럼 1번만 돌고 종료 (크론용)
+STOP_TRADER_PRICE_SOURCE = os.getenv("STOP_TRADER_PRICE_SOURCE", "WS")                  #WS: 실시간 체결가 + REST 보조, REST: REST 현재가만
+STOP_TRADER_WS_MAX_AGE_SEC = float(os.getenv("STOP_TRADER_WS_MAX_AGE_SEC", "30"))      #실시간 체결가가 이보다 오래되면 그 종목은 REST로 조회(초)
+STOP_TRADER_HIGH_ALERT_SEC = float(os.getenv("STOP_TRADER_HIGH_ALERT_SEC", "60"))       #트레일링 스탑로스 최고가 갱신 알림은 주문당 이 시간(초)에 1번만
 
-IsMarketOpen = KisKR.IsMarketOpen()
+#트레일링 주문에서 데몬이 직접 바꾸는 값들! 저장할 때 이 값들만 저장소에 반영한다
+TRACK_KEYS = ['HighestPrice', 'LowestPrice', 'IsActivated']
 
-auto_order_file_path = "/var/autobot/KIS_KR_StopTrader_AutoOrderList.json"
-time.sleep(random.random()*0.1)
 
 #지정가 주문을 읽고 필요 수량만큼 취소하는 함수
 def CancelLimitOrdersForQuantity(stock_code, target_quantity):
     """
     지정가 주문을 읽고 목표 수량만큼 취소하는 함수
-    
+
     Args:
         stock_code: 주식 종목 코드 (예: "005930")
         target_quantity: 목표 취소 수량
-    
+
     Returns:
         float: 실제 취소된 수량
     """
     canceled_quantity = 0.0  # 취소된 주문의 총 수량을 추적
-    
+
     try:
         # 해당 종목의 모든 주문 정보를 가져옵니다 (매도 주문만)
         orders_data = KisKR.GetOrderList(stock_code, side="SELL", status="OPEN")
-        
+
         if len(orders_data) > 0:
             for order in orders_data:
                 # 필요한 수량이 확보되었는지 확인
                 if canceled_quantity >= target_quantity:
                     print(f"목표 수량 {target_quantity} 확보 완료. 추가 주문 취소 중단")
                     break
-                
+
                 # 지정가 매도 주문이고 상태가 'Open'인 경우만 취소
                 if order['OrderSide'] == 'Sell' and order['OrderType'] == 'Limit' and order['OrderSatus'] == 'Open':
                     remaining_quantity = float(order['OrderAmt'])
-                    
+
                     # 주문 취소
                     try:
-                        KisKR.CancelModifyOrder(stock_code, order['OrderNum'], order['OrderNum2'], 
+                        KisKR.CancelModifyOrder(stock_code, order['OrderNum'], order['OrderNum2'],
                                               remaining_quantity, order['OrderAvgPrice'], mode="CANCEL")
                         canceled_quantity += remaining_quantity
                         print(f"주문 취소: {order['OrderNum']}-{order['OrderNum2']}, 수량: {remaining_quantity}, 누적 취소 수량: {canceled_quantity}")
                         time.sleep(0.1)  # API 호출 제한 방지
                     except Exception as e:
                         print(f"주문 취소 실패: {order['OrderNum']}-{order['OrderNum2']}, 에러: {e}")
-        
+
         print(f"총 취소된 수량: {canceled_quantity}, 목표 수량: {target_quantity}")
-        
+
     except Exception as e:
         print(f"주문 정보 조회 실패: {e}")
-    
+
     return canceled_quantity
 
-#자동 주문 리스트 읽기!
+
+#현재 계좌의 해당 종목 매도 가능 수량을 리턴!
+def GetFreeAmt(stock_code):
+    balances = KisKR.GetMyStockList()
+    for balance in balances:
+        if balance['StockCode'] == stock_code:
+            return float(balance['StockAmt'])
+    return 0
+
+
+#지정가 주문 취소 옵션이 있으면 부족한 수량만큼 지정가 매도 주문을 취소한다
+def FreeUpLimitOrders(AutoStopData, order_volume, label):
+    if not AutoStopData.get('CancelLimitOrders', False):
+        return
+
+    stock_code = AutoStopData['stock_code']
+
+    # 부족한 수량 계산
+    need_quantity = order_volume - GetFreeAmt(stock_code)
+
+    # 부족한 수량만큼 지정가 주문 취소
+    if need_quantity > 0:
+        canceled_quantity = CancelLimitOrdersForQuantity(stock_code, need_quantity)
+        if canceled_quantity > 0:
+            msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " " + label + " 전 지정가 주문 취소 완료. 취소 수량: " + str(canceled_quantity)
+            print(msg)
+            line_alert.SendMessage(msg)
+            time.sleep(0.1)
+
+
+############################################################################################################################################################
+#주문 리스트 (메모리) 관리! 주문 원본은 KIS_KR_StopOrderStore (SQLite) 에 있고
+#데몬은 메모리에 들고 체크하다가 바뀐 주문만 1건 단위로 바로 저장한다 (트레일링 최고가도 체결 처리 직후 디스크에 남는다)
+
 AutoOrderList = list()
-try:
-    with open(auto_order_file_path, 'r') as json_file:
-        fcntl.flock(json_file, fcntl.LOCK_EX)  # 파일 락 설정
-        AutoOrderList = json.load(json_file)
-        fcntl.flock(json_file, fcntl.LOCK_UN)  # 파일 락 해제
-except Exception as e:
-    print("Exception by First:", e)
+StoreVersion = None             #마지막으로 읽은 저장소 버전! 다른 봇이 주문을 추가/취소하면 바뀐다
+OrderByCodeDict = dict()        #종목코드 -> 그 종목의 주문 리스트
+DirtyOrderList = list()         #트레일링 값이 바뀌어서 저장해야 할 주문
+PendingDeleteIdList = list()    #처리가 끝났는데 아직 저장소에서 못 지운 (주문 ID, 계좌) (다음에 다시 시도)
 
-# 스탑로스가 실행된 종목들을 추적하는 리스트
-stop_loss_executed_tickers = []
 
-#장이 열린 상황에서만!
-if IsMarketOpen == True:
-    print("장이 열린 상황")
+#주문 1건을 구분하는 키! 주문 ID는 계좌마다 따로 만들어져서 계좌까지 같이 본다
+def GetOrderKey(AutoStopData):
+    return (AutoStopData['OrderId'], AutoStopData.get('AccountType', 'REAL'))
 
-    items_to_remove = list()
 
-    #저장된 스탑 주문 데이터를 순회한다 
+#종목코드별로 주문을 묶는다
+def RebuildOrderIndex():
+    OrderByCodeDict.clear()
     for AutoStopData in AutoOrderList:
-        
-        #계좌 세팅!
-        Common.SetChangeMode(AutoStopData.get('AccountType', 'REAL'))
-        DIST = Common.GetNowDist()
-        stock_code = AutoStopData['stock_code']
-        stock_name = KisKR.GetStockName(stock_code)
-
-        # 스탑 매수 주문 처리
-        if AutoStopData['OrderType'] == "StopBuy":
-
-            stop_price = AutoStopData['StopPrice']
-            order_volume = AutoStopData['OrderVolume']
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 스탑 가격에 도달했는지 확인
-            if nowPrice >= stop_price:
-                # 스탑 매수 실행
-                data = KisKR.MakeBuyMarketOrder(stock_code, order_volume)
-                print(data)
-                
-                msg = DIST + " " + stock_code + " " + stock_name + " 스탑 매수 주문이 실행되었습니다.\n"
+        OrderByCodeDict.setdefault(AutoStopData['stock_code'], list()).append(AutoStopData)
+
+
+#저장소가 바뀌었을 때만(봇이 주문을 추가/취소했을 때) 다시 읽는다
+def ReloadAutoOrderListIfChanged():
+    global AutoOrderList, StoreVersion
+
+    FlushOrderStore()
+
+    version = StopOrderStore.GetDataVersion()
+    if version == StoreVersion:
+        return False
+
+    AutoOrderList = [AutoStopData for AutoStopData in StopOrderStore.GetAllOrders() if GetOrderKey(AutoStopData) not in PendingDeleteIdList]
+    StoreVersion = version
+    RebuildOrderIndex()
+    return True
+
+
+#트레일링 값(최고가/최저가/활성화)이 바뀐 주문 표시
+def MarkDirty(AutoStopData):
+    if AutoStopData not in DirtyOrderList:
+        DirtyOrderList.append(AutoStopData)
+
+
+#바뀐 주문/지울 주문을 저장소에 반영한다! 실패하면 남겨뒀다가 다음에 다시
+def FlushOrderStore():
+
+    for order_id, account_type in list(PendingDeleteIdList):
+        try:
+            StopOrderStore.DeleteOrder(order_id, account_type)
+            PendingDeleteIdList.remove((order_id, account_type))
+        except Exception as e:
+            print("주문 삭제 저장 실패:", order_id, account_type, e)
+
+    if len(DirtyOrderList) == 0:
+        return
+
+    UpdateList = [GetOrderKey(AutoStopData) + ({key: AutoStopData[key] for key in TRACK_KEYS if key in AutoStopData},)
+                  for AutoStopData in DirtyOrderList]
+    try:
+        StopOrderStore.UpdateOrdersFields(UpdateList)
+        DirtyOrderList.clear()
+    except Exception as e:
+        print("트레일링 값 저장 실패:", e)
+
+
+#처리 끝난 주문을 메모리와 저장소에서 뺀다
+def RemoveOrder(AutoStopData):
+    if AutoStopData in DirtyOrderList:
+        DirtyOrderList.remove(AutoStopData)
+    if AutoStopData in AutoOrderList:
+        AutoOrderList.remove(AutoStopData)
+    OrderList = OrderByCodeDict.get(AutoStopData['stock_code'])
+    if OrderList is not None and AutoStopData in OrderList:
+        OrderList.remove(AutoStopData)
+        if len(OrderList) == 0:
+            del OrderByCodeDict[AutoStopData['stock_code']]
+
+    order_id, account_type = GetOrderKey(AutoStopData)
+    HighAlertTimeDict.pop((order_id, account_type), None)
+    try:
+        StopOrderStore.DeleteOrder(order_id, account_type)
+    except Exception as e:
+        print("주문 삭제 저장 실패:", order_id, account_type, e)
+        if (order_id, account_type) not in PendingDeleteIdList:
+            PendingDeleteIdList.append((order_id, account_type))
+
+
+############################################################################################################################################################
+#주문 타입별 체크 함수! (주문 데이터, 현재가)를 받아서
+#"DONE": 주문 완료(삭제), "STOPLOSS": 스탑로스 실행(그 종목 주문 전부 정리), None: 계속 대기 를 리턴한다
+
+
+# 스탑 매수 주문 처리
+def CheckStopBuy(AutoStopData, nowPrice):
+
+    stop_price = AutoStopData['StopPrice']
+    order_volume = AutoStopData['OrderVolume']
+    stock_code = AutoStopData['stock_code']
+
+    # 스탑 가격에 도달했는지 확인
+    if nowPrice >= stop_price:
+        # 스탑 매수 실행
+        data = KisKR.MakeBuyMarketOrder(stock_code, order_volume)
+        print(data)
+
+        #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+        try:
+            msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑 매수 주문이 실행되었습니다.\n"
+            msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
+            msg += "주문 수량: " + str(order_volume) + "주\n"
+            msg += "스탑 가격: " + str(stop_price) + "원\n"
+            msg += "현재 가격: " + str(nowPrice) + "원"
+            print(msg)
+            line_alert.SendMessage(msg)
+        except Exception as e:
+            print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+        return "DONE"
+
+    return None
+
+
+# 스탑 매도 주문 처리
+def CheckStopSell(AutoStopData, nowPrice):
+
+    stop_price = AutoStopData['StopPrice']
+    order_volume = AutoStopData['OrderVolume']
+    stock_code = AutoStopData['stock_code']
+
+    # 스탑 가격에 도달했는지 확인
+    if nowPrice <= stop_price:
+        FreeUpLimitOrders(AutoStopData, order_volume, "스탑 매도")
+
+        # 스탑 매도 실행
+        data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
+        print(data)
+
+        #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+        try:
+            msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑 매도 주문이 실행되었습니다.\n"
+            msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
+            msg += "주문 수량: " + str(order_volume) + "주\n"
+            msg += "스탑 가격: " + str(stop_price) + "원\n"
+            msg += "현재 가격: " + str(nowPrice) + "원"
+            print(msg)
+            line_alert.SendMessage(msg)
+        except Exception as e:
+            print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+        return "DONE"
+
+    return None
+
+
+# 익절 매도 주문 처리
+def CheckProfitSell(AutoStopData, nowPrice):
+
+    profit_price = AutoStopData['ProfitPrice']
+    order_volume = AutoStopData['OrderVolume']
+    stock_code = AutoStopData['stock_code']
+
+    # 익절 가격에 도달했는지 확인
+    if nowPrice >= profit_price:
+        FreeUpLimitOrders(AutoStopData, order_volume, "익절 매도")
+
+        # 익절 매도 실행
+        data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
+        print(data)
+
+        #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+        try:
+            msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 익절 매도 주문이 실행되었습니다.\n"
+            msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
+            msg += "주문 수량: " + str(order_volume) + "주\n"
+            msg += "익절 가격: " + str(profit_price) + "원\n"
+            msg += "현재 가격: " + str(nowPrice) + "원"
+            print(msg)
+            line_alert.SendMessage(msg)
+        except Exception as e:
+            print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+        return "DONE"
+
+    return None
+
+
+# 트레일링 스탑 매수 주문 처리
+def CheckTrailingStopBuy(AutoStopData, nowPrice):
+
+    order_volume = AutoStopData['OrderVolume']
+    trailing_percent = AutoStopData['TrailingPercent']
+    lowest_price = AutoStopData['LowestPrice']
+    is_activated = AutoStopData.get('IsActivated', True)
+    activation_price = AutoStopData.get('ActivationPrice')
+    stock_code = AutoStopData['stock_code']
+
+    # 활성화 가격이 설정되어 있고 아직 활성화되지 않았다면
+    if activation_price is not None and not is_activated:
+        if nowPrice <= activation_price:
+            AutoStopData['IsActivated'] = True
+            AutoStopData['LowestPrice'] = nowPrice
+            lowest_price = nowPrice
+            is_activated = True
+            MarkDirty(AutoStopData)
+            print(f"트레일링 스탑 매수 활성화: {stock_code}, 활성화 가격: {activation_price}")
+    # 활성화 가격이 None인 경우 즉시 활성화
+    elif activation_price is None and not is_activated:
+        AutoStopData['IsActivated'] = True
+        AutoStopData['LowestPrice'] = nowPrice
+        lowest_price = nowPrice
+        is_activated = True
+        MarkDirty(AutoStopData)
+        print(f"트레일링 스탑 매수 즉시 활성화: {stock_code} (ActivationPrice: None)")
+
+    # 활성화된 상태에서만 트레일링 로직 실행
+    if is_activated:
+        # 최저가 업데이트
+        if nowPrice < lowest_price:
+            AutoStopData['LowestPrice'] = nowPrice
+            lowest_price = nowPrice
+            MarkDirty(AutoStopData)
+
+        # 트레일링 스탑 가격 계산
+        trailing_stop_price = lowest_price * (1 + trailing_percent / 100)
+
+        # 현재가가 트레일링 스탑 가격에 도달했는지 확인
+        if nowPrice >= trailing_stop_price:
+            # 트레일링 스탑 매수 실행
+            data = KisKR.MakeBuyMarketOrder(stock_code, order_volume)
+            print(data)
+
+            #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+            try:
+                msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑 매수 주문이 실행되었습니다.\n"
                 msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
                 msg += "주문 수량: " + str(order_volume) + "주\n"
-                msg += "스탑 가격: " + str(stop_price) + "원\n"
+                msg += "트레일링 퍼센트: " + str(trailing_percent) + "%\n"
+                msg += "최저가: " + str(lowest_price) + "원\n"
+                msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
                 msg += "현재 가격: " + str(nowPrice) + "원"
                 print(msg)
                 line_alert.SendMessage(msg)
-                
-                # 주문 완료 후 리스트에서 제거
-                items_to_remove.append(AutoStopData)
-
-        # 스탑 매도 주문 처리
-        elif AutoStopData['OrderType'] == "StopSell":
-
-            stop_price = AutoStopData['StopPrice']
-            order_volume = AutoStopData['OrderVolume']
-            cancel_limit_orders = AutoStopData.get('CancelLimitOrders', False)
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 스탑 가격에 도달했는지 확인
-            if nowPrice <= stop_price:
-                # 지정가 주문 취소 옵션이 있으면 실행
-                if cancel_limit_orders:
-                    # 현재 매도 가능 수량 확인
-                    balances = KisKR.GetMyStockList()
-                    free_quantity = 0
-                    for balance in balances:
-                        if balance['StockCode'] == stock_code:
-                            free_quantity = float(balance['StockAmt'])
-                            break
-                    
-                    # 부족한 수량 계산
-                    need_quantity = order_volume - free_quantity
-                    
-                    # 부족한 수량만큼 지정가 주문 취소
-                    if need_quantity > 0:
-                        canceled_quantity = CancelLimitOrdersForQuantity(stock_code, need_quantity)
-                        if canceled_quantity > 0:
-                            msg = DIST + " " + stock_code + " " + stock_name + " 스탑 매도 전 지정가 주문 취소 완료. 취소 수량: " + str(canceled_quantity)
-                            print(msg)
-                            line_alert.SendMessage(msg)
-                            time.sleep(0.1)
-                
-                # 스탑 매도 실행
-                data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
-                print(data)
-                
-                msg = DIST + " " + stock_code + " " + stock_name + " 스탑 매도 주문이 실행되었습니다.\n"
+            except Exception as e:
+                print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+            return "DONE"
+
+    return None
+
+
+# 트레일링 스탑 매도 주문 처리
+def CheckTrailingStopSell(AutoStopData, nowPrice):
+
+    order_volume = AutoStopData['OrderVolume']
+    trailing_percent = AutoStopData['TrailingPercent']
+    highest_price = AutoStopData['HighestPrice']
+    is_activated = AutoStopData.get('IsActivated', True)
+    activation_price = AutoStopData.get('ActivationPrice')
+    stock_code = AutoStopData['stock_code']
+
+    # 활성화 가격이 설정되어 있고 아직 활성화되지 않았다면
+    if activation_price is not None and not is_activated:
+        if nowPrice <= activation_price:
+            AutoStopData['IsActivated'] = True
+            AutoStopData['HighestPrice'] = nowPrice
+            highest_price = nowPrice
+            is_activated = True
+            MarkDirty(AutoStopData)
+            print(f"트레일링 스탑 매도 활성화: {stock_code}, 활성화 가격: {activation_price}")
+    # 활성화 가격이 None인 경우 즉시 활성화
+    elif activation_price is None and not is_activated:
+        AutoStopData['IsActivated'] = True
+        AutoStopData['HighestPrice'] = nowPrice
+        highest_price = nowPrice
+        is_activated = True
+        MarkDirty(AutoStopData)
+        print(f"트레일링 스탑 매도 즉시 활성화: {stock_code} (ActivationPrice: None)")
+
+    # 활성화된 상태에서만 트레일링 로직 실행
+    if is_activated:
+        # 최고가 업데이트
+        if nowPrice > highest_price:
+            AutoStopData['HighestPrice'] = nowPrice
+            highest_price = nowPrice
+            MarkDirty(AutoStopData)
+
+        # 트레일링 스탑 가격 계산
+        trailing_stop_price = highest_price * (1 - trailing_percent / 100)
+
+        # 현재가가 트레일링 스탑 가격에 도달했는지 확인
+        if nowPrice <= trailing_stop_price:
+            FreeUpLimitOrders(AutoStopData, order_volume, "트레일링 스탑 매도")
+
+            # 트레일링 스탑 매도 실행
+            data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
+            print(data)
+
+            #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+            try:
+                msg = Common.GetNowDist() + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑 매도 주문이 실행되었습니다.\n"
                 msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
                 msg += "주문 수량: " + str(order_volume) + "주\n"
-                msg += "스탑 가격: " + str(stop_price) + "원\n"
+                msg += "트레일링 퍼센트: " + str(trailing_percent) + "%\n"
+                msg += "최고가: " + str(highest_price) + "원\n"
+                msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
                 msg += "현재 가격: " + str(nowPrice) + "원"
                 print(msg)
                 line_alert.SendMessage(msg)
-                
-                # 주문 완료 후 리스트에서 제거
-                items_to_remove.append(AutoStopData)
-
-        # 익절 매도 주문 처리
-        elif AutoStopData['OrderType'] == "ProfitSell":
-
-            profit_price = AutoStopData['ProfitPrice']
-            order_volume = AutoStopData['OrderVolume']
-            cancel_limit_orders = AutoStopData.get('CancelLimitOrders', False)
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 익절 가격에 도달했는지 확인
-            if nowPrice >= profit_price:
-                # 지정가 주문 취소 옵션이 있으면 실행
-                if cancel_limit_orders:
-                    # 현재 매도 가능 수량 확인
-                    balances = KisKR.GetMyStockList()
-                    free_quantity = 0
-                    for balance in balances:
-                        if balance['StockCode'] == stock_code:
-                            free_quantity = float(balance['StockAmt'])
-                            break
-                    
-                    # 부족한 수량 계산
-                    need_quantity = order_volume - free_quantity
-                    
-                    # 부족한 수량만큼 지정가 주문 취소
-                    if need_quantity > 0:
-                        canceled_quantity = CancelLimitOrdersForQuantity(stock_code, need_quantity)
-                        if canceled_quantity > 0:
-                            msg = DIST + " " + stock_code + " " + stock_name + " 익절 매도 전 지정가 주문 취소 완료. 취소 수량: " + str(canceled_quantity)
-                            print(msg)
-                            line_alert.SendMessage(msg)
-                            time.sleep(0.1)
-                
-                # 익절 매도 실행
-                data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
-                print(data)
-                
-                msg = DIST + " " + stock_code + " " + stock_name + " 익절 매도 주문이 실행되었습니다.\n"
-                msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
-                msg += "주문 수량: " + str(order_volume) + "주\n"
-                msg += "익절 가격: " + str(profit_price) + "원\n"
-                msg += "현재 가격: " + str(nowPrice) + "원"
+            except Exception as e:
+                print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+            return "DONE"
+
+    return None
+
+
+# 스탑로스 주문 처리 (보유수량 전부 정리)
+def CheckStopLoss(AutoStopData, nowPrice):
+
+    stop_price = AutoStopData['StopPrice']
+    stock_code = AutoStopData['stock_code']
+    DIST = Common.GetNowDist()
+
+    # 스탑 가격에 도달했는지 확인
+    if nowPrice <= stop_price:
+
+        KisKR.CancelAllOrders(stock_code)
+        time.sleep(0.5)
+
+        # 현재 매도 가능 수량 확인
+        FreeAmt = GetFreeAmt(stock_code)
+
+        # 보유수량이 0이면 주문하지 않음
+        if FreeAmt <= 0:
+            msg = DIST + " " + stock_code + " 보유수량이 0이므로 스탑로스 주문을 실행하지 않습니다."
+            print(msg)
+            try:
+                line_alert.SendMessage(msg)
+            except Exception as e:
+                print("스탑로스 알림 실패:", AutoStopData['OrderId'], e)
+            return "DONE"
+
+        # 스탑로스 실행 (보유수량 전부 매도)
+        data = KisKR.MakeSellMarketOrder(stock_code, FreeAmt)
+        print(data)
+
+        #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+        try:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑로스 주문이 실행되었습니다.\n"
+            msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
+            msg += "매도 수량: " + str(FreeAmt) + "주\n"
+            msg += "스탑 가격: " + str(stop_price) + "원\n"
+            msg += "현재 가격: " + str(nowPrice) + "원\n"
+            msg += "보유수량 전부 정리 완료"
+            print(msg)
+            line_alert.SendMessage(msg)
+        except Exception as e:
+            print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+        return "STOPLOSS"
+
+    return None
+
+
+HighAlertTimeDict = dict()      #(주문 ID, 계좌) -> 마지막으로 최고가 갱신 알림을 보낸 시각
+
+
+#실시간 체결마다 최고가가 바뀌니 알림(종목명 조회 + 라인 전송)은 주문당 STOP_TRADER_HIGH_ALERT_SEC 에 1번만 보낸다
+def SendHighAlert(AutoStopData, DIST, nowPrice):
+
+    OrderKey = GetOrderKey(AutoStopData)
+    if time.time() - HighAlertTimeDict.get(OrderKey, 0) < STOP_TRADER_HIGH_ALERT_SEC:
+        return
+    HighAlertTimeDict[OrderKey] = time.time()
+
+    stock_code = AutoStopData['stock_code']
+    try:
+        msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑로스 최고가 업데이트: " + str(nowPrice)
+        line_alert.SendMessage(msg)
+    except Exception as e:
+        print("최고가 갱신 알림 실패:", AutoStopData['OrderId'], e)
+
+
+# 트레일링 스탑로스 처리 (보유수량 전부 정리)
+def CheckTrailingStopLoss(AutoStopData, nowPrice):
+
+    stock_code = AutoStopData['stock_code']
+    DIST = Common.GetNowDist()
+
+    # 활성화 여부 확인
+    if AutoStopData.get('IsActivated', True) == False:
+        activation_price = AutoStopData.get('ActivationPrice')
+        # 활성화 가격이 설정되어 있고 해당 가격에 도달한 경우
+        if activation_price is not None and nowPrice >= activation_price:
+            AutoStopData['IsActivated'] = True
+            AutoStopData['HighestPrice'] = nowPrice
+            MarkDirty(AutoStopData)
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑로스가 활성화되었습니다. 활성화 가격: " + str(nowPrice)
+            print(msg)
+            line_alert.SendMessage(msg)
+        # 활성화 가격이 None인 경우 즉시 활성화
+        elif activation_price is None:
+            AutoStopData['IsActivated'] = True
+            AutoStopData['HighestPrice'] = nowPrice
+            MarkDirty(AutoStopData)
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑로스가 즉시 활성화되었습니다. (ActivationPrice: None)"
+            print(msg)
+            line_alert.SendMessage(msg)
+        else:
+            # 아직 활성화되지 않았으면 다음 체크로
+            return None
+
+    # 활성화된 경우 최고가 업데이트
+    if nowPrice > AutoStopData['HighestPrice']:
+        AutoStopData['HighestPrice'] = nowPrice
+        MarkDirty(AutoStopData)
+        print(DIST + " " + stock_code + " 트레일링 스탑로스 최고가 업데이트: " + str(nowPrice))
+        SendHighAlert(AutoStopData, DIST, nowPrice)
+
+    # 트레일링 스탑 가격 계산 (최고가 대비 n% 하락)
+    trailing_stop_price = AutoStopData['HighestPrice'] * (1 - AutoStopData['TrailingPercent'] / 100)
+
+    # 현재 가격이 트레일링 스탑 가격 이하이면 매도 실행
+    if nowPrice <= trailing_stop_price:
+        try:
+            KisKR.CancelAllOrders(stock_code)
+            time.sleep(0.5)
+
+            # 현재 매도 가능 수량 확인
+            FreeAmt = GetFreeAmt(stock_code)
+
+            # 보유수량이 0이면 주문하지 않음
+            if FreeAmt <= 0:
+                msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 보유수량이 0이므로 트레일링 스탑로스 주문을 실행하지 않습니다."
                 print(msg)
                 line_alert.SendMessage(msg)
-                
-                # 주문 완료 후 리스트에서 제거
-                items_to_remove.append(AutoStopData)
-
-        # 트레일링 스탑 매수 주문 처리
-        elif AutoStopData['OrderType'] == "TrailingStopBuy":
-            print(AutoStopData)
-            
-            order_volume = AutoStopData['OrderVolume']
-            trailing_percent = AutoStopData['TrailingPercent']
-            lowest_price = AutoStopData['LowestPrice']
-            is_activated = AutoStopData.get('IsActivated', True)
-            activation_price = AutoStopData.get('ActivationPrice')
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 활성화 가격이 설정되어 있고 아직 활성화되지 않았다면
-            if activation_price is not None and not is_activated:
-                if nowPrice <= activation_price:
-                    AutoStopData['IsActivated'] = True
-                    AutoStopData['LowestPrice'] = nowPrice
-                    is_activated = True
-                    print(f"트레일링 스탑 매수 활성화: {stock_code}, 활성화 가격: {activation_price}")
-            # 활성화 가격이 None인 경우 즉시 활성화
-            elif activation_price is None and not is_activated:
-                AutoStopData['IsActivated'] = True
-                AutoStopData['LowestPrice'] = nowPrice
-                is_activated = True
-                print(f"트레일링 스탑 매수 즉시 활성화: {stock_code} (ActivationPrice: None)")
-            
-            # 활성화된 상태에서만 트레일링 로직 실행
-            if is_activated:
-                # 최저가 업데이트
-                if nowPrice < lowest_price:
-                    AutoStopData['LowestPrice'] = nowPrice
-                    lowest_price = nowPrice
-                
-                # 트레일링 스탑 가격 계산
-                trailing_stop_price = lowest_price * (1 + trailing_percent / 100)
-                
-                # 현재가가 트레일링 스탑 가격에 도달했는지 확인
-                if nowPrice >= trailing_stop_price:
-                    # 트레일링 스탑 매수 실행
-                    data = KisKR.MakeBuyMarketOrder(stock_code, order_volume)
-                    print(data)
-                    
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑 매수 주문이 실행되었습니다.\n"
-                    msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
-                    msg += "주문 수량: " + str(order_volume) + "주\n"
-                    msg += "트레일링 퍼센트: " + str(trailing_percent) + "%\n"
-                    msg += "최저가: " + str(lowest_price) + "원\n"
-                    msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
-                    msg += "현재 가격: " + str(nowPrice) + "원"
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    
-                    # 주문 완료 후 리스트에서 제거
-                    items_to_remove.append(AutoStopData)
-
-        # 트레일링 스탑 매도 주문 처리
-        elif AutoStopData['OrderType'] == "TrailingStopSell":
-            print(AutoStopData)
-            
-            order_volume = AutoStopData['OrderVolume']
-            trailing_percent = AutoStopData['TrailingPercent']
-            highest_price = AutoStopData['HighestPrice']
-            is_activated = AutoStopData.get('IsActivated', True)
-            activation_price = AutoStopData.get('ActivationPrice')
-            cancel_limit_orders = AutoStopData.get('CancelLimitOrders', False)
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 활성화 가격이 설정되어 있고 아직 활성화되지 않았다면
-            if activation_price is not None and not is_activated:
-                if nowPrice <= activation_price:
-                    AutoStopData['IsActivated'] = True
-                    AutoStopData['HighestPrice'] = nowPrice
-                    is_activated = True
-                    print(f"트레일링 스탑 매도 활성화: {stock_code}, 활성화 가격: {activation_price}")
-            # 활성화 가격이 None인 경우 즉시 활성화
-            elif activation_price is None and not is_activated:
-                AutoStopData['IsActivated'] = True
-                AutoStopData['HighestPrice'] = nowPrice
-                is_activated = True
-                print(f"트레일링 스탑 매도 즉시 활성화: {stock_code} (ActivationPrice: None)")
-            
-            # 활성화된 상태에서만 트레일링 로직 실행
-            if is_activated:
-                # 최고가 업데이트
-                if nowPrice > highest_price:
-                    AutoStopData['HighestPrice'] = nowPrice
-                    highest_price = nowPrice
-                
-                # 트레일링 스탑 가격 계산
-                trailing_stop_price = highest_price * (1 - trailing_percent / 100)
-                
-                # 현재가가 트레일링 스탑 가격에 도달했는지 확인
-                if nowPrice <= trailing_stop_price:
-                    # 지정가 주문 취소 옵션이 있으면 실행
-                    if cancel_limit_orders:
-                        # 현재 매도 가능 수량 확인
-                        balances = KisKR.GetMyStockList()
-                        free_quantity = 0
-                        for balance in balances:
-                            if balance['StockCode'] == stock_code:
-                                free_quantity = float(balance['StockAmt'])
-                                break
-                        
-                        # 부족한 수량 계산
-                        need_quantity = order_volume - free_quantity
-                        
-                        # 부족한 수량만큼 지정가 주문 취소
-                        if need_quantity > 0:
-                            canceled_quantity = CancelLimitOrdersForQuantity(stock_code, need_quantity)
-                            if canceled_quantity > 0:
-                                msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑 매도 전 지정가 주문 취소 완료. 취소 수량: " + str(canceled_quantity)
-                                print(msg)
-                                line_alert.SendMessage(msg)
-                                time.sleep(0.1)
-                    
-                    # 트레일링 스탑 매도 실행
-                    data = KisKR.MakeSellMarketOrder(stock_code, order_volume)
-                    print(data)
-                    
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑 매도 주문이 실행되었습니다.\n"
-                    msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
-                    msg += "주문 수량: " + str(order_volume) + "주\n"
-                    msg += "트레일링 퍼센트: " + str(trailing_percent) + "%\n"
-                    msg += "최고가: " + str(highest_price) + "원\n"
-                    msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
-                    msg += "현재 가격: " + str(nowPrice) + "원"
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    
-                    # 주문 완료 후 리스트에서 제거
-                    items_to_remove.append(AutoStopData)
-
-        # 스탑로스 주문 처리 (보유수량 전부 정리)
-        elif AutoStopData['OrderType'] == "StopLoss":
-            print(AutoStopData)
-            
-            
-            stop_price = AutoStopData['StopPrice']
-            
-            # 현재가 조회
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.1)
-            
-            # 스탑 가격에 도달했는지 확인
-            if nowPrice <= stop_price:
-
-
-                KisKR.CancelAllOrders(stock_code)
-                time.sleep(0.5)
-                
-                # 현재 매도 가능 수량 확인
-                balances = KisKR.GetMyStockList()
-                FreeAmt = 0
-                for balance in balances:
-                    if balance['StockCode'] == stock_code:
-                        FreeAmt = float(balance['StockAmt'])
-                        break
-                                # 보유수량이 0이면 주문하지 않음
-                if FreeAmt <= 0:
-                    msg = DIST + " " + stock_code + " 보유수량이 0이므로 스탑로스 주문을 실행하지 않습니다."
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    items_to_remove.append(AutoStopData)
-                    continue
-                
-                # 스탑로스 실행 (보유수량 전부 매도)
-                data = KisKR.MakeSellMarketOrder(stock_code, FreeAmt)
-                print(data)
-                
-                msg = DIST + " " + stock_code + " " + stock_name + " 스탑로스 주문이 실행되었습니다.\n"
+                return "DONE"
+
+            # 매도 주문 실행 (보유수량 전부)
+            KisKR.MakeSellMarketOrder(stock_code, FreeAmt)
+            time.sleep(0.2)
+
+            #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 주문은 끝난 걸로 처리해야 다음 틱에 또 주문이 나가지 않는다
+            try:
+                msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 트레일링 스탑로스 주문이 실행되었습니다.\n"
                 msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
                 msg += "매도 수량: " + str(FreeAmt) + "주\n"
-                msg += "스탑 가격: " + str(stop_price) + "원\n"
-                msg += "현재 가격: " + str(nowPrice) + "원\n"
+                msg += "실행 가격: " + str(nowPrice) + "원\n"
+                msg += "최고가: " + str(AutoStopData['HighestPrice']) + "원\n"
+                msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
                 msg += "보유수량 전부 정리 완료"
                 print(msg)
                 line_alert.SendMessage(msg)
-                
-                # 주문 완료 후 리스트에서 제거
-                items_to_remove.append(AutoStopData)
-                
-                # 스탑로스가 실행된 종목을 추적 리스트에 추가
-                stop_loss_executed_tickers.append(stock_code)
-
-        # 트레일링 스탑로스 처리 (보유수량 전부 정리)
-        elif AutoStopData['OrderType'] == "TrailingStopLoss":
-            nowPrice = KisKR.GetCurrentPrice(stock_code)
-            time.sleep(0.2)
-            
-            # 활성화 여부 확인
-            if AutoStopData.get('IsActivated', True) == False:
-                activation_price = AutoStopData.get('ActivationPrice')
-                # 활성화 가격이 설정되어 있고 해당 가격에 도달한 경우
-                if activation_price is not None and nowPrice >= activation_price:
-                    AutoStopData['IsActivated'] = True
-                    AutoStopData['HighestPrice'] = nowPrice
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑로스가 활성화되었습니다. 활성화 가격: " + str(nowPrice)
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                # 활성화 가격이 None인 경우 즉시 활성화
-                elif activation_price is None:
-                    AutoStopData['IsActivated'] = True
-                    AutoStopData['HighestPrice'] = nowPrice
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑로스가 즉시 활성화되었습니다. (ActivationPrice: None)"
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                else:
-                    # 아직 활성화되지 않았으면 다음 체크로
-                    continue
-            
-            # 활성화된 경우 최고가 업데이트
-            if AutoStopData.get('IsActivated', True) == True:
-                if nowPrice > AutoStopData['HighestPrice']:
-                    AutoStopData['HighestPrice'] = nowPrice
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑로스 최고가 업데이트: " + str(nowPrice)
-                    print(msg)
-                    line_alert.SendMessage(msg)
-            
-            # 트레일링 스탑 가격 계산 (최고가 대비 n% 하락)
-            trailing_stop_price = AutoStopData['HighestPrice'] * (1 - AutoStopData['TrailingPercent'] / 100)
-            
-            # 현재 가격이 트레일링 스탑 가격 이하이면 매도 실행
-            if nowPrice <= trailing_stop_price:
-                try:
-                    KisKR.CancelAllOrders(stock_code)
-                    time.sleep(0.5)
-
-                    # 현재 매도 가능 수량 확인
-                    balances = KisKR.GetMyStockList()
-                    FreeAmt = 0
-                    for balance in balances:
-                        if balance['StockCode'] == stock_code:
-                            FreeAmt = float(balance['StockAmt'])
-                            break
-                    
-                    # 보유수량이 0이면 주문하지 않음
-                    if FreeAmt <= 0:
-                        msg = DIST + " " + stock_code + " " + stock_name + " 보유수량이 0이므로 트레일링 스탑로스 주문을 실행하지 않습니다."
-                        print(msg)
-                        line_alert.SendMessage(msg)
-                        items_to_remove.append(AutoStopData)
-                        continue
-                    
-                    # 매도 주문 실행 (보유수량 전부)
-                    KisKR.MakeSellMarketOrder(stock_code, FreeAmt)
-                    time.sleep(0.2)
-                    
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑로스 주문이 실행되었습니다.\n"
-                    msg += "주문 ID: " + AutoStopData['OrderId'] + "\n"
-                    msg += "매도 수량: " + str(FreeAmt) + "주\n"
-                    msg += "실행 가격: " + str(nowPrice) + "원\n"
-                    msg += "최고가: " + str(AutoStopData['HighestPrice']) + "원\n"
-                    msg += "트레일링 스탑 가격: " + str(trailing_stop_price) + "원\n"
-                    msg += "보유수량 전부 정리 완료"
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    
-                    # 주문 완료 후 리스트에서 제거
-                    items_to_remove.append(AutoStopData)
-                    
-                    # 트레일링 스탑로스가 실행된 종목을 추적 리스트에 추가
-                    stop_loss_executed_tickers.append(stock_code)
-                    
-                except Exception as e:
-                    msg = DIST + " " + stock_code + " " + stock_name + " 트레일링 스탑로스 주문 실행 중 오류 발생: " + str(e)
-                    print(msg)
-                    line_alert.SendMessage(msg)
-                    items_to_remove.append(AutoStopData)
-
-    # 스탑로스가 실행된 종목의 모든 스탑트레이더 주문 삭제
-    for ticker in stop_loss_executed_tickers:
-        for AutoStopData in AutoOrderList:
-            if AutoStopData['stock_code'] == ticker and AutoStopData not in items_to_remove:
-                msg = DIST + " " + ticker + " " + KisKR.GetStockName(ticker) + " 스탑로스 실행으로 인한 관련 주문 삭제: " + AutoStopData['OrderType']
-                print(msg)
+            except Exception as e:
+                print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+
+            return "STOPLOSS"
+
+        except Exception as e:
+            #오류 알림에서는 종목명을 조회하지 않고 알림 실패도 삼킨다 (여기서 또 예외가 나면 주문이 다시 걸린다)
+            msg = DIST + " " + stock_code + " 트레일링 스탑로스 주문 실행 중 오류 발생: " + str(e)
+            print(msg)
+            try:
                 line_alert.SendMessage(msg)
-                items_to_remove.append(AutoStopData)
+            except Exception as e:
+                print("주문 실행 알림 실패:", AutoStopData['OrderId'], e)
+            return "DONE"
 
-    # 스탑로스 실행 후 추가 보유수량 확인 및 매도
-    for ticker in stop_loss_executed_tickers:
+    return None
+
+
+#주문 타입 -> 체크 함수
+CheckFuncDict = {
+    "StopBuy": CheckStopBuy,
+    "StopSell": CheckStopSell,
+    "ProfitSell": CheckProfitSell,
+    "TrailingStopBuy": CheckTrailingStopBuy,
+    "TrailingStopSell": CheckTrailingStopSell,
+    "StopLoss": CheckStopLoss,
+    "TrailingStopLoss": CheckTrailingStopLoss,
+}
+
+
+#스탑로스가 실행된 종목의 나머지 스탑트레이더 주문을 지우고 추가 보유수량까지 정리한다
+def AfterStopLoss(stock_code):
+
+    DIST = Common.GetNowDist()
+
+    # 스탑로스가 실행된 종목의 모든 스탑트레이더 주문 삭제 (알림보다 먼저 지워야 알림이 실패해도 주문이 다시 걸리지 않는다)
+    for AutoStopData in list(OrderByCodeDict.get(stock_code, list())):
+        RemoveOrder(AutoStopData)
         try:
+            msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑로스 실행으로 인한 관련 주문 삭제: " + AutoStopData['OrderType']
+            print(msg)
+            line_alert.SendMessage(msg)
+        except Exception as e:
+            print("관련 주문 삭제 알림 실패:", AutoStopData['OrderId'], e)
 
-            KisKR.CancelAllOrders(ticker)
-            time.sleep(0.5)
+    # 스탑로스 실행 후 추가 보유수량 확인 및 매도
+    try:
 
-            # 추가 보유수량 확인
-            balances = KisKR.GetMyStockList()
-            additional_balance = 0
-            for balance in balances:
-                if balance['StockCode'] == ticker:
-                    additional_balance = float(balance['StockAmt'])
-                    break
+        KisKR.CancelAllOrders(stock_code)
+        time.sleep(0.5)
+
+        # 추가 보유수량 확인
+        additional_balance = GetFreeAmt(stock_code)
+        time.sleep(0.1)
+
+        if additional_balance > 0:
+            # 추가 보유수량 매도
+            data = KisKR.MakeSellMarketOrder(stock_code, additional_balance)
+            print(data)
             time.sleep(0.1)
-            
-            if additional_balance > 0:
-                # 추가 보유수량 매도
-                data = KisKR.MakeSellMarketOrder(ticker, additional_balance)
-                print(data)
-                time.sleep(0.1)
-                
-                msg = DIST + " " + ticker + " " + KisKR.GetStockName(ticker) + " 스탑로스 후 추가 보유수량 발견 및 매도 완료: " + str(additional_balance) + "주"
+
+            #여기부터는 주문이 이미 나간 뒤! 알림이 실패해도 그냥 넘어간다
+            try:
+                msg = DIST + " " + stock_code + " " + KisKR.GetStockName(stock_code) + " 스탑로스 후 추가 보유수량 발견 및 매도 완료: " + str(additional_balance) + "주"
                 print(msg)
                 line_alert.SendMessage(msg)
-        except Exception as e:
-            msg = DIST + " " + ticker + " " + KisKR.GetStockName(ticker) + " 스탑로스 후 추가 보유수량 확인/매도 중 오류: " + str(e)
-            print(msg)
+            except Exception as e:
+                print("추가 보유수량 매도 알림 실패:", stock_code, e)
+    except Exception as e:
+        msg = DIST + " " + stock_code + " 스탑로스 후 추가 보유수량 확인/매도 중 오류: " + str(e)
+        print(msg)
+        try:
             line_alert.SendMessage(msg)
+        except Exception as e:
+            print("추가 보유수량 오류 알림 실패:", stock_code, e)
+
+
+#종목 현재가가 들어왔을 때 그 종목에 걸린 주문만 체크한다!
+def OnPriceUpdate(stock_code, nowPrice):
+
+    StopLossDist = None
+
+    for AutoStopData in list(OrderByCodeDict.get(stock_code, list())):
+
+        CheckFunc = CheckFuncDict.get(AutoStopData['OrderType'])
+        if CheckFunc is None:
+            continue
+
+        #계좌 세팅!
+        Common.SetChangeMode(AutoStopData.get('AccountType', 'REAL'))
+
+        try:
+            result = CheckFunc(AutoStopData, nowPrice)
+        except Exception as e:
+            #체크 함수는 주문이 나간 뒤에는 예외를 내지 않고 결과를 리턴한다! 여기로 오면 주문 전 오류라 다음 가격에 다시 체크
+            print("주문 체크 중 오류:", AutoStopData.get('OrderId'), e)
+            continue
+
+        if result is not None:
+            RemoveOrder(AutoStopData)
+
+        if result == "STOPLOSS":
+            StopLossDist = Common.GetNowDist()
+
+    if StopLossDist is not None:
+        Common.SetChangeMode(StopLossDist)
+        AfterStopLoss(stock_code)
+
+    #이번 가격으로 바뀐 트레일링 값은 바로 저장
+    FlushOrderStore()
+
+
+#종목코드별 현재가를 1번씩만 받아서 체크한다! 종목 리스트를 안 넘기면 주문이 걸린 전체 종목
+#먼저 종목 현재가를 한꺼번에(동시에) 받아 두고 그 가격으로 모든 주문을 체크하니, 한 주기 안의 주문들은 모두 같은 가격을 본다
+def CheckAllOrders(stock_code_list = None):
+
+    if stock_code_list is None:
+        stock_code_list = list(OrderByCodeDict.keys())
+
+    if len(stock_code_list) == 0:
+        return
+
+    #현재가는 계좌와 상관없으니 장 체크용 계좌로 조회 (캐시 없이 매 주기 새로)
+    Common.SetChangeMode(BASE_DIST)
+    PriceDict = KisKR.GetCurrentPriceBatch(stock_code_list, 0)
+
+    for stock_code in stock_code_list:
+
+        nowPrice = PriceDict.get(stock_code)
+
+        if not isinstance(nowPrice, int):
+            print("현재가 조회 실패:", stock_code, nowPrice)
+            continue
 
-    # 완료된 주문들을 리스트에서 제거
-    for item in items_to_remove:
-        AutoOrderList.remove(item)
+        OnPriceUpdate(stock_code, nowPrice)
 
 
-    time.sleep(random.random()*0.1)
-    #파일에 저장
-    with open(auto_order_file_path, 'w') as outfile:
-        fcntl.flock(outfile, fcntl.LOCK_EX)
-        json.dump(AutoOrderList, outfile)
-        fcntl.flock(outfile, fcntl.LOCK_UN)
+############################################################################################################################################################
+#실시간 체결가! 웹소켓 스레드에서는 큐에 넣기만 하고 주문 체크는 메인 루프에서 순서대로 한다
+
+TickQueue = queue.Queue()
+
+
+def OnRealtimeTick(stock_code, PriceInfo):
+    TickQueue.put((stock_code, PriceInfo['Price']))
+
+
+#주문이 걸린 종목을 실시간 등록하고, 실시간 가격을 아직 못 받았거나 오래된 종목(REST로 조회할 종목) 리스트를 리턴
+def SyncRealtimeCodes():
+
+    stock_code_list = list(OrderByCodeDict.keys())
+    LiveCodeList = RealtimeKR.SyncSubscribe(stock_code_list)
+
+    if not RealtimeKR.IsRealtimeAlive():
+        return stock_code_list
+
+    #체결이 한동안 안 들어온 종목(거래가 뜸하거나 등록이 조용히 끊긴 종목)도 REST로 확인한다
+    return [stock_code for stock_code in stock_code_list
+            if stock_code not in LiveCodeList or RealtimeKR.GetRealtimePrice(stock_code, STOP_TRADER_WS_MAX_AGE_SEC) is None]
+
+
+#wait_sec 동안 들어오는 체결을 모두 처리한다! (체결마다 그 종목 주문 체크)
+def ProcessTicks(wait_sec):
+
+    end_time = time.time() + wait_sec
+    while True:
+        remain_sec = end_time - time.time()
+        if remain_sec <= 0:
+            break
+        try:
+            stock_code, nowPrice = TickQueue.get(timeout=remain_sec)
+        except queue.Empty:
+            break
+        OnPriceUpdate(stock_code, nowPrice)
+
+
+############################################################################################################################################################
+
+time.sleep(STOP_TRADER_START_DELAY)
+
+#주문이 걸린 종목 이름을 시작할 때 한번에 채워둔다 (알림 메시지마다 이름을 조회하지 않게)
+try:
+    Common.SetChangeMode(BASE_DIST)
+    ReloadAutoOrderListIfChanged()
+    KisKR.WarmStockMeta(list(OrderByCodeDict.keys()))
+except Exception as e:
+    print("종목 정보 미리 받기 실패:", e)
+
+IsRealtime = False
+if STOP_TRADER_PRICE_SOURCE == "WS" and not STOP_TRADER_ONCE:
+    RealtimeKR.AddPriceListener(OnRealtimeTick)
+    IsRealtime = RealtimeKR.StartRealtime(BASE_DIST)
+    if not IsRealtime:
+        print("실시간 체결가를 쓸 수 없어 REST 현재가로만 체크합니다")
+
+IsMarketOpen = False
+MarketCheckTime = 0
+
+while True:
+
+    try:
+        #장 열림 여부는 가끔씩만 다시 확인한다
+        if time.time() - MarketCheckTime >= STOP_TRADER_MARKET_CHECK_SEC:
+            Common.SetChangeMode(BASE_DIST)
+            IsMarketOpen = KisKR.IsMarketOpen()
+            MarketCheckTime = time.time()
+            print("장이 열린 상황" if IsMarketOpen == True else "장이 마감된 상황")
+
+        #장이 열린 상황에서만!
+        if IsMarketOpen == True:
+
+            ReloadAutoOrderListIfChanged()
+
+            if IsRealtime:
+                #실시간으로 들어온 체결 먼저 처리하고, 실시간으로 못 받는 종목만 REST로
+                ProcessTicks(STOP_TRADER_INTERVAL)
+                CheckAllOrders(SyncRealtimeCodes())
+            else:
+                CheckAllOrders()
+
+        elif IsRealtime:
+            #장이 끝나면 실시간 등록을 풀고 남은 체결도 버린다
+            RealtimeKR.SyncSubscribe(list())
+            while not TickQueue.empty():
+                TickQueue.get_nowait()
+
+    except Exception as e:
+        print("StopTrader 루프 오류:", e)
+
+    if STOP_TRADER_ONCE:
+        break
 
+    #실시간 모드는 ProcessTicks 에서 기다리니 장중에는 바로 다음 루프로
+    if IsMarketOpen == True and IsRealtime:
+        continue
 
-else:
-    print("장이 마감된 상황") 
\ No newline at end of file
+    time.sleep(STOP_TRADER_INTERVAL if IsMarketOpen == True else STOP_TRADER_MARKET_CHECK_SEC)
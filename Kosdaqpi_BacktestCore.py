@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+'''
+코스닥피 Best 백테스트(Kosdaqpi_Test_best.py) 시뮬레이션 코어!
+
+예전에는 날짜마다 NowInvestList 딕셔너리 리스트를 돌면서 매수/매도/평가금을 계산했는데
+    1. 상태와 상관없는 신호(코스피 매수/매도, 코스닥 돌파가/컷가/필터, 모멘텀 비중, 횡보/추세 플래그)는
+       Kosdaqpi_Strategy 함수로 (날짜 x 종목) 배열에 한번에 만들어 두고
+    2. 상태가 이어지는 부분(보유 종목, 현금, 매수가, 투자금, 익스포저, 손절 카운트)만
+       미리 잡아둔 배열 위에서 루프를 돈다 (numba 가 있으면 컴파일, 없으면 같은 코드를 파이썬으로 실행)
+매매 로그는 루프 안에서 출력하지 않고 이벤트 배열에 쌓아 두었다가 스크립트에서 예전과 같은 형식으로 출력한다.
+
+계산 순서(보유 순서, 합산 순서)를 예전 스크립트와 똑같이 맞춰서 결과가 같다! (tests/test_backtest_parity.py)
+'''
+from datetime import datetime
+
+import numpy as np
+
+import Kosdaqpi_Features as Features
+import Kosdaqpi_Strategy as Strategy
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+KOSPI_CODES = ["122630", "252670"]      #KODEX 레버리지, KODEX 200선물인버스2X (시가 매매)
+KOSDAQ_CODES = Strategy.KOSDAQ_CODES    #KODEX 코스닥150레버리지, KODEX 코스닥150선물인버스 (돌파 매매)
+NO_HOLD_LOG_CODES = ["252670"]          #코스피 매도 조건을 안 맞아도 "hold.." 로그를 안 찍는 종목
+
+KIND_OTHER = 0
+KIND_KOSPI = 1
+KIND_KOSDAQ = 2
+
+EVENT_BUY = 1
+EVENT_SELL = 2
+EVENT_HOLD = 3
+
+#GetCutAdjustRate 는 IsCutCnt 4 이상이면 같은 값이라 0~4 까지만 미리 계산해 둔다
+CUT_CNT_LEVELS = 5
+
+
+#날짜 정보에서 년도를 구한다! (예전 스크립트와 같은 순서로 형식을 시도)
+def GetDateYear(date):
+    for date_format in ["%Y-%m-%d %H:%M:%S", "%Y%m%d", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(str(date), date_format).year
+        except Exception:
+            pass
+    return datetime.strptime(str(date), "%Y-%m-%d").year
+
+
+#상태와 상관없는 신호들을 (날짜 x 종목) 배열로 만든다! 코드 순서 = InvestStockList
+def MakeSignalArrays(FeatureDict, InvestStockList, gugan_lenth):
+
+    codes = list(InvestStockList)
+    m = len(codes)
+
+    RowIndex = Features.MakeRowIndex(FeatureDict)
+    DateCodeIndex = Features.MakeDateCodeIndex(FeatureDict)
+    dates = sorted(DateCodeIndex.keys())
+    n = len(dates)
+
+    code_pos = {stock_code: j for j, stock_code in enumerate(codes)}
+
+    Arr = dict()
+    Arr['dates'] = dates
+    Arr['codes'] = codes
+    Arr['year'] = np.array([GetDateYear(date) for date in dates], dtype=np.int64)
+
+    Arr['kind'] = np.array([KIND_KOSDAQ if c in KOSDAQ_CODES else (KIND_KOSPI if c in KOSPI_CODES else KIND_OTHER) for c in codes], dtype=np.int64)
+    Arr['hold_log'] = np.array([c not in NO_HOLD_LOG_CODES for c in codes], dtype=np.bool_)
+
+    #그날 매수 후보 순서 (종가 높은 순, 최대 종목 수만큼)
+    Arr['day_order'] = np.full((n, m), -1, dtype=np.int64)
+    Arr['day_order_cnt'] = np.zeros(n, dtype=np.int64)
+
+    Arr['has'] = np.zeros((n, m), dtype=np.bool_)
+    for name in ['open', 'low', 'high', 'prevOpen', 'cut_price', 'dolpa_price', 'mom_rate']:
+        Arr[name] = np.full((n, m), np.nan)
+    for name in ['kospi_buy', 'kospi_sell', 'kosdaq_filter']:
+        Arr[name] = np.zeros((n, m), dtype=np.bool_)
+    Arr['cut_adj'] = np.ones((n, m, 2, CUT_CNT_LEVELS))
+
+    Arr['no_way'] = np.zeros(n, dtype=np.bool_)
+    Arr['strong'] = np.zeros(n, dtype=np.bool_)
+    Arr['very_strong'] = np.zeros(n, dtype=np.bool_)
+
+    for i, date in enumerate(dates):
+
+        day_codes = [c for c in DateCodeIndex.get(date, [])[:m] if c in code_pos]
+        Arr['day_order_cnt'][i] = len(day_codes)
+        for k, stock_code in enumerate(day_codes):
+            Arr['day_order'][i, k] = code_pos[stock_code]
+
+        Kosdaq_Long_Data = RowIndex.get((date, "233740"))
+        Kosdaq_Short_Data = RowIndex.get((date, "251340"))
+        Kospi_Long_Data = RowIndex.get((date, "122630"))
+        Kospi_Short_Data = RowIndex.get((date, "252670"))
+
+        Arr['no_way'][i], Arr['strong'][i], Arr['very_strong'][i] = Strategy.GetMarketFlags(Kosdaq_Long_Data, Kosdaq_Short_Data, Kospi_Long_Data, Kospi_Short_Data)
+
+        for j, stock_code in enumerate(codes):
+            stock_data = RowIndex.get((date, stock_code))
+            if stock_data is None:
+                continue
+
+            Arr['has'][i, j] = True
+            Arr['open'][i, j] = stock_data['open']
+            Arr['low'][i, j] = stock_data['low']
+            Arr['high'][i, j] = stock_data['high']
+            Arr['prevOpen'][i, j] = stock_data['prevOpen']
+
+            if stock_code in KOSDAQ_CODES:
+                Arr['cut_price'][i, j] = Strategy.GetKosdaqCutPrice(stock_code, stock_data)
+                Arr['dolpa_price'][i, j] = Strategy.GetKosdaqDolPaPrice(stock_code, stock_data)
+                Arr['kosdaq_filter'][i, j] = Strategy.CheckKosdaqBuyFilter(stock_code, stock_data, gugan_lenth)
+                Arr['mom_rate'][i, j] = Strategy.GetKosdaqMomentumRate(stock_code, Kosdaq_Long_Data, Kosdaq_Short_Data)
+                for cut in range(2):
+                    for cnt in range(CUT_CNT_LEVELS):
+                        Arr['cut_adj'][i, j, cut, cnt] = Strategy.GetCutAdjustRate(cut == 1, cnt, stock_data)
+            else:
+                Arr['kospi_sell'][i, j] = Strategy.CheckKospiSell(stock_code, stock_data)
+                Arr['kospi_buy'][i, j] = Strategy.CheckKospiBuy(stock_code, stock_data)
+
+    return Arr
+
+
+#상태가 이어지는 매매 루프! 보유/현금/매수가/투자금/익스포저/손절 카운트를 배열과 변수로만 들고 간다
+#매매 로그는 ev_int(종류, 날짜 위치, 종목 위치, 매수 날짜 위치) / ev_val(금액들) 에 순서대로 쌓는다
+def _simulate_core(year, start_year, day_order, day_order_cnt, has, kind, hold_log,
+                   open_, low, high, prev_open, cut_price, dolpa_price, kospi_buy, kospi_sell, kosdaq_filter,
+                   mom_rate, cut_adj, no_way, strong, very_strong, total_money, fee, expo_params):
+
+    n, m = has.shape
+    cut_levels = cut_adj.shape[3]
+    div_num = m
+
+    #보유 종목 (매수한 순서대로)
+    held_cnt = 0
+    held = np.full(m, -1, dtype=np.int64)
+    is_held = np.zeros(m, dtype=np.bool_)
+    pos_money = np.zeros(m)
+    first_money = np.zeros(m)
+    buy_price = np.zeros(m)
+    dolpa_check = np.zeros(m, dtype=np.bool_)
+    buy_day = np.full(m, -1, dtype=np.int64)
+
+    sold = np.zeros(m, dtype=np.bool_)
+    sold_today = np.zeros(m, dtype=np.bool_)
+
+    #날짜별 결과 + 보유 현황 스냅샷 (로그 출력용)
+    equity = np.zeros(n)
+    cash_hist = np.zeros(n)
+    now_money_hist = np.zeros(n)
+    snap_cnt = np.zeros(n, dtype=np.int64)
+    snap_code = np.full((n, m), -1, dtype=np.int64)
+    snap_money = np.zeros((n, m))
+    snap_first = np.zeros((n, m))
+    snap_buy_price = np.zeros((n, m))
+    snap_dolpa = np.zeros((n, m), dtype=np.bool_)
+    snap_buy_day = np.zeros((n, m), dtype=np.int64)
+
+    stat_try = np.zeros(m, dtype=np.int64)
+    stat_success = np.zeros(m, dtype=np.int64)
+    stat_fail = np.zeros(m, dtype=np.int64)
+    stat_acc = np.zeros(m)
+
+    max_events = n * m * 3
+    ev_int = np.zeros((max_events, 4), dtype=np.int64)
+    ev_val = np.zeros((max_events, 6))
+    ev_cnt = 0
+
+    cash = total_money
+    peak = total_money
+    exposure = 1.0
+    is_cut = False
+    cut_cnt = 0
+    try_cnt = 0
+    success_cnt = 0
+    fail_cnt = 0
+    first_day = -1
+
+    for i in range(n):
+
+        kosdaq_sell_cnt = 0
+        kosdaq_sell_money_future = 0.0
+        for j in range(m):
+            sold[j] = False
+            sold_today[j] = False
+
+        #투자중인 종목들!!
+        for h in range(held_cnt):
+            j = held[h]
+
+            if not (pos_money[j] > 0) or not has[i, j]:
+                continue
+
+            now_open = open_[i, j]
+            prev_open_price = prev_open[i, j]
+            sell_price = now_open
+            is_sell = False
+
+            #코스닥 전략: 목표컷 하향 돌파시 컷가로 매도
+            if kind[j] == 2:
+                if cut_price[i, j] >= low[i, j]:
+                    is_sell = True
+                    sell_price = cut_price[i, j]
+
+            #매일 매일 투자금 반영!
+            if dolpa_check[j] == False:
+                dolpa_check[j] = True
+                pos_money[j] = pos_money[j] * (1.0 + ((sell_price - buy_price[j]) / buy_price[j]))
+            else:
+                pos_money[j] = pos_money[j] * (1.0 + ((sell_price - prev_open_price) / prev_open_price))
+
+            rate = (sell_price * (1.0 - fee) - buy_price[j]) / buy_price[j]
+            revenue_rate = (rate - fee) * 100.0
+
+            if kind[j] == 2:
+                if is_sell:
+                    kosdaq_sell_cnt += 1
+                    if revenue_rate < 0:
+                        is_cut = True
+                        cut_cnt += 1
+                    else:
+                        is_cut = False
+                        cut_cnt -= 1
+                        if cut_cnt < 0:
+                            cut_cnt = 0
+            else:
+                #코스피 전략: 시가 매도 조건
+                is_sell = kospi_sell[i, j]
+                if is_sell == False and hold_log[j]:
+                    ev_int[ev_cnt, 0] = 3
+                    ev_int[ev_cnt, 1] = i
+                    ev_int[ev_cnt, 2] = j
+                    ev_cnt += 1
+
+            if is_sell:
+                return_money = pos_money[j] * (1.0 - fee)
+
+                if kind[j] == 2 and now_open > cut_price[i, j]:
+                    kosdaq_sell_money_future += return_money
+
+                try_cnt += 1
+                stat_try[j] += 1
+                if revenue_rate > 0:
+                    success_cnt += 1
+                    stat_success[j] += 1
+                else:
+                    fail_cnt += 1
+                    stat_fail[j] += 1
+                stat_acc[j] += revenue_rate
+
+                cash += return_money
+                pos_money[j] = 0
+
+                ev_int[ev_cnt, 0] = 2
+                ev_int[ev_cnt, 1] = i
+                ev_int[ev_cnt, 2] = j
+                ev_int[ev_cnt, 3] = buy_day[j]
+                ev_val[ev_cnt, 0] = buy_price[j]
+                ev_val[ev_cnt, 1] = first_money[j]
+                ev_val[ev_cnt, 2] = revenue_rate
+                ev_val[ev_cnt, 3] = return_money
+                ev_val[ev_cnt, 4] = sell_price * (1.0 - fee)
+                ev_cnt += 1
+
+                sold[j] = True
+                sold_today[j] = True
+
+        #리스트에서 제거 (순서 유지)
+        keep = 0
+        for h in range(held_cnt):
+            j = held[h]
+            if sold[j]:
+                is_held[j] = False
+            else:
+                held[keep] = j
+                keep += 1
+        held_cnt = keep
+
+        #코스피 먼저 매수 여부를 판단하고 다음에 코스닥! (최대 종목 수의 절반만 투자)
+        for phase in range(2):
+
+            if not (held_cnt < div_num / 2 and year[i] >= start_year):
+                continue
+
+            if phase == 0 and first_day < 0:
+                first_day = i
+
+            for k in range(day_order_cnt[i]):
+                j = day_order[i, k]
+
+                if sold_today[j] or is_held[j]:
+                    continue
+
+                is_buy = False
+                buy_rate = 1.0
+                adjust_rate = 1.0
+                price = open_[i, j]
+
+                if phase == 0 and kind[j] == 1:
+                    is_buy = kospi_buy[i, j]
+
+                elif phase == 1 and kind[j] == 2:
+                    price = dolpa_price[i, j]
+                    if price <= high[i, j]:
+                        is_buy = kosdaq_filter[i, j]
+                    if is_buy:
+                        buy_rate = mom_rate[i, j]
+                        level = cut_cnt if cut_cnt < cut_levels else cut_levels - 1
+                        adjust_rate = cut_adj[i, j, 1 if is_cut else 0, level]
+
+                if not is_buy:
+                    continue
+
+                if no_way[i]:
+                    invest_go_money = ((cash - kosdaq_sell_money_future) / m) * buy_rate
+                elif held_cnt + kosdaq_sell_cnt == 0:
+                    invest_go_money = (cash - kosdaq_sell_money_future) * 0.5 * buy_rate
+                else:
+                    invest_go_money = (cash - kosdaq_sell_money_future) * buy_rate
+                if phase == 1:
+                    invest_go_money = invest_go_money * adjust_rate
+
+                if buy_rate > 0 and adjust_rate > 0:
+                    invest_go_money *= exposure
+
+                    buy_amt = calc_buy_amt(invest_go_money, price, cash - kosdaq_sell_money_future, fee)
+                    now_fee = (buy_amt * price) * fee
+
+                    if buy_amt > 0:
+                        real_invest_money = buy_amt * price
+
+                        cash -= (buy_amt * price)
+                        cash -= now_fee
+
+                        held[held_cnt] = j
+                        held_cnt += 1
+                        is_held[j] = True
+                        pos_money[j] = real_invest_money
+                        first_money[j] = real_invest_money
+                        buy_price[j] = price
+                        dolpa_check[j] = False
+                        buy_day[j] = i
+
+                        ev_int[ev_cnt, 0] = 1
+                        ev_int[ev_cnt, 1] = i
+                        ev_int[ev_cnt, 2] = j
+                        ev_int[ev_cnt, 3] = i
+                        ev_val[ev_cnt, 0] = price
+                        ev_val[ev_cnt, 1] = real_invest_money
+                        ev_val[ev_cnt, 5] = open_[i, j]
+                        ev_cnt += 1
+
+        #평가금 = 남은 현금 + 보유 종목 투자금 (매수한 순서대로 더한다)
+        now_money = 0.0
+        for h in range(held_cnt):
+            j = held[h]
+            now_money += pos_money[j]
+            snap_code[i, h] = j
+            snap_money[i, h] = pos_money[j]
+            snap_first[i, h] = first_money[j]
+            snap_buy_price[i, h] = buy_price[j]
+            snap_dolpa[i, h] = dolpa_check[j]
+            snap_buy_day[i, h] = buy_day[j]
+        snap_cnt[i] = held_cnt
+
+        invest_money = cash + now_money
+        if invest_money > peak:
+            peak = invest_money
+        current_dd = (invest_money / peak) - 1.0
+
+        #깊은 DD 구간에서는 업사이드 가산을 일부 제한해 MDD를 방어한다.
+        exposure = exposure_rate(current_dd, no_way[i], strong[i], very_strong[i], cut_cnt, expo_params)
+
+        equity[i] = invest_money
+        cash_hist[i] = cash
+        now_money_hist[i] = now_money
+
+    stats = np.array([try_cnt, success_cnt, fail_cnt, first_day], dtype=np.int64)
+
+    return (equity, cash_hist, now_money_hist, snap_cnt, snap_code, snap_money, snap_first, snap_buy_price, snap_dolpa, snap_buy_day,
+            stat_try, stat_success, stat_fail, stat_acc, ev_int[:ev_cnt], ev_val[:ev_cnt], stats)
+
+
+#컴파일 캐시(cache=True)는 전역 변수가 바뀐 걸 모르니, 환경변수로 바뀌는 값(EXPO_* / DD_GUARD_*)은 전부 인자로 넘긴다
+if njit is not None:
+    calc_buy_amt = njit(cache=True)(Features.CalcBuyAmt)
+    exposure_rate = njit(cache=True)(Strategy.CalcExposureRate)
+    simulate_core = njit(cache=True)(_simulate_core)
+else:
+    calc_buy_amt = Features.CalcBuyAmt
+    exposure_rate = Strategy.CalcExposureRate
+    simulate_core = _simulate_core
+
+
+#신호 배열을 만들고 시뮬레이션을 돌려서 결과 딕셔너리를 리턴!
+def RunBest(FeatureDict, InvestStockList, TotalMoney, fee, StartYear, gugan_lenth = 7):
+
+    Arr = MakeSignalArrays(FeatureDict, InvestStockList, gugan_lenth)
+
+    (equity, cash_hist, now_money_hist, snap_cnt, snap_code, snap_money, snap_first, snap_buy_price, snap_dolpa, snap_buy_day,
+     stat_try, stat_success, stat_fail, stat_acc, ev_int, ev_val, stats) = simulate_core(
+        Arr['year'], StartYear, Arr['day_order'], Arr['day_order_cnt'], Arr['has'], Arr['kind'], Arr['hold_log'],
+        Arr['open'], Arr['low'], Arr['high'], Arr['prevOpen'], Arr['cut_price'], Arr['dolpa_price'],
+        Arr['kospi_buy'], Arr['kospi_sell'], Arr['kosdaq_filter'], Arr['mom_rate'], Arr['cut_adj'],
+        Arr['no_way'], Arr['strong'], Arr['very_strong'], float(TotalMoney), fee, Strategy.GetExposureParams())
+
+    Result = dict()
+    Result['Dates'] = Arr['dates']
+    Result['Codes'] = Arr['codes']
+    Result['TotalMoney'] = TotalMoney
+    Result['TotalMoneyList'] = equity.tolist()
+    Result['RemainMoneyList'] = cash_hist.tolist()
+    Result['NowInvestMoneyList'] = now_money_hist.tolist()
+    Result['TryCnt'] = int(stats[0])
+    Result['SuccesCnt'] = int(stats[1])
+    Result['FailCnt'] = int(stats[2])
+    Result['FirstDateIndex'] = int(stats[3])
+    Result['FirstDateStr'] = str(Arr['dates'][stats[3]]) if stats[3] >= 0 else ""
+    Result['StockStats'] = {stock_code: {'try': int(stat_try[j]), 'success': int(stat_success[j]), 'fail': int(stat_fail[j]), 'accRev': float(stat_acc[j])}
+                            for j, stock_code in enumerate(Arr['codes'])}
+    Result['Events'] = ev_int
+    Result['EventValues'] = ev_val
+    Result['Snapshot'] = (snap_cnt, snap_code, snap_money, snap_first, snap_buy_price, snap_dolpa, snap_buy_day)
+
+    #첫 매수 전까지는 현금이 처음 넘긴 금액 그대로다 (정수로 넘겼으면 예전 스크립트처럼 정수로 보여준다)
+    first_buy = [int(e[1]) for e in ev_int if e[0] == EVENT_BUY]
+    Result['FirstBuyIndex'] = first_buy[0] if len(first_buy) > 0 else len(Arr['dates'])
+
+    return Result
+
+
+#이벤트 1건을 예전 스크립트의 print 인자 그대로 만들어 준다! print(*args) 로 찍으면 예전 로그와 같다
+def GetEventPrintArgs(Result, k, GetName):
+
+    kind, i, j, bi = [int(x) for x in Result['Events'][k]]
+    values = [float(x) for x in Result['EventValues'][k]]
+    stock_code = Result['Codes'][j]
+    date = Result['Dates'][i]
+
+    if kind == EVENT_HOLD:
+        return ("hold..",)
+
+    if kind == EVENT_SELL:
+        return (GetName(stock_code), "(", stock_code, ") ", str(date), " ", i + 1, " >>>>>>>>>>>>>>>>> 매도! 매수일:", str(Result['Dates'][bi]),
+                " 매수가:", str(values[0]), " 매수금:", str(values[1]), " 수익률: ", round(values[2], 2), "%", " ,회수금:", round(values[3], 2), " 매도가", values[4])
+
+    return (GetName(stock_code), "(", stock_code, ") ", str(date), " ", i + 1, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(values[1], 2),
+            " 돌파가격", values[0], " 시가:", values[5])
+
+
+#그날 보유 현황을 예전 NowInvestList 모양(딕셔너리 리스트)으로 만들어 준다 (BACKTEST_LOG=ALL 덤프용)
+def GetNowInvestList(Result, i):
+
+    snap_cnt, snap_code, snap_money, snap_first, snap_buy_price, snap_dolpa, snap_buy_day = Result['Snapshot']
+
+    NowInvestList = list()
+    for h in range(int(snap_cnt[i])):
+        InvestData = dict()
+        InvestData['stock_code'] = Result['Codes'][int(snap_code[i, h])]
+        InvestData['InvestMoney'] = float(snap_money[i, h])
+        InvestData['FirstMoney'] = float(snap_first[i, h])
+        InvestData['BuyPrice'] = float(snap_buy_price[i, h])
+        InvestData['DolPaCheck'] = bool(snap_dolpa[i, h])
+        InvestData['Date'] = str(Result['Dates'][int(snap_buy_day[i, h])])
+        NowInvestList.append(InvestData)
+
+    return NowInvestList
@@ -106,6 +106,7 @@ FAQ로 해결 안되는 기술적인 문제는 파이썬 자동매매 연구소
 '''
 
 import KIS_Common as Common
+import Kosdaqpi_Features as Features
 import KIS_API_Helper_KR as KisKR
 import time
 import pprint
@@ -133,8 +134,8 @@ def EnsureFreshTokenIfExpired():
             print("[TOKEN] expired token detected. dist=", dist, " path=", token_path)
 
             if os.path.exists(token_path):
-                os.remove(token_path)
                 print("[TOKEN] removed expired token file:", token_path)
+            Common.ClearToken(dist)
 
             new_token = Common.GetToken(dist)
             if new_token == "FAIL" or new_token is None:
@@ -361,8 +362,7 @@ except Exception as e:
         KospidaqStrategyList.append(KospidaqStrategyData)
 
     #파일에 저장
-    with open(data_file_path, 'w') as outfile:
-        json.dump(KospidaqStrategyList, outfile)
+    Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
 
 
 ###################################################################
@@ -382,8 +382,7 @@ except Exception as e:
     DateData['Date'] = "00" #오늘날짜
 
     #파일에 저장
-    with open(date_file_path, 'w') as outfile:
-        json.dump(DateData, outfile)
+    Common.MarkStateDirty(date_file_path, DateData)
 
 ###################################################################
 ###################################################################
@@ -464,126 +463,14 @@ if ENABLE_ORDER_EXECUTION == True:
         gugan_lenth = 7
 
 
-        for stock_code in InvestStockList:
-            df = Common.GetOhlcv("KR", stock_code,200)
-            
-            #########################################################################################
-            #OBV 활용! 
-            # OBV 계산
-            df['direction'] = 0
-            df.loc[df['close'] > df['close'].shift(1), 'direction'] = 1
-            df.loc[df['close'] < df['close'].shift(1), 'direction'] = -1
-            df['obv'] = (df['direction'] * df['volume']).cumsum()
-
-            # OBV 이동평균선
-            df['obv_ma'] = df['obv'].rolling(window=10).mean()
-            
-            df['prev_obv_ma'] = df['obv_ma'].shift(1)
-            df['prev_obv_ma2'] = df['obv_ma'].shift(2)
-            df['prev_obv'] = df['obv'].shift(1)
-
-            #########################################################################################
-    
-            period = 14
-
-            delta = df["close"].diff()
-            up, down = delta.copy(), delta.copy()
-            up[up < 0] = 0
-            down[down > 0] = 0
-            _gain = up.ewm(com=(period - 1), min_periods=period).mean()
-            _loss = down.abs().ewm(com=(period - 1), min_periods=period).mean()
-            RS = _gain / _loss
-
-            df['RSI'] = pd.Series(100 - (100 / (1 + RS)), name="RSI")
-
-            df['prevRSI'] = df['RSI'].shift(1)
-            df['prevRSI2'] = df['RSI'].shift(2)
-            
-            df['high_'+str(gugan_lenth)+'_max'] = df['high'].rolling(window=gugan_lenth).max().shift(1)
-            df['low_'+str(gugan_lenth)+'_min'] = df['low'].rolling(window=gugan_lenth).min().shift(1)
-
-
-            df['prevVolume'] = df['volume'].shift(1)
-            df['prevVolume2'] = df['volume'].shift(2)
-            df['prevVolume3'] = df['volume'].shift(3)
-
-            df['prevClose'] = df['close'].shift(1)
-            df['prevOpen'] = df['open'].shift(1)
-
-            df['prevHigh'] = df['high'].shift(1)
-            df['prevHigh2'] = df['high'].shift(2)
-
-            df['prevLow'] = df['low'].shift(1)
-            df['prevLow2'] = df['low'].shift(2)
-
-            df['Disparity20'] = df['prevClose'] / df['prevClose'].rolling(window=20).mean() * 100.0
-            
-            df['Disparity11'] = df['prevClose'] / df['prevClose'].rolling(window=11).mean() * 100.0
-
-
-            df['ma3_before'] = df['close'].rolling(3).mean().shift(1)
-            df['ma6_before'] = df['close'].rolling(6).mean().shift(1)
-            df['ma19_before'] = df['close'].rolling(19).mean().shift(1)
-
-
-            df['ma10_before'] = df['close'].rolling(10).mean().shift(1)
-
-            df['ma20_before'] = df['close'].rolling(20).mean().shift(1)
-            df['ma20_before2'] = df['close'].rolling(20).mean().shift(2)
-            df['ma60_before'] = df['close'].rolling(60).mean().shift(1)
-            df['ma60_before2'] = df['close'].rolling(60).mean().shift(2)
-
-            df['ma120_before'] = df['close'].rolling(120).mean().shift(1)
+        #유니버스 전체 OHLCV를 한번에 동시에 가져온다!
+        OhlcvDict = Common.GetOhlcvBatch("KR", InvestStockList, 200)
 
+        #지표는 공용 피처 모듈에서 전 종목을 한번에 계산한다! (같은 데이터/파라미터면 저장된 결과 사용)
+        FeatureDict = Features.MakeFeatureDict(OhlcvDict, gugan_lenth, hl_range_window=TRAILING_STOP_CANDLE_COUNT)
 
-
-            df['prevChangeMa'] = df['change'].shift(1).rolling(window=20).mean()
-            
-
-            df['prevChangeMa_S'] = df['change'].shift(1).rolling(window=10).mean()
-            
-            # [2026.01.23] 절반 트레일링 스탑 정리 로직 추가 - 콜백비율 계산용 데이터
-            df['hl_range'] = df['high'] - df['low']
-            df['hl_range_avg'] = df['hl_range'].rolling(window=TRAILING_STOP_CANDLE_COUNT).mean()
-
-            #10일마다 총 100일 평균모멘텀스코어
-            specific_days = list()
-
-            for i in range(1,11):
-                st = i * 10
-                specific_days.append(st)
-
-            for day in specific_days:
-                column_name = f'Momentum_{day}'
-                df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-                
-            df['Average_Momentum'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-
-            # Define the list of specific trading days to compare
-            specific_days = list()
-
-            for i in range(1,11):
-                st = i * 3
-                specific_days.append(st)
-
-
-
-            # Iterate over the specific trading days and compare the current market price with the corresponding closing prices
-            for day in specific_days:
-                # Create a column name for each specific trading day
-                column_name = f'Momentum_{day}'
-                
-                # Compare current market price with the closing price of the specific trading day
-                df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-
-            # Calculate the average momentum score
-            df['Average_Momentum3'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-
-            df.dropna(inplace=True) #데이터 없는건 날린다!
+        for stock_code in InvestStockList:
+            df = FeatureDict[stock_code]
 
 
             data_dict = {stock_code: df}
@@ -600,23 +487,20 @@ if ENABLE_ORDER_EXECUTION == True:
                 #0으로 초기화!!!!!
                 DateSiGaLogicDoneDict[stock_code] = 0
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
             #시가매매 체크한 기록이 없는 맨 처음이라면 
             if DateSiGaLogicDoneDict.get('InvestCnt') == None:
                 DateSiGaLogicDoneDict['InvestCnt'] =  GetKospidaqInvestCnt(KospidaqStrategyList) #일단 투자중 개수 저장!
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
                     
                     
             if DateSiGaLogicDoneDict.get('IsCut') == None:
                 DateSiGaLogicDoneDict['IsCut'] =  False
                 DateSiGaLogicDoneDict['IsCutCnt'] =  0
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
 
@@ -626,26 +510,30 @@ if ENABLE_ORDER_EXECUTION == True:
         # Sort the combined DataFrame by date
         combined_df.sort_index(inplace=True)
 
+        #(날짜, 종목코드)로 한 줄 데이터를 바로 꺼낼 수 있게 미리 나눠둔다! (매번 combined_df 전체를 마스크로 훑지 않도록)
+        RowIndex = Features.MakeRowIndex(FeatureDict)
+        DateCodeIndex = Features.MakeDateCodeIndex(FeatureDict)
+
         pprint.pprint(combined_df)
         print(" len(combined_df) ", len(combined_df))
 
 
         date = combined_df.iloc[-1].name
 
-        all_stocks = combined_df.loc[combined_df.index == date].groupby('stock_code')['close'].max().nlargest(DivNum)
+        all_stocks = DateCodeIndex.get(date, [])[:DivNum]
         
 
         #######################################################################################################################################
         # 횡보장을 정의하기 위한 로직!!
         # https://blog.naver.com/zacra/223225906361 이 포스팅을 정독하세요!!!
-        Kosdaq_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "233740")]
-        Kosdaq_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "251340")]
-        Kospi_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "122630")]
-        Kospi_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "252670")]
+        Kosdaq_Long_Data = RowIndex.get((date, "233740"))
+        Kosdaq_Short_Data = RowIndex.get((date, "251340"))
+        Kospi_Long_Data = RowIndex.get((date, "122630"))
+        Kospi_Short_Data = RowIndex.get((date, "252670"))
         
         
         IsNoWay = False
-        if  (Kospi_Long_Data['prevChangeMa_S'].values[0] > 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kospi_Long_Data['prevChangeMa_S'].values[0] < 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] < 0)  or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] > 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] < 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] < 0) :
+        if  (Kospi_Long_Data['prevChangeMa_S'] > 0 and Kospi_Short_Data['prevChangeMa_S'] > 0) or (Kospi_Long_Data['prevChangeMa_S'] < 0 and Kospi_Short_Data['prevChangeMa_S'] < 0)  or (Kosdaq_Long_Data['prevChangeMa_S'] > 0 and Kosdaq_Short_Data['prevChangeMa_S'] > 0) or (Kosdaq_Long_Data['prevChangeMa_S'] < 0 and Kosdaq_Short_Data['prevChangeMa_S'] < 0) :
             IsNoWay = True
         #######################################################################################################################################
 
@@ -692,14 +580,12 @@ if ENABLE_ORDER_EXECUTION == True:
                 
                 DateSiGaLogicDoneDict['InvestCnt'] = GetKospidaqInvestCnt(KospidaqStrategyList) #일단 투자중 개수 저장!
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
                     
                     
 
                 DateData['Date'] = day_str #오늘 맨처음 할일 (종목 선정 및 돌파가격 설정, 상태 설정)을 끝냈으니 날짜를 넣어 다음날 다시 실행되게 한다.
-                with open(date_file_path, 'w') as outfile:
-                    json.dump(DateData, outfile)
+                Common.MarkStateDirty(date_file_path, DateData)
 
                 #기본적으로 날이 바뀌었기 때문에 데이 조건(BUY_DAY,SELL_DAY)를 모두 초기화 한다!
                 for KospidaqStrategyData in KospidaqStrategyList:
@@ -715,8 +601,8 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
             
-                for stock_code in  all_stocks.index:
-                    stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                for stock_code in  all_stocks:
+                    stock_data = RowIndex.get((date, stock_code))
 
                     #해당 정보를 읽는다.
                     KospidaqStrategyData = GetKospidaqStrategyData(stock_code,KospidaqStrategyList)
@@ -740,7 +626,7 @@ if ENABLE_ORDER_EXECUTION == True:
                     if stock_code in ["233740","251340"]:
                         
                             
-                        PrevClosePrice = stock_data['prevClose'].values[0] 
+                        PrevClosePrice = stock_data['prevClose'] 
                         
                         DolpaRate = 0.4
 
@@ -752,7 +638,7 @@ if ENABLE_ORDER_EXECUTION == True:
                         #KODEX 코스닥150레버리지
                         else: 
 
-                            if PrevClosePrice > stock_data['ma60_before'].values[0]:
+                            if PrevClosePrice > stock_data['ma60_before']:
                                 DolpaRate = 0.3
                             else:
                                 DolpaRate = 0.4
@@ -762,7 +648,7 @@ if ENABLE_ORDER_EXECUTION == True:
                         #갭 상승 하락을 이용한 돌파값 조절!
                         # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
                         ##########################################################################
-                        Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
+                        Gap = ((abs(stock_data['open'] - PrevClosePrice) / PrevClosePrice)) * 100.0
 
                         GapSt = (Gap*0.025)
 
@@ -771,14 +657,14 @@ if ENABLE_ORDER_EXECUTION == True:
                         if GapSt < 0:
                             GapSt = 0.1
 
-                        if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
+                        if PrevClosePrice > stock_data['open'] and Gap >= 3.0:
                             DolpaRate *= (1.0 + GapSt)
 
-                        if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
+                        if PrevClosePrice < stock_data['open'] and Gap >= 3.0:
                             DolpaRate *= (1.0 - GapSt)
 
             
-                        DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
+                        DolPaPrice = stock_data['open'] + ((stock_data['prevHigh'] - stock_data['prevLow']) * DolpaRate)
 
 
                         #어제 무슨 이유에서건 매수 실패했다면 일단 REST로!
@@ -804,25 +690,25 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
                             if stock_code == "251340":
-                                if stock_data['prevClose'].values[0] <= stock_data['ma20_before'].values[0]:
+                                if stock_data['prevClose'] <= stock_data['ma20_before']:
                                     IsBuyReady = False 
             
 
                             else: #레버리지
 
-                                if stock_data['prevLow'].values[0] > stock_data['open'].values[0] and stock_data['prevClose'].values[0] < stock_data['ma10_before'].values[0]:
+                                if stock_data['prevLow'] > stock_data['open'] and stock_data['prevClose'] < stock_data['ma10_before']:
                                     IsBuyReady = False 
                                     
                             # 추가 개선 로직 https://blog.naver.com/zacra/223326173552 이 포스팅 참고!!!!
                             IsJung = False    
-                            if stock_data['ma10_before'].values[0] > stock_data['ma20_before'].values[0] > stock_data['ma60_before'].values[0] > stock_data['ma120_before'].values[0]:
+                            if stock_data['ma10_before'] > stock_data['ma20_before'] > stock_data['ma60_before'] > stock_data['ma120_before']:
                                 IsJung = True
                                 
                             if IsJung == False:
                                 
                                         
-                                high_price = stock_data['high_'+str(gugan_lenth)+'_max'].values[0] 
-                                low_price =  stock_data['low_'+str(gugan_lenth)+'_min'].values[0] 
+                                high_price = stock_data['high_'+str(gugan_lenth)+'_max'] 
+                                low_price =  stock_data['low_'+str(gugan_lenth)+'_min'] 
                                 
                                 Gap = (high_price - low_price) / 4
                                 
@@ -830,7 +716,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                 MaximunPrice = low_price + Gap * 3.0
                                 
                                 
-                                if stock_data['open'].values[0] > MaximunPrice:
+                                if stock_data['open'] > MaximunPrice:
                                     IsBuyReady = False
             
             
@@ -838,7 +724,7 @@ if ENABLE_ORDER_EXECUTION == True:
                             #OBV 활용! 추가 필터!
                             if IsBuyReady == True:
                                 #OBV 10이평선이 감소중이고 OBV값이 10이평선 아래에 있다면 매수를 취소한다!
-                                if stock_data['prev_obv_ma2'].values[0] > stock_data['prev_obv_ma'].values[0] and stock_data['prev_obv'].values[0] < stock_data['prev_obv_ma'].values[0]:
+                                if stock_data['prev_obv_ma2'] > stock_data['prev_obv_ma'] and stock_data['prev_obv'] < stock_data['prev_obv_ma']:
                                     IsBuyReady = False
                                     
 
@@ -902,8 +788,8 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
                     #파일에 저장
-                    with open(data_file_path, 'w') as outfile:
-                        json.dump(KospidaqStrategyList, outfile)
+                    Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
+                    Common.FlushState()
             else:
 
                 if time_info.tm_min == 0 or time_info.tm_min == 30:
@@ -920,13 +806,13 @@ if ENABLE_ORDER_EXECUTION == True:
 
                 stock_code = KospidaqStrategyData['StockCode']
                 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
 
-                if len(stock_data) == 1:
+                if stock_data is not None:
                     
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     #현재가!
@@ -963,8 +849,7 @@ if ENABLE_ORDER_EXECUTION == True:
 
                                                 
                                 #파일에 저장
-                                with open(data_file_path, 'w') as outfile:
-                                    json.dump(KospidaqStrategyList, outfile)
+                                Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
 
                             else:
 
@@ -1018,9 +903,9 @@ if ENABLE_ORDER_EXECUTION == True:
                                         time.sleep(0.5)
                                         
                                         # 새로운 수량 기준으로 콜백비율 재계산 및 재설정
-                                        stock_data_now = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                                        if len(stock_data_now) == 1:
-                                            hl_avg = stock_data_now['hl_range_avg'].values[0]
+                                        stock_data_now = RowIndex.get((date, stock_code))
+                                        if stock_data_now is not None:
+                                            hl_avg = stock_data_now['hl_range_avg']
                                             current_price = KisKR.GetCurrentPrice(stock_code)
                                             if current_price > 0 and hl_avg > 0:
                                                 callback_rate = (hl_avg * TRAILING_STOP_MULTIPLIER / current_price) * 100.0
@@ -1060,20 +945,20 @@ if ENABLE_ORDER_EXECUTION == True:
 
                                     else:
 
-                                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
+                                        if PrevClosePrice > stock_data['ma60_before']:
                                             CutRate = 0.4
                                         else:
                                             CutRate = 0.3
 
 
                                     
-                                    CutPrice = stock_data['open'].values[0] - ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * CutRate)
+                                    CutPrice = stock_data['open'] - ((stock_data['prevHigh'] - stock_data['prevLow']) * CutRate)
                                     
                                     
 
                                     CurrentPrice = KisKR.GetCurrentPrice(stock_code)  
 
-                                    if CurrentPrice <= CutPrice or stock_data['low'].values[0] <= CutPrice :
+                                    if CurrentPrice <= CutPrice or stock_data['low'] <= CutPrice :
                                         
                                         # [2026.01.23] 절반 트레일링 스탑 정리 로직 추가 - 매도 시 트레일링 스탑 취소
                                         if KospidaqStrategyData.get('IsTrailingStopSet') == True:
@@ -1098,8 +983,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                             DateSiGaLogicDoneDict['IsCut'] = True
                                             DateSiGaLogicDoneDict['IsCutCnt'] += 1
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
                                         else:
@@ -1110,8 +994,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                                 DateSiGaLogicDoneDict['IsCutCnt'] = 0
 
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
 
@@ -1138,25 +1021,25 @@ if ENABLE_ORDER_EXECUTION == True:
 
                                     if stock_code == "252670":
                                         
-                                        if stock_data['Disparity11'].values[0] > 105:
+                                        if stock_data['Disparity11'] > 105:
                                             #
-                                            if  PrevClosePrice < stock_data['ma3_before'].values[0]: 
+                                            if  PrevClosePrice < stock_data['ma3_before']: 
                                                 IsSellGo = True
 
                                         else:
                                             #
-                                            if PrevClosePrice < stock_data['ma6_before'].values[0] and PrevClosePrice < stock_data['ma19_before'].values[0] : 
+                                            if PrevClosePrice < stock_data['ma6_before'] and PrevClosePrice < stock_data['ma19_before'] : 
                                                 IsSellGo = True
 
                                     else:
                                         print("")
                                         
                             
-                                        total_volume = (stock_data['prevVolume'].values[0]+ stock_data['prevVolume2'].values[0] +stock_data['prevVolume3'].values[0]) / 3.0
+                                        total_volume = (stock_data['prevVolume']+ stock_data['prevVolume2'] +stock_data['prevVolume3']) / 3.0
 
-                                        Disparity = stock_data['Disparity20'].values[0] 
+                                        Disparity = stock_data['Disparity20'] 
 
-                                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0] or stock_data['prevVolume'].values[0] < total_volume) and (Disparity < 98 or Disparity > 105):
+                                        if (stock_data['prevLow2'] < stock_data['prevLow'] or stock_data['prevVolume'] < total_volume) and (Disparity < 98 or Disparity > 105):
                                             print("hold..")
                                         else:
                                             IsSellGo = True
@@ -1171,8 +1054,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                         
                                         DateSiGaLogicDoneDict['InvestCnt'] -= 1 #코스피 시가 매도 걸렸을 때만 투자중 카운트를 감소!
                                         #파일에 저장
-                                        with open(siga_logic_file_path, 'w') as outfile:
-                                            json.dump(DateSiGaLogicDoneDict, outfile)
+                                        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                        Common.FlushState()
                                             
                     
                                         # 남은 물량 전량 매도
@@ -1231,13 +1114,13 @@ if ENABLE_ORDER_EXECUTION == True:
 
                 stock_code = KospidaqStrategyData['StockCode']
                 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
 
-                if len(stock_data) == 1:
+                if stock_data is not None:
                     
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     #현재가!
@@ -1271,10 +1154,10 @@ if ENABLE_ORDER_EXECUTION == True:
                                 KospidaqStrategyData['IsTrailingStopSet'] = False
                             
                             if KospidaqStrategyData['IsTrailingStopSet'] == False:
-                                stock_data_now = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                                if len(stock_data_now) == 1:
+                                stock_data_now = RowIndex.get((date, stock_code))
+                                if stock_data_now is not None:
                                     # 최근 N개 캔들 고가-저가 평균의 M배를 콜백비율로 설정
-                                    hl_avg = stock_data_now['hl_range_avg'].values[0]
+                                    hl_avg = stock_data_now['hl_range_avg']
                                     current_price = KisKR.GetCurrentPrice(stock_code)
                                     if current_price > 0 and hl_avg > 0:
                                         callback_rate = (hl_avg * TRAILING_STOP_MULTIPLIER / current_price) * 100.0
@@ -1366,7 +1249,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                 #KODEX 코스닥150레버리지
                                 else: 
 
-                                    if PrevClosePrice > stock_data['ma60_before'].values[0]:
+                                    if PrevClosePrice > stock_data['ma60_before']:
                                         DolpaRate = 0.3
                                     else:
                                         DolpaRate = 0.4
@@ -1377,7 +1260,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                 #갭 상승 하락을 이용한 돌파값 조절!
                                 # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
                                 ##########################################################################
-                                Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
+                                Gap = ((abs(stock_data['open'] - PrevClosePrice) / PrevClosePrice)) * 100.0
 
                                 GapSt = (Gap*0.025)
 
@@ -1386,33 +1269,33 @@ if ENABLE_ORDER_EXECUTION == True:
                                 if GapSt < 0:
                                     GapSt = 0.1
 
-                                if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
+                                if PrevClosePrice > stock_data['open'] and Gap >= 3.0:
                                     DolpaRate *= (1.0 + GapSt)
 
-                                if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
+                                if PrevClosePrice < stock_data['open'] and Gap >= 3.0:
                                     DolpaRate *= (1.0 - GapSt)
 
 
                     
-                                DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
+                                DolPaPrice = stock_data['open'] + ((stock_data['prevHigh'] - stock_data['prevLow']) * DolpaRate)
 
                                 KospidaqStrategyData['TargetPrice'] = DolPaPrice
 
 
                                 #돌파가격보다 현재가가 높다? 돌파한거다 매수한다!
-                                if CurrentPrice >= KospidaqStrategyData['TargetPrice'] or stock_data['high'].values[0] >= KospidaqStrategyData['TargetPrice']  :
+                                if CurrentPrice >= KospidaqStrategyData['TargetPrice'] or stock_data['high'] >= KospidaqStrategyData['TargetPrice']  :
 
                                     Rate = 1.0
-                                    if len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1:
+                                    if Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None:
                                     
                                         IsLongStrong = False
                                         
-                                        if Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]:
+                                        if Kosdaq_Long_Data['Average_Momentum'] > Kosdaq_Short_Data['Average_Momentum']:
                                             IsLongStrong = True
                                             
                                         IsLongStrong2 = False
                                         
-                                        if Kosdaq_Long_Data['prevChangeMa'].values[0] > Kosdaq_Short_Data['prevChangeMa'].values[0]:
+                                        if Kosdaq_Long_Data['prevChangeMa'] > Kosdaq_Short_Data['prevChangeMa']:
                                             IsLongStrong2 = True
                                             
                                             
@@ -1440,12 +1323,12 @@ if ENABLE_ORDER_EXECUTION == True:
 
                                     if DateSiGaLogicDoneDict['IsCut'] == True and DateSiGaLogicDoneDict['IsCutCnt'] >= 2:
                                         
-                                        if stock_data['prevOpen'].values[0] > stock_data['prevClose'].values[0] and stock_data['prevHigh2'].values[0] > stock_data['prevHigh'].values[0]:
+                                        if stock_data['prevOpen'] > stock_data['prevClose'] and stock_data['prevHigh2'] > stock_data['prevHigh']:
 
-                                            AdjustRate = stock_data['Average_Momentum3'].values[0] 
+                                            AdjustRate = stock_data['Average_Momentum3'] 
 
                                             if DateSiGaLogicDoneDict['IsCutCnt'] >= 4:
-                                                AdjustRate = stock_data['Average_Momentum3'].values[0] * 0.5
+                                                AdjustRate = stock_data['Average_Momentum3'] * 0.5
 
 
                                         
@@ -1501,8 +1384,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                     
                                         DateSiGaLogicDoneDict['InvestCnt'] += 1
                                         #파일에 저장
-                                        with open(siga_logic_file_path, 'w') as outfile:
-                                            json.dump(DateSiGaLogicDoneDict, outfile)
+                                        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                        Common.FlushState()
                                             
                                         RemainInvestMoney -= InvestMoneyCell
                                         
@@ -1543,15 +1426,15 @@ if ENABLE_ORDER_EXECUTION == True:
                                     if stock_code == "252670":
 
                                         #이거변경
-                                        if PrevClosePrice > stock_data['ma3_before'].values[0]  and PrevClosePrice > stock_data['ma6_before'].values[0]  and PrevClosePrice > stock_data['ma19_before'].values[0] and stock_data['prevRSI'].values[0] < 70 and stock_data['prevRSI2'].values[0] < stock_data['prevRSI'].values[0]:
-                                            if (stock_data['prevVolume2'].values[0] < stock_data['prevVolume'].values[0]) and (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and PrevClosePrice > stock_data['ma60_before'].values[0] and stock_data['ma60_before2'].values[0] < stock_data['ma60_before'].values[0]  and stock_data['ma3_before'].values[0]  > stock_data['ma6_before'].values[0]  > stock_data['ma19_before'].values[0]  :
+                                        if PrevClosePrice > stock_data['ma3_before']  and PrevClosePrice > stock_data['ma6_before']  and PrevClosePrice > stock_data['ma19_before'] and stock_data['prevRSI'] < 70 and stock_data['prevRSI2'] < stock_data['prevRSI']:
+                                            if (stock_data['prevVolume2'] < stock_data['prevVolume']) and (stock_data['prevLow2'] < stock_data['prevLow']) and PrevClosePrice > stock_data['ma60_before'] and stock_data['ma60_before2'] < stock_data['ma60_before']  and stock_data['ma3_before']  > stock_data['ma6_before']  > stock_data['ma19_before']  :
                                                 IsBuyGo = True
 
                                     else:
 
-                                        Disparity = stock_data['Disparity20'].values[0] 
+                                        Disparity = stock_data['Disparity20'] 
                                         
-                                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'].values[0] < 80 :
+                                        if (stock_data['prevLow2'] < stock_data['prevLow']) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'] < 80 :
                                             IsBuyGo = True
                         
                                         
@@ -1610,8 +1493,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                             
                                         DateSiGaLogicDoneDict['InvestCnt'] += 1
                                         #파일에 저장
-                                        with open(siga_logic_file_path, 'w') as outfile:
-                                            json.dump(DateSiGaLogicDoneDict, outfile)
+                                        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                        Common.FlushState()
                                             
                                         
                                         
@@ -1635,12 +1518,12 @@ if ENABLE_ORDER_EXECUTION == True:
                                     #시가 매수 로직 안으로 들어왔다면 날자를 바꿔준다!!
                                     DateSiGaLogicDoneDict[stock_code] = day_n
                                     #파일에 저장
-                                    with open(siga_logic_file_path, 'w') as outfile:
-                                        json.dump(DateSiGaLogicDoneDict, outfile)
+                                    Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                    Common.FlushState()
 
             #파일에 저장
-            with open(data_file_path, 'w') as outfile:
-                json.dump(KospidaqStrategyList, outfile)
+            Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
+            Common.FlushState()
     else:
         print("Market Is Close!!!!!!!!!!!")
 
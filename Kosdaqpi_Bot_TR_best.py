@@ -106,6 +106,8 @@ FAQ로 해결 안되는 기술적인 문제는 파이썬 자동매매 연구소
 '''
 
 import KIS_Common as Common
+import Kosdaqpi_Features as Features
+import Kosdaqpi_Strategy as Strategy #봇/백테스트 공용 신호 엔진
 import KIS_API_Helper_KR as KisKR
 import time
 import pprint
@@ -173,15 +175,7 @@ REORDER_MAX_TRIES = int(os.getenv("REORDER_MAX_TRIES", "2"))  # 체결 미확인
 REORDER_COOLDOWN_SEC = int(os.getenv("REORDER_COOLDOWN_SEC", "180"))  # 재주문 최소 간격(초)
 #####################################################################################################################################
 
-# Best 조합 업사이드 가산 (백테스트 best와 동일한 기본값)
-EXPO_UP_MAX_DD = -0.07
-EXPO_UP_RATE = 1.16
-EXPO_UP2_MAX_DD = -0.04
-EXPO_UP2_RATE = 1.22
-DD_GUARD_LV1 = -0.14
-DD_GUARD_LV2 = -0.18
-DD_GUARD_RATE1 = 0.88
-DD_GUARD_RATE2 = 0.75
+# Best 조합 업사이드 가산 (EXPO_* / DD_GUARD_* 는 백테스트 best와 같이 Kosdaqpi_Strategy 에서 읽는다)
 
 
 
@@ -287,6 +281,9 @@ pprint.pprint(MyStockList)
 print("--------------------------------------------")
 ##########################################################
 
+#투자 종목 이름/시장 정보를 시작할 때 한번에 채워둔다 (캐시에 없거나 오래된 종목이 있을 때만 목록을 받는다)
+KisKR.WarmStockMeta(InvestStockList)
+
 
 
 
@@ -356,8 +353,7 @@ except Exception as e:
         KospidaqStrategyList.append(KospidaqStrategyData)
 
     #파일에 저장
-    with open(data_file_path, 'w') as outfile:
-        json.dump(KospidaqStrategyList, outfile)
+    Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
 
 
 ###################################################################
@@ -377,8 +373,7 @@ except Exception as e:
     DateData['Date'] = "00" #오늘날짜
 
     #파일에 저장
-    with open(date_file_path, 'w') as outfile:
-        json.dump(DateData, outfile)
+    Common.MarkStateDirty(date_file_path, DateData)
 
 ###################################################################
 ###################################################################
@@ -462,126 +457,14 @@ if ENABLE_ORDER_EXECUTION == True:
         gugan_lenth = 7
 
 
-        for stock_code in InvestStockList:
-            df = Common.GetOhlcv("KR", stock_code,200)
-            
-            #########################################################################################
-            #OBV 활용! 
-            # OBV 계산
-            df['direction'] = 0
-            df.loc[df['close'] > df['close'].shift(1), 'direction'] = 1
-            df.loc[df['close'] < df['close'].shift(1), 'direction'] = -1
-            df['obv'] = (df['direction'] * df['volume']).cumsum()
-
-            # OBV 이동평균선
-            df['obv_ma'] = df['obv'].rolling(window=10).mean()
-            
-            df['prev_obv_ma'] = df['obv_ma'].shift(1)
-            df['prev_obv_ma2'] = df['obv_ma'].shift(2)
-            df['prev_obv'] = df['obv'].shift(1)
-
-            #########################################################################################
-    
-            period = 14
-
-            delta = df["close"].diff()
-            up, down = delta.copy(), delta.copy()
-            up[up < 0] = 0
-            down[down > 0] = 0
-            _gain = up.ewm(com=(period - 1), min_periods=period).mean()
-            _loss = down.abs().ewm(com=(period - 1), min_periods=period).mean()
-            RS = _gain / _loss
-
-            df['RSI'] = pd.Series(100 - (100 / (1 + RS)), name="RSI")
-
-            df['prevRSI'] = df['RSI'].shift(1)
-            df['prevRSI2'] = df['RSI'].shift(2)
-            
-            df['high_'+str(gugan_lenth)+'_max'] = df['high'].rolling(window=gugan_lenth).max().shift(1)
-            df['low_'+str(gugan_lenth)+'_min'] = df['low'].rolling(window=gugan_lenth).min().shift(1)
-
-
-            df['prevVolume'] = df['volume'].shift(1)
-            df['prevVolume2'] = df['volume'].shift(2)
-            df['prevVolume3'] = df['volume'].shift(3)
-
-            df['prevClose'] = df['close'].shift(1)
-            df['prevOpen'] = df['open'].shift(1)
-
-            df['prevHigh'] = df['high'].shift(1)
-            df['prevHigh2'] = df['high'].shift(2)
-
-            df['prevLow'] = df['low'].shift(1)
-            df['prevLow2'] = df['low'].shift(2)
-
-            df['Disparity20'] = df['prevClose'] / df['prevClose'].rolling(window=20).mean() * 100.0
-            
-            df['Disparity11'] = df['prevClose'] / df['prevClose'].rolling(window=11).mean() * 100.0
-
-
-            df['ma3_before'] = df['close'].rolling(3).mean().shift(1)
-            df['ma6_before'] = df['close'].rolling(6).mean().shift(1)
-            df['ma19_before'] = df['close'].rolling(19).mean().shift(1)
-
-
-            df['ma10_before'] = df['close'].rolling(10).mean().shift(1)
-
-            df['ma20_before'] = df['close'].rolling(20).mean().shift(1)
-            df['ma20_before2'] = df['close'].rolling(20).mean().shift(2)
-            df['ma60_before'] = df['close'].rolling(60).mean().shift(1)
-            df['ma60_before2'] = df['close'].rolling(60).mean().shift(2)
-
-            df['ma120_before'] = df['close'].rolling(120).mean().shift(1)
-
+        #유니버스 전체 OHLCV를 한번에 동시에 가져온다!
+        OhlcvDict = Common.GetOhlcvBatch("KR", InvestStockList, 200)
 
+        #지표는 공용 피처 모듈에서 전 종목을 한번에 계산한다! (같은 데이터/파라미터면 저장된 결과 사용)
+        FeatureDict = Features.MakeFeatureDict(OhlcvDict, gugan_lenth, hl_range_window=TRAILING_STOP_CANDLE_COUNT)
 
-            df['prevChangeMa'] = df['change'].shift(1).rolling(window=20).mean()
-            
-
-            df['prevChangeMa_S'] = df['change'].shift(1).rolling(window=10).mean()
-            
-            # [2026.01.23] 절반 트레일링 스탑 정리 로직 추가 - 콜백비율 계산용 데이터
-            df['hl_range'] = df['high'] - df['low']
-            df['hl_range_avg'] = df['hl_range'].rolling(window=TRAILING_STOP_CANDLE_COUNT).mean()
-
-            #10일마다 총 100일 평균모멘텀스코어
-            specific_days = list()
-
-            for i in range(1,11):
-                st = i * 10
-                specific_days.append(st)
-
-            for day in specific_days:
-                column_name = f'Momentum_{day}'
-                df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-                
-            df['Average_Momentum'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-
-            # Define the list of specific trading days to compare
-            specific_days = list()
-
-            for i in range(1,11):
-                st = i * 3
-                specific_days.append(st)
-
-
-
-            # Iterate over the specific trading days and compare the current market price with the corresponding closing prices
-            for day in specific_days:
-                # Create a column name for each specific trading day
-                column_name = f'Momentum_{day}'
-                
-                # Compare current market price with the closing price of the specific trading day
-                df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-
-            # Calculate the average momentum score
-            df['Average_Momentum3'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-
-            df.dropna(inplace=True) #데이터 없는건 날린다!
+        for stock_code in InvestStockList:
+            df = FeatureDict[stock_code]
 
 
             data_dict = {stock_code: df}
@@ -598,29 +481,25 @@ if ENABLE_ORDER_EXECUTION == True:
                 #0으로 초기화!!!!!
                 DateSiGaLogicDoneDict[stock_code] = 0
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
             #시가매매 체크한 기록이 없는 맨 처음이라면 
             if DateSiGaLogicDoneDict.get('InvestCnt') == None:
                 DateSiGaLogicDoneDict['InvestCnt'] =  GetKospidaqInvestCnt(KospidaqStrategyList) #일단 투자중 개수 저장!
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
                     
                     
             if DateSiGaLogicDoneDict.get('IsCut') == None:
                 DateSiGaLogicDoneDict['IsCut'] =  False
                 DateSiGaLogicDoneDict['IsCutCnt'] =  0
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
             if DateSiGaLogicDoneDict.get('PeakMoney') == None:
                 DateSiGaLogicDoneDict['PeakMoney'] = TotalMoney
                 DateSiGaLogicDoneDict['ExposureRate'] = 1.0
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
 
@@ -630,44 +509,29 @@ if ENABLE_ORDER_EXECUTION == True:
         # Sort the combined DataFrame by date
         combined_df.sort_index(inplace=True)
 
+        #(날짜, 종목코드)로 한 줄 데이터를 바로 꺼낼 수 있게 미리 나눠둔다! (매번 combined_df 전체를 마스크로 훑지 않도록)
+        RowIndex = Features.MakeRowIndex(FeatureDict)
+        DateCodeIndex = Features.MakeDateCodeIndex(FeatureDict)
+
         pprint.pprint(combined_df)
         print(" len(combined_df) ", len(combined_df))
 
 
         date = combined_df.iloc[-1].name
 
-        all_stocks = combined_df.loc[combined_df.index == date].groupby('stock_code')['close'].max().nlargest(DivNum)
+        all_stocks = DateCodeIndex.get(date, [])[:DivNum]
         
 
         #######################################################################################################################################
         # 횡보장을 정의하기 위한 로직!!
         # https://blog.naver.com/zacra/223225906361 이 포스팅을 정독하세요!!!
-        Kosdaq_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "233740")]
-        Kosdaq_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "251340")]
-        Kospi_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "122630")]
-        Kospi_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "252670")]
+        Kosdaq_Long_Data = RowIndex.get((date, "233740"))
+        Kosdaq_Short_Data = RowIndex.get((date, "251340"))
+        Kospi_Long_Data = RowIndex.get((date, "122630"))
+        Kospi_Short_Data = RowIndex.get((date, "252670"))
         
         
-        IsNoWay = False
-        if  (Kospi_Long_Data['prevChangeMa_S'].values[0] > 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kospi_Long_Data['prevChangeMa_S'].values[0] < 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] < 0)  or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] > 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] < 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] < 0) :
-            IsNoWay = True
-
-        IsStrongTrend = False
-        if (
-            Kosdaq_Long_Data['ma20_before'].values[0] > Kosdaq_Long_Data['ma60_before'].values[0]
-            and Kospi_Long_Data['ma20_before'].values[0] > Kospi_Long_Data['ma60_before'].values[0]
-            and Kosdaq_Long_Data['prevChangeMa'].values[0] > 0
-            and Kospi_Long_Data['prevChangeMa'].values[0] > 0
-        ):
-            IsStrongTrend = True
-
-        IsVeryStrongTrend = False
-        if (
-            IsStrongTrend == True
-            and Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]
-            and Kospi_Long_Data['prevChangeMa'].values[0] > Kospi_Short_Data['prevChangeMa'].values[0]
-        ):
-            IsVeryStrongTrend = True
+        IsNoWay, IsStrongTrend, IsVeryStrongTrend = Strategy.GetMarketFlags(Kosdaq_Long_Data, Kosdaq_Short_Data, Kospi_Long_Data, Kospi_Short_Data)
 
         # 실계좌용 DD 추정: 남은현금 + 보유수량*현재가
         CurrentNowInvestMoney = 0
@@ -685,20 +549,10 @@ if ENABLE_ORDER_EXECUTION == True:
             DateSiGaLogicDoneDict['PeakMoney'] = CurrentPortfolioMoney
         CurrentDD = (CurrentPortfolioMoney / DateSiGaLogicDoneDict['PeakMoney']) - 1.0
 
-        ExposureRate = 1.0
-        if CurrentDD >= EXPO_UP2_MAX_DD and IsNoWay == False and IsVeryStrongTrend == True and DateSiGaLogicDoneDict['IsCutCnt'] == 0:
-            ExposureRate = EXPO_UP2_RATE
-        elif CurrentDD >= EXPO_UP_MAX_DD and IsNoWay == False and IsStrongTrend == True and DateSiGaLogicDoneDict['IsCutCnt'] == 0:
-            ExposureRate = EXPO_UP_RATE
-
-        if CurrentDD <= DD_GUARD_LV2:
-            ExposureRate = min(ExposureRate, DD_GUARD_RATE2)
-        elif CurrentDD <= DD_GUARD_LV1:
-            ExposureRate = min(ExposureRate, DD_GUARD_RATE1)
+        ExposureRate = Strategy.GetExposureRate(CurrentDD, IsNoWay, IsStrongTrend, IsVeryStrongTrend, DateSiGaLogicDoneDict['IsCutCnt'])
 
         DateSiGaLogicDoneDict['ExposureRate'] = ExposureRate
-        with open(siga_logic_file_path, 'w') as outfile:
-            json.dump(DateSiGaLogicDoneDict, outfile)
+        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
         #######################################################################################################################################
 
         
@@ -744,14 +598,12 @@ if ENABLE_ORDER_EXECUTION == True:
                 
                 DateSiGaLogicDoneDict['InvestCnt'] = GetKospidaqInvestCnt(KospidaqStrategyList) #일단 투자중 개수 저장!
                 #파일에 저장
-                with open(siga_logic_file_path, 'w') as outfile:
-                    json.dump(DateSiGaLogicDoneDict, outfile)
+                Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
                     
                     
 
                 DateData['Date'] = day_str #오늘 맨처음 할일 (종목 선정 및 돌파가격 설정, 상태 설정)을 끝냈으니 날짜를 넣어 다음날 다시 실행되게 한다.
-                with open(date_file_path, 'w') as outfile:
-                    json.dump(DateData, outfile)
+                Common.MarkStateDirty(date_file_path, DateData)
 
                 #기본적으로 날이 바뀌었기 때문에 데이 조건(BUY_DAY,SELL_DAY)를 모두 초기화 한다!
                 for KospidaqStrategyData in KospidaqStrategyList:
@@ -767,8 +619,8 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
             
-                for stock_code in  all_stocks.index:
-                    stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                for stock_code in  all_stocks:
+                    stock_data = RowIndex.get((date, stock_code))
 
                     #해당 정보를 읽는다.
                     KospidaqStrategyData = GetKospidaqStrategyData(stock_code,KospidaqStrategyList)
@@ -795,45 +647,10 @@ if ENABLE_ORDER_EXECUTION == True:
                     if stock_code in ["233740","251340"]:
                         
                             
-                        PrevClosePrice = stock_data['prevClose'].values[0] 
+                        PrevClosePrice = stock_data['prevClose'] 
                         
-                        DolpaRate = 0.4
-
-                        # KODEX 코스닥150선물인버스
-                        if stock_code == "251340":
-
-                            DolpaRate = 0.4
-
-                        #KODEX 코스닥150레버리지
-                        else: 
-
-                            if PrevClosePrice > stock_data['ma60_before'].values[0]:
-                                DolpaRate = 0.3
-                            else:
-                                DolpaRate = 0.4
-
-
-                        ##########################################################################
-                        #갭 상승 하락을 이용한 돌파값 조절!
-                        # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
-                        ##########################################################################
-                        Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
-
-                        GapSt = (Gap*0.025)
-
-                        if GapSt > 1.0:
-                            GapSt = 1.0
-                        if GapSt < 0:
-                            GapSt = 0.1
-
-                        if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
-                            DolpaRate *= (1.0 + GapSt)
-
-                        if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
-                            DolpaRate *= (1.0 - GapSt)
-
-            
-                        DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
+                        #변동성 돌파 시가 + (전일고가-전일저가)*DolpaRate (갭 조절 포함)
+                        DolPaPrice = Strategy.GetKosdaqDolPaPrice(stock_code, stock_data)
 
 
                         #어제 무슨 이유에서건 매수 실패했다면 일단 REST로!
@@ -851,50 +668,14 @@ if ENABLE_ORDER_EXECUTION == True:
                         
                         if KospidaqStrategyData['Status'] != "INVESTING": #투자 상태가 아니라면 조건을 체크하여 매수시도할 수 있다!
                             
-                            IsBuyReady = True #일단 무조건 True 만약 필터하고자 하면 False로 하고 조건만족시 True로 바꾸면 된다.
                             
 
                             KospidaqStrategyData['StockCode'] = stock_code #대상 종목 코드
                             KospidaqStrategyData['StockName'] = KisKR.GetStockName(stock_code)
 
 
-                            if stock_code == "251340":
-                                if stock_data['prevClose'].values[0] <= stock_data['ma20_before'].values[0]:
-                                    IsBuyReady = False 
-            
-
-                            else: #레버리지
-
-                                if stock_data['prevLow'].values[0] > stock_data['open'].values[0] and stock_data['prevClose'].values[0] < stock_data['ma10_before'].values[0]:
-                                    IsBuyReady = False 
-                                    
-                            # 추가 개선 로직 https://blog.naver.com/zacra/223326173552 이 포스팅 참고!!!!
-                            IsJung = False    
-                            if stock_data['ma10_before'].values[0] > stock_data['ma20_before'].values[0] > stock_data['ma60_before'].values[0] > stock_data['ma120_before'].values[0]:
-                                IsJung = True
-                                
-                            if IsJung == False:
-                                
-                                        
-                                high_price = stock_data['high_'+str(gugan_lenth)+'_max'].values[0] 
-                                low_price =  stock_data['low_'+str(gugan_lenth)+'_min'].values[0] 
-                                
-                                Gap = (high_price - low_price) / 4
-                                
-                                
-                                MaximunPrice = low_price + Gap * 3.0
-                                
-                                
-                                if stock_data['open'].values[0] > MaximunPrice:
-                                    IsBuyReady = False
-            
-            
-            
-                            #OBV 활용! 추가 필터!
-                            if IsBuyReady == True:
-                                #OBV 10이평선이 감소중이고 OBV값이 10이평선 아래에 있다면 매수를 취소한다!
-                                if stock_data['prev_obv_ma2'].values[0] > stock_data['prev_obv_ma'].values[0] and stock_data['prev_obv'].values[0] < stock_data['prev_obv_ma'].values[0]:
-                                    IsBuyReady = False
+                            #돌파 전 필터(인버스 20이평/레버리지 10이평, IsJung, OBV)를 통과해야 READY!
+                            IsBuyReady = Strategy.CheckKosdaqBuyFilter(stock_code, stock_data, gugan_lenth)
                                     
 
                             #기본 필터 통과!! 돌파가격을 정하고 READY상태로 변경
@@ -957,8 +738,8 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
                     #파일에 저장
-                    with open(data_file_path, 'w') as outfile:
-                        json.dump(KospidaqStrategyList, outfile)
+                    Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
+                    Common.FlushState()
             else:
 
                 if time_info.tm_min == 0 or time_info.tm_min == 30:
@@ -975,13 +756,13 @@ if ENABLE_ORDER_EXECUTION == True:
 
                 stock_code = KospidaqStrategyData['StockCode']
                 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
 
-                if len(stock_data) == 1:
+                if stock_data is not None:
                     
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     #현재가!
@@ -1018,8 +799,7 @@ if ENABLE_ORDER_EXECUTION == True:
 
                                                 
                                 #파일에 저장
-                                with open(data_file_path, 'w') as outfile:
-                                    json.dump(KospidaqStrategyList, outfile)
+                                Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
 
                             else:
 
@@ -1073,9 +853,9 @@ if ENABLE_ORDER_EXECUTION == True:
                                         time.sleep(0.5)
                                         
                                         # 새로운 수량 기준으로 콜백비율 재계산 및 재설정
-                                        stock_data_now = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                                        if len(stock_data_now) == 1:
-                                            hl_avg = stock_data_now['hl_range_avg'].values[0]
+                                        stock_data_now = RowIndex.get((date, stock_code))
+                                        if stock_data_now is not None:
+                                            hl_avg = stock_data_now['hl_range_avg']
                                             current_price = KisKR.GetCurrentPrice(stock_code)
                                             if current_price > 0 and hl_avg > 0:
                                                 callback_rate = (hl_avg * TRAILING_STOP_MULTIPLIER / current_price) * 100.0
@@ -1108,27 +888,14 @@ if ENABLE_ORDER_EXECUTION == True:
                                 if stock_amt > 0:
                                     
 
-                                    CutRate = 0.4
-
-                                    if stock_code == "251340":
-                                        CutRate = 0.4
-
-                                    else:
-
-                                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
-                                            CutRate = 0.4
-                                        else:
-                                            CutRate = 0.3
-
-
-                                    
-                                    CutPrice = stock_data['open'].values[0] - ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * CutRate)
+                                    #목표컷 매도가! 시가 - (전일고가 - 전일저가) x CutRate
+                                    CutPrice = Strategy.GetKosdaqCutPrice(stock_code, stock_data)
                                     
                                     
 
                                     CurrentPrice = KisKR.GetCurrentPrice(stock_code)  
 
-                                    if CurrentPrice <= CutPrice or stock_data['low'].values[0] <= CutPrice :
+                                    if CurrentPrice <= CutPrice or stock_data['low'] <= CutPrice :
                                         
                                         # [2026.01.23] 절반 트레일링 스탑 정리 로직 추가 - 매도 시 트레일링 스탑 취소
                                         if KospidaqStrategyData.get('IsTrailingStopSet') == True:
@@ -1153,8 +920,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                             DateSiGaLogicDoneDict['IsCut'] = True
                                             DateSiGaLogicDoneDict['IsCutCnt'] += 1
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
                                         else:
@@ -1165,8 +931,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                                 DateSiGaLogicDoneDict['IsCutCnt'] = 0
 
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
 
 
 
@@ -1189,32 +954,11 @@ if ENABLE_ORDER_EXECUTION == True:
                                 
                                 if stock_amt > 0:
                                     
-                                    IsSellGo = False
-
-                                    if stock_code == "252670":
-                                        
-                                        if stock_data['Disparity11'].values[0] > 105:
-                                            #
-                                            if  PrevClosePrice < stock_data['ma3_before'].values[0]: 
-                                                IsSellGo = True
-
-                                        else:
-                                            #
-                                            if PrevClosePrice < stock_data['ma6_before'].values[0] and PrevClosePrice < stock_data['ma19_before'].values[0] : 
-                                                IsSellGo = True
+                                    IsSellGo = Strategy.CheckKospiSell(stock_code, stock_data)
 
-                                    else:
-                                        print("")
-                                        
-                            
-                                        total_volume = (stock_data['prevVolume'].values[0]+ stock_data['prevVolume2'].values[0] +stock_data['prevVolume3'].values[0]) / 3.0
-
-                                        Disparity = stock_data['Disparity20'].values[0] 
-
-                                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0] or stock_data['prevVolume'].values[0] < total_volume) and (Disparity < 98 or Disparity > 105):
-                                            print("hold..")
-                                        else:
-                                            IsSellGo = True
+                                    # KODEX 레버리지 홀드
+                                    if IsSellGo == False and stock_code != "252670":
+                                        print("hold..")
 
                         
                                     if IsSellGo == True:
@@ -1226,8 +970,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                         
                                         DateSiGaLogicDoneDict['InvestCnt'] -= 1 #코스피 시가 매도 걸렸을 때만 투자중 카운트를 감소!
                                         #파일에 저장
-                                        with open(siga_logic_file_path, 'w') as outfile:
-                                            json.dump(DateSiGaLogicDoneDict, outfile)
+                                        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                        Common.FlushState()
                                             
                     
                                         # 남은 물량 전량 매도
@@ -1286,13 +1030,13 @@ if ENABLE_ORDER_EXECUTION == True:
 
                 stock_code = KospidaqStrategyData['StockCode']
                 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
 
-                if len(stock_data) == 1:
+                if stock_data is not None:
                     
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     #현재가!
@@ -1326,10 +1070,10 @@ if ENABLE_ORDER_EXECUTION == True:
                                     KospidaqStrategyData['IsTrailingStopSet'] = False
                                 
                                 if KospidaqStrategyData['IsTrailingStopSet'] == False:
-                                    stock_data_now = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                                    if len(stock_data_now) == 1:
+                                    stock_data_now = RowIndex.get((date, stock_code))
+                                    if stock_data_now is not None:
                                         # 최근 N개 캔들 고가-저가 평균의 M배를 콜백비율로 설정
-                                        hl_avg = stock_data_now['hl_range_avg'].values[0]
+                                        hl_avg = stock_data_now['hl_range_avg']
                                         current_price = KisKR.GetCurrentPrice(stock_code)
                                         if current_price > 0 and hl_avg > 0:
                                             callback_rate = (hl_avg * TRAILING_STOP_MULTIPLIER / current_price) * 100.0
@@ -1436,79 +1180,17 @@ if ENABLE_ORDER_EXECUTION == True:
                                 
 
                         
-                                DolpaRate = 0.4
-
-                                # KODEX 코스닥150선물인버스
-                                if stock_code == "251340":
-
-                                    DolpaRate = 0.4
-
-                                #KODEX 코스닥150레버리지
-                                else: 
-
-                                    if PrevClosePrice > stock_data['ma60_before'].values[0]:
-                                        DolpaRate = 0.3
-                                    else:
-                                        DolpaRate = 0.4
-
-
-                    
-                                ##########################################################################
-                                #갭 상승 하락을 이용한 돌파값 조절!
-                                # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
-                                ##########################################################################
-                                Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
-
-                                GapSt = (Gap*0.025)
-
-                                if GapSt > 1.0:
-                                    GapSt = 1.0
-                                if GapSt < 0:
-                                    GapSt = 0.1
-
-                                if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
-                                    DolpaRate *= (1.0 + GapSt)
-
-                                if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
-                                    DolpaRate *= (1.0 - GapSt)
-
-
-                    
-                                DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
+                                #변동성 돌파 시가 + (전일고가-전일저가)*DolpaRate (갭 조절 포함)
+                                DolPaPrice = Strategy.GetKosdaqDolPaPrice(stock_code, stock_data)
 
                                 KospidaqStrategyData['TargetPrice'] = DolPaPrice
 
 
                                 #돌파가격보다 현재가가 높다? 돌파한거다 매수한다!
-                                if CurrentPrice >= KospidaqStrategyData['TargetPrice'] or stock_data['high'].values[0] >= KospidaqStrategyData['TargetPrice']  :
+                                if CurrentPrice >= KospidaqStrategyData['TargetPrice'] or stock_data['high'] >= KospidaqStrategyData['TargetPrice']  :
 
-                                    Rate = 1.0
-                                    if len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1:
-                                    
-                                        IsLongStrong = False
-                                        
-                                        if Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]:
-                                            IsLongStrong = True
-                                            
-                                        IsLongStrong2 = False
-                                        
-                                        if Kosdaq_Long_Data['prevChangeMa'].values[0] > Kosdaq_Short_Data['prevChangeMa'].values[0]:
-                                            IsLongStrong2 = True
-                                            
-                                            
-                                        if IsLongStrong == True and IsLongStrong2 == True:
-                                            
-                                            if stock_code == "233740":
-                                                Rate = 1.3
-                                            else:
-                                                Rate = 0.7
-                                                
-                                        elif IsLongStrong == False and IsLongStrong2 == False:
-                                                
-                                            if stock_code == "233740":
-                                                Rate = 0.7
-                                            else:
-                                                Rate = 1.3
+                                    #모멘텀 스코어를 통한 비중 조절!
+                                    Rate = Strategy.GetKosdaqMomentumRate(stock_code, Kosdaq_Long_Data, Kosdaq_Short_Data)
                                                 
 
                                     #############################################################
@@ -1516,16 +1198,7 @@ if ENABLE_ORDER_EXECUTION == True:
                                     # https://blog.naver.com/zacra/223225906361 이 포스팅 체크!!!
                                     #############################################################
                                                 
-                                    AdjustRate = 1.0
-
-                                    if DateSiGaLogicDoneDict['IsCut'] == True and DateSiGaLogicDoneDict['IsCutCnt'] >= 2:
-                                        
-                                        if stock_data['prevOpen'].values[0] > stock_data['prevClose'].values[0] and stock_data['prevHigh2'].values[0] > stock_data['prevHigh'].values[0]:
-
-                                            AdjustRate = stock_data['Average_Momentum3'].values[0] 
-
-                                            if DateSiGaLogicDoneDict['IsCutCnt'] >= 4:
-                                                AdjustRate = stock_data['Average_Momentum3'].values[0] * 0.5
+                                    AdjustRate = Strategy.GetCutAdjustRate(DateSiGaLogicDoneDict['IsCut'], DateSiGaLogicDoneDict['IsCutCnt'], stock_data)
 
 
                                         
@@ -1582,8 +1255,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                         if IsOrderAccepted(order_data):
                                             DateSiGaLogicDoneDict['InvestCnt'] += 1
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                            Common.FlushState()
 
                                             RemainInvestMoney -= InvestMoneyCell
 
@@ -1623,20 +1296,7 @@ if ENABLE_ORDER_EXECUTION == True:
 
 
                                             
-                                    IsBuyGo = False
-                                    if stock_code == "252670":
-
-                                        #이거변경
-                                        if PrevClosePrice > stock_data['ma3_before'].values[0]  and PrevClosePrice > stock_data['ma6_before'].values[0]  and PrevClosePrice > stock_data['ma19_before'].values[0] and stock_data['prevRSI'].values[0] < 70 and stock_data['prevRSI2'].values[0] < stock_data['prevRSI'].values[0]:
-                                            if (stock_data['prevVolume2'].values[0] < stock_data['prevVolume'].values[0]) and (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and PrevClosePrice > stock_data['ma60_before'].values[0] and stock_data['ma60_before2'].values[0] < stock_data['ma60_before'].values[0]  and stock_data['ma3_before'].values[0]  > stock_data['ma6_before'].values[0]  > stock_data['ma19_before'].values[0]  :
-                                                IsBuyGo = True
-
-                                    else:
-
-                                        Disparity = stock_data['Disparity20'].values[0] 
-                                        
-                                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'].values[0] < 80 :
-                                            IsBuyGo = True
+                                    IsBuyGo = Strategy.CheckKospiBuy(stock_code, stock_data)
                         
                                         
                                     IsBuyOrderSent = False
@@ -1698,8 +1358,8 @@ if ENABLE_ORDER_EXECUTION == True:
                                         if IsOrderAccepted(order_data):
                                             DateSiGaLogicDoneDict['InvestCnt'] += 1
                                             #파일에 저장
-                                            with open(siga_logic_file_path, 'w') as outfile:
-                                                json.dump(DateSiGaLogicDoneDict, outfile)
+                                            Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                            Common.FlushState()
 
                                             RemainInvestMoney -= InvestMoneyCell
 
@@ -1732,12 +1392,12 @@ if ENABLE_ORDER_EXECUTION == True:
                                     if IsBuyGo == False or IsBuyOrderSent == True:
                                         DateSiGaLogicDoneDict[stock_code] = day_n
                                         #파일에 저장
-                                        with open(siga_logic_file_path, 'w') as outfile:
-                                            json.dump(DateSiGaLogicDoneDict, outfile)
+                                        Common.MarkStateDirty(siga_logic_file_path, DateSiGaLogicDoneDict)
+                                        Common.FlushState()
 
             #파일에 저장
-            with open(data_file_path, 'w') as outfile:
-                json.dump(KospidaqStrategyList, outfile)
+            Common.MarkStateDirty(data_file_path, KospidaqStrategyList)
+            Common.FlushState()
     else:
         print("Market Is Close!!!!!!!!!!!")
 
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+'''
+코스닥피 전략 공용 지표(피처) 모듈!
+
+라이브 봇(Kosdaqpi_Bot_TR*.py)과 백테스트(Kosdaqpi_Test*.py)가 똑같이 쓰는
+OBV, RSI, 이동평균, 이격도, 평균모멘텀스코어 등을 여기서 한번에 계산한다.
+
+종목별 데이터를 마지막 날짜 기준으로 오른쪽 정렬해서 (봉 위치 x 종목) 판넬로 만든 뒤
+rolling/ewm/shift를 종목 전체에 대해 한번에 돌린다. 위치 기준 계산이라 종목별로 따로 계산한 것과 결과가 같다.
+
+같은 데이터 + 같은 파라미터면 계산 결과를 파일로 저장해 두고 다시 읽어서 쓴다!
+'''
+import os
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+
+#계산 로직이 바뀌면 이 값을 올려서 저장된 피처를 무효화 한다
+FEATURE_VERSION = 1
+
+FEATURE_STORE_USE = os.getenv("FEATURE_STORE_USE", "1") == "1"
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "./feature_store")
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'change']
+
+
+#종목별 df들을 마지막 봉 기준으로 오른쪽 정렬한 (봉 위치 x 종목) 판넬로 만든다! 모자란 앞부분은 NaN
+def MakePanel(OhlcvDict, column, max_len):
+    arr = np.full((max_len, len(OhlcvDict)), np.nan)
+    for i, df in enumerate(OhlcvDict.values()):
+        values = df[column].to_numpy(dtype=float)
+        arr[max_len - len(values):, i] = values
+    return pd.DataFrame(arr, columns=list(OhlcvDict.keys()))
+
+
+#판넬 단위로 지표들을 계산해서 {컬럼명: 판넬} 딕셔너리로 리턴!
+def CalcFeaturePanels(OhlcvDict, gugan_lenth = 7, hl_range_window = None, with_vol20 = False):
+
+    max_len = max(len(df) for df in OhlcvDict.values())
+
+    Open = MakePanel(OhlcvDict, 'open', max_len)
+    High = MakePanel(OhlcvDict, 'high', max_len)
+    Low = MakePanel(OhlcvDict, 'low', max_len)
+    Close = MakePanel(OhlcvDict, 'close', max_len)
+    Volume = MakePanel(OhlcvDict, 'volume', max_len)
+    Change = MakePanel(OhlcvDict, 'change', max_len)
+
+    FeatureDict = dict()
+
+    #########################################################################################
+    #OBV 활용!
+    Direction = np.sign(Close.diff()).fillna(0)
+    Obv = (Direction * Volume).cumsum()
+    ObvMa = Obv.rolling(window=10).mean()
+
+    FeatureDict['direction'] = Direction
+    FeatureDict['obv'] = Obv
+    FeatureDict['obv_ma'] = ObvMa
+    FeatureDict['prev_obv_ma'] = ObvMa.shift(1)
+    FeatureDict['prev_obv_ma2'] = ObvMa.shift(2)
+    FeatureDict['prev_obv'] = Obv.shift(1)
+
+    #########################################################################################
+    #RSI
+    period = 14
+
+    delta = Close.diff()
+    up = delta.clip(lower=0)
+    down = delta.clip(upper=0)
+    _gain = up.ewm(com=(period - 1), min_periods=period).mean()
+    _loss = down.abs().ewm(com=(period - 1), min_periods=period).mean()
+    Rsi = 100 - (100 / (1 + (_gain / _loss)))
+
+    FeatureDict['RSI'] = Rsi
+    FeatureDict['prevRSI'] = Rsi.shift(1)
+    FeatureDict['prevRSI2'] = Rsi.shift(2)
+
+    FeatureDict['high_'+str(gugan_lenth)+'_max'] = High.rolling(window=gugan_lenth).max().shift(1)
+    FeatureDict['low_'+str(gugan_lenth)+'_min'] = Low.rolling(window=gugan_lenth).min().shift(1)
+
+    #########################################################################################
+    PrevClose = Close.shift(1)
+
+    FeatureDict['prevVolume'] = Volume.shift(1)
+    FeatureDict['prevVolume2'] = Volume.shift(2)
+    FeatureDict['prevVolume3'] = Volume.shift(3)
+
+    FeatureDict['prevClose'] = PrevClose
+    FeatureDict['prevOpen'] = Open.shift(1)
+
+    FeatureDict['prevHigh'] = High.shift(1)
+    FeatureDict['prevHigh2'] = High.shift(2)
+
+    FeatureDict['prevLow'] = Low.shift(1)
+    FeatureDict['prevLow2'] = Low.shift(2)
+
+    FeatureDict['Disparity20'] = PrevClose / PrevClose.rolling(window=20).mean() * 100.0
+    FeatureDict['Disparity11'] = PrevClose / PrevClose.rolling(window=11).mean() * 100.0
+
+    #이동평균은 기간별로 한번씩만 구하고 shift만 다르게!
+    Ma20 = Close.rolling(20).mean()
+    Ma60 = Close.rolling(60).mean()
+
+    FeatureDict['ma3_before'] = Close.rolling(3).mean().shift(1)
+    FeatureDict['ma6_before'] = Close.rolling(6).mean().shift(1)
+    FeatureDict['ma19_before'] = Close.rolling(19).mean().shift(1)
+    FeatureDict['ma10_before'] = Close.rolling(10).mean().shift(1)
+    FeatureDict['ma20_before'] = Ma20.shift(1)
+    FeatureDict['ma20_before2'] = Ma20.shift(2)
+    FeatureDict['ma60_before'] = Ma60.shift(1)
+    FeatureDict['ma60_before2'] = Ma60.shift(2)
+    FeatureDict['ma120_before'] = Close.rolling(120).mean().shift(1)
+
+    PrevChange = Change.shift(1)
+    FeatureDict['prevChangeMa'] = PrevChange.rolling(window=20).mean()
+    FeatureDict['prevChangeMa_S'] = PrevChange.rolling(window=10).mean()
+
+    if with_vol20 == True:
+        FeatureDict['vol20'] = Change.rolling(window=20).std().shift(1)
+
+    # [2026.01.23] 절반 트레일링 스탑 정리 로직 추가 - 콜백비율 계산용 데이터
+    if hl_range_window is not None:
+        HlRange = High - Low
+        FeatureDict['hl_range'] = HlRange
+        FeatureDict['hl_range_avg'] = HlRange.rolling(window=hl_range_window).mean()
+
+    #########################################################################################
+    #평균모멘텀스코어! 임시 컬럼 10개를 만들지 않고 배열에서 바로 더한다
+    #10일마다 총 100일 평균모멘텀스코어 / 3일마다 총 30일 평균모멘텀스코어
+    PrevCloseArr = PrevClose.to_numpy()
+    CloseArr = Close.to_numpy()
+
+    for column_name, step in [('Average_Momentum', 10), ('Average_Momentum3', 3)]:
+        MomentumSum = np.zeros(CloseArr.shape)
+        for i in range(1,11):
+            day = i * step
+            ShiftArr = np.full(CloseArr.shape, np.nan)
+            ShiftArr[day:] = CloseArr[:-day]
+            with np.errstate(invalid='ignore'):
+                MomentumSum += (PrevCloseArr > ShiftArr)
+        FeatureDict[column_name] = pd.DataFrame(MomentumSum / 10, columns=Close.columns)
+
+    return FeatureDict
+
+
+#판넬 계산 결과를 종목별 df로 다시 나눠준다! (원본 OHLCV 컬럼 + 지표 컬럼, NaN 있는 행은 제거)
+def SplitFeaturePanels(OhlcvDict, FeaturePanelDict):
+
+    max_len = max(len(df) for df in OhlcvDict.values())
+
+    ResultDict = dict()
+    for stock_code, df in OhlcvDict.items():
+        start = max_len - len(df)
+
+        df = df.copy()
+        for column_name, panel in FeaturePanelDict.items():
+            df[column_name] = panel[stock_code].to_numpy()[start:]
+
+        df.dropna(inplace=True) #데이터 없는건 날린다!
+        ResultDict[stock_code] = df
+
+    return ResultDict
+
+
+############################################################################################################################################################
+#피처 저장소! 파일 하나에 (종목, 파라미터) 별로 마지막 계산 결과를 저장하고 데이터 해시가 같으면 그대로 쓴다
+
+def GetParamKey(gugan_lenth, hl_range_window, with_vol20):
+    param_str = json.dumps([FEATURE_VERSION, gugan_lenth, hl_range_window, bool(with_vol20)])
+    return hashlib.md5(param_str.encode()).hexdigest()[:12]
+
+
+#OHLCV 데이터 버전(내용 해시)
+def GetDataKey(df):
+    return hashlib.md5(pd.util.hash_pandas_object(df[OHLCV_COLUMNS], index=True).to_numpy().tobytes()).hexdigest()
+
+
+def GetFeatureStorePath(stock_code, param_key):
+    return os.path.join(FEATURE_STORE_DIR, f"{stock_code}_{param_key}.pkl")
+
+
+def LoadFeatureStore(stock_code, param_key, data_key):
+    try:
+        data = pd.read_pickle(GetFeatureStorePath(stock_code, param_key))
+        if data['DataKey'] == data_key:
+            return data['df']
+    except Exception:
+        pass
+    return None
+
+
+def SaveFeatureStore(stock_code, param_key, data_key, df):
+    try:
+        os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+        store_path = GetFeatureStorePath(stock_code, param_key)
+        tmp_path = store_path + "." + str(os.getpid()) + ".tmp"
+        pd.to_pickle({'DataKey': data_key, 'df': df}, tmp_path)
+        os.replace(tmp_path, store_path)
+    except Exception as e:
+        print("피처 저장 실패:", e)
+
+
+#종목별 OHLCV 딕셔너리를 받아서 지표가 붙은 종목별 df 딕셔너리를 리턴!
+#gugan_lenth: 고가/저가 돌파 구간, hl_range_window: 트레일링 스탑용 고저폭 평균 기간(봇만 사용), with_vol20: 20일 변동성 추가 여부
+def MakeFeatureDict(OhlcvDict, gugan_lenth = 7, hl_range_window = None, with_vol20 = False):
+
+    param_key = GetParamKey(gugan_lenth, hl_range_window, with_vol20)
+
+    ResultDict = dict()
+    CalcDict = dict()
+    DataKeyDict = dict()
+
+    for stock_code, df in OhlcvDict.items():
+        if not isinstance(df, pd.DataFrame) or len(df) == 0:
+            ResultDict[stock_code] = None
+            continue
+
+        if FEATURE_STORE_USE == True:
+            DataKeyDict[stock_code] = GetDataKey(df)
+            df_feature = LoadFeatureStore(stock_code, param_key, DataKeyDict[stock_code])
+            if df_feature is not None:
+                print("피처 저장소 사용:", stock_code)
+                ResultDict[stock_code] = df_feature
+                continue
+
+        CalcDict[stock_code] = df
+
+    if len(CalcDict) > 0:
+        CalcResultDict = SplitFeaturePanels(CalcDict, CalcFeaturePanels(CalcDict, gugan_lenth, hl_range_window, with_vol20))
+
+        for stock_code, df_feature in CalcResultDict.items():
+            ResultDict[stock_code] = df_feature
+            if FEATURE_STORE_USE == True:
+                SaveFeatureStore(stock_code, param_key, DataKeyDict[stock_code], df_feature)
+
+    return {stock_code: ResultDict[stock_code] for stock_code in OhlcvDict}
+
+
+############################################################################################################################################################
+#백테스트/봇에서 날짜별로 데이터를 바로 꺼내 쓰기 위한 인덱스!
+#매일 combined_df 전체를 (날짜 == date) & (종목 == code) 마스크로 훑지 않고 딕셔너리에서 O(1)로 꺼낸다
+
+#(날짜, 종목코드) -> 그날 한 줄 데이터 {컬럼명: 값} 딕셔너리
+def MakeRowIndex(FeatureDict):
+
+    RowIndex = dict()
+
+    for stock_code, df in FeatureDict.items():
+        if df is None:
+            continue
+
+        columns = list(df.columns)
+        for date, row in zip(df.index, df.itertuples(index=False, name=None)):
+            RowIndex[(date, stock_code)] = dict(zip(columns, row))
+
+    return RowIndex
+
+
+#날짜 -> 그날 데이터가 있는 종목코드 리스트 (종가 높은 순, 같으면 종목코드 순)
+#기존 groupby('stock_code')['close'].max().nlargest() 와 같은 순서
+def MakeDateCodeIndex(FeatureDict):
+
+    DateCloseDict = dict()
+
+    for stock_code in sorted(code for code, df in FeatureDict.items() if df is not None):
+        df = FeatureDict[stock_code]
+        for date, close in zip(df.index, df['close'].to_numpy()):
+            DateCloseDict.setdefault(date, list()).append((stock_code, close))
+
+    DateCodeIndex = dict()
+    for date, CodeCloseList in DateCloseDict.items():
+        DateCodeIndex[date] = [stock_code for stock_code, close in sorted(CodeCloseList, key=lambda x: -x[1])]
+
+    return DateCodeIndex
+
+
+############################################################################################################################################################
+#백테스트 공용 계산
+
+#매수 수량! InvestGoMoney로 살 수 있는 수량에서 현금(CashMoney)이 (매수금 + 수수료)보다 모자라면 줄인다
+#예전엔 한주씩 빼면서 while로 맞췄는데 같은 결과를 한번에 계산한다 (현금이 1주 가격보다 적으면 예전처럼 그대로 둔다)
+#숫자 연산만 쓰므로 numba 로 컴파일해서 Kosdaqpi_BacktestCore 의 시뮬레이션 루프 안에서도 부른다
+def CalcBuyAmt(InvestGoMoney, Price, CashMoney, fee):
+
+    BuyAmt = int(InvestGoMoney / Price)
+
+    if CashMoney < (BuyAmt*Price) + (BuyAmt*Price) * fee and CashMoney > Price:
+        MaxAmt = BuyAmt
+        BuyAmt = min(MaxAmt, int(CashMoney / (Price * (1.0 + fee))))
+
+        #부동소수 오차 보정
+        while BuyAmt > 0 and CashMoney < (BuyAmt*Price) + (BuyAmt*Price) * fee:
+            BuyAmt -= 1
+        while BuyAmt + 1 < MaxAmt and not (CashMoney < ((BuyAmt + 1)*Price) + ((BuyAmt + 1)*Price) * fee):
+            BuyAmt += 1
+
+    return BuyAmt
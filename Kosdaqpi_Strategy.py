@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+'''
+코스닥피 전략 신호 엔진 (실매매 봇 / 백테스트 공용)
+
+Kosdaqpi_Bot_TR_best.py (실매매)와 Kosdaqpi_Test_best.py (백테스트)가 같은 함수를 불러서 판단한다.
+여기를 고치면 봇과 백테스트가 같이 바뀌므로 백테스트/튜닝 결과가 실제 매매 로직과 어긋나지 않는다!
+
+여기 함수들은 주문, 잔고 조회, 파일 저장, 출력을 하지 않는다.
+stock_data 는 Features.MakeRowIndex() 로 만든 (날짜, 종목코드) -> 한 행 dict 이고
+IsCut / IsCutCnt / CurrentDD 같은 상태값은 부르는 쪽(봇이면 DateSiGaLogicDoneDict, 백테스트면 변수)에서 넘겨준다.
+
+주문 수량 계산과 주문 상태 관리(READY, INVESTING 등)는 봇/백테스트 쪽에 그대로 둔다.
+'''
+import os
+
+
+KOSDAQ_CODES = ["233740", "251340"] #KODEX 코스닥150레버리지, KODEX 코스닥150선물인버스
+
+
+# ExposureRate 업사이드 가산 / DD 가드 기본값 (환경변수로 덮어쓸 수 있음)
+EXPO_UP_MAX_DD = float(os.getenv("EXPO_UP_MAX_DD", "-0.07"))
+EXPO_UP_RATE = float(os.getenv("EXPO_UP_RATE", "1.16"))
+EXPO_UP2_MAX_DD = float(os.getenv("EXPO_UP2_MAX_DD", "-0.04"))
+EXPO_UP2_RATE = float(os.getenv("EXPO_UP2_RATE", "1.22"))
+DD_GUARD_LV1 = float(os.getenv("DD_GUARD_LV1", "-0.14"))
+DD_GUARD_LV2 = float(os.getenv("DD_GUARD_LV2", "-0.18"))
+DD_GUARD_RATE1 = float(os.getenv("DD_GUARD_RATE1", "0.88"))
+DD_GUARD_RATE2 = float(os.getenv("DD_GUARD_RATE2", "0.75"))
+
+
+
+#######################################################################################################################################
+#횡보장/추세장 판단! (IsNoWay, IsStrongTrend, IsVeryStrongTrend)
+# https://blog.naver.com/zacra/223225906361 이 포스팅을 정독하세요!!!
+# 4종목 중 데이터가 없는 게 있으면 해당 플래그는 False
+def GetMarketFlags(Kosdaq_Long_Data, Kosdaq_Short_Data, Kospi_Long_Data, Kospi_Short_Data):
+
+    IsNoWay = False
+    if Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None and Kospi_Long_Data is not None and Kospi_Short_Data is not None:
+        if  (Kospi_Long_Data['prevChangeMa_S'] > 0 and Kospi_Short_Data['prevChangeMa_S'] > 0) or (Kospi_Long_Data['prevChangeMa_S'] < 0 and Kospi_Short_Data['prevChangeMa_S'] < 0)  or (Kosdaq_Long_Data['prevChangeMa_S'] > 0 and Kosdaq_Short_Data['prevChangeMa_S'] > 0) or (Kosdaq_Long_Data['prevChangeMa_S'] < 0 and Kosdaq_Short_Data['prevChangeMa_S'] < 0) :
+            IsNoWay = True
+
+    IsStrongTrend = False
+    if Kosdaq_Long_Data is not None and Kospi_Long_Data is not None:
+        if (
+            Kosdaq_Long_Data['ma20_before'] > Kosdaq_Long_Data['ma60_before']
+            and Kospi_Long_Data['ma20_before'] > Kospi_Long_Data['ma60_before']
+            and Kosdaq_Long_Data['prevChangeMa'] > 0
+            and Kospi_Long_Data['prevChangeMa'] > 0
+        ):
+            IsStrongTrend = True
+
+    IsVeryStrongTrend = False
+    if IsStrongTrend == True and Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None and Kospi_Long_Data is not None and Kospi_Short_Data is not None:
+        if (
+            Kosdaq_Long_Data['Average_Momentum'] > Kosdaq_Short_Data['Average_Momentum']
+            and Kospi_Long_Data['prevChangeMa'] > Kospi_Short_Data['prevChangeMa']
+        ):
+            IsVeryStrongTrend = True
+
+    return IsNoWay, IsStrongTrend, IsVeryStrongTrend
+
+
+#추세가 강하고 DD가 얕으면 투자 비중을 올리고, 깊은 DD 구간에서는 비중을 제한해 MDD를 방어한다.
+def GetExposureRate(CurrentDD, IsNoWay, IsStrongTrend, IsVeryStrongTrend, IsCutCnt):
+    return CalcExposureRate(CurrentDD, IsNoWay, IsStrongTrend, IsVeryStrongTrend, IsCutCnt, GetExposureParams())
+
+
+#GetExposureRate 에 쓰는 기준값들 (EXPO_* / DD_GUARD_*) 을 튜플 하나로! 백테스트 코어에는 이 튜플을 인자로 넘긴다
+def GetExposureParams():
+    return (EXPO_UP_MAX_DD, EXPO_UP_RATE, EXPO_UP2_MAX_DD, EXPO_UP2_RATE,
+            DD_GUARD_LV1, DD_GUARD_LV2, DD_GUARD_RATE1, DD_GUARD_RATE2)
+
+
+#GetExposureRate 본체! 기준값을 전역 대신 인자로 받아서 numba 로 컴파일해도(캐시해도) 환경변수 값이 그대로 반영된다
+def CalcExposureRate(CurrentDD, IsNoWay, IsStrongTrend, IsVeryStrongTrend, IsCutCnt, ExpoParams):
+
+    if CurrentDD >= ExpoParams[2] and IsNoWay == False and IsVeryStrongTrend == True and IsCutCnt == 0:
+        ExposureRate = ExpoParams[3]
+    elif CurrentDD >= ExpoParams[0] and IsNoWay == False and IsStrongTrend == True and IsCutCnt == 0:
+        ExposureRate = ExpoParams[1]
+    else:
+        ExposureRate = 1.0
+
+    if CurrentDD <= ExpoParams[5]:
+        ExposureRate = min(ExposureRate, ExpoParams[7])
+    elif CurrentDD <= ExpoParams[4]:
+        ExposureRate = min(ExposureRate, ExpoParams[6])
+
+    return ExposureRate
+
+
+#######################################################################################################################################
+#코스닥 전략...돌파 매매..
+
+#변동성 돌파 가격! 시가 + (전일고가-전일저가)*DolpaRate
+def GetKosdaqDolPaPrice(stock_code, stock_data):
+
+    PrevClosePrice = stock_data['prevClose']
+
+    DolpaRate = 0.4
+
+    #KODEX 코스닥150선물인버스
+    if stock_code == "251340":
+
+        DolpaRate = 0.4
+
+    #KODEX 코스닥150레버리지
+    else:
+
+        if PrevClosePrice > stock_data['ma60_before']:
+            DolpaRate = 0.3
+        else:
+            DolpaRate = 0.4
+
+    ##########################################################################
+    #갭 상승 하락을 이용한 돌파값 조절!
+    # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
+    ##########################################################################
+    Gap = ((abs(stock_data['open'] - PrevClosePrice) / PrevClosePrice)) * 100.0
+
+    GapSt = (Gap*0.025)
+
+    if GapSt > 1.0:
+        GapSt = 1.0
+    if GapSt < 0:
+        GapSt = 0.1
+
+    if PrevClosePrice > stock_data['open'] and Gap >= 3.0:
+        DolpaRate *= (1.0 + GapSt)
+
+    if PrevClosePrice < stock_data['open'] and Gap >= 3.0:
+        DolpaRate *= (1.0 - GapSt)
+
+    return stock_data['open'] + ((stock_data['prevHigh'] - stock_data['prevLow']) * DolpaRate)
+
+
+#돌파 전에 거르는 필터! True면 돌파시 매수 가능
+def CheckKosdaqBuyFilter(stock_code, stock_data, gugan_lenth):
+
+    IsBuyReady = True
+
+    #KODEX 코스닥150선물인버스
+    if stock_code == "251340":
+        if stock_data['prevClose'] <= stock_data['ma20_before']:
+            IsBuyReady = False
+
+    #KODEX 코스닥150레버리지
+    else:
+
+        if stock_data['prevLow'] > stock_data['open'] and stock_data['prevClose'] < stock_data['ma10_before']:
+            IsBuyReady = False
+
+    # 추가 개선 로직 https://blog.naver.com/zacra/223326173552 이 포스팅 참고!!!!
+    IsJung = False
+    if stock_data['ma10_before'] > stock_data['ma20_before'] > stock_data['ma60_before'] > stock_data['ma120_before']:
+        IsJung = True
+
+    if IsJung == False:
+
+        high_price = stock_data['high_'+str(gugan_lenth)+'_max']
+        low_price =  stock_data['low_'+str(gugan_lenth)+'_min']
+
+        Gap = (high_price - low_price) / 4
+
+        MaximunPrice = low_price + Gap * 3.0
+
+        if stock_data['open'] > MaximunPrice:
+            IsBuyReady = False
+
+    #OBV 활용! 추가 필터!
+    if IsBuyReady == True:
+        #OBV 10이평선이 감소중이고 OBV값이 10이평선 아래에 있다면 매수를 취소한다!
+        if stock_data['prev_obv_ma2'] > stock_data['prev_obv_ma'] and stock_data['prev_obv'] < stock_data['prev_obv_ma']:
+            IsBuyReady = False
+
+    return IsBuyReady
+
+
+#모멘텀 스코어를 통한 비중 조절! 레버리지/인버스 중 강한 쪽은 1.3, 약한 쪽은 0.7
+def GetKosdaqMomentumRate(stock_code, Kosdaq_Long_Data, Kosdaq_Short_Data):
+
+    Rate = 1.0
+
+    if Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None:
+
+        IsLongStrong = False
+
+        if Kosdaq_Long_Data['Average_Momentum'] > Kosdaq_Short_Data['Average_Momentum']:
+            IsLongStrong = True
+
+        IsLongStrong2 = False
+
+        if Kosdaq_Long_Data['prevChangeMa'] > Kosdaq_Short_Data['prevChangeMa']:
+            IsLongStrong2 = True
+
+
+        if IsLongStrong == True and IsLongStrong2 == True:
+
+            if stock_code == "233740":
+                Rate = 1.3
+            else:
+                Rate = 0.7
+
+        elif IsLongStrong == False and IsLongStrong2 == False:
+
+            if stock_code == "233740":
+                Rate = 0.7
+            else:
+                Rate = 1.3
+
+    return Rate
+
+
+#############################################################
+#시스템 손절(?) 관련
+# https://blog.naver.com/zacra/223225906361 이 포스팅 체크!!!
+#############################################################
+def GetCutAdjustRate(IsCut, IsCutCnt, stock_data):
+
+    AdjustRate = 1.0
+
+    if IsCut == True and IsCutCnt >= 2:
+
+        if stock_data['prevOpen'] > stock_data['prevClose'] and stock_data['prevHigh2'] > stock_data['prevHigh']:
+
+            if IsCutCnt >= 4:
+                AdjustRate = stock_data['Average_Momentum3'] * 0.5
+            else:
+                AdjustRate = stock_data['Average_Momentum3']
+
+    return AdjustRate
+
+
+#목표컷 매도가! 시가 - (전일고가 - 전일저가) x CutRate
+def GetKosdaqCutPrice(stock_code, stock_data):
+
+    CutRate = 0.4
+
+    # KODEX 코스닥150선물인버스
+    if stock_code == "251340":
+        CutRate = 0.4
+
+    # KODEX 코스닥150레버리지
+    else:
+
+        if stock_data['prevClose'] > stock_data['ma60_before']:
+            CutRate = 0.4
+        else:
+            CutRate = 0.3
+
+    return stock_data['open'] - ((stock_data['prevHigh'] - stock_data['prevLow']) * CutRate)
+
+
+
+#######################################################################################################################################
+#코스피 전략...시가 매매
+
+def CheckKospiBuy(stock_code, stock_data):
+
+    PrevClosePrice = stock_data['prevClose']
+
+    IsBuyGo = False
+
+    # KODEX 200선물인버스2X
+    if stock_code == "252670":
+
+        if PrevClosePrice > stock_data['ma3_before']  and PrevClosePrice > stock_data['ma6_before']  and PrevClosePrice > stock_data['ma19_before'] and stock_data['prevRSI'] < 70 and stock_data['prevRSI2'] < stock_data['prevRSI']:
+            if (stock_data['prevVolume2'] < stock_data['prevVolume']) and (stock_data['prevLow2'] < stock_data['prevLow']) and PrevClosePrice > stock_data['ma60_before'] and stock_data['ma60_before2'] < stock_data['ma60_before']  and stock_data['ma3_before']  > stock_data['ma6_before']  > stock_data['ma19_before']  :
+                IsBuyGo = True
+
+    # KODEX 레버리지
+    else:
+
+        Disparity = stock_data['Disparity20']
+
+        if (stock_data['prevLow2'] < stock_data['prevLow']) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'] < 80 :
+            IsBuyGo = True
+
+    return IsBuyGo
+
+
+def CheckKospiSell(stock_code, stock_data):
+
+    PrevClosePrice = stock_data['prevClose']
+
+    IsSellGo = False
+
+    # KODEX 200선물인버스2X
+    if stock_code == "252670":
+
+        if stock_data['Disparity11'] > 105:
+
+            if  PrevClosePrice < stock_data['ma3_before']:
+                IsSellGo = True
+
+        else:
+
+            if PrevClosePrice < stock_data['ma6_before'] and PrevClosePrice < stock_data['ma19_before'] :
+                IsSellGo = True
+
+    # KODEX 레버리지
+    else:
+
+        total_volume = (stock_data['prevVolume']+ stock_data['prevVolume2'] +stock_data['prevVolume3']) / 3.0
+
+        Disparity = stock_data['Disparity20']
+
+        if (stock_data['prevLow2'] < stock_data['prevLow'] or stock_data['prevVolume'] < total_volume) and (Disparity < 98 or Disparity > 105):
+            IsSellGo = False #hold..
+        else:
+            IsSellGo = True
+
+    return IsSellGo
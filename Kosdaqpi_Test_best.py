@@ -62,12 +62,13 @@ FAQ로 해결 안되는 기술적인 문제는 클래스101 강의의 댓글이
 '''
 
 import KIS_Common as Common
+import Kosdaqpi_Features as Features
+import Kosdaqpi_BacktestCore as BacktestCore
 import KIS_API_Helper_KR as KisKR
 import pandas as pd
 import pprint
 import numpy as np
 import matplotlib.pyplot as plt
-from datetime import datetime
 import os
 
 
@@ -91,19 +92,17 @@ fee = 0.0015 #수수료+세금+슬리피지를 매수매도마다 0.15%로 세
 #전략 백테스팅 시작 년도 지정!!!
 StartYear = 2017
 
-# Best 조합: 발췌 로직 + 업사이드 가산
-EXPO_UP_MAX_DD = float(os.getenv("EXPO_UP_MAX_DD", "-0.07"))
-EXPO_UP_RATE = float(os.getenv("EXPO_UP_RATE", "1.16"))
-EXPO_UP2_MAX_DD = float(os.getenv("EXPO_UP2_MAX_DD", "-0.04"))
-EXPO_UP2_RATE = float(os.getenv("EXPO_UP2_RATE", "1.22"))
-DD_GUARD_LV1 = float(os.getenv("DD_GUARD_LV1", "-0.14"))
-DD_GUARD_LV2 = float(os.getenv("DD_GUARD_LV2", "-0.18"))
-DD_GUARD_RATE1 = float(os.getenv("DD_GUARD_RATE1", "0.88"))
-DD_GUARD_RATE2 = float(os.getenv("DD_GUARD_RATE2", "0.75"))
+#백테스트 로그! "ALL": 매매 + 매일 보유현황/일별 잔고 덤프, "TRADE": 매매 로그만, "NONE": 최종 결과만
+BACKTEST_LOG = os.getenv("BACKTEST_LOG", "TRADE").upper()
 
+# Best 조합: 발췌 로직 + 업사이드 가산 (EXPO_* / DD_GUARD_* 는 Kosdaqpi_Strategy 에서 읽는다)
 
 
 
+
+#테스트 종목 이름을 한번에 채워둔다 (캐시에 없는 종목만 조회)
+KisKR.WarmStockMeta(InvestStockList)
+
 StockDataList = list()
 
 for stock_code in InvestStockList:
@@ -136,121 +135,14 @@ stock_df_list = []
 
 gugan_lenth = 7 
 
-for stock_code in InvestStockList:
-    df = Common.GetOhlcv("KR", stock_code,2200)
-
-    period = 14
-
-    delta = df["close"].diff()
-    up, down = delta.copy(), delta.copy()
-    up[up < 0] = 0
-    down[down > 0] = 0
-    _gain = up.ewm(com=(period - 1), min_periods=period).mean()
-    _loss = down.abs().ewm(com=(period - 1), min_periods=period).mean()
-    RS = _gain / _loss
-
-    df['RSI'] = pd.Series(100 - (100 / (1 + RS)), name="RSI")
-
-    df['prevRSI'] = df['RSI'].shift(1)
-    df['prevRSI2'] = df['RSI'].shift(2)
-    
-    df['high_'+str(gugan_lenth)+'_max'] = df['high'].rolling(window=gugan_lenth).max().shift(1)
-    df['low_'+str(gugan_lenth)+'_min'] = df['low'].rolling(window=gugan_lenth).min().shift(1)
-    
-    #########################################################################################
-    #OBV 활용! 
-    # OBV 계산
-    df['direction'] = 0
-    df.loc[df['close'] > df['close'].shift(1), 'direction'] = 1
-    df.loc[df['close'] < df['close'].shift(1), 'direction'] = -1
-    df['obv'] = (df['direction'] * df['volume']).cumsum()
-
-    # OBV 이동평균선
-    df['obv_ma'] = df['obv'].rolling(window=10).mean()
-    
-    df['prev_obv_ma'] = df['obv_ma'].shift(1)
-    df['prev_obv_ma2'] = df['obv_ma'].shift(2)
-    df['prev_obv'] = df['obv'].shift(1)
-
-    #########################################################################################
-    
-
-
-    df['prevVolume'] = df['volume'].shift(1)
-    df['prevVolume2'] = df['volume'].shift(2)
-    df['prevVolume3'] = df['volume'].shift(3)
-
-    df['prevClose'] = df['close'].shift(1)
-    df['prevOpen'] = df['open'].shift(1)
-
-    df['prevHigh'] = df['high'].shift(1)
-    df['prevHigh2'] = df['high'].shift(2)
-
-    df['prevLow'] = df['low'].shift(1)
-    df['prevLow2'] = df['low'].shift(2)
-
-    df['Disparity20'] = df['prevClose'] / df['prevClose'].rolling(window=20).mean() * 100.0
-    
-    df['Disparity11'] = df['prevClose'] / df['prevClose'].rolling(window=11).mean() * 100.0
-
-
-    df['ma3_before'] = df['close'].rolling(3).mean().shift(1)
-    df['ma6_before'] = df['close'].rolling(6).mean().shift(1)
-    df['ma19_before'] = df['close'].rolling(19).mean().shift(1)
-
-
-    df['ma10_before'] = df['close'].rolling(10).mean().shift(1)
-
-    df['ma20_before'] = df['close'].rolling(20).mean().shift(1)
-    df['ma20_before2'] = df['close'].rolling(20).mean().shift(2)
-    df['ma60_before'] = df['close'].rolling(60).mean().shift(1)
-    df['ma60_before2'] = df['close'].rolling(60).mean().shift(2)
-
-    df['ma120_before'] = df['close'].rolling(120).mean().shift(1)
-
-
-    df['prevChangeMa'] = df['change'].shift(1).rolling(window=20).mean()
-    
-
-    df['prevChangeMa_S'] = df['change'].shift(1).rolling(window=10).mean()
-
-    #10일마다 총 100일 평균모멘텀스코어
-    specific_days = list()
-
-    for i in range(1,11):
-        st = i * 10
-        specific_days.append(st)
-
-    for day in specific_days:
-        column_name = f'Momentum_{day}'
-        df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-        
-    df['Average_Momentum'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
+#유니버스 전체 OHLCV를 한번에 동시에 가져온다!
+OhlcvDict = Common.GetOhlcvBatch("KR", InvestStockList, 2200)
 
-    # Define the list of specific trading days to compare
-    specific_days = list()
+#지표는 공용 피처 모듈에서 전 종목을 한번에 계산한다! (같은 데이터/파라미터면 저장된 결과 사용)
+FeatureDict = Features.MakeFeatureDict(OhlcvDict, gugan_lenth)
 
-    for i in range(1,11):
-        st = i * 3
-        specific_days.append(st)
-
-
-
-    # Iterate over the specific trading days and compare the current market price with the corresponding closing prices
-    for day in specific_days:
-        # Create a column name for each specific trading day
-        column_name = f'Momentum_{day}'
-        
-        # Compare current market price with the closing price of the specific trading day
-        df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-
-    # Calculate the average momentum score
-    df['Average_Momentum3'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-
-    df.dropna(inplace=True) #데이터 없는건 날린다!
+for stock_code in InvestStockList:
+    df = FeatureDict[stock_code]
 
    
 
@@ -274,782 +166,59 @@ print(" len(combined_df) ", len(combined_df))
 
 
 
-IsBuy = False #매수 했는지 여부
-BUY_PRICE = 0  #매수한 금액! 
-
-TryCnt = 0      #매매횟수
-SuccesCnt = 0   #익절 숫자
-FailCnt = 0     #손절 숫자
-
-
-
-IsFirstDateSet = False
-FirstDateStr = ""
-FirstDateIndex = 0
-
-
-NowInvestCode = ""
-InvestMoney = TotalMoney
-
-
-DivNum = len(InvestStockList)
-
-RemainInvestMoney = InvestMoney
+#신호는 (날짜 x 종목) 배열로 한번에 만들고 보유/현금/매수가/투자금/익스포저 같은 상태만 배열 위에서 루프를 돈다!
+#전략 판단은 Kosdaqpi_Strategy, 루프는 Kosdaqpi_BacktestCore (numba 가 있으면 컴파일해서 돈다)
+BestResult = BacktestCore.RunBest(FeatureDict, InvestStockList, TotalMoney, fee, StartYear, gugan_lenth)
 
 
+TryCnt = BestResult['TryCnt']         #매매횟수
+SuccesCnt = BestResult['SuccesCnt']   #익절 숫자
+FailCnt = BestResult['FailCnt']       #손절 숫자
 
+FirstDateStr = BestResult['FirstDateStr']
 
 ResultList = list()
 
-TotalMoneyList = list()
-
-NowInvestList = list()
-
-
-IsCut = False
-IsCutCnt = 0
-PeakInvestMoney = TotalMoney
-ExposureRate = 1.0
-
-
-i = 0
-# Iterate over each date
-for date in combined_df.index.unique():
- 
-    #날짜 정보를 획득
-    date_format = "%Y-%m-%d %H:%M:%S"
-    date_object = None
-
-    try:
-        date_object = datetime.strptime(str(date), date_format)
-    
-    except Exception as e:
-        try:
-            date_format = "%Y%m%d"
-            date_object = datetime.strptime(str(date), date_format)
-
-        except Exception as e2:
-            date_format = "%Y-%m-%d"
-            date_object = datetime.strptime(str(date), date_format)
-
-
-
-
-    all_stocks = combined_df.loc[combined_df.index == date].groupby('stock_code')['close'].max().nlargest(DivNum)
-    
-    #######################################################################################################################################
-    #횡보장을 정의하기 위한 로직!!
-    # https://blog.naver.com/zacra/223225906361 이 포스팅을 정독하세요!!!
-    Kosdaq_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "233740")]
-    Kosdaq_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "251340")]
-    Kospi_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "122630")]
-    Kospi_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "252670")]
-    
-    IsNoWay = False
-    if len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1 and len(Kospi_Long_Data) == 1 and len(Kospi_Short_Data) == 1:
-        if  (Kospi_Long_Data['prevChangeMa_S'].values[0] > 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kospi_Long_Data['prevChangeMa_S'].values[0] < 0 and Kospi_Short_Data['prevChangeMa_S'].values[0] < 0)  or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] > 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] > 0) or (Kosdaq_Long_Data['prevChangeMa_S'].values[0] < 0 and Kosdaq_Short_Data['prevChangeMa_S'].values[0] < 0) :
-            IsNoWay = True
-
-    IsStrongTrend = False
-    if len(Kosdaq_Long_Data) == 1 and len(Kospi_Long_Data) == 1:
-        if (
-            Kosdaq_Long_Data['ma20_before'].values[0] > Kosdaq_Long_Data['ma60_before'].values[0]
-            and Kospi_Long_Data['ma20_before'].values[0] > Kospi_Long_Data['ma60_before'].values[0]
-            and Kosdaq_Long_Data['prevChangeMa'].values[0] > 0
-            and Kospi_Long_Data['prevChangeMa'].values[0] > 0
-        ):
-            IsStrongTrend = True
-
-    IsVeryStrongTrend = False
-    if IsStrongTrend == True and len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1 and len(Kospi_Long_Data) == 1 and len(Kospi_Short_Data) == 1:
-        if (
-            Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]
-            and Kospi_Long_Data['prevChangeMa'].values[0] > Kospi_Short_Data['prevChangeMa'].values[0]
-        ):
-            IsVeryStrongTrend = True
-    #######################################################################################################################################
-
-
-
-    i += 1
-
-
-    today_sell_code = list()
-
-
-
-    items_to_remove = list()
-
-
-    Kosdaq_sell_cnt = 0
-
-    Kosdaq_sell_money_furture = 0
-
-
-    #투자중인 종목들!!
-    for investData in NowInvestList:
-
-        stock_code = investData['stock_code'] 
-        
-        if investData['InvestMoney'] > 0:
-            stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-
-            if len(stock_data) == 1:
-                
-                ####!!!!코스닥 전략!!!####
-                #조건 만족시 매도 한다!
-                if stock_code in ["233740","251340"]:
-                    
-                        
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
-
-
-                    CutRate = 0.4
-
-                    # KODEX 코스닥150선물인버스
-                    if stock_code == "251340":
-                        CutRate = 0.4
-
-                    # KODEX 코스닥150레버리지
-                    else:
-
-                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
-                            CutRate = 0.4
-                        else:
-                            CutRate = 0.3
-
-
-
-                    #목표컷 매도가! 시가 - (전일종가 - 전일저가) x CutRate 
-                    CutPrice = stock_data['open'].values[0] - ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * CutRate)
-
-                    SellPrice = NowOpenPrice
-
-
-                    IsSellGo = False
-
-
-                    #하향 돌파했다면 매도 고고!!
-                    if CutPrice >= stock_data['low'].values[0] :
-                        IsSellGo = True
-                        SellPrice = CutPrice
-
-
-                    #매일 매일 투자금 반영!
-                    if investData['DolPaCheck'] == False:
-                        investData['DolPaCheck'] = True
-                        investData['InvestMoney'] = investData['InvestMoney'] *  (1.0 + ((SellPrice - investData['BuyPrice'] ) / investData['BuyPrice'] ))
-                    else:
-                        investData['InvestMoney'] = investData['InvestMoney'] *  (1.0 + ((SellPrice - PrevOpenPrice ) / PrevOpenPrice))
-
-
-                    #진입(매수)가격 대비 변동률
-                    Rate = (SellPrice* (1.0 - fee) - investData['BuyPrice']) / investData['BuyPrice']
-
-
-                    RevenueRate = (Rate - fee)*100.0 #수익률 계산
-
-                    if IsSellGo == True :
-
-                        Kosdaq_sell_cnt += 1 #코스닥 돌파 매도가 일어난 날!
-                        
-                        
-                        if RevenueRate < 0:
-                            IsCut = True
-                            IsCutCnt += 1
-                        else:
-                            IsCut = False
-                            IsCutCnt -= 1
-                            if IsCutCnt < 0:
-                                IsCutCnt = 0
-
-                        ReturnMoney = (investData['InvestMoney'] * (1.0 - fee))  #수수료 및 세금, 슬리피지 반영!
-
-                        if NowOpenPrice > CutPrice:
-                            Kosdaq_sell_money_furture += ReturnMoney
-
-                        TryCnt += 1
-
-                        if RevenueRate > 0: #수익률이 0보다 크다면 익절한 셈이다!
-                            SuccesCnt += 1
-                        else:
-                            FailCnt += 1
-            
-                        #종목별 성과를 기록한다.
-                        for stock_data in StockDataList:
-                            if stock_code == stock_data['stock_code']:
-                                stock_data['try'] += 1
-                                if RevenueRate > 0:
-                                    stock_data['success'] += 1
-                                else:
-                                    stock_data['fail'] +=1
-                                stock_data['accRev'] += RevenueRate
-
-
-                        
-                        RemainInvestMoney += ReturnMoney
-                        investData['InvestMoney'] = 0
-
-
-                        NowInvestMoney = 0
-                        for iData in NowInvestList:
-                            NowInvestMoney += iData['InvestMoney']
-
-                        InvestMoney = RemainInvestMoney + NowInvestMoney
-
-                        print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
-                                
-                        items_to_remove.append(investData)
-
-                        today_sell_code.append(stock_code)
-
-                ####!!!!코스피 전략!!!####
-                #조건 만족시 매도 한다!
-                else:
-                    
-
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
-
-
-                    SellPrice = NowOpenPrice
-
- 
-                    IsSellGo = False
-
-                    #매일 매일 투자금 반영!
-                    if investData['DolPaCheck'] == False:
-                        investData['DolPaCheck'] = True
-                        investData['InvestMoney'] = investData['InvestMoney'] *  (1.0 + ((SellPrice - investData['BuyPrice'] ) / investData['BuyPrice'] ))
-                    else:
-                        investData['InvestMoney'] = investData['InvestMoney'] *  (1.0 + ((SellPrice - PrevOpenPrice ) / PrevOpenPrice))
-
-
-                    #진입(매수)가격 대비 변동률
-                    Rate = (SellPrice* (1.0 - fee) - investData['BuyPrice']) / investData['BuyPrice']
-
-                    RevenueRate = (Rate - fee)*100.0 #수익률 계산
-                    
-                    # KODEX 200선물인버스2X
-                    if stock_code == "252670":
-                        
-                        if stock_data['Disparity11'].values[0] > 105:
-
-                            if  PrevClosePrice < stock_data['ma3_before'].values[0]: 
-                                IsSellGo = True
-
-                        else:
-
-                            if PrevClosePrice < stock_data['ma6_before'].values[0] and PrevClosePrice < stock_data['ma19_before'].values[0] : 
-                                IsSellGo = True
-
-                    # KODEX 레버리지
-                    else:
-
-                        total_volume = (stock_data['prevVolume'].values[0]+ stock_data['prevVolume2'].values[0] +stock_data['prevVolume3'].values[0]) / 3.0
-
-                        Disparity = stock_data['Disparity20'].values[0] 
+TotalMoneyList = BestResult['TotalMoneyList']
 
-                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0] or stock_data['prevVolume'].values[0] < total_volume) and (Disparity < 98 or Disparity > 105):
-                            print("hold..")
-                        else:
-                            IsSellGo = True
-                    
 
-             
-             
+#종목별 성과를 기록한다.
+for stock_data in StockDataList:
+    stock_data.update(BestResult['StockStats'][stock_data['stock_code']])
 
-                    #조건 만족 했다면 매도 고고!
-                    if IsSellGo == True :
 
 
-                        ReturnMoney = (investData['InvestMoney'] * (1.0 - fee))  #수수료 및 세금, 슬리피지 반영!
+#매매 로그! 날짜 순서대로 매도 -> 매수 로그를 찍고 ALL 이면 매일 보유현황/잔고까지 찍는다
+if BACKTEST_LOG != "NONE":
 
+    EventList = BestResult['Events']
+    k = 0
 
-                        TryCnt += 1
+    for i, date in enumerate(BestResult['Dates']):
 
-                        if RevenueRate > 0: #수익률이 0보다 크다면 익절한 셈이다!
-                            SuccesCnt += 1
-                        else:
-                            FailCnt += 1
-            
-                        #종목별 성과를 기록한다.
-                        for stock_data in StockDataList:
-                            if stock_code == stock_data['stock_code']:
-                                stock_data['try'] += 1
-                                if RevenueRate > 0:
-                                    stock_data['success'] += 1
-                                else:
-                                    stock_data['fail'] +=1
-                                stock_data['accRev'] += RevenueRate
+        while k < len(EventList) and EventList[k][1] == i:
+            if EventList[k][0] != BacktestCore.EVENT_HOLD or BACKTEST_LOG == "ALL":
+                print(*BacktestCore.GetEventPrintArgs(BestResult, k, lambda stock_code: GetStockName(stock_code, StockDataList)))
+            k += 1
 
+        if BACKTEST_LOG == "ALL":
 
-                        
-                        RemainInvestMoney += ReturnMoney
-                        investData['InvestMoney'] = 0
+            NowInvestList = BacktestCore.GetNowInvestList(BestResult, i)
 
+            InvestCoinListStr = ""
+            for iData in NowInvestList:
+                InvestCoinListStr += GetStockName(iData['stock_code'], StockDataList)  + " "
 
-                        #pprint.pprint(NowInvestList)
+            #첫 매수 전까지는 남은 금액이 처음 금액 그대로다
+            RemainInvestMoney = BestResult['RemainMoneyList'][i] if i >= BestResult['FirstBuyIndex'] else TotalMoney
+            NowInvestMoney = BestResult['NowInvestMoneyList'][i] if len(NowInvestList) > 0 else 0
+            InvestMoney = RemainInvestMoney + NowInvestMoney
 
-                        NowInvestMoney = 0
-                        for iData in NowInvestList:
-                            NowInvestMoney += iData['InvestMoney']
+            print("\n\n>>>>>>>>>>>>", InvestCoinListStr, "---> 투자개수 : ", len(NowInvestList))
+            pprint.pprint(NowInvestList)
+            print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>--))", str(date), " 잔고:",str(InvestMoney) , "=" , str(RemainInvestMoney) , "+" , str(NowInvestMoney), "\n\n" )
 
-                        InvestMoney = RemainInvestMoney + NowInvestMoney
 
-                        print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
-                                
-                        items_to_remove.append(investData)
-
-                        today_sell_code.append(stock_code)
-
-
-    #리스트에서 제거
-    for item in items_to_remove:
-        NowInvestList.remove(item)
-
-
-
-
-
-    #최대 2개 종목만 투자 가능함! 코스피 매수 조건 체크!
-    #즉 코스피 먼저 매수 여부를 판단하여 매수한다!
-    if len(NowInvestList) < int(DivNum)/2 and int(date_object.strftime("%Y")) >= StartYear:
-
-        if IsFirstDateSet == False:
-            FirstDateStr = str(date)
-            FirstDateIndex = i-1
-            IsFirstDateSet = True
-
-
-        for stock_code in all_stocks.index:
-
-            IsAlReadyInvest = False
-            for investData in NowInvestList:
-                if stock_code == investData['stock_code']: 
-                    IsAlReadyInvest = True
-                    break    
-            
-            if stock_code not in today_sell_code and IsAlReadyInvest == False:
-
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                ####!!!!코스피 전략!!!####
-                if stock_code in ["122630","252670"]:
-                    
-
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
-                    
-                    DolPaPrice = stock_data['open'].values[0]
-
-
-                    IsBuyGo = False
-                    
-                    
-                    
-                    # KODEX 200선물인버스2X
-                    if stock_code == "252670":
-
-
-                        if PrevClosePrice > stock_data['ma3_before'].values[0]  and PrevClosePrice > stock_data['ma6_before'].values[0]  and PrevClosePrice > stock_data['ma19_before'].values[0] and stock_data['prevRSI'].values[0] < 70 and stock_data['prevRSI2'].values[0] < stock_data['prevRSI'].values[0]:
-                            if (stock_data['prevVolume2'].values[0] < stock_data['prevVolume'].values[0]) and (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and PrevClosePrice > stock_data['ma60_before'].values[0] and stock_data['ma60_before2'].values[0] < stock_data['ma60_before'].values[0]  and stock_data['ma3_before'].values[0]  > stock_data['ma6_before'].values[0]  > stock_data['ma19_before'].values[0]  :
-                                IsBuyGo = True
-
-                    # KODEX 레버리지
-                    else:
-
-                        Disparity = stock_data['Disparity20'].values[0] 
-                        
-                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'].values[0] < 80 :
-                            IsBuyGo = True
-                            
-
-                                    
-                    #조건을 만족했다면 매수 고고!
-                    if IsBuyGo == True :
-
-
-
-                        Rate = 1.0
-
-
-                        #InvestGoMoney = (InvestMoney / len(InvestStockList)) * Rate
-                        InvestGoMoney = 0
-
-
-
-                        if IsNoWay == True:
-                            InvestGoMoney = ((RemainInvestMoney - Kosdaq_sell_money_furture) / len(InvestStockList)) * Rate
-
-                        else:
-                     
-                            if len(NowInvestList) + Kosdaq_sell_cnt == 0:
-
-                                InvestGoMoney = (RemainInvestMoney - Kosdaq_sell_money_furture) * 0.5 * Rate
-
-                            else:
-                                InvestGoMoney = (RemainInvestMoney - Kosdaq_sell_money_furture) * Rate
-                    
-                   
-            
-
-
-                        if Rate > 0:
-                            InvestGoMoney *= ExposureRate
-
-
-                            BuyAmt = int(InvestGoMoney /  DolPaPrice) #매수 가능 수량을 구한다!
-
-                            NowFee = (BuyAmt*DolPaPrice) * fee
-
-
-
-                            #매수해야 되는데 남은돈이 부족하다면 수량을 하나씩 감소시켜 만족할 때 매수한다!!
-                            while (RemainInvestMoney - Kosdaq_sell_money_furture)  < (BuyAmt*DolPaPrice) + NowFee:
-                                if (RemainInvestMoney - Kosdaq_sell_money_furture)  > DolPaPrice:
-                                    BuyAmt -= 1
-                                    NowFee = (BuyAmt*DolPaPrice) * fee
-                                else:
-                                    break
-                            
-                            if BuyAmt > 0:
-
-
-
-                                RealInvestMoney = (BuyAmt*DolPaPrice) #실제 들어간 투자금
-
-                                RemainInvestMoney -= (BuyAmt*DolPaPrice) #남은 투자금!
-                                RemainInvestMoney -= NowFee
-
-
-                                InvestData = dict()
-
-                                InvestData['stock_code'] = stock_code
-                                InvestData['InvestMoney'] = RealInvestMoney
-                                InvestData['FirstMoney'] = RealInvestMoney
-                                InvestData['BuyPrice'] = DolPaPrice
-                                InvestData['DolPaCheck'] = False
-                                InvestData['Date'] = str(date)
-
-
-
-                                NowInvestList.append(InvestData)
-
-
-                                NowInvestMoney = 0
-                                for iData in NowInvestList:
-                                    NowInvestMoney += iData['InvestMoney']
-
-                                InvestMoney = RemainInvestMoney + NowInvestMoney
-
-
-                                print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'].values[0])
-
-             
-             
-
-    #최대 2개 종목만 투자 가능함! 코스닥 매수 조건 체크!
-    if len(NowInvestList) < int(DivNum)/2 and int(date_object.strftime("%Y")) >= StartYear:
-
-        for stock_code in all_stocks.index:
-
-            IsAlReadyInvest = False
-            for investData in NowInvestList:
-                if stock_code == investData['stock_code']: 
-                    IsAlReadyInvest = True
-                    break    
-            
-
-            if stock_code not in today_sell_code and IsAlReadyInvest == False:
-
-                #코스닥 매도가 일어났는데 현재 또 코스피에 보유중인 종목이 있다면 코스닥 매도는 장중 매도니깐 이때는 매도하지 않음!
-                #if Kosdaq_sell_cnt == 1 and len(NowInvestList) == 1:
-                #    continue
-
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
-                
-                ####!!!!코스닥 전략!!!####
-                if stock_code in ["233740","251340"]:
-                    
-
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
-
-                    DolpaRate = 0.4
-
-
-                    #KODEX 코스닥150선물인버스
-                    if stock_code == "251340":
-
-                        DolpaRate = 0.4
-
-                    #KODEX 코스닥150레버리지
-                    else: 
-
-                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
-                            DolpaRate = 0.3
-                        else:
-                            DolpaRate = 0.4
-
-                    ##########################################################################
-                    #갭 상승 하락을 이용한 돌파값 조절!
-                    # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
-                    ##########################################################################
-                    Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
-
-                    GapSt = (Gap*0.025)
-
-                    if GapSt > 1.0:
-                        GapSt = 1.0
-                    if GapSt < 0:
-                        GapSt = 0.1
-
-                    if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
-                        DolpaRate *= (1.0 + GapSt)
-
-                    if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
-                        DolpaRate *= (1.0 - GapSt)
-
-
-                    #변동성 돌파 시가 + (전일고가-전일저가)*DolpaRate
-                    DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
-
-
-
-                    IsBuyGo = False
-
-                    DolPaRate = (DolPaPrice - stock_data['open'].values[0]) / stock_data['open'].values[0] * 100
-
-                    #돌파 했다면 매수 고???
-                    if DolPaPrice <= stock_data['high'].values[0]  :
-
-
-                        IsBuyGo = True
-
-                        #추가 필터를 거쳐 아래 조건을 만족하면 매수하지 않는다!
-
-                        #KODEX 코스닥150선물인버스
-                        if stock_code == "251340":
-                            if stock_data['prevClose'].values[0] <= stock_data['ma20_before'].values[0]:
-                                IsBuyGo = False 
-        
-                        #KODEX 코스닥150레버리지
-                        else: 
-
-                            if stock_data['prevLow'].values[0] > stock_data['open'].values[0] and stock_data['prevClose'].values[0] < stock_data['ma10_before'].values[0]:
-                                IsBuyGo = False 
-
-                        # 추가 개선 로직 https://blog.naver.com/zacra/223326173552 이 포스팅 참고!!!!
-                        IsJung = False    
-                        if stock_data['ma10_before'].values[0] > stock_data['ma20_before'].values[0] > stock_data['ma60_before'].values[0] > stock_data['ma120_before'].values[0]:
-                            IsJung = True
-                            
-                        if IsJung == False:
-                            
-                                    
-                            high_price = stock_data['high_'+str(gugan_lenth)+'_max'].values[0] 
-                            low_price =  stock_data['low_'+str(gugan_lenth)+'_min'].values[0] 
-                            
-                            Gap = (high_price - low_price) / 4
-                            
-                            
-                            MaximunPrice = low_price + Gap * 3.0
-                            
-                            
-                            if stock_data['open'].values[0] > MaximunPrice:
-                                IsBuyGo = False
-            
-                    #OBV 활용! 추가 필터!
-                    if IsBuyGo == True:
-                        #OBV 10이평선이 감소중이고 OBV값이 10이평선 아래에 있다면 매수를 취소한다!
-                        if stock_data['prev_obv_ma2'].values[0] > stock_data['prev_obv_ma'].values[0] and stock_data['prev_obv'].values[0] < stock_data['prev_obv_ma'].values[0]:
-                            IsBuyGo = False
-
-                            
-                    if IsBuyGo == True :
-     
-
-
-                        Rate = 1.0
-
-                        #모멘텀 스코어를 통한 비중 조절!
-                        if len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1:
-                        
-                            IsLongStrong = False
-                            
-                            if Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]:
-                                IsLongStrong = True
-                                
-                            IsLongStrong2 = False
-                            
-                            if Kosdaq_Long_Data['prevChangeMa'].values[0] > Kosdaq_Short_Data['prevChangeMa'].values[0]:
-                                IsLongStrong2 = True
-                                
-                                
-                            if IsLongStrong == True and IsLongStrong2 == True:
-                                
-                                if stock_code == "233740":
-                                    Rate = 1.3
-                                else:
-                                    Rate = 0.7
-                                    
-                            elif IsLongStrong == False and IsLongStrong2 == False:
-                                    
-                                if stock_code == "233740":
-                                    Rate = 0.7
-                                else:
-                                    Rate = 1.3
-                                    
-
-                                
-                        #InvestGoMoney = (InvestMoney / len(InvestStockList)) * Rate
-                        InvestGoMoney = 0
-                        
-                        #############################################################
-                        #시스템 손절(?) 관련
-                        # https://blog.naver.com/zacra/223225906361 이 포스팅 체크!!!
-                        #############################################################
-                        AdjustRate = 1.0
-
-                        if IsCut == True and IsCutCnt >= 2:
-
-                            
-                            if stock_data['prevOpen'].values[0] > stock_data['prevClose'].values[0] and stock_data['prevHigh2'].values[0] > stock_data['prevHigh'].values[0]:
-                                
-                                
-                                if IsCutCnt >= 4:
-                                    AdjustRate = stock_data['Average_Momentum3'].values[0] * 0.5
-                                    
-
-                                else:
-                                    AdjustRate =  stock_data['Average_Momentum3'].values[0]
-
-
-                            
-                                
-
-                        if IsNoWay == True:
-                            InvestGoMoney = ((RemainInvestMoney - Kosdaq_sell_money_furture) / len(InvestStockList)) * Rate * AdjustRate
-
-                        else:
-                     
-                            if len(NowInvestList) + Kosdaq_sell_cnt == 0:
-
-                                InvestGoMoney = (RemainInvestMoney - Kosdaq_sell_money_furture) * 0.5 * Rate  * AdjustRate
-
-                            else:
-                                InvestGoMoney = (RemainInvestMoney - Kosdaq_sell_money_furture) * Rate  * AdjustRate
-                    
-                   
-                        if Rate > 0 and AdjustRate > 0:
-                            InvestGoMoney *= ExposureRate
-
-
-                            BuyAmt = int(InvestGoMoney /  DolPaPrice) #매수 가능 수량을 구한다!
-
-                            NowFee = (BuyAmt*DolPaPrice) * fee
-
-
-
-                            #매수해야 되는데 남은돈이 부족하다면 수량을 하나씩 감소시켜 만족할 때 매수한다!!
-                            while (RemainInvestMoney - Kosdaq_sell_money_furture)  < (BuyAmt*DolPaPrice) + NowFee:
-                                if (RemainInvestMoney - Kosdaq_sell_money_furture)  > DolPaPrice:
-                                    BuyAmt -= 1
-                                    NowFee = (BuyAmt*DolPaPrice) * fee
-                                else:
-                                    break
-                            
-                            if BuyAmt > 0:
-
-
-
-                                RealInvestMoney = (BuyAmt*DolPaPrice) #실제 들어간 투자금
-
-                                RemainInvestMoney -= (BuyAmt*DolPaPrice) #남은 투자금!
-                                RemainInvestMoney -= NowFee
-
-
-                                InvestData = dict()
-
-                                InvestData['stock_code'] = stock_code
-                                InvestData['InvestMoney'] = RealInvestMoney
-                                InvestData['FirstMoney'] = RealInvestMoney
-                                InvestData['BuyPrice'] = DolPaPrice
-                                InvestData['DolPaCheck'] = False
-                                InvestData['Date'] = str(date)
-
-
-
-                                NowInvestList.append(InvestData)
-
-
-                                NowInvestMoney = 0
-                                for iData in NowInvestList:
-                                    NowInvestMoney += iData['InvestMoney']
-
-                                InvestMoney = RemainInvestMoney + NowInvestMoney
-
-
-                                print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'].values[0])
-
-        
-
-       
-
-
-    
-    NowInvestMoney = 0
-
-    for iData in NowInvestList:
-        NowInvestMoney += iData['InvestMoney']
-
-
-
-    InvestMoney = RemainInvestMoney + NowInvestMoney
-
-    if InvestMoney > PeakInvestMoney:
-        PeakInvestMoney = InvestMoney
-    CurrentDD = (InvestMoney / PeakInvestMoney) - 1.0
-
-    if CurrentDD >= EXPO_UP2_MAX_DD and IsNoWay == False and IsVeryStrongTrend == True and IsCutCnt == 0:
-        ExposureRate = EXPO_UP2_RATE
-    elif CurrentDD >= EXPO_UP_MAX_DD and IsNoWay == False and IsStrongTrend == True and IsCutCnt == 0:
-        ExposureRate = EXPO_UP_RATE
-    else:
-        ExposureRate = 1.0
-
-    # 깊은 DD 구간에서는 업사이드 가산을 일부 제한해 MDD를 방어한다.
-    if CurrentDD <= DD_GUARD_LV2:
-        ExposureRate = min(ExposureRate, DD_GUARD_RATE2)
-    elif CurrentDD <= DD_GUARD_LV1:
-        ExposureRate = min(ExposureRate, DD_GUARD_RATE1)
-
-    InvestCoinListStr = ""
-    #print("\n\n------------------------------------")
-    for iData in NowInvestList:
-        InvestCoinListStr += GetStockName(iData['stock_code'], StockDataList)  + " "
-
-   # print("------------------------------------\n\n")
-
-
-
-    
-
-
-    print("\n\n>>>>>>>>>>>>", InvestCoinListStr, "---> 투자개수 : ", len(NowInvestList))
-    pprint.pprint(NowInvestList)
-    print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>--))", str(date), " 잔고:",str(InvestMoney) , "=" , str(RemainInvestMoney) , "+" , str(NowInvestMoney), "\n\n" )
-    
-
-    TotalMoneyList.append(InvestMoney)
-
-    #####################################################
-    #####################################################
-    #####################################################
-    #'''
-    
-   
 
 
 #결과 정리 및 데이터 만들기!!
@@ -1123,8 +292,9 @@ if len(TotalMoneyList) > 0:
     
 
 
-    for idx, row in result_df.iterrows():
-        print(idx, " " , row['Total_Money'], " "  , row['Cum_Ror'])
+    if BACKTEST_LOG == "ALL":
+        for idx, row in result_df.iterrows():
+            print(idx, " " , row['Total_Money'], " "  , row['Cum_Ror'])
         
 
 
@@ -62,6 +62,7 @@ FAQ로 해결 안되는 기술적인 문제는 클래스101 강의의 댓글이
 '''
 
 import KIS_Common as Common
+import Kosdaqpi_Features as Features
 import KIS_API_Helper_KR as KisKR
 import pandas as pd
 import pprint
@@ -91,6 +92,9 @@ fee = 0.0015 #수수료+세금+슬리피지를 매수매도마다 0.15%로 세
 #전략 백테스팅 시작 년도 지정!!!
 StartYear = 2017
 
+#백테스트 로그! "ALL": 매매 + 매일 보유현황/일별 잔고 덤프, "TRADE": 매매 로그만, "NONE": 최종 결과만
+BACKTEST_LOG = os.getenv("BACKTEST_LOG", "TRADE").upper()
+
 # 강추세 기반 업사이드 노출 오버레이
 EXPO_UP_MAX_DD = float(os.getenv("EXPO_UP_MAX_DD", "-0.06"))
 EXPO_UP_RATE = float(os.getenv("EXPO_UP_RATE", "1.10"))
@@ -100,6 +104,9 @@ EXPO_UP2_RATE = float(os.getenv("EXPO_UP2_RATE", "1.18"))
 
 
 
+#테스트 종목 이름을 한번에 채워둔다 (캐시에 없는 종목만 조회)
+KisKR.WarmStockMeta(InvestStockList)
+
 StockDataList = list()
 
 for stock_code in InvestStockList:
@@ -132,121 +139,14 @@ stock_df_list = []
 
 gugan_lenth = 7 
 
-for stock_code in InvestStockList:
-    df = Common.GetOhlcv("KR", stock_code,2200)
-
-    period = 14
-
-    delta = df["close"].diff()
-    up, down = delta.copy(), delta.copy()
-    up[up < 0] = 0
-    down[down > 0] = 0
-    _gain = up.ewm(com=(period - 1), min_periods=period).mean()
-    _loss = down.abs().ewm(com=(period - 1), min_periods=period).mean()
-    RS = _gain / _loss
-
-    df['RSI'] = pd.Series(100 - (100 / (1 + RS)), name="RSI")
-
-    df['prevRSI'] = df['RSI'].shift(1)
-    df['prevRSI2'] = df['RSI'].shift(2)
-    
-    df['high_'+str(gugan_lenth)+'_max'] = df['high'].rolling(window=gugan_lenth).max().shift(1)
-    df['low_'+str(gugan_lenth)+'_min'] = df['low'].rolling(window=gugan_lenth).min().shift(1)
-    
-    #########################################################################################
-    #OBV 활용! 
-    # OBV 계산
-    df['direction'] = 0
-    df.loc[df['close'] > df['close'].shift(1), 'direction'] = 1
-    df.loc[df['close'] < df['close'].shift(1), 'direction'] = -1
-    df['obv'] = (df['direction'] * df['volume']).cumsum()
-
-    # OBV 이동평균선
-    df['obv_ma'] = df['obv'].rolling(window=10).mean()
-    
-    df['prev_obv_ma'] = df['obv_ma'].shift(1)
-    df['prev_obv_ma2'] = df['obv_ma'].shift(2)
-    df['prev_obv'] = df['obv'].shift(1)
-
-    #########################################################################################
-    
-
-
-    df['prevVolume'] = df['volume'].shift(1)
-    df['prevVolume2'] = df['volume'].shift(2)
-    df['prevVolume3'] = df['volume'].shift(3)
-
-    df['prevClose'] = df['close'].shift(1)
-    df['prevOpen'] = df['open'].shift(1)
-
-    df['prevHigh'] = df['high'].shift(1)
-    df['prevHigh2'] = df['high'].shift(2)
-
-    df['prevLow'] = df['low'].shift(1)
-    df['prevLow2'] = df['low'].shift(2)
-
-    df['Disparity20'] = df['prevClose'] / df['prevClose'].rolling(window=20).mean() * 100.0
-    
-    df['Disparity11'] = df['prevClose'] / df['prevClose'].rolling(window=11).mean() * 100.0
-
-
-    df['ma3_before'] = df['close'].rolling(3).mean().shift(1)
-    df['ma6_before'] = df['close'].rolling(6).mean().shift(1)
-    df['ma19_before'] = df['close'].rolling(19).mean().shift(1)
-
-
-    df['ma10_before'] = df['close'].rolling(10).mean().shift(1)
-
-    df['ma20_before'] = df['close'].rolling(20).mean().shift(1)
-    df['ma20_before2'] = df['close'].rolling(20).mean().shift(2)
-    df['ma60_before'] = df['close'].rolling(60).mean().shift(1)
-    df['ma60_before2'] = df['close'].rolling(60).mean().shift(2)
-
-    df['ma120_before'] = df['close'].rolling(120).mean().shift(1)
-
-
-    df['prevChangeMa'] = df['change'].shift(1).rolling(window=20).mean()
-    
-
-    df['prevChangeMa_S'] = df['change'].shift(1).rolling(window=10).mean()
-
-    #10일마다 총 100일 평균모멘텀스코어
-    specific_days = list()
-
-    for i in range(1,11):
-        st = i * 10
-        specific_days.append(st)
-
-    for day in specific_days:
-        column_name = f'Momentum_{day}'
-        df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
-        
-    df['Average_Momentum'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
-
-
-    # Define the list of specific trading days to compare
-    specific_days = list()
-
-    for i in range(1,11):
-        st = i * 3
-        specific_days.append(st)
-
-
-
-    # Iterate over the specific trading days and compare the current market price with the corresponding closing prices
-    for day in specific_days:
-        # Create a column name for each specific trading day
-        column_name = f'Momentum_{day}'
-        
-        # Compare current market price with the closing price of the specific trading day
-        df[column_name] = (df['prevClose'] > df['close'].shift(day)).astype(int)
+#유니버스 전체 OHLCV를 한번에 동시에 가져온다!
+OhlcvDict = Common.GetOhlcvBatch("KR", InvestStockList, 2200)
 
-    # Calculate the average momentum score
-    df['Average_Momentum3'] = df[[f'Momentum_{day}' for day in specific_days]].sum(axis=1) / 10
+#지표는 공용 피처 모듈에서 전 종목을 한번에 계산한다! (같은 데이터/파라미터면 저장된 결과 사용)
+FeatureDict = Features.MakeFeatureDict(OhlcvDict, gugan_lenth)
 
-
-
-    df.dropna(inplace=True) #데이터 없는건 날린다!
+for stock_code in InvestStockList:
+    df = FeatureDict[stock_code]
 
    
 
@@ -265,6 +165,10 @@ combined_df = pd.concat([list(data_dict.values())[0].assign(stock_code=stock_cod
 # Sort the combined DataFrame by date
 combined_df.sort_index(inplace=True)
 
+#(날짜, 종목코드)로 한 줄 데이터를 바로 꺼낼 수 있게 미리 나눠둔다! (매번 combined_df 전체를 마스크로 훑지 않도록)
+RowIndex = Features.MakeRowIndex(FeatureDict)
+DateCodeIndex = Features.MakeDateCodeIndex(FeatureDict)
+
 pprint.pprint(combined_df)
 print(" len(combined_df) ", len(combined_df))
 
@@ -329,31 +233,31 @@ for date in combined_df.index.unique():
 
 
 
-    all_stocks = combined_df.loc[combined_df.index == date].groupby('stock_code')['close'].max().nlargest(DivNum)
+    all_stocks = DateCodeIndex.get(date, [])[:DivNum]
     
     #######################################################################################################################################
     #횡보장을 정의하기 위한 로직!!
     # https://blog.naver.com/zacra/223225906361 이 포스팅을 정독하세요!!!
-    Kosdaq_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "233740")]
-    Kosdaq_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "251340")]
-    Kospi_Long_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "122630")]
-    Kospi_Short_Data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == "252670")]
+    Kosdaq_Long_Data = RowIndex.get((date, "233740"))
+    Kosdaq_Short_Data = RowIndex.get((date, "251340"))
+    Kospi_Long_Data = RowIndex.get((date, "122630"))
+    Kospi_Short_Data = RowIndex.get((date, "252670"))
     
     IsStrongTrend = False
-    if len(Kosdaq_Long_Data) == 1 and len(Kospi_Long_Data) == 1:
+    if Kosdaq_Long_Data is not None and Kospi_Long_Data is not None:
         if (
-            Kosdaq_Long_Data['ma20_before'].values[0] > Kosdaq_Long_Data['ma60_before'].values[0]
-            and Kospi_Long_Data['ma20_before'].values[0] > Kospi_Long_Data['ma60_before'].values[0]
-            and Kosdaq_Long_Data['prevChangeMa'].values[0] > 0
-            and Kospi_Long_Data['prevChangeMa'].values[0] > 0
+            Kosdaq_Long_Data['ma20_before'] > Kosdaq_Long_Data['ma60_before']
+            and Kospi_Long_Data['ma20_before'] > Kospi_Long_Data['ma60_before']
+            and Kosdaq_Long_Data['prevChangeMa'] > 0
+            and Kospi_Long_Data['prevChangeMa'] > 0
         ):
             IsStrongTrend = True
 
     IsVeryStrongTrend = False
-    if IsStrongTrend == True and len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1 and len(Kospi_Long_Data) == 1 and len(Kospi_Short_Data) == 1:
+    if IsStrongTrend == True and Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None and Kospi_Long_Data is not None and Kospi_Short_Data is not None:
         if (
-            Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]
-            and Kospi_Long_Data['prevChangeMa'].values[0] > Kospi_Short_Data['prevChangeMa'].values[0]
+            Kosdaq_Long_Data['Average_Momentum'] > Kosdaq_Short_Data['Average_Momentum']
+            and Kospi_Long_Data['prevChangeMa'] > Kospi_Short_Data['prevChangeMa']
         ):
             IsVeryStrongTrend = True
     #######################################################################################################################################
@@ -381,18 +285,18 @@ for date in combined_df.index.unique():
         stock_code = investData['stock_code'] 
         
         if investData['InvestMoney'] > 0:
-            stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+            stock_data = RowIndex.get((date, stock_code))
 
-            if len(stock_data) == 1:
+            if stock_data is not None:
                 
                 ####!!!!코스닥 전략!!!####
                 #조건 만족시 매도 한다!
                 if stock_code in ["233740","251340"]:
                     
                         
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     CutRate = 0.4
@@ -404,7 +308,7 @@ for date in combined_df.index.unique():
                     # KODEX 코스닥150레버리지
                     else:
 
-                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
+                        if PrevClosePrice > stock_data['ma60_before']:
                             CutRate = 0.4
                         else:
                             CutRate = 0.3
@@ -412,7 +316,7 @@ for date in combined_df.index.unique():
 
 
                     #목표컷 매도가! 시가 - (전일종가 - 전일저가) x CutRate 
-                    CutPrice = stock_data['open'].values[0] - ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * CutRate)
+                    CutPrice = stock_data['open'] - ((stock_data['prevHigh'] - stock_data['prevLow']) * CutRate)
 
                     SellPrice = NowOpenPrice
 
@@ -421,7 +325,7 @@ for date in combined_df.index.unique():
 
 
                     #하향 돌파했다면 매도 고고!!
-                    if CutPrice >= stock_data['low'].values[0] :
+                    if CutPrice >= stock_data['low'] :
                         IsSellGo = True
                         SellPrice = CutPrice
 
@@ -472,14 +376,8 @@ for date in combined_df.index.unique():
                         RemainInvestMoney += ReturnMoney
                         investData['InvestMoney'] = 0
 
-
-                        NowInvestMoney = 0
-                        for iData in NowInvestList:
-                            NowInvestMoney += iData['InvestMoney']
-
-                        InvestMoney = RemainInvestMoney + NowInvestMoney
-
-                        print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
+                        if BACKTEST_LOG != "NONE":
+                            print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
                                 
                         items_to_remove.append(investData)
 
@@ -490,9 +388,9 @@ for date in combined_df.index.unique():
                 else:
                     
 
-                    NowOpenPrice = stock_data['open'].values[0]
-                    PrevOpenPrice = stock_data['prevOpen'].values[0] 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    NowOpenPrice = stock_data['open']
+                    PrevOpenPrice = stock_data['prevOpen'] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
 
                     SellPrice = NowOpenPrice
@@ -516,25 +414,26 @@ for date in combined_df.index.unique():
                     # KODEX 200선물인버스2X
                     if stock_code == "252670":
                         
-                        if stock_data['Disparity11'].values[0] > 105:
+                        if stock_data['Disparity11'] > 105:
 
-                            if  PrevClosePrice < stock_data['ma3_before'].values[0]: 
+                            if  PrevClosePrice < stock_data['ma3_before']: 
                                 IsSellGo = True
 
                         else:
 
-                            if PrevClosePrice < stock_data['ma6_before'].values[0] and PrevClosePrice < stock_data['ma19_before'].values[0] : 
+                            if PrevClosePrice < stock_data['ma6_before'] and PrevClosePrice < stock_data['ma19_before'] : 
                                 IsSellGo = True
 
                     # KODEX 레버리지
                     else:
 
-                        total_volume = (stock_data['prevVolume'].values[0]+ stock_data['prevVolume2'].values[0] +stock_data['prevVolume3'].values[0]) / 3.0
+                        total_volume = (stock_data['prevVolume']+ stock_data['prevVolume2'] +stock_data['prevVolume3']) / 3.0
 
-                        Disparity = stock_data['Disparity20'].values[0] 
+                        Disparity = stock_data['Disparity20'] 
 
-                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0] or stock_data['prevVolume'].values[0] < total_volume) and (Disparity < 98 or Disparity > 105):
-                            print("hold..")
+                        if (stock_data['prevLow2'] < stock_data['prevLow'] or stock_data['prevVolume'] < total_volume) and (Disparity < 98 or Disparity > 105):
+                            if BACKTEST_LOG == "ALL":
+                                print("hold..")
                         else:
                             IsSellGo = True
                     
@@ -574,13 +473,8 @@ for date in combined_df.index.unique():
 
                         #pprint.pprint(NowInvestList)
 
-                        NowInvestMoney = 0
-                        for iData in NowInvestList:
-                            NowInvestMoney += iData['InvestMoney']
-
-                        InvestMoney = RemainInvestMoney + NowInvestMoney
-
-                        print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
+                        if BACKTEST_LOG != "NONE":
+                            print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매도! 매수일:",investData['Date']," 매수가:",str(investData['BuyPrice']) ," 매수금:",str(investData['FirstMoney'])," 수익률: ", round(RevenueRate,2) , "%", " ,회수금:", round(ReturnMoney,2)  , " 매도가", SellPrice * (1.0 - fee))
                                 
                         items_to_remove.append(investData)
 
@@ -605,7 +499,7 @@ for date in combined_df.index.unique():
             IsFirstDateSet = True
 
 
-        for stock_code in all_stocks.index:
+        for stock_code in all_stocks:
 
             IsAlReadyInvest = False
             for investData in NowInvestList:
@@ -615,14 +509,14 @@ for date in combined_df.index.unique():
             
             if stock_code not in today_sell_code and IsAlReadyInvest == False:
 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
                 ####!!!!코스피 전략!!!####
                 if stock_code in ["122630","252670"]:
                     
 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    PrevClosePrice = stock_data['prevClose'] 
                     
-                    DolPaPrice = stock_data['open'].values[0]
+                    DolPaPrice = stock_data['open']
 
 
                     IsBuyGo = False
@@ -633,16 +527,16 @@ for date in combined_df.index.unique():
                     if stock_code == "252670":
 
 
-                        if PrevClosePrice > stock_data['ma3_before'].values[0]  and PrevClosePrice > stock_data['ma6_before'].values[0]  and PrevClosePrice > stock_data['ma19_before'].values[0] and stock_data['prevRSI'].values[0] < 70 and stock_data['prevRSI2'].values[0] < stock_data['prevRSI'].values[0]:
-                            if (stock_data['prevVolume2'].values[0] < stock_data['prevVolume'].values[0]) and (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and PrevClosePrice > stock_data['ma60_before'].values[0] and stock_data['ma60_before2'].values[0] < stock_data['ma60_before'].values[0]  and stock_data['ma3_before'].values[0]  > stock_data['ma6_before'].values[0]  > stock_data['ma19_before'].values[0]  :
+                        if PrevClosePrice > stock_data['ma3_before']  and PrevClosePrice > stock_data['ma6_before']  and PrevClosePrice > stock_data['ma19_before'] and stock_data['prevRSI'] < 70 and stock_data['prevRSI2'] < stock_data['prevRSI']:
+                            if (stock_data['prevVolume2'] < stock_data['prevVolume']) and (stock_data['prevLow2'] < stock_data['prevLow']) and PrevClosePrice > stock_data['ma60_before'] and stock_data['ma60_before2'] < stock_data['ma60_before']  and stock_data['ma3_before']  > stock_data['ma6_before']  > stock_data['ma19_before']  :
                                 IsBuyGo = True
 
                     # KODEX 레버리지
                     else:
 
-                        Disparity = stock_data['Disparity20'].values[0] 
+                        Disparity = stock_data['Disparity20'] 
                         
-                        if (stock_data['prevLow2'].values[0] < stock_data['prevLow'].values[0]) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'].values[0] < 80 :
+                        if (stock_data['prevLow2'] < stock_data['prevLow']) and (Disparity < 98 or Disparity > 106) and stock_data['prevRSI'] < 80 :
                             IsBuyGo = True
                             
 
@@ -673,19 +567,10 @@ for date in combined_df.index.unique():
                             InvestGoMoney *= ExposureRate
 
 
-                            BuyAmt = int(InvestGoMoney /  DolPaPrice) #매수 가능 수량을 구한다!
+                            #매수 가능 수량을 구한다! 남은돈이 부족하면 (매수금 + 수수료)가 남은돈 안에 들어오는 수량으로 줄인다
+                            BuyAmt = Features.CalcBuyAmt(InvestGoMoney, DolPaPrice, RemainInvestMoney - Kosdaq_sell_money_furture, fee)
 
                             NowFee = (BuyAmt*DolPaPrice) * fee
-
-
-
-                            #매수해야 되는데 남은돈이 부족하다면 수량을 하나씩 감소시켜 만족할 때 매수한다!!
-                            while (RemainInvestMoney - Kosdaq_sell_money_furture)  < (BuyAmt*DolPaPrice) + NowFee:
-                                if (RemainInvestMoney - Kosdaq_sell_money_furture)  > DolPaPrice:
-                                    BuyAmt -= 1
-                                    NowFee = (BuyAmt*DolPaPrice) * fee
-                                else:
-                                    break
                             
                             if BuyAmt > 0:
 
@@ -711,14 +596,8 @@ for date in combined_df.index.unique():
                                 NowInvestList.append(InvestData)
 
 
-                                NowInvestMoney = 0
-                                for iData in NowInvestList:
-                                    NowInvestMoney += iData['InvestMoney']
-
-                                InvestMoney = RemainInvestMoney + NowInvestMoney
-
-
-                                print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'].values[0])
+                                if BACKTEST_LOG != "NONE":
+                                    print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'])
 
              
              
@@ -726,7 +605,7 @@ for date in combined_df.index.unique():
     #최대 2개 종목만 투자 가능함! 코스닥 매수 조건 체크!
     if len(NowInvestList) < int(DivNum)/2 and int(date_object.strftime("%Y")) >= StartYear:
 
-        for stock_code in all_stocks.index:
+        for stock_code in all_stocks:
 
             IsAlReadyInvest = False
             for investData in NowInvestList:
@@ -741,13 +620,13 @@ for date in combined_df.index.unique():
                 #if Kosdaq_sell_cnt == 1 and len(NowInvestList) == 1:
                 #    continue
 
-                stock_data = combined_df[(combined_df.index == date) & (combined_df['stock_code'] == stock_code)]
+                stock_data = RowIndex.get((date, stock_code))
                 
                 ####!!!!코스닥 전략!!!####
                 if stock_code in ["233740","251340"]:
                     
 
-                    PrevClosePrice = stock_data['prevClose'].values[0] 
+                    PrevClosePrice = stock_data['prevClose'] 
 
                     DolpaRate = 0.4
 
@@ -760,7 +639,7 @@ for date in combined_df.index.unique():
                     #KODEX 코스닥150레버리지
                     else: 
 
-                        if PrevClosePrice > stock_data['ma60_before'].values[0]:
+                        if PrevClosePrice > stock_data['ma60_before']:
                             DolpaRate = 0.3
                         else:
                             DolpaRate = 0.4
@@ -769,7 +648,7 @@ for date in combined_df.index.unique():
                     #갭 상승 하락을 이용한 돌파값 조절!
                     # https://blog.naver.com/zacra/223277173514 이 포스팅을 체크!!!!
                     ##########################################################################
-                    Gap = ((abs(stock_data['open'].values[0] - PrevClosePrice) / PrevClosePrice)) * 100.0
+                    Gap = ((abs(stock_data['open'] - PrevClosePrice) / PrevClosePrice)) * 100.0
 
                     GapSt = (Gap*0.025)
 
@@ -778,24 +657,24 @@ for date in combined_df.index.unique():
                     if GapSt < 0:
                         GapSt = 0.1
 
-                    if PrevClosePrice > stock_data['open'].values[0] and Gap >= 3.0:
+                    if PrevClosePrice > stock_data['open'] and Gap >= 3.0:
                         DolpaRate *= (1.0 + GapSt)
 
-                    if PrevClosePrice < stock_data['open'].values[0] and Gap >= 3.0:
+                    if PrevClosePrice < stock_data['open'] and Gap >= 3.0:
                         DolpaRate *= (1.0 - GapSt)
 
 
                     #변동성 돌파 시가 + (전일고가-전일저가)*DolpaRate
-                    DolPaPrice = stock_data['open'].values[0] + ((stock_data['prevHigh'].values[0] - stock_data['prevLow'].values[0]) * DolpaRate)
+                    DolPaPrice = stock_data['open'] + ((stock_data['prevHigh'] - stock_data['prevLow']) * DolpaRate)
 
 
 
                     IsBuyGo = False
 
-                    DolPaRate = (DolPaPrice - stock_data['open'].values[0]) / stock_data['open'].values[0] * 100
+                    DolPaRate = (DolPaPrice - stock_data['open']) / stock_data['open'] * 100
 
                     #돌파 했다면 매수 고???
-                    if DolPaPrice <= stock_data['high'].values[0]  :
+                    if DolPaPrice <= stock_data['high']  :
 
 
                         IsBuyGo = True
@@ -804,25 +683,25 @@ for date in combined_df.index.unique():
 
                         #KODEX 코스닥150선물인버스
                         if stock_code == "251340":
-                            if stock_data['prevClose'].values[0] <= stock_data['ma20_before'].values[0]:
+                            if stock_data['prevClose'] <= stock_data['ma20_before']:
                                 IsBuyGo = False 
         
                         #KODEX 코스닥150레버리지
                         else: 
 
-                            if stock_data['prevLow'].values[0] > stock_data['open'].values[0] and stock_data['prevClose'].values[0] < stock_data['ma10_before'].values[0]:
+                            if stock_data['prevLow'] > stock_data['open'] and stock_data['prevClose'] < stock_data['ma10_before']:
                                 IsBuyGo = False 
 
                         # 추가 개선 로직 https://blog.naver.com/zacra/223326173552 이 포스팅 참고!!!!
                         IsJung = False    
-                        if stock_data['ma10_before'].values[0] > stock_data['ma20_before'].values[0] > stock_data['ma60_before'].values[0] > stock_data['ma120_before'].values[0]:
+                        if stock_data['ma10_before'] > stock_data['ma20_before'] > stock_data['ma60_before'] > stock_data['ma120_before']:
                             IsJung = True
                             
                         if IsJung == False:
                             
                                     
-                            high_price = stock_data['high_'+str(gugan_lenth)+'_max'].values[0] 
-                            low_price =  stock_data['low_'+str(gugan_lenth)+'_min'].values[0] 
+                            high_price = stock_data['high_'+str(gugan_lenth)+'_max'] 
+                            low_price =  stock_data['low_'+str(gugan_lenth)+'_min'] 
                             
                             Gap = (high_price - low_price) / 4
                             
@@ -830,13 +709,13 @@ for date in combined_df.index.unique():
                             MaximunPrice = low_price + Gap * 3.0
                             
                             
-                            if stock_data['open'].values[0] > MaximunPrice:
+                            if stock_data['open'] > MaximunPrice:
                                 IsBuyGo = False
             
                     #OBV 활용! 추가 필터!
                     if IsBuyGo == True:
                         #OBV 10이평선이 감소중이고 OBV값이 10이평선 아래에 있다면 매수를 취소한다!
-                        if stock_data['prev_obv_ma2'].values[0] > stock_data['prev_obv_ma'].values[0] and stock_data['prev_obv'].values[0] < stock_data['prev_obv_ma'].values[0]:
+                        if stock_data['prev_obv_ma2'] > stock_data['prev_obv_ma'] and stock_data['prev_obv'] < stock_data['prev_obv_ma']:
                             IsBuyGo = False
 
                             
@@ -847,16 +726,16 @@ for date in combined_df.index.unique():
                         Rate = 1.0
 
                         #모멘텀 스코어를 통한 비중 조절!
-                        if len(Kosdaq_Long_Data) == 1 and len(Kosdaq_Short_Data) == 1:
+                        if Kosdaq_Long_Data is not None and Kosdaq_Short_Data is not None:
                         
                             IsLongStrong = False
                             
-                            if Kosdaq_Long_Data['Average_Momentum'].values[0] > Kosdaq_Short_Data['Average_Momentum'].values[0]:
+                            if Kosdaq_Long_Data['Average_Momentum'] > Kosdaq_Short_Data['Average_Momentum']:
                                 IsLongStrong = True
                                 
                             IsLongStrong2 = False
                             
-                            if Kosdaq_Long_Data['prevChangeMa'].values[0] > Kosdaq_Short_Data['prevChangeMa'].values[0]:
+                            if Kosdaq_Long_Data['prevChangeMa'] > Kosdaq_Short_Data['prevChangeMa']:
                                 IsLongStrong2 = True
                                 
                                 
@@ -889,19 +768,10 @@ for date in combined_df.index.unique():
                             InvestGoMoney *= ExposureRate
 
 
-                            BuyAmt = int(InvestGoMoney /  DolPaPrice) #매수 가능 수량을 구한다!
+                            #매수 가능 수량을 구한다! 남은돈이 부족하면 (매수금 + 수수료)가 남은돈 안에 들어오는 수량으로 줄인다
+                            BuyAmt = Features.CalcBuyAmt(InvestGoMoney, DolPaPrice, RemainInvestMoney - Kosdaq_sell_money_furture, fee)
 
                             NowFee = (BuyAmt*DolPaPrice) * fee
-
-
-
-                            #매수해야 되는데 남은돈이 부족하다면 수량을 하나씩 감소시켜 만족할 때 매수한다!!
-                            while (RemainInvestMoney - Kosdaq_sell_money_furture)  < (BuyAmt*DolPaPrice) + NowFee:
-                                if (RemainInvestMoney - Kosdaq_sell_money_furture)  > DolPaPrice:
-                                    BuyAmt -= 1
-                                    NowFee = (BuyAmt*DolPaPrice) * fee
-                                else:
-                                    break
                             
                             if BuyAmt > 0:
 
@@ -927,14 +797,8 @@ for date in combined_df.index.unique():
                                 NowInvestList.append(InvestData)
 
 
-                                NowInvestMoney = 0
-                                for iData in NowInvestList:
-                                    NowInvestMoney += iData['InvestMoney']
-
-                                InvestMoney = RemainInvestMoney + NowInvestMoney
-
-
-                                print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'].values[0])
+                                if BACKTEST_LOG != "NONE":
+                                    print(GetStockName(stock_code, StockDataList), "(",stock_code, ") ", str(date), " " ,i, " >>>>>>>>>>>>>>>>> 매수! ,매수금액:", round(RealInvestMoney,2) , " 돌파가격", DolPaPrice, " 시가:", stock_data['open'])
 
         
 
@@ -962,21 +826,22 @@ for date in combined_df.index.unique():
     else:
         ExposureRate = 1.0
 
-    InvestCoinListStr = ""
-    #print("\n\n------------------------------------")
-    for iData in NowInvestList:
-        InvestCoinListStr += GetStockName(iData['stock_code'], StockDataList)  + " "
+    if BACKTEST_LOG == "ALL":
+        InvestCoinListStr = ""
+        #print("\n\n------------------------------------")
+        for iData in NowInvestList:
+            InvestCoinListStr += GetStockName(iData['stock_code'], StockDataList)  + " "
 
-   # print("------------------------------------\n\n")
+       # print("------------------------------------\n\n")
 
 
 
     
 
 
-    print("\n\n>>>>>>>>>>>>", InvestCoinListStr, "---> 투자개수 : ", len(NowInvestList))
-    pprint.pprint(NowInvestList)
-    print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>--))", str(date), " 잔고:",str(InvestMoney) , "=" , str(RemainInvestMoney) , "+" , str(NowInvestMoney), "\n\n" )
+        print("\n\n>>>>>>>>>>>>", InvestCoinListStr, "---> 투자개수 : ", len(NowInvestList))
+        pprint.pprint(NowInvestList)
+        print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>--))", str(date), " 잔고:",str(InvestMoney) , "=" , str(RemainInvestMoney) , "+" , str(NowInvestMoney), "\n\n" )
     
 
     TotalMoneyList.append(InvestMoney)
@@ -1060,8 +925,9 @@ if len(TotalMoneyList) > 0:
     
 
 
-    for idx, row in result_df.iterrows():
-        print(idx, " " , row['Total_Money'], " "  , row['Cum_Ror'])
+    if BACKTEST_LOG == "ALL":
+        for idx, row in result_df.iterrows():
+            print(idx, " " , row['Total_Money'], " "  , row['Cum_Ror'])
         
 
 
@@ -1,4 +1,6 @@
+import hashlib
 import os
+from dataclasses import dataclass, field
 from datetime import datetime
 
 import matplotlib.pyplot as plt
@@ -8,6 +10,11 @@ import pandas as pd
 import KIS_Common as Common
 import KIS_API_Helper_KR as KisKR
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 
 Common.SetChangeMode(os.getenv("ACCOUNT_MODE", "VIRTUAL"))
 
@@ -89,6 +96,60 @@ ENABLE_PLOT = env_bool("ENABLE_PLOT", True)
 REBALANCE_FREQ_DAYS = env_int("REBALANCE_FREQ_DAYS", 5)
 MIN_WEIGHT_CHANGE = env_float("MIN_WEIGHT_CHANGE", 0.06)
 
+# run_backtest(params, data)에 넘기는 파라미터 기본값 (키 이름 = 환경변수 이름)
+DEFAULT_PARAMS = {
+    "TOTAL_MONEY": TOTAL_MONEY,
+    "FEE": FEE,
+    "START_YEAR": START_YEAR,
+    "MAX_WEIGHT": MAX_WEIGHT,
+    "MAX_LEVERAGE": MAX_LEVERAGE,
+    "RISK_OFF_DD_ON": RISK_OFF_DD_ON,
+    "RISK_OFF_DD_OFF": RISK_OFF_DD_OFF,
+    "RISK_ON_POS": RISK_ON_POS,
+    "NEUTRAL_POS": NEUTRAL_POS,
+    "RISK_OFF_POS": RISK_OFF_POS,
+    "RISK_ON_TARGET_VOL": RISK_ON_TARGET_VOL,
+    "NEUTRAL_TARGET_VOL": NEUTRAL_TARGET_VOL,
+    "RISK_OFF_TARGET_VOL": RISK_OFF_TARGET_VOL,
+    "BACKTEST_START": BACKTEST_START,
+    "BACKTEST_END": BACKTEST_END,
+    "REBALANCE_FREQ_DAYS": REBALANCE_FREQ_DAYS,
+    "MIN_WEIGHT_CHANGE": MIN_WEIGHT_CHANGE,
+}
+
+
+def make_params(params=None):
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        unknown = [k for k in params if k not in DEFAULT_PARAMS]
+        if unknown:
+            raise KeyError(f"알 수 없는 파라미터: {unknown}")
+        p.update(params)
+    return p
+
+
+@dataclass
+class BacktestMetrics:
+    revenue: float
+    mdd: float
+    cagr: float
+    final_money: float
+    start_date: pd.Timestamp
+    end_date: pd.Timestamp
+    total_try: int = 0
+    total_success: int = 0
+    total_fail: int = 0
+    stock_stats: dict = field(default_factory=dict)
+    result_df: pd.DataFrame = None
+    equity: pd.Series = None
+
+    # with_curve: 시작 금액 대비 평가금 비율(equity)도 같이 (워크포워드 OOS 곡선 이어붙이기용)
+    def as_dict(self, with_curve=False):
+        d = {"revenue": self.revenue, "mdd": self.mdd, "cagr": self.cagr}
+        if with_curve:
+            d["equity"] = self.equity
+        return d
+
 
 def get_name(code):
     try:
@@ -98,12 +159,13 @@ def get_name(code):
         return code
 
 
-def prepare_df(code):
-    try:
-        df = Common.GetOhlcv("KR", code, LIMIT_BARS)
-    except Exception as e:
-        print(f"[WARN] {code} GetOhlcv 예외: {e}")
-        return None
+def prepare_df(code, df=None, limit_bars=None):
+    if df is None:
+        try:
+            df = Common.GetOhlcv("KR", code, limit_bars or LIMIT_BARS)
+        except Exception as e:
+            print(f"[WARN] {code} GetOhlcv 예외: {e}")
+            return None
 
     if not isinstance(df, pd.DataFrame):
         print(f"[WARN] {code} GetOhlcv 반환 타입 이상: {type(df)}")
@@ -140,89 +202,178 @@ def prepare_df(code):
     return df
 
 
-def regime_of_row(proxy_row):
-    if proxy_row is None:
-        return "neutral"
-    trend = 1 if proxy_row["ma20"] > proxy_row["ma60"] else -1
-    mom = 1 if proxy_row["mom20"] > 0 else -1
-    score = trend + mom
-    if score >= 2:
-        return "risk_on"
-    if score <= -2:
-        return "risk_off"
-    return "neutral"
-
-
-def target_params(regime):
-    if regime == "risk_on":
-        return RISK_ON_POS, RISK_ON_TARGET_VOL
-    if regime == "risk_off":
-        return RISK_OFF_POS, RISK_OFF_TARGET_VOL
-    return NEUTRAL_POS, NEUTRAL_TARGET_VOL
-
-
-def signal_and_score(row, is_inverse):
-    long_signal = int(row["ma20"] > row["ma60"]) + int(row["mom20"] > 0) + int(row["mom60"] > 0)
-    short_signal = int(row["ma20"] < row["ma60"]) + int(row["mom20"] < 0) + int(row["mom60"] < 0)
-    if is_inverse:
-        signal = short_signal >= 2
-        score = (-row["mom20"]) * 0.6 + (-row["mom60"]) * 0.4
-    else:
-        signal = long_signal >= 2
-        score = row["mom20"] * 0.6 + row["mom60"] * 0.4
-    return signal, float(score)
-
-
-def make_target_weights(day_rows, regime, risk_off_overlay):
-    max_pos, target_vol = target_params(regime)
-    if risk_off_overlay:
-        max_pos = max(1, max_pos - 1)
-        target_vol *= 0.75
-
-    candidates = []
-    for code, row in day_rows.items():
-        if regime in ("risk_on", "neutral") and code not in CORE_CODES:
-            continue
-        if regime == "risk_off" and code not in CORE_CODES.union(DEFENSIVE_CODES):
-            continue
-        is_inv = code in INVERSE_CODES
-        sig, score = signal_and_score(row, is_inv)
-        atr_pct = max(float(row["atr_pct"]), 0.05)
-        if sig:
-            candidates.append((code, score, atr_pct))
-
-    if not candidates:
-        return {}
-
-    candidates.sort(key=lambda x: x[1], reverse=True)
-    selected = candidates[:max_pos]
-
-    inv_risk = np.array([1.0 / c[2] for c in selected], dtype=float)
-    w = inv_risk / inv_risk.sum()
+REGIME_RISK_ON = 0
+REGIME_NEUTRAL = 1
+REGIME_RISK_OFF = 2
+
+
+# (날짜 x 종목) 판넬! 파라미터와 상관없는 신호/점수/레짐/후보 순위는 데이터당 한번만 계산해서 data["panel"]에 둔다
+def build_panel(data):
+    panel = data.get("panel")
+    if panel is not None:
+        return panel
+
+    data_map = data["data_map"]
+    codes = list(data_map.keys())
+    dates = data["dates"]
+    n, m = len(dates), len(codes)
+
+    def mat(col):
+        return np.column_stack([data_map[c][col].reindex(dates).to_numpy(dtype=float) for c in codes])
+
+    open_ = mat("open")
+    ret_oo = mat("ret_oo")
+    ma20 = mat("ma20")
+    ma60 = mat("ma60")
+    mom20 = mat("mom20")
+    mom60 = mat("mom60")
+    atr = np.maximum(mat("atr_pct"), 0.05)
+
+    is_inv = np.array([c in INVERSE_CODES for c in codes])
+    is_core = np.array([c in CORE_CODES for c in codes])
+    is_def = np.array([c in DEFENSIVE_CODES for c in codes])
+
+    long_signal = (ma20 > ma60).astype(int) + (mom20 > 0) + (mom60 > 0)
+    short_signal = (ma20 < ma60).astype(int) + (mom20 < 0) + (mom60 < 0)
+    signal = np.where(is_inv, short_signal >= 2, long_signal >= 2)
+    score = np.where(is_inv, (-mom20) * 0.6 + (-mom60) * 0.4, mom20 * 0.6 + mom60 * 0.4)
+
+    pj = codes.index(MARKET_PROXY)
+    trend = np.where(ma20[:, pj] > ma60[:, pj], 1, -1)
+    mom = np.where(mom20[:, pj] > 0, 1, -1)
+    rs = trend + mom
+    regime = np.where(rs >= 2, REGIME_RISK_ON, np.where(rs <= -2, REGIME_RISK_OFF, REGIME_NEUTRAL))
+
+    # risk_on/neutral 은 코어만, risk_off 는 코어+방어 종목만 후보
+    eligible = np.where((regime == REGIME_RISK_OFF)[:, None], (is_core | is_def)[None, :], is_core[None, :])
+    cand = signal & eligible
+
+    # 후보 중 점수 높은 순 (같으면 종목 순서) 순위
+    key = np.where(cand, -score, np.inf)
+    order = np.argsort(key, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.broadcast_to(np.arange(m), (n, m)), axis=1)
+
+    panel = {
+        "codes": codes,
+        "open": open_,
+        "ret_oo": ret_oo,
+        "atr": atr,
+        "regime": regime,
+        "cand": cand,
+        "rank": rank,
+    }
+    data["panel"] = panel
+    return panel
+
+
+# 구간(lo:hi) 전체 날짜의 목표 비중을 한번에 계산! overlay: 리스크오프 오버레이 중일 때 비중
+def target_weight_matrix(panel, lo, hi, p, overlay):
+    regime = panel["regime"][lo:hi]
+    max_pos = np.choose(regime, [p["RISK_ON_POS"], p["NEUTRAL_POS"], p["RISK_OFF_POS"]])
+    target_vol = np.choose(regime, [p["RISK_ON_TARGET_VOL"], p["NEUTRAL_TARGET_VOL"], p["RISK_OFF_TARGET_VOL"]]).astype(float)
+    if overlay:
+        max_pos = np.maximum(1, max_pos - 1)
+        target_vol = target_vol * 0.75
+
+    atr = panel["atr"][lo:hi]
+    selected = panel["cand"][lo:hi] & (panel["rank"][lo:hi] < max_pos[:, None])
+
+    inv_risk = np.where(selected, 1.0 / atr, 0.0)
+    inv_sum = inv_risk.sum(axis=1, keepdims=True)
+    w = np.divide(inv_risk, inv_sum, out=np.zeros_like(inv_risk), where=inv_sum > 0)
 
     # Rough volatility targeting: ATR% proxy
-    est_daily_vol = np.sqrt(np.sum((w * np.array([c[2] for c in selected]) / 100.0) ** 2))
+    est_daily_vol = np.sqrt(np.sum((w * atr / 100.0) ** 2, axis=1))
     est_annual_vol = est_daily_vol * np.sqrt(252)
-    leverage = min(MAX_LEVERAGE, target_vol / max(est_annual_vol, 1e-6))
-    w = w * leverage
-    w = np.clip(w, 0, MAX_WEIGHT)
-    if w.sum() > 1.0:
-        w = w / w.sum()
+    leverage = np.minimum(p["MAX_LEVERAGE"], target_vol / np.maximum(est_annual_vol, 1e-6))
+    w = w * leverage[:, None]
+    w = np.clip(w, 0, p["MAX_WEIGHT"])
+    w_sum = w.sum(axis=1, keepdims=True)
+    return np.where(w_sum > 1.0, w / np.where(w_sum > 1.0, w_sum, 1.0), w)
+
+
+# 리밸런싱/수수료/드로다운 오버레이 상태가 이어지는 부분만 배열 위에서 루프 (numba 있으면 컴파일)
+def _simulate_core(w_off, w_on, regime, open_, ret_oo, fee, rebalance_freq, min_weight_change, dd_on, dd_off, total_money):
+    n, m = w_off.shape
+    values = np.empty(n)
+    stat_try = np.zeros(m)
+    stat_success = np.zeros(m)
+    stat_fail = np.zeros(m)
+    stat_acc = np.zeros(m)
+
+    weights = np.zeros(m)
+    trade_open = np.full(m, np.nan)
+    value = total_money
+    peak = total_money
+    risk_off_overlay = False
+    last_regime = -1
+    last_rebalance_idx = -999
 
-    return {c[0]: float(weight) for c, weight in zip(selected, w)}
+    for i in range(n):
+        raw = w_on[i] if risk_off_overlay else w_off[i]
 
+        target = weights
+        if regime[i] != last_regime or i - last_rebalance_idx >= rebalance_freq:
+            if np.abs(raw - weights).sum() >= min_weight_change:
+                target = raw
+                last_rebalance_idx = i
+        last_regime = regime[i]
 
-def run():
+        # trade stats: close and open
+        for j in range(m):
+            if weights[j] > 0 and target[j] <= 0 and not np.isnan(trade_open[j]):
+                exit_p = open_[i, j] * (1.0 - fee)
+                rr = (exit_p / trade_open[j] - 1.0) * 100.0
+                stat_try[j] += 1
+                stat_acc[j] += rr
+                if rr > 0:
+                    stat_success[j] += 1
+                else:
+                    stat_fail[j] += 1
+                trade_open[j] = np.nan
+            elif target[j] > 0 and weights[j] <= 0:
+                trade_open[j] = open_[i, j] * (1.0 + fee)
+
+        # turnover fee
+        value *= (1.0 - np.abs(target - weights).sum() * fee)
+        weights = target.copy()
+
+        # open-to-open return
+        value *= (1.0 + (weights * ret_oo[i]).sum())
+
+        if value > peak:
+            peak = value
+        dd = value / peak - 1.0
+        if (not risk_off_overlay) and dd <= dd_on:
+            risk_off_overlay = True
+        elif risk_off_overlay and dd >= dd_off:
+            risk_off_overlay = False
+
+        values[i] = value
+
+    return values, stat_try, stat_success, stat_fail, stat_acc
+
+
+simulate_core = njit(cache=True)(_simulate_core) if njit is not None else _simulate_core
+
+
+# 유니버스 데이터를 한번만 읽어서 지표까지 붙여 둔다. run_backtest(params, data)에 그대로 넘겨서 여러 번 돌린다
+def load_backtest_data(universe=None, limit_bars=None):
     validate_mode_credentials()
-    print(f"계좌 모드: {Common.GetNowDist()}")
-    print("테스트하는 총 금액: ", format(round(TOTAL_MONEY), ","))
-    print("유니버스:", UNIVERSE)
+    universe = universe or UNIVERSE
+    limit_bars = limit_bars or LIMIT_BARS
 
     data_map = {}
     names = {}
-    for code in UNIVERSE:
+    ohlcv_map = Common.GetOhlcvBatch("KR", universe, limit_bars)
+    try:
+        KisKR.WarmStockMeta(universe)  # 종목 이름을 한번에 채워둔다
+    except Exception:
+        pass
+    for code in universe:
         names[code] = get_name(code)
-        df = prepare_df(code)
+        df = prepare_df(code, ohlcv_map.get(code), limit_bars)
         if df is not None and len(df) > 0:
             data_map[code] = df
         else:
@@ -230,11 +381,11 @@ def run():
 
     if MARKET_PROXY not in data_map:
         print(f"[ERROR] MARKET_PROXY_CODE({MARKET_PROXY}) 데이터가 없어 백테스트를 중단합니다.")
-        return 1
+        return None
 
     if len(data_map) < 2:
         print("[ERROR] 유효 종목이 부족합니다.")
-        return 1
+        return None
 
     common_dates = None
     for df in data_map.values():
@@ -243,109 +394,87 @@ def run():
     dates = sorted(list(common_dates))
     if len(dates) < 200:
         print("[ERROR] 공통 날짜가 너무 적습니다.")
-        return 1
+        return None
 
-    if BACKTEST_START:
-        s = pd.to_datetime(BACKTEST_START)
-        dates = [d for d in dates if pd.to_datetime(d) >= s]
-    if BACKTEST_END:
-        e = pd.to_datetime(BACKTEST_END)
-        dates = [d for d in dates if pd.to_datetime(d) <= e]
+    data = {"data_map": data_map, "names": names, "dates": dates, "limit_bars": limit_bars}
+    data_fingerprint(data)
+    return data
+
+
+# 데이터 지문! 유니버스/LIMIT_BARS/종목별 봉 개수, 첫날~마지막날(종가 포함)이 같으면 같은 값
+# 튜닝 결과 캐시 키에 넣어서 새 거래일이 붙거나 유니버스가 바뀌면 예전 결과를 재사용하지 않게 한다
+def data_fingerprint(data):
+    fp = data.get("fingerprint")
+    if fp is not None:
+        return fp
+
+    h = hashlib.sha1()
+    h.update(f"limit_bars={data.get('limit_bars')}".encode())
+    for code in sorted(data["data_map"]):
+        df = data["data_map"][code]
+        h.update(
+            f"|{code}:{len(df)}:{df.index[0]}:{df.index[-1]}:{float(df['close'].iloc[0])}:{float(df['close'].iloc[-1])}".encode()
+        )
+    dates = data["dates"]
+    h.update(f"|dates:{len(dates)}:{dates[0]}:{dates[-1]}".encode())
+
+    fp = h.hexdigest()[:16]
+    data["fingerprint"] = fp
+    return fp
+
+
+# 파라미터 한 세트로 백테스트를 돌려서 BacktestMetrics를 리턴! 기간이 너무 짧으면 None
+def run_backtest(params, data, verbose=False):
+    p = make_params(params)
+
+    # 정렬된 날짜 인덱스를 한번 만들어 두고 기간은 searchsorted 로 잘라서 쓴다 (폴드마다 전체 날짜를 훑지 않음)
+    date_index = data.get("date_index")
+    if date_index is None:
+        date_index = pd.DatetimeIndex(pd.to_datetime(data["dates"]))
+        data["date_index"] = date_index
+
+    s = pd.Timestamp(year=int(p["START_YEAR"]), month=1, day=1)
+    if p["BACKTEST_START"]:
+        s = max(s, pd.to_datetime(p["BACKTEST_START"]))
+    lo = date_index.searchsorted(s, side="left")
+    hi = len(date_index)
+    if p["BACKTEST_END"]:
+        hi = date_index.searchsorted(pd.to_datetime(p["BACKTEST_END"]), side="right")
+    dates = data["dates"][lo:hi]
 
-    dates = [d for d in dates if pd.to_datetime(d).year >= START_YEAR]
     if len(dates) < 30:
-        print("[ERROR] 백테스트 기간이 너무 짧습니다.")
-        return 1
+        if verbose:
+            print("[ERROR] 백테스트 기간이 너무 짧습니다.")
+        return None
 
-    value = TOTAL_MONEY
-    peak = TOTAL_MONEY
-    risk_off_overlay = False
-    weights = {}
-    last_regime = None
-    last_rebalance_idx = -999
+    total_money = p["TOTAL_MONEY"]
+
+    # 마지막 날은 다음날 시가로 수익률을 못 구하니 제외 (dates[:-1])
+    panel = build_panel(data)
+    hi = lo + len(dates) - 1
+    values, stat_try, stat_success, stat_fail, stat_acc = simulate_core(
+        target_weight_matrix(panel, lo, hi, p, False),
+        target_weight_matrix(panel, lo, hi, p, True),
+        panel["regime"][lo:hi],
+        panel["open"][lo:hi],
+        panel["ret_oo"][lo:hi],
+        float(p["FEE"]),
+        int(p["REBALANCE_FREQ_DAYS"]),
+        float(p["MIN_WEIGHT_CHANGE"]),
+        float(p["RISK_OFF_DD_ON"]),
+        float(p["RISK_OFF_DD_OFF"]),
+        float(total_money),
+    )
 
-    value_curve = []
-    trade_open = {}
     stock_stats = {
-        c: {"try": 0, "success": 0, "fail": 0, "accRev": 0.0}
-        for c in data_map.keys()
+        c: {"try": int(stat_try[j]), "success": int(stat_success[j]), "fail": int(stat_fail[j]), "accRev": float(stat_acc[j])}
+        for j, c in enumerate(panel["codes"])
     }
+    return make_metrics(dates[:-1], values, stock_stats, total_money)
 
-    for i, date in enumerate(dates[:-1]):
-        day_rows = {}
-        for code, df in data_map.items():
-            r = df.loc[df.index == date]
-            if len(r) == 1:
-                day_rows[code] = r.iloc[0]
-
-        proxy_row = day_rows.get(MARKET_PROXY)
-        regime = regime_of_row(proxy_row)
-        raw_target_w = make_target_weights(day_rows, regime, risk_off_overlay)
-
-        do_rebalance = False
-        if regime != last_regime:
-            do_rebalance = True
-        elif i - last_rebalance_idx >= REBALANCE_FREQ_DAYS:
-            do_rebalance = True
-
-        if do_rebalance:
-            all_codes = set(weights.keys()).union(set(raw_target_w.keys()))
-            delta = sum(abs(raw_target_w.get(c, 0.0) - weights.get(c, 0.0)) for c in all_codes)
-            target_w = raw_target_w if delta >= MIN_WEIGHT_CHANGE else dict(weights)
-            if target_w is raw_target_w:
-                last_rebalance_idx = i
-        else:
-            target_w = dict(weights)
-
-        last_regime = regime
-
-        # trade stats: close and open
-        for code, prev_w in list(weights.items()):
-            if prev_w > 0 and target_w.get(code, 0.0) <= 0:
-                row = day_rows.get(code)
-                if row is not None and code in trade_open:
-                    exit_p = float(row["open"]) * (1.0 - FEE)
-                    entry_p = trade_open[code]
-                    rr = (exit_p / entry_p - 1.0) * 100.0
-                    stock_stats[code]["try"] += 1
-                    stock_stats[code]["accRev"] += rr
-                    if rr > 0:
-                        stock_stats[code]["success"] += 1
-                    else:
-                        stock_stats[code]["fail"] += 1
-                    del trade_open[code]
-
-        for code, w in target_w.items():
-            if w > 0 and weights.get(code, 0.0) <= 0:
-                row = day_rows.get(code)
-                if row is not None:
-                    trade_open[code] = float(row["open"]) * (1.0 + FEE)
-
-        # turnover fee
-        all_codes = set(weights.keys()).union(set(target_w.keys()))
-        turnover = sum(abs(target_w.get(c, 0.0) - weights.get(c, 0.0)) for c in all_codes)
-        value *= (1.0 - turnover * FEE)
-        weights = target_w
-
-        # open-to-open return
-        day_ret = 0.0
-        for code, w in weights.items():
-            row = day_rows.get(code)
-            if row is not None:
-                day_ret += w * float(row["ret_oo"])
-        value *= (1.0 + day_ret)
-
-        if value > peak:
-            peak = value
-        dd = value / peak - 1.0
-        if (not risk_off_overlay) and dd <= RISK_OFF_DD_ON:
-            risk_off_overlay = True
-        elif risk_off_overlay and dd >= RISK_OFF_DD_OFF:
-            risk_off_overlay = False
-
-        value_curve.append((date, value))
 
-    result_df = pd.DataFrame(value_curve, columns=["date", "Total_Money"]).set_index("date")
+def make_metrics(dates, values, stock_stats, total_money):
+    result_df = pd.DataFrame({"Total_Money": values}, index=pd.Index(dates, name="date"))
     result_df["Ror"] = np.nan_to_num(result_df["Total_Money"].pct_change()) + 1
     result_df["Cum_Ror"] = result_df["Ror"].cumprod()
     result_df["Highwatermark"] = result_df["Cum_Ror"].cummax()
@@ -356,18 +485,27 @@ def run():
     end_date = pd.to_datetime(result_df.index[-1])
     years = (end_date - start_date).days / 365.25
     final_money = float(result_df["Total_Money"].iloc[-1])
-    revenue_rate = (final_money / TOTAL_MONEY - 1.0) * 100.0
-    mdd = float(result_df["MaxDrawdown"].min()) * 100.0
-    cagr = ((final_money / TOTAL_MONEY) ** (1 / max(years, 1e-6)) - 1) * 100.0
 
-    total_try = sum(v["try"] for v in stock_stats.values())
-    total_success = sum(v["success"] for v in stock_stats.values())
-    total_fail = sum(v["fail"] for v in stock_stats.values())
+    return BacktestMetrics(
+        revenue=(final_money / total_money - 1.0) * 100.0,
+        mdd=float(result_df["MaxDrawdown"].min()) * 100.0,
+        cagr=((final_money / total_money) ** (1 / max(years, 1e-6)) - 1) * 100.0,
+        final_money=final_money,
+        start_date=start_date,
+        end_date=end_date,
+        total_try=sum(v["try"] for v in stock_stats.values()),
+        total_success=sum(v["success"] for v in stock_stats.values()),
+        total_fail=sum(v["fail"] for v in stock_stats.values()),
+        stock_stats=stock_stats,
+        result_df=result_df,
+        equity=result_df["Total_Money"] / total_money,
+    )
+
 
+def print_report(m, names):
     print("\n\n--------------------")
-    print(f"--->>> {str(start_date.date())} ~ {str(end_date.date())} <<<---")
-    for code in data_map.keys():
-        s = stock_stats[code]
+    print(f"--->>> {str(m.start_date.date())} ~ {str(m.end_date.date())} <<<---")
+    for code, s in m.stock_stats.items():
         print(f"{names.get(code, code)}  ( {code} )")
         if s["try"] > 0:
             win = (s["success"] / s["try"]) * 100.0
@@ -382,27 +520,49 @@ def run():
     print("---------- 총 결과 ----------")
     print(
         f"최초 금액: {format(int(round(TOTAL_MONEY,0)), ',')}  "
-        f"최종 금액: {format(int(round(final_money,0)), ',')}  \n"
-        f"수익률: {round(revenue_rate,2)} % MDD: {round(mdd,2)} %"
+        f"최종 금액: {format(int(round(m.final_money,0)), ',')}  \n"
+        f"수익률: {round(m.revenue,2)} % MDD: {round(m.mdd,2)} %"
     )
-    if total_try > 0:
-        print(f"성공: {total_success}  실패: {total_fail}  -> 승률:  {round(total_success/total_try*100.0,2)}  %")
-    print(f"연복리수익률(CAGR): {round(cagr,2)} %\n")
+    if m.total_try > 0:
+        print(f"성공: {m.total_success}  실패: {m.total_fail}  -> 승률:  {round(m.total_success/m.total_try*100.0,2)}  %")
+    print(f"연복리수익률(CAGR): {round(m.cagr,2)} %\n")
+
+
+def plot_result(result_df):
+    result_df = result_df.copy()
+    result_df.index = pd.to_datetime(result_df.index)
+    fig, axs = plt.subplots(2, 1, figsize=(10, 10))
+    axs[0].plot(result_df["Cum_Ror"] * 100, label="Strategy")
+    axs[0].set_ylabel("Cumulative Return (%)")
+    axs[0].set_title("Return Chart")
+    axs[0].legend()
+    axs[1].plot(result_df.index, result_df["MaxDrawdown"] * 100, label="MDD")
+    axs[1].plot(result_df.index, result_df["Drawdown"] * 100, label="Drawdown")
+    axs[1].set_ylabel("Drawdown (%)")
+    axs[1].set_title("Drawdown Chart")
+    axs[1].legend()
+    plt.tight_layout()
+    plt.show()
+
+
+def run():
+    validate_mode_credentials()
+    print(f"계좌 모드: {Common.GetNowDist()}")
+    print("테스트하는 총 금액: ", format(round(TOTAL_MONEY), ","))
+    print("유니버스:", UNIVERSE)
+
+    data = load_backtest_data()
+    if data is None:
+        return 1
+
+    m = run_backtest(None, data, verbose=True)
+    if m is None:
+        return 1
+
+    print_report(m, data["names"])
 
     if ENABLE_PLOT:
-        result_df.index = pd.to_datetime(result_df.index)
-        fig, axs = plt.subplots(2, 1, figsize=(10, 10))
-        axs[0].plot(result_df["Cum_Ror"] * 100, label="Strategy")
-        axs[0].set_ylabel("Cumulative Return (%)")
-        axs[0].set_title("Return Chart")
-        axs[0].legend()
-        axs[1].plot(result_df.index, result_df["MaxDrawdown"] * 100, label="MDD")
-        axs[1].plot(result_df.index, result_df["Drawdown"] * 100, label="Drawdown")
-        axs[1].set_ylabel("Drawdown (%)")
-        axs[1].set_title("Drawdown Chart")
-        axs[1].legend()
-        plt.tight_layout()
-        plt.show()
+        plot_result(m.result_df)
 
     return 0
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트의 모듈(Kosdaqpi_*.py)을 바로 import 할 수 있게
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
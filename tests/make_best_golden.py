@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+'''
+test_backtest_parity.py 의 기준값(tests/data/test_best_golden.json)을 만드는 스크립트!
+
+배열 코어로 바꾸기 전(baseline) Kosdaqpi_Test_best.py 를 합성 OHLCV(시드 고정)로 그대로 돌려서
+출력 로그에서 매매 로그 / 일별 평가금 / 종목별 성공·실패를 뽑아 JSON 으로 저장한다.
+KIS 호출 대신 합성 데이터를 넘겨주는 것만 바꾸고 스크립트 코드는 손대지 않는다. (matplotlib 필요)
+
+    git show 2e76e4c:Kosdaqpi_Test_best.py > /tmp/Kosdaqpi_Test_best_baseline.py
+    python tests/make_best_golden.py /tmp/Kosdaqpi_Test_best_baseline.py
+'''
+import contextlib
+import io
+import json
+import os
+import re
+import runpy
+import sys
+import types
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TESTS_DIR)
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from test_backtest_parity import MakeSyntheticOhlcv, TradeHash, TradeProceeds, GOLDEN_PATH, GOLDEN_SEEDS, EQUITY_STEP
+
+
+#예전 스크립트를 합성 데이터로 돌리고 출력 로그를 리턴
+def RunScript(script_path, seed):
+    OhlcvDict = MakeSyntheticOhlcv(seed)
+
+    Common = types.ModuleType('KIS_Common')
+    Common.SetChangeMode = lambda dist = "REAL": None
+    Common.GetOhlcv = lambda area, stock_code, limit = 500: OhlcvDict[stock_code].iloc[-limit:].copy()
+    KisKR = types.ModuleType('KIS_API_Helper_KR')
+    KisKR.GetStockName = lambda stock_code: "N" + stock_code
+
+    SavedModules = {name: sys.modules.get(name) for name in ['KIS_Common', 'KIS_API_Helper_KR']}
+    sys.modules['KIS_Common'] = Common
+    sys.modules['KIS_API_Helper_KR'] = KisKR
+
+    Out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(Out):
+            runpy.run_path(script_path, run_name='__main__')
+    finally:
+        for name, module in SavedModules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    return Out.getvalue()
+
+
+#출력 로그에서 기준값을 뽑는다
+def ParseLog(log):
+    lines = log.splitlines()
+
+    TradeLineList = [line for line in lines if '매수!' in line or '매도!' in line]
+    EquityList = [float(line.split('잔고:')[1].split('=')[0]) for line in lines if '잔고:' in line]
+
+    StockStats = dict()
+    for k, line in enumerate(lines):
+        m = re.match(r'^N(\d{6})\s+\(\s*(\d{6})\s*\)$', line.strip())
+        if m is not None and k + 1 < len(lines):
+            s = re.match(r'^성공: (\d+)\s+실패: (\d+)', lines[k + 1].strip())
+            StockStats[m.group(2)] = [int(s.group(1)), int(s.group(2))] if s is not None else [0, 0]
+
+    return {
+        'trade_count': len(TradeLineList),
+        'trade_sha1': TradeHash(TradeLineList),
+        'trade_head': TradeLineList[:3],
+        'proceeds_sum': TradeProceeds(TradeLineList),
+        'equity_count': len(EquityList),
+        'equity': EquityList[::EQUITY_STEP],
+        'final_money': EquityList[-1],
+        'stock_stats': StockStats,
+    }
+
+
+if __name__ == '__main__':
+    Golden = {str(seed): ParseLog(RunScript(sys.argv[1], seed)) for seed in GOLDEN_SEEDS}
+
+    os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+    with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+        json.dump(Golden, f, ensure_ascii=False, indent=1)
+    print("saved", GOLDEN_PATH)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+'''
+Kosdaqpi_Test_best 배열 시뮬레이션 코어(Kosdaqpi_BacktestCore) 회귀 테스트!
+
+기준값(tests/data/test_best_golden.json)은 배열 코어로 바꾸기 전(baseline) Kosdaqpi_Test_best.py 를
+같은 합성 OHLCV(시드 고정)로 돌린 출력에서 뽑아 둔 것이다 (tests/make_best_golden.py).
+예전 스크립트 안의 지표/전략/루프 코드로만 만든 값이라 공용 모듈(Features / Strategy / BacktestCore)이 바뀌어도 기준은 그대로다.
+CalcBuyAmt 는 예전 "한주씩 빼는" while 루프와 랜덤 입력에서 같은 수량인지 본다.
+
+KIS 호출 없이 돈다 (Features / Strategy / BacktestCore 는 순수 계산 모듈).
+'''
+import hashlib
+import io
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Kosdaqpi_Features as Features
+import Kosdaqpi_Strategy as Strategy
+import Kosdaqpi_BacktestCore as BacktestCore
+
+
+INVEST_STOCK_LIST = ["122630", "252670", "233740", "251340"]
+TOTAL_MONEY = 10000000
+FEE = 0.0015
+START_YEAR = 2017
+GUGAN_LENTH = 7
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "test_best_golden.json")
+GOLDEN_SEEDS = [3, 7, 11]
+EQUITY_STEP = 20    #일별 평가금은 20일마다 하나씩만 저장
+
+
+def GetName(stock_code):
+    return "N" + stock_code
+
+
+#호가 단위(5원)로 맞춘 랜덤워크 일봉
+def MakeSyntheticOhlcv(seed, bars = 2200):
+    r = np.random.RandomState(seed)
+    dates = pd.bdate_range(end="2024-12-31", periods=bars)
+
+    OhlcvDict = dict()
+    for stock_code in INVEST_STOCK_LIST:
+        c = np.round(np.cumprod(1 + r.normal(0.0003, 0.02, bars)) * 10000 / 5) * 5
+        o = np.round(c * (1 + r.normal(0, 0.008, bars)) / 5) * 5
+        h = np.maximum(o, c) * (1 + np.abs(r.normal(0, 0.01, bars)))
+        l = np.minimum(o, c) * (1 - np.abs(r.normal(0, 0.01, bars)))
+        df = pd.DataFrame({'open': o, 'high': h, 'low': l, 'close': c, 'volume': r.randint(1e5, 1e6, bars).astype(float)}, index=dates)
+        df['change'] = df['close'].pct_change()
+        OhlcvDict[stock_code] = df.dropna()
+
+    return OhlcvDict
+
+
+@pytest.fixture(autouse=True)
+def NoFeatureStore(monkeypatch):
+    monkeypatch.setattr(Features, "FEATURE_STORE_USE", False)
+
+
+#예전 Kosdaqpi_Test_best.py 의 매수 수량 계산 (한주씩 빼면서 맞춘다)
+def LegacyBuyAmt(InvestGoMoney, DolPaPrice, CashMoney, fee):
+    BuyAmt = int(InvestGoMoney / DolPaPrice)
+    NowFee = (BuyAmt*DolPaPrice) * fee
+    while CashMoney < (BuyAmt*DolPaPrice) + NowFee:
+        if CashMoney > DolPaPrice:
+            BuyAmt -= 1
+            NowFee = (BuyAmt*DolPaPrice) * fee
+        else:
+            break
+    return BuyAmt
+
+
+#회수금은 표시용 반올림이 예전 스크립트와 0.01 차이날 수 있어서 (평가금은 같다) 해시에서 빼고 따로 합계로 본다
+def TradeSkeleton(line):
+    return re.sub(r'회수금: \S+', '회수금: *', line)
+
+
+def TradeHash(TradeLineList):
+    return hashlib.sha1("\n".join(TradeSkeleton(line) for line in TradeLineList).encode('utf-8')).hexdigest()
+
+
+def TradeProceeds(TradeLineList):
+    return sum(float(m.group(1)) for m in (re.search(r'회수금: (\S+)', line) for line in TradeLineList) if m is not None)
+
+
+def LoadGolden(seed):
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)[str(seed)]
+
+
+def NewTradeLog(Result):
+    Log = io.StringIO()
+    for k in range(len(Result['Events'])):
+        print(*BacktestCore.GetEventPrintArgs(Result, k, GetName), file=Log)
+    return Log.getvalue()
+
+
+@pytest.mark.parametrize("seed", GOLDEN_SEEDS)
+def test_run_best_matches_baseline_script(seed):
+    Golden = LoadGolden(seed)
+
+    FeatureDict = Features.MakeFeatureDict(MakeSyntheticOhlcv(seed), GUGAN_LENTH)
+    New = BacktestCore.RunBest(FeatureDict, INVEST_STOCK_LIST, TOTAL_MONEY, FEE, START_YEAR, GUGAN_LENTH)
+
+    assert Golden['trade_count'] > 50   #합성 데이터에서 매매가 충분히 일어나야 의미가 있다
+
+    TradeLineList = [line for line in NewTradeLog(New).splitlines() if '매수!' in line or '매도!' in line]
+    assert len(TradeLineList) == Golden['trade_count']
+    assert [TradeSkeleton(line) for line in TradeLineList[:3]] == [TradeSkeleton(line) for line in Golden['trade_head']]
+    assert TradeHash(TradeLineList) == Golden['trade_sha1']
+    assert TradeProceeds(TradeLineList) == pytest.approx(Golden['proceeds_sum'], abs=0.011 * Golden['trade_count'])
+
+    assert len(New['TotalMoneyList']) == Golden['equity_count']
+    np.testing.assert_allclose(New['TotalMoneyList'][::EQUITY_STEP], Golden['equity'], rtol=1e-12)
+    assert New['TotalMoneyList'][-1] == pytest.approx(Golden['final_money'], rel=1e-12)
+
+    for stock_code, (success, fail) in Golden['stock_stats'].items():
+        assert (New['StockStats'][stock_code]['success'], New['StockStats'][stock_code]['fail']) == (success, fail)
+
+
+#합성 데이터에서는 DD 가 얕은 채로 강한 추세가 오는 날이 거의 없어서 업사이드 가산은 골든으로 잘 안 잡힌다
+#그래서 예전 스크립트의 익스포저 계산(기본값 그대로)을 옮겨 두고 격자 입력에서 같은지 따로 본다
+def BaselineExposureRate(CurrentDD, IsNoWay, IsStrongTrend, IsVeryStrongTrend, IsCutCnt):
+    if CurrentDD >= -0.04 and IsNoWay == False and IsVeryStrongTrend == True and IsCutCnt == 0:
+        ExposureRate = 1.22
+    elif CurrentDD >= -0.07 and IsNoWay == False and IsStrongTrend == True and IsCutCnt == 0:
+        ExposureRate = 1.16
+    else:
+        ExposureRate = 1.0
+
+    if CurrentDD <= -0.18:
+        ExposureRate = min(ExposureRate, 0.75)
+    elif CurrentDD <= -0.14:
+        ExposureRate = min(ExposureRate, 0.88)
+    return ExposureRate
+
+
+def test_exposure_rate_matches_baseline():
+    ExpoParams = (-0.07, 1.16, -0.04, 1.22, -0.14, -0.18, 0.88, 0.75)
+
+    for CurrentDD in np.linspace(-0.3, 0.0, 61):
+        for IsNoWay in [False, True]:
+            for IsStrongTrend in [False, True]:
+                for IsVeryStrongTrend in [False, True]:
+                    for IsCutCnt in [0, 1, 4]:
+                        Args = (float(CurrentDD), IsNoWay, IsStrongTrend, IsVeryStrongTrend, IsCutCnt)
+                        assert BacktestCore.exposure_rate(*Args, ExpoParams) == BaselineExposureRate(*Args), Args
+
+
+#EXPO_* / DD_GUARD_* 는 실행할 때마다 환경변수로 바뀌니 코어가 전역이 아니라 인자로 받아야 한다
+#(numba 컴파일 캐시는 전역이 바뀐 걸 모른다) -> 같은 프로세스에서 값을 바꿔 다시 돌리면 결과가 바뀌어야 한다
+def test_exposure_params_reach_core(monkeypatch):
+    FeatureDict = Features.MakeFeatureDict(MakeSyntheticOhlcv(3), GUGAN_LENTH)
+
+    Base = BacktestCore.RunBest(FeatureDict, INVEST_STOCK_LIST, TOTAL_MONEY, FEE, START_YEAR, GUGAN_LENTH)
+    monkeypatch.setattr(Strategy, "EXPO_UP_RATE", 1.3)
+    monkeypatch.setattr(Strategy, "DD_GUARD_RATE2", 0.5)
+    Changed = BacktestCore.RunBest(FeatureDict, INVEST_STOCK_LIST, TOTAL_MONEY, FEE, START_YEAR, GUGAN_LENTH)
+
+    assert Changed['TotalMoneyList'][-1] != Base['TotalMoneyList'][-1]
+
+
+#numba 가 있으면 컴파일된 코어가 파이썬 코어와 같은 결과를 내는지 본다 (없으면 건너뛴다)
+def test_numba_core_matches_python_core():
+    pytest.importorskip("numba", reason="numba 가 없으면 파이썬 코어만 돈다")
+    assert BacktestCore.simulate_core is not BacktestCore._simulate_core
+
+    FeatureDict = Features.MakeFeatureDict(MakeSyntheticOhlcv(7), GUGAN_LENTH)
+    Arr = BacktestCore.MakeSignalArrays(FeatureDict, INVEST_STOCK_LIST, GUGAN_LENTH)
+
+    for ExpoParams in [Strategy.GetExposureParams(), (-0.07, 1.3, -0.04, 1.22, -0.14, -0.18, 0.88, 0.5)]:
+        Args = (Arr['year'], START_YEAR, Arr['day_order'], Arr['day_order_cnt'], Arr['has'], Arr['kind'], Arr['hold_log'],
+                Arr['open'], Arr['low'], Arr['high'], Arr['prevOpen'], Arr['cut_price'], Arr['dolpa_price'],
+                Arr['kospi_buy'], Arr['kospi_sell'], Arr['kosdaq_filter'], Arr['mom_rate'], Arr['cut_adj'],
+                Arr['no_way'], Arr['strong'], Arr['very_strong'], float(TOTAL_MONEY), FEE, ExpoParams)
+
+        Compiled = BacktestCore.simulate_core(*Args)
+        Python = BacktestCore._simulate_core(*Args)
+
+        for c, p in zip(Compiled, Python):
+            np.testing.assert_allclose(c, p, rtol=1e-12)
+
+
+def test_calc_buy_amt_matches_decrement_loop():
+    r = np.random.RandomState(17)
+
+    for _ in range(30000):
+        Price = float(np.round(r.uniform(100, 50000) / 5) * 5)
+        InvestGoMoney = r.uniform(0, 2e7)
+        fee = float(r.choice([0.0, 0.0015, 0.003]))
+        #현금이 모자란 경우 / 딱 맞는 경우 / 1주 가격 근처 / 충분한 경우를 골고루
+        CashMoney = float(r.choice([
+            r.uniform(0, InvestGoMoney),
+            int(InvestGoMoney / Price) * Price * (1.0 + fee),
+            r.uniform(0.5, 1.5) * Price,
+            r.uniform(InvestGoMoney, InvestGoMoney * 2 + 1),
+        ]))
+
+        assert Features.CalcBuyAmt(InvestGoMoney, Price, CashMoney, fee) == LegacyBuyAmt(InvestGoMoney, Price, CashMoney, fee), (InvestGoMoney, Price, CashMoney, fee)
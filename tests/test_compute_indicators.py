@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+'''
+여러 지표 한번에 구하기(KIS_Common.ComputeIndicators) 테스트!
+
+spec 의 지표/파라미터/기준 날짜(st)마다 GetMA / GetRSI / GetBB / GetMACD / GetStoch / GetIC 를
+따로 부른 값과 비교하고, 넘어온 ohlcv 를 건드리지 않는지 본다.
+KIS_Common 의존 패키지가 없으면 건너뛴다.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_allclose
+
+try:
+    import KIS_Common as Common
+except (ImportError, OSError) as e:
+    pytest.skip("KIS_Common 을 불러올 수 없어 건너뜀: " + str(e), allow_module_level=True)
+
+
+ST_LIST = [-1, -2, -5, -30]
+
+SPEC = [("ma", 5, ST_LIST), ("ma", 20, ST_LIST), ("ma", 60, ST_LIST),
+        ("rsi", 14, ST_LIST), ("rsi", 2, ST_LIST),
+        ("bb", 20, 2.0, ST_LIST), ("bb", 10, 1.5, ST_LIST),
+        ("macd", ST_LIST),
+        ("stoch", 14, ST_LIST), ("stoch", 5, ST_LIST),
+        ("ic", ST_LIST)]
+
+
+#랜덤워크 합성 일봉 (중간에 종가가 같은 구간을 넣어 RSI 상승/하락 0 도 나오게)
+def MakeOhlcv(n = 200, seed = 3):
+    rng = np.random.default_rng(seed)
+    close = np.cumsum(rng.normal(0, 1, n)) + 100
+    close[80:86] = close[80]
+    return pd.DataFrame({'open': close + rng.normal(0, 0.3, n),
+                         'high': close + rng.random(n),
+                         'low': close - rng.random(n),
+                         'close': close,
+                         'volume': rng.integers(1000, 5000, n).astype(float)},
+                        index=pd.date_range('2024-01-01', periods=n))
+
+
+#지표 1개를 따로 구한 값 (ComputeIndicators 와 같은 모양으로)
+def SingleIndicator(df, kind, params, st):
+    if kind == "ma":
+        return Common.GetMA(df, params[0], st)
+    if kind == "rsi":
+        return Common.GetRSI(df, params[0], st)
+    if kind == "bb":
+        return Common.GetBB(df, params[0], st, params[1])
+    if kind == "macd":
+        return Common.GetMACD(df, st)
+    if kind == "stoch":
+        return Common.GetStoch(df, params[0], st)
+    if kind == "ic":
+        return Common.GetIC(df, st)
+    raise KeyError(kind)
+
+
+@pytest.mark.parametrize("length", [200, 40])
+def test_matches_single_indicator_helpers(length):
+    df = MakeOhlcv().iloc[:length]
+
+    result = Common.ComputeIndicators(df, SPEC)
+
+    assert list(result.keys()) == [(item[0],) + tuple(item[1:-1]) for item in SPEC]
+
+    for item in SPEC:
+        kind, params = item[0], tuple(item[1:-1])
+        for st in ST_LIST:
+            got = result[(kind,) + params][st]
+            expected = SingleIndicator(df, kind, params, st)
+            msg = str((kind,) + params) + " st=" + str(st)
+
+            if isinstance(expected, dict):
+                assert sorted(got.keys()) == sorted(expected.keys()), msg
+                for key in expected:
+                    assert_allclose(got[key], expected[key], rtol=1e-9, atol=1e-10, equal_nan=True, err_msg=msg + " " + key)
+            else:
+                assert_allclose(got, expected, rtol=1e-9, atol=1e-10, equal_nan=True, err_msg=msg)
+
+
+def test_input_frame_is_unchanged():
+    df = MakeOhlcv()
+    before = df.copy()
+
+    Common.ComputeIndicators(df, SPEC)
+
+    assert list(df.columns) == list(before.columns)
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_single_st_and_errors():
+    df = MakeOhlcv()
+
+    result = Common.ComputeIndicators(df, [("MA", 5, -1), ("rsi", 14, [])])
+    assert result[("ma", 5)] == {-1: pytest.approx(Common.GetMA(df, 5, -1), rel=1e-12)}
+    assert result[("rsi", 14)] == {}
+
+    with pytest.raises(KeyError):
+        Common.ComputeIndicators(df, [("cci", 20, [-1])])
+    with pytest.raises(IndexError):
+        Common.ComputeIndicators(df, [("ma", 5, [-len(df) - 1])])
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+증분 지표 엔진(KIS_Common.IndicatorState / GetIndicatorState) 테스트!
+
+봉을 1개씩 넣어가며 (장중 현재봉 교체, 과거 종가 변경 포함)
+GetMA / GetRSI / GetBB / GetMACD / GetStoch / GetIC 를 봉 전체로 다시 계산한 값과 비교한다.
+KIS_Common 의존 패키지가 없으면 건너뛴다.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.testing import assert_allclose
+
+try:
+    import KIS_Common as Common
+except (ImportError, OSError) as e:
+    pytest.skip("KIS_Common 을 불러올 수 없어 건너뜀: " + str(e), allow_module_level=True)
+
+
+ST_LIST = [-1, -2, -3]
+
+
+#랜덤워크 합성 일봉 (중간에 종가가 같은 구간을 넣어 RSI 상승/하락 0 도 나오게)
+def MakeOhlcv(n = 160, seed = 1):
+    rng = np.random.default_rng(seed)
+    close = np.cumsum(rng.normal(0, 1, n)) + 100
+    close[50:55] = close[50]
+    return pd.DataFrame({'open': close + rng.normal(0, 0.3, n),
+                         'high': close + rng.random(n),
+                         'low': close - rng.random(n),
+                         'close': close,
+                         'volume': rng.integers(1000, 5000, n).astype(float)},
+                        index=pd.date_range('2024-01-01', periods=n))
+
+
+#IndiState 와 봉 전체로 다시 계산한 값이 같은지 본다
+def AssertSameAsFull(IndiState, df):
+    for st in ST_LIST:
+        assert IndiState.GetMA(5, st) == pytest.approx(Common.GetMA(df, 5, st), rel=1e-12, nan_ok=True)
+        assert IndiState.GetMA(20, st) == pytest.approx(Common.GetMA(df, 20, st), rel=1e-12, nan_ok=True)
+
+        assert_allclose(IndiState.GetRSI(14, st), Common.GetRSI(df, 14, st), rtol=1e-10, equal_nan=True)
+
+        bb = IndiState.GetBB(20, st)
+        bb_full = Common.GetBB(df, 20, st)
+        assert_allclose([bb['ma'], bb['upper'], bb['lower']], [bb_full['ma'], bb_full['upper'], bb_full['lower']], rtol=1e-12)
+
+        macd = IndiState.GetMACD(st)
+        macd_full = Common.GetMACD(df, st)
+        assert_allclose([macd['macd'], macd['macd_siginal'], macd['ocl']],
+                        [macd_full['macd'], macd_full['macd_siginal'], macd_full['ocl']], rtol=1e-9, atol=1e-10)
+
+        stoch = IndiState.GetStoch(14, st)
+        stoch_full = Common.GetStoch(df, 14, st)
+        assert_allclose([stoch['fast_k'], stoch['slow_d']], [stoch_full['fast_k'], stoch_full['slow_d']], rtol=1e-12, equal_nan=True)
+
+        if len(df) >= 27:
+            ic = IndiState.GetIC(st)
+            ic_full = Common.GetIC(df, st)
+            for key in ['conversion', 'base', 'huhang_span', 'sunhang_span_a', 'sunhang_span_b']:
+                assert_allclose(ic[key], ic_full[key], rtol=1e-12, equal_nan=True, err_msg=key)
+
+
+def test_bars_one_by_one():
+    df = MakeOhlcv()
+    IndiState = Common.IndicatorState()
+
+    for i in range(1, len(df) + 1):
+        IndiState.Update(df.iloc[:i])
+        if i >= 60:   #60봉째에 처음 물어봐서 가지고 있는 봉으로 채우고, 그 뒤로는 봉마다 갱신
+            AssertSameAsFull(IndiState, df.iloc[:i])
+
+    assert len(IndiState.Close) == len(df)
+
+
+def test_live_bar_replacement():
+    df = MakeOhlcv()
+    IndiState = Common.IndicatorState(df.iloc[:100])
+    AssertSameAsFull(IndiState, df.iloc[:100])
+
+    #장중에 현재봉(마지막 봉)만 계속 바뀐다
+    live = df.iloc[:100].copy()
+    for price in [live['close'].iloc[-1] + 3.0, live['close'].iloc[-1] - 5.0, live['close'].iloc[-2]]:
+        live.iloc[-1, live.columns.get_loc('close')] = price
+        live.iloc[-1, live.columns.get_loc('high')] = max(live['high'].iloc[-1], price)
+        live.iloc[-1, live.columns.get_loc('low')] = min(live['low'].iloc[-1], price)
+        IndiState.Update(live)
+        assert len(IndiState.Close) == 100
+        AssertSameAsFull(IndiState, live)
+
+    #장이 끝나고 확정된 봉 + 다음 봉
+    IndiState.Update(df.iloc[:101])
+    AssertSameAsFull(IndiState, df.iloc[:101])
+
+    #GetOhlcv(limit) 처럼 앞쪽 봉이 밀려나도 새 봉만 반영한다
+    IndiState.Update(df.iloc[2:102])
+    assert len(IndiState.Close) == 102
+    assert IndiState.GetMA(20, -1) == pytest.approx(Common.GetMA(df.iloc[:102], 20, -1), rel=1e-12)
+
+
+@pytest.mark.parametrize("changed_pos", [-2, -10])
+def test_changed_earlier_close(changed_pos):
+    df = MakeOhlcv()
+    IndiState = Common.IndicatorState(df.iloc[:120])
+    AssertSameAsFull(IndiState, df.iloc[:120])
+
+    #과거 종가가 바뀌면(수정주가 등) 처음부터 다시 만든다
+    adjusted = df.iloc[:121].copy()
+    adjusted.iloc[changed_pos - 1, adjusted.columns.get_loc('close')] *= 0.5
+    IndiState.Update(adjusted)
+
+    assert len(IndiState.Close) == 121
+    AssertSameAsFull(IndiState, adjusted)
+
+
+def test_get_indicator_state_cache():
+    df = MakeOhlcv()
+
+    IndiState = Common.GetIndicatorState("TEST01", "D", df.iloc[:80])
+    try:
+        assert Common.GetIndicatorState("TEST01", "D") is IndiState
+        assert Common.GetIndicatorState("TEST01", "5m") is not IndiState
+
+        assert Common.GetIndicatorState("TEST01", "D", df.iloc[:81]) is IndiState
+        AssertSameAsFull(IndiState, df.iloc[:81])
+    finally:
+        Common.IndicatorStateDict.pop(("TEST01", "D"), None)
+        Common.IndicatorStateDict.pop(("TEST01", "5m"), None)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+'''
+국내 주식 실시간 체결가 헬퍼(KIS_API_Helper_KR_Realtime) 테스트!
+
+로컬 가짜 서버(KIS_KR_Realtime_StandIn)를 빈 포트로 띄우고 고정 접속키로 붙어서
+체결 데이터 파싱 / 리스너 / 끊겼을 때 재접속+재등록 / 등록 한도 / 오래된 체결가(max_age_sec) 를 본다.
+websocket-client 나 KIS_Common 의존 패키지가 없으면 건너뛴다.
+'''
+import time
+
+import pytest
+
+pytest.importorskip("websocket", reason="websocket-client 가 없으면 실시간 헬퍼를 쓸 수 없다")
+
+try:
+    import KIS_API_Helper_KR_Realtime as RealtimeKR
+except (ImportError, OSError) as e:
+    pytest.skip("KIS_Common 을 불러올 수 없어 건너뜀: " + str(e), allow_module_level=True)
+
+import KIS_KR_Realtime_StandIn as StandIn
+
+
+#cond() 가 참이 될 때까지 기다린다 (웹소켓 스레드가 처리할 시간)
+def WaitFor(cond, timeout = 5.0):
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return cond()
+
+
+def IsServerSubscribed(server, stock_code):
+    with server.lock:
+        return any(stock_code in codes for codes in server.clients.values())
+
+
+@pytest.fixture
+def Server(monkeypatch):
+    server = StandIn.StandInServer(port=0, tick_sec=None, pingpong_sec=3600)
+    server.Start()
+
+    monkeypatch.setattr(RealtimeKR, "KIS_WS_URL", server.GetUrl())
+    monkeypatch.setattr(RealtimeKR, "KIS_WS_APPROVAL_KEY", "test")
+    monkeypatch.setattr(RealtimeKR, "KIS_WS_RECONNECT_SEC", 0.1)
+
+    assert RealtimeKR.StartRealtime("REAL") == True
+    assert WaitFor(RealtimeKR.IsRealtimeAlive)
+
+    yield server
+
+    RealtimeKR.StopRealtime()
+    with RealtimeKR.RealtimeLock:
+        RealtimeKR.SubscribedCodeList.clear()
+        RealtimeKR.RealtimePriceDict.clear()
+        RealtimeKR.RealtimeListenerList.clear()
+    server.Stop()
+
+
+def test_parse_execution_data():
+    rec1 = StandIn.MakeExecutionRecord("005930", 70100, 69000, 70500, 68800, 12345)
+    rec2 = StandIn.MakeExecutionRecord("005930", 70200, 69000, 70500, 68800, 12346)
+
+    TickList = RealtimeKR.ParseExecutionData("0|H0STCNT0|002|" + rec1 + "^" + rec2)
+
+    assert [Tick['Price'] for Tick in TickList] == [70100, 70200]
+    assert TickList[0]['StockCode'] == "005930"
+    assert (TickList[0]['Open'], TickList[0]['High'], TickList[0]['Low'], TickList[0]['Volume']) == (69000, 70500, 68800, 12345)
+
+    assert RealtimeKR.ParseExecutionData("1|H0STCNI0|001|abc") == []
+    assert RealtimeKR.ParseExecutionData('{"header": {"tr_id": "PINGPONG"}}') == []
+
+
+def test_listener_receives_ticks(Server):
+    TickList = list()
+    RealtimeKR.AddPriceListener(lambda stock_code, PriceInfo: TickList.append((stock_code, PriceInfo['Price'])))
+
+    assert RealtimeKR.Subscribe("005930") == True
+    assert WaitFor(lambda: IsServerSubscribed(Server, "005930"))
+
+    Server.PushTick("005930", 70000)
+    Server.PushTick("005930", 70300)
+    assert WaitFor(lambda: len(TickList) == 2)
+
+    assert TickList == [("005930", 70000), ("005930", 70300)]
+    assert RealtimeKR.GetRealtimePrice("005930") == 70300
+    PriceInfo = RealtimeKR.GetRealtimePriceInfo("005930")
+    assert (PriceInfo['High'], PriceInfo['Low']) == (70300, 70000)
+
+
+def test_reconnect_resubscribes(Server):
+    RealtimeKR.SyncSubscribe(["005930", "000660"])
+    assert WaitFor(lambda: IsServerSubscribed(Server, "005930") and IsServerSubscribed(Server, "000660"))
+
+    Server.DropClients()
+
+    #다시 접속하면 OnRealtimeOpen 에서 구독 종목을 전부 다시 등록한다
+    assert WaitFor(lambda: IsServerSubscribed(Server, "005930") and IsServerSubscribed(Server, "000660"))
+    assert RealtimeKR.IsRealtimeAlive()
+
+    Server.PushTick("000660", 180000)
+    assert WaitFor(lambda: RealtimeKR.GetRealtimePrice("000660") == 180000)
+
+
+def test_subscribe_limit(Server, monkeypatch):
+    monkeypatch.setattr(RealtimeKR, "KIS_WS_MAX_SUBSCRIBE", 2)
+
+    LiveCodeList = RealtimeKR.SyncSubscribe(["005930", "000660", "035720"])
+
+    assert LiveCodeList == ["005930", "000660"]
+    assert RealtimeKR.Subscribe("035720") == False
+    assert WaitFor(lambda: IsServerSubscribed(Server, "000660"))
+    assert not IsServerSubscribed(Server, "035720")
+
+    #한 종목을 빼면 자리가 난다
+    assert RealtimeKR.SyncSubscribe(["000660", "035720"]) == ["000660", "035720"]
+    assert WaitFor(lambda: IsServerSubscribed(Server, "035720") and not IsServerSubscribed(Server, "005930"))
+
+
+def test_stale_tick_falls_back(Server):
+    RealtimeKR.Subscribe("005930")
+    assert WaitFor(lambda: IsServerSubscribed(Server, "005930"))
+
+    Server.PushTick("005930", 70000)
+    assert WaitFor(lambda: RealtimeKR.GetRealtimePrice("005930", 30) == 70000)
+
+    #체결이 한동안 안 들어온 걸로 만든다 -> max_age_sec 를 넘기면 None (스탑트레이더는 REST로 조회)
+    with RealtimeKR.RealtimeLock:
+        RealtimeKR.RealtimePriceDict["005930"]['UpdatedAt'] = time.time() - 60
+
+    assert RealtimeKR.GetRealtimePrice("005930", 30) is None
+    assert RealtimeKR.GetRealtimePrice("005930") == 70000
+
+    Server.PushTick("005930", 70100)
+    assert WaitFor(lambda: RealtimeKR.GetRealtimePrice("005930", 30) == 70100)
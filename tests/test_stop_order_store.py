@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+'''
+스탑 주문 저장소(KIS_KR_StopOrderStore) 테스트!
+
+임시 폴더에 DB / 예전 JSON 파일을 두고
+예전 JSON 옮겨 담기(중복, 주문 ID 없음) / 계좌가 다른 같은 주문 ID / 여러 건 수정 / "All" 삭제 /
+다른 연결에서 보이는 data_version 변화를 본다.
+'''
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import KIS_KR_StopOrderStore as StopOrderStore
+
+
+def MakeOrder(order_id, stock_code = "005930", order_type = "StopLoss", account_type = "REAL", **kwargs):
+    order = {'OrderId': order_id, 'stock_code': stock_code, 'OrderType': order_type, 'AccountType': account_type}
+    order.update(kwargs)
+    return order
+
+
+def CloseConnection():
+    conn = getattr(StopOrderStore.StoreLocal, 'conn', None)
+    if conn is not None:
+        conn.close()
+        StopOrderStore.StoreLocal.conn = None
+
+
+@pytest.fixture
+def Store(tmp_path, monkeypatch):
+    monkeypatch.setattr(StopOrderStore, "STOP_ORDER_DB_PATH", str(tmp_path / "stop_order.db"))
+    monkeypatch.setattr(StopOrderStore, "STOP_ORDER_JSON_PATH", str(tmp_path / "stop_order.json"))
+    monkeypatch.setattr(StopOrderStore, "IsStoreReady", False)
+    CloseConnection()
+
+    yield StopOrderStore
+
+    CloseConnection()
+
+
+def test_migrate_json_file(Store, capsys):
+    OrderList = [MakeOrder("1001", TargetPrice=70000),
+                 MakeOrder("1001", TargetPrice=71000),   #같은 (주문 ID, 계좌) -> 못 옮긴다
+                 MakeOrder("1001", account_type="VIRTUAL"),
+                 {'stock_code': "000660", 'OrderType': "StopLoss"},   #주문 ID 없음
+                 MakeOrder("1002", stock_code="000660", order_type="TrailingStop")]
+    with open(Store.STOP_ORDER_JSON_PATH, 'w') as f:
+        json.dump(OrderList, f)
+
+    AllOrders = Store.GetAllOrders()
+
+    assert [(order['OrderId'], order['AccountType']) for order in AllOrders] == [("1001", "REAL"), ("1001", "VIRTUAL"), ("1002", "REAL")]
+    assert Store.GetOrder("1001", "REAL")['TargetPrice'] == 70000
+
+    assert not os.path.exists(Store.STOP_ORDER_JSON_PATH)
+    with open(Store.STOP_ORDER_JSON_PATH + ".migrated", 'r') as f:
+        assert json.load(f) == OrderList
+
+    out = capsys.readouterr().out
+    assert "예전 스탑 주문 3 건을 DB로 옮겼습니다" in out
+    assert "(이미 있는 주문)" in out
+    assert "(주문 ID 없음)" in out
+
+    #다시 열어도 또 옮기지 않는다
+    CloseConnection()
+    Store.IsStoreReady = False
+    assert len(Store.GetAllOrders()) == 3
+
+
+def test_same_order_id_on_two_accounts(Store):
+    Store.AddOrder(MakeOrder("1001", TargetPrice=70000))
+    Store.AddOrder(MakeOrder("1001", account_type="VIRTUAL", TargetPrice=50000))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        Store.AddOrder(MakeOrder("1001"))
+
+    assert Store.GetOrder("1001", "REAL")['TargetPrice'] == 70000
+    assert Store.GetOrder("1001", "VIRTUAL")['TargetPrice'] == 50000
+    assert len(Store.GetOrders(account_type="VIRTUAL")) == 1
+
+    assert Store.DeleteOrder("1001", "VIRTUAL") == True
+    assert Store.GetOrder("1001", "VIRTUAL") is None
+    assert Store.GetOrder("1001", "REAL") is not None
+    assert Store.DeleteOrder("1001", "VIRTUAL") == False
+
+
+def test_update_orders_fields(Store):
+    Store.AddOrder(MakeOrder("1001", HighPrice=70000))
+    Store.AddOrder(MakeOrder("1001", account_type="VIRTUAL", HighPrice=70000))
+    Store.AddOrder(MakeOrder("1002", HighPrice=80000))
+
+    updated = Store.UpdateOrdersFields([("1001", "REAL", {'HighPrice': 71000}),
+                                        ("1002", None, {'HighPrice': 82000, 'IsTrailing': True}),
+                                        ("9999", None, {'HighPrice': 1})])   #없는 주문은 건너뛴다
+
+    assert updated == 2
+    assert Store.GetOrder("1001", "REAL")['HighPrice'] == 71000
+    assert Store.GetOrder("1001", "VIRTUAL")['HighPrice'] == 70000
+    assert Store.GetOrder("1002") == MakeOrder("1002", HighPrice=82000, IsTrailing=True)
+
+    #계좌를 None 으로 넘기면 같은 주문 ID 전부
+    assert Store.UpdateOrdersFields([("1001", None, {'HighPrice': 72000})]) == 2
+    assert [order['HighPrice'] for order in Store.GetOrders(order_type="StopLoss")] == [72000, 72000, 82000]
+
+    assert Store.UpdateOrdersFields([]) == 0
+    assert Store.UpdateOrderFields("9999", {'HighPrice': 1}) == False
+
+
+def test_delete_orders_all(Store):
+    Store.AddOrder(MakeOrder("1001", order_type="StopLoss"))
+    Store.AddOrder(MakeOrder("1002", order_type="TrailingStop"))
+    Store.AddOrder(MakeOrder("1003", order_type="StopLoss", account_type="VIRTUAL"))
+    Store.AddOrder(MakeOrder("1004", stock_code="000660", order_type="StopLoss"))
+
+    DeletedList = Store.DeleteOrders("005930", "All", "REAL")
+
+    assert sorted(order['OrderId'] for order in DeletedList) == ["1001", "1002"]
+    assert [(order['OrderId'], order['AccountType']) for order in Store.GetAllOrders()] == [("1003", "VIRTUAL"), ("1004", "REAL")]
+
+    assert [order['OrderId'] for order in Store.DeleteOrders("005930", None, None)] == ["1003"]
+    assert Store.DeleteOrders("005930", "All", None) == []
+
+
+def test_data_version_changes_from_other_connection(Store):
+    Store.AddOrder(MakeOrder("1001"))
+    version = Store.GetDataVersion()
+
+    #같은 연결에서 쓴 건 data_version 이 안 바뀐다
+    Store.UpdateOrderFields("1001", {'HighPrice': 71000})
+    assert Store.GetDataVersion() == version
+
+    #다른 스레드(= 다른 연결)에서 쓰면 바뀐다
+    def Worker():
+        Store.AddOrder(MakeOrder("1002"))
+        CloseConnection()
+
+    worker = threading.Thread(target=Worker)
+    worker.start()
+    worker.join()
+
+    assert Store.GetDataVersion() != version
+    assert [order['OrderId'] for order in Store.GetAllOrders()] == ["1001", "1002"]
+
+    #다른 프로세스처럼 따로 연 sqlite3 연결에서 지워도 바뀐다
+    version = Store.GetDataVersion()
+    other = sqlite3.connect(Store.STOP_ORDER_DB_PATH, isolation_level=None)
+    other.execute("DELETE FROM stop_order WHERE order_id = '1002'")
+    other.close()
+
+    assert Store.GetDataVersion() != version
+    assert Store.GetOrder("1002") is None
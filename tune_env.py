@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+import os
+
+
+# 튜닝 스크립트 공통 환경값! Kosdaqpi_Test_v3 / KIS_Common 보다 먼저 import 해야 적용된다
+os.environ.setdefault("MPLBACKEND", "Agg")
+# 연달아 돌리는 튜닝에서는 방금 저장한 OHLCV 저장소를 한투 재조회 없이 그대로 쓴다 (실봇 기본값은 0)
+os.environ.setdefault("OHLCV_STORE_FRESH_SEC", "300")
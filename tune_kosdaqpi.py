@@ -2,15 +2,16 @@
 import itertools
 import os
 import random
-import re
-import subprocess
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from pathlib import Path
 
+import tune_env  # 튜닝 공통 환경값 (Kosdaqpi_Test_v3 보다 먼저 import)
+
+import pandas as pd
+
+import Kosdaqpi_Test_v3 as Backtest
+import tune_search
+import tune_store
 
-TARGET_SCRIPT = Path("/Users/yonghyuk/newcodex/Kosdaqpi_Test_new.py")
-PYTHON_BIN = os.environ.get("PYTHON_BIN", "/Users/yonghyuk/newcodex/newcodex/bin/python")
 
 # 원본 기준치(사용자가 공유한 값)
 BASE_REVENUE = float(os.environ.get("BASE_REVENUE", "3078.99"))
@@ -20,20 +21,16 @@ BASE_CAGR = float(os.environ.get("BASE_CAGR", "50.28"))
 TOP_N = int(os.environ.get("TOP_N", "10"))
 MAX_RUNS = int(os.environ.get("MAX_RUNS", "300"))
 RANDOM_SEED = int(os.environ.get("RANDOM_SEED", "42"))
-TUNE_WORKERS = int(os.environ.get("TUNE_WORKERS", "1"))
-RETRY_COUNT = int(os.environ.get("RETRY_COUNT", "2"))
-
+TUNE_WORKERS = int(os.environ.get("TUNE_WORKERS", str(os.cpu_count() or 1)))
+# 결과 DB에서 이 태그로 저장/재사용 (데이터가 바뀌면 지문이 붙은 태그가 달라져서 자동으로 새로 돌린다. 전략을 바꾸면 태그를 바꾼다)
+TUNE_RUN_TAG = os.environ.get("TUNE_RUN_TAG", "tune_kosdaqpi")
 
-def parse_result(text):
-    m = re.search(r"수익률:\s*([-\d.,]+)\s*% MDD:\s*([-\d.,]+)\s*%", text)
-    c = re.search(r"연복리수익률\(CAGR\):\s*([-\d.,]+)", text)
-    if not m or not c:
-        return None
-    return {
-        "revenue": float(m.group(1).replace(",", "")),
-        "mdd": float(m.group(2).replace(",", "")),
-        "cagr": float(c.group(1).replace(",", "")),
-    }
+# GRID: 전체 조합(MAX_RUNS 넘으면 랜덤 샘플) / ADAPTIVE: TPE 샘플링 + 짧은 기간부터 successive halving
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "GRID").upper()
+SEARCH_ROUNDS = int(os.environ.get("SEARCH_ROUNDS", "4"))
+SEARCH_BATCH = int(os.environ.get("SEARCH_BATCH", "54"))
+SEARCH_ETA = int(os.environ.get("SEARCH_ETA", "3"))
+SEARCH_FRACTIONS = [float(x) for x in os.environ.get("SEARCH_FRACTIONS", "0.25,0.5,1.0").split(",")]
 
 
 def score(r):
@@ -41,47 +38,28 @@ def score(r):
     return (r["revenue"] * 1.0) + (r["cagr"] * 8.0) - (abs(r["mdd"]) * 12.0)
 
 
-def run_one(idx, total, params):
-    env = os.environ.copy()
-    for k, v in params.items():
-        env[k] = str(v)
-    env["ENABLE_PLOT"] = "0"
-    env["MPLBACKEND"] = "Agg"
-
-    out = ""
-    proc = None
-    parsed = None
-    for _ in range(RETRY_COUNT + 1):
-        proc = subprocess.run(
-            [PYTHON_BIN, str(TARGET_SCRIPT)],
-            capture_output=True,
-            text=True,
-            env=env,
-        )
-        out = (proc.stdout or "") + "\n" + (proc.stderr or "")
-        parsed = parse_result(out)
-        if parsed is not None:
-            break
-
-    if parsed is None:
-        reason = "unknown"
-        if "유효한 OHLCV 데이터를 가져오지 못했습니다" in out:
-            reason = "ohlcv_load_failed"
-        elif "Get Authentification token fail" in out:
-            reason = "auth_failed"
-        elif "NameResolutionError" in out:
-            reason = "dns_failed"
-        tail = "\n".join(out.strip().splitlines()[-4:])
+def make_result(idx, total, params, metrics, error):
+    if error is not None:
         return {
             "idx": idx,
             "total": total,
             "params": params,
             "ok": False,
-            "reason": reason,
-            "returncode": proc.returncode if proc else -1,
-            "tail": tail,
+            "reason": error.split(":")[0],
+            "error": error,
         }
 
+    if metrics is None:
+        return {
+            "idx": idx,
+            "total": total,
+            "params": params,
+            "ok": False,
+            "reason": "period_too_short",
+            "error": "",
+        }
+
+    parsed = dict(metrics)
     parsed["params"] = params
     parsed["score"] = score(parsed)
     parsed["beats_base"] = (
@@ -95,50 +73,93 @@ def run_one(idx, total, params):
     return parsed
 
 
+# 전체 기간 중 최근 frac 비율만 쓰도록 시작일을 구한다 (1.0 이면 None = 전체)
+def trailing_start(data, frac):
+    if frac >= 1.0:
+        return None
+    dates = [d for d in data["dates"] if pd.to_datetime(d).year >= Backtest.START_YEAR]
+    return pd.to_datetime(dates[int(len(dates) * (1.0 - frac))]).strftime("%Y-%m-%d")
+
+
+def run_adaptive(grid, data, conn, fail_reasons):
+    def evaluate(params_list, frac):
+        start = trailing_start(data, frac)
+        tasks = []
+        for i, params in enumerate(params_list):
+            p = dict(params)
+            if start is not None:
+                p["BACKTEST_START"] = start
+            tasks.append((i, p))
+
+        out = [(params, None) for params in params_list]
+        for i, params, metrics, error in tune_store.run_sweep_cached(conn, TUNE_RUN_TAG, tasks, data, TUNE_WORKERS, score):
+            if error is not None:
+                reason = error.split(":")[0]
+                fail_reasons[reason] = fail_reasons.get(reason, 0) + 1
+                print(f"[SEARCH] failed reason={reason} error={error} params={params}")
+            out[i] = (params_list[i], metrics)
+        return out
+
+    history = tune_search.adaptive_search(
+        grid,
+        evaluate,
+        score,
+        rounds=SEARCH_ROUNDS,
+        batch=SEARCH_BATCH,
+        fractions=SEARCH_FRACTIONS,
+        eta=SEARCH_ETA,
+        seed=RANDOM_SEED,
+    )
+    return [make_result(i, len(history), params, metrics, None) for i, (params, metrics) in enumerate(history, start=1)]
+
+
 def main():
-    if not TARGET_SCRIPT.exists():
-        print(f"[ERROR] target script not found: {TARGET_SCRIPT}")
+    # 데이터는 한번만 읽고 워커 프로세스들이 mmap으로 같이 쓴다
+    data = Backtest.load_backtest_data()
+    if data is None:
+        print("[ERROR] 백테스트 데이터 로딩 실패")
         sys.exit(1)
 
     grid = {
         "RISK_OFF_DD_ON": [-0.11, -0.13, -0.15],
         "RISK_OFF_DD_OFF": [-0.04, -0.06, -0.08],
-        "STOP_ARM_PROFIT_PCT": [8.0, 10.0, 12.0],
-        "STOP_MIN_HOLD_DAYS": [5, 7, 9],
-        "TRAIL_ATR_MULTIPLIER": [3.2, 3.6, 4.0],
-        "HARD_STOP_ATR_MULTIPLIER": [4.0, 4.6, 5.2],
-        "MIN_POSITION_FLOOR_RATE": [0.85, 0.95, 1.0],
-        "RISK_PER_TRADE": [0.02, 0.03],
-        "ENABLE_REGIME_OVERLAY": [1],
-        "ENABLE_RISK_PARITY": [0, 1],
-        "EXPOSURE_NEUTRAL": [0.80, 0.90],
-        "EXPOSURE_RISK_OFF": [0.55, 0.70],
+        "MAX_WEIGHT": [0.30, 0.35, 0.40],
+        "MAX_LEVERAGE": [1.0, 1.2, 1.4],
+        "RISK_ON_TARGET_VOL": [0.20, 0.24, 0.28],
+        "NEUTRAL_TARGET_VOL": [0.12, 0.16, 0.20],
+        "RISK_OFF_TARGET_VOL": [0.08, 0.10, 0.12],
+        "RISK_ON_POS": [3, 4],
+        "NEUTRAL_POS": [2, 3],
+        "RISK_OFF_POS": [1, 2],
+        "REBALANCE_FREQ_DAYS": [3, 5, 10],
+        "MIN_WEIGHT_CHANGE": [0.04, 0.06, 0.08],
     }
 
-    keys = list(grid.keys())
-    combos = list(itertools.product(*[grid[k] for k in keys]))
-    print(f"[INFO] total combos: {len(combos)}")
-    if MAX_RUNS > 0 and MAX_RUNS < len(combos):
-        random.seed(RANDOM_SEED)
-        combos = random.sample(combos, MAX_RUNS)
-        print(f"[INFO] sampled combos: {len(combos)} (seed={RANDOM_SEED})")
-
     results = []
     fail_reasons = {}
-    with ThreadPoolExecutor(max_workers=max(1, TUNE_WORKERS)) as ex:
-        future_map = {}
-        for i, combo in enumerate(combos, start=1):
-            params = {k: v for k, v in zip(keys, combo)}
-            fut = ex.submit(run_one, i, len(combos), params)
-            future_map[fut] = params
-
-        for fut in as_completed(future_map):
-            res = fut.result()
+    print(f"[INFO] workers: {TUNE_WORKERS} search mode: {SEARCH_MODE}")
+    conn = tune_store.open_results_db()
+
+    if SEARCH_MODE == "ADAPTIVE":
+        results = run_adaptive(grid, data, conn, fail_reasons)
+    else:
+        keys = list(grid.keys())
+        combos = list(itertools.product(*[grid[k] for k in keys]))
+        print(f"[INFO] total combos: {len(combos)}")
+        if MAX_RUNS > 0 and MAX_RUNS < len(combos):
+            random.seed(RANDOM_SEED)
+            combos = random.sample(combos, MAX_RUNS)
+            print(f"[INFO] sampled combos: {len(combos)} (seed={RANDOM_SEED})")
+
+        tasks = [(i, {k: v for k, v in zip(keys, combo)}) for i, combo in enumerate(combos, start=1)]
+
+        for i, params, metrics, error in tune_store.run_sweep_cached(conn, TUNE_RUN_TAG, tasks, data, TUNE_WORKERS, score):
+            res = make_result(i, len(combos), params, metrics, error)
             if not res["ok"]:
                 reason = res.get("reason", "unknown")
                 fail_reasons[reason] = fail_reasons.get(reason, 0) + 1
                 print(
-                    f"[RUN {res['idx']}/{res['total']}] failed reason={reason} rc={res.get('returncode')} "
+                    f"[RUN {res['idx']}/{res['total']}] failed reason={reason} error={res.get('error')} "
                     f"params={res['params']}"
                 )
                 continue
@@ -151,7 +172,7 @@ def main():
     if not results:
         if fail_reasons:
             print(f"[ERROR] fail summary: {fail_reasons}")
-        print("[ERROR] no valid result parsed")
+        print("[ERROR] no valid result")
         sys.exit(2)
 
     results.sort(key=lambda x: x["score"], reverse=True)
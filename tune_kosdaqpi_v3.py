@@ -1,53 +1,64 @@
 #!/usr/bin/env python3
 import itertools
 import os
-import re
-import subprocess
 import sys
 from datetime import datetime
 
+import tune_env  # 튜닝 공통 환경값 (Kosdaqpi_Test_v3 보다 먼저 import)
+
+import pandas as pd
+
+import Kosdaqpi_Test_v3 as Backtest
+import tune_store
+import tune_sweep
 
-PYTHON_BIN = os.environ.get("PYTHON_BIN", "/Users/yonghyuk/newcodex/newcodex/bin/python")
-TARGET_SCRIPT = "/Users/yonghyuk/newcodex/Kosdaqpi_Test_v3.py"
 
 START = int(os.environ.get("WFO_START_YEAR", "2017"))
 END = int(os.environ.get("WFO_END_YEAR", "2026"))
 TRAIN_YEARS = int(os.environ.get("WFO_TRAIN_YEARS", "4"))
 TEST_YEARS = int(os.environ.get("WFO_TEST_YEARS", "1"))
 TOP_N = int(os.environ.get("TOP_N", "5"))
-
-
-def parse_metrics(text):
-    m = re.search(r"수익률:\s*([-\d.,]+)\s*% MDD:\s*([-\d.,]+)\s*%", text)
-    c = re.search(r"연복리수익률\(CAGR\):\s*([-\d.,]+)", text)
-    if not m or not c:
-        return None
-    return {
-        "revenue": float(m.group(1).replace(",", "")),
-        "mdd": float(m.group(2).replace(",", "")),
-        "cagr": float(c.group(1).replace(",", "")),
-    }
+TUNE_WORKERS = int(os.environ.get("TUNE_WORKERS", str(os.cpu_count() or 1)))
+# 결과 DB에서 이 태그로 저장/재사용 (폴드 기간은 파라미터에 들어가 있어서 폴드별로 따로 저장된다)
+TUNE_RUN_TAG = os.environ.get("TUNE_RUN_TAG", "tune_kosdaqpi_v3")
+# 폴드별 test 구간 평가곡선을 이어붙인 OOS 곡선 저장 경로 (빈 값이면 저장 안함)
+WFO_EQUITY_CSV = os.environ.get("WFO_EQUITY_CSV", "./wfo_oos_equity.csv")
 
 
 def score(m):
     return m["revenue"] + (m["cagr"] * 6.0) - (abs(m["mdd"]) * 10.0)
 
 
-def run_once(params, start_date, end_date):
-    env = os.environ.copy()
-    env["ENABLE_PLOT"] = "0"
-    env["MPLBACKEND"] = "Agg"
-    env["BACKTEST_START"] = start_date
-    env["BACKTEST_END"] = end_date
-    for k, v in params.items():
-        env[k] = str(v)
+def with_period(params, start_date, end_date):
+    p = dict(params)
+    p["BACKTEST_START"] = start_date
+    p["BACKTEST_END"] = end_date
+    return p
 
-    p = subprocess.run([PYTHON_BIN, TARGET_SCRIPT], capture_output=True, text=True, env=env)
-    out = (p.stdout or "") + "\n" + (p.stderr or "")
-    return parse_metrics(out)
+
+# 폴드별 test 평가곡선(시작 금액 대비 비율)을 일간 수익률로 바꿔 순서대로 이어붙인다
+def stitch_oos_equity(fold_results):
+    rets = []
+    for row in sorted(fold_results, key=lambda x: x["fold"]):
+        eq = row["test"]["equity"]
+        r = eq / eq.shift(1)
+        r.iloc[0] = eq.iloc[0]
+        rets.append(r)
+    ret = pd.concat(rets)
+    ret.index = pd.to_datetime(ret.index)
+    ret = ret[~ret.index.duplicated(keep="first")]
+    equity = ret.cumprod()
+    drawdown = equity / equity.cummax() - 1.0
+    return pd.DataFrame({"Ror": ret, "Equity": equity, "Drawdown": drawdown})
 
 
 def main():
+    # 데이터는 한번만 읽고 폴드/조합 모두 같은 데이터로 돌린다 (워커 프로세스들은 mmap으로 공유)
+    data = Backtest.load_backtest_data()
+    if data is None:
+        print("[ERROR] 백테스트 데이터 로딩 실패")
+        return 1
+
     grid = {
         "MAX_WEIGHT": [0.30, 0.35],
         "MAX_LEVERAGE": [1.0, 1.15, 1.25],
@@ -79,26 +90,51 @@ def main():
         print("[ERROR] 워크포워드 폴드 생성 실패")
         return 1
 
-    fold_results = []
+    # 모든 폴드의 train 조합을 한번에 풀에 넣는다
+    print(f"[INFO] workers: {TUNE_WORKERS}")
+    tasks = []
     for fi, (train_s, train_e, test_s, test_e) in enumerate(folds, start=1):
-        print(f"\n[FOLD {fi}] train={train_s}~{train_e} test={test_s}~{test_e}")
-        ranked = []
-        for i, combo in enumerate(combos, start=1):
+        for ci, combo in enumerate(combos):
             params = {k: v for k, v in zip(keys, combo)}
-            m = run_once(params, train_s, train_e)
-            if m is None:
-                continue
-            ranked.append((score(m), params, m))
-            if i % 100 == 0:
-                print(f"  train progress: {i}/{len(combos)}")
+            tasks.append(((fi, ci), with_period(params, train_s, train_e)))
+
+    conn = tune_store.open_results_db()
+    ranked_by_fold = {fi: [] for fi in range(1, len(folds) + 1)}
+    done = 0
+    train_iter = tune_store.run_sweep_cached(conn, TUNE_RUN_TAG, tasks, data, TUNE_WORKERS, score, lambda key: key[0])
+    for (fi, ci), params, m, error in train_iter:
+        done += 1
+        if done % 100 == 0:
+            print(f"  train progress: {done}/{len(tasks)}")
+        if m is None:
+            continue
+        params = {k: params[k] for k in keys}
+        ranked_by_fold[fi].append((score(m), ci, params, m))
 
+    best_by_fold = {}
+    test_tasks = []
+    for fi, (train_s, train_e, test_s, test_e) in enumerate(folds, start=1):
+        ranked = ranked_by_fold[fi]
         if not ranked:
+            continue
+        # 점수가 같으면 조합 순서가 빠른 것 (순차 실행 때와 같은 결과)
+        ranked.sort(key=lambda x: (-x[0], x[1]))
+        best_by_fold[fi] = ranked[0]
+        test_tasks.append((fi, with_period(ranked[0][2], test_s, test_e)))
+
+    # test 는 폴드당 한번이라 DB 캐시 없이 평가곡선까지 받아온다
+    test_iter = tune_sweep.run_sweep(test_tasks, data, TUNE_WORKERS, with_curve=True)
+    test_by_fold = {fi: m for fi, params, m, error in test_iter}
+
+    fold_results = []
+    for fi, (train_s, train_e, test_s, test_e) in enumerate(folds, start=1):
+        print(f"\n[FOLD {fi}] train={train_s}~{train_e} test={test_s}~{test_e}")
+        if fi not in best_by_fold:
             print("  [WARN] train valid result 없음")
             continue
 
-        ranked.sort(key=lambda x: x[0], reverse=True)
-        best_score, best_params, best_train = ranked[0]
-        test_m = run_once(best_params, test_s, test_e)
+        best_score, _, best_params, best_train = best_by_fold[fi]
+        test_m = test_by_fold.get(fi)
         if test_m is None:
             print("  [WARN] test parse 실패")
             continue
@@ -133,6 +169,19 @@ def main():
     print(f"avg test mdd: {round(avg_mdd,2)}%")
     print(f"avg test cagr: {round(avg_cagr,2)}%")
 
+    # OOS(test 구간만) 이어붙인 곡선
+    oos = stitch_oos_equity(fold_results)
+    years = (oos.index[-1] - oos.index[0]).days / 365.25
+    final = float(oos["Equity"].iloc[-1])
+    print("\n=== WFO OOS (stitched) ===")
+    print(f"period: {oos.index[0].date()} ~ {oos.index[-1].date()}")
+    print(f"oos revenue: {round((final - 1.0) * 100.0,2)}%")
+    print(f"oos mdd: {round(float(oos['Drawdown'].min()) * 100.0,2)}%")
+    print(f"oos cagr: {round((final ** (1 / max(years, 1e-6)) - 1) * 100.0,2)}%")
+    if WFO_EQUITY_CSV:
+        oos.to_csv(WFO_EQUITY_CSV, index_label="date")
+        print(f"oos equity saved: {WFO_EQUITY_CSV}")
+
     # show top folds by test score
     scored = sorted(
         fold_results,
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import math
+import random
+
+
+# 적응형 탐색! (TPE 방식 샘플링 + successive halving)
+# - 라운드마다 후보를 뽑는다: 첫 라운드는 랜덤, 다음부터는 좋은 결과들에 많이 나온 값 쪽으로 (l(x)/g(x) 가 큰 후보)
+# - 후보들은 짧은 기간부터 돌려서 상위 1/eta 만 더 긴 기간으로 올리고 마지막에 전체 기간으로 평가한다
+# - 좋은 결과 = score 상위 gamma + CAGR/MDD 파레토 프론트
+
+
+def params_tuple(grid, params):
+    return tuple(params[k] for k in grid)
+
+
+def random_params(grid, rng):
+    return {k: rng.choice(v) for k, v in grid.items()}
+
+
+# CAGR은 높을수록, MDD(음수)는 0에 가까울수록 좋은 것 - 다른 점에 둘 다 밀리지 않는 점들의 인덱스
+def pareto_front(metrics_list):
+    front = []
+    for i, a in enumerate(metrics_list):
+        dominated = False
+        for j, b in enumerate(metrics_list):
+            if i == j:
+                continue
+            if b["cagr"] >= a["cagr"] and b["mdd"] >= a["mdd"] and (b["cagr"] > a["cagr"] or b["mdd"] > a["mdd"]):
+                dominated = True
+                break
+        if not dominated:
+            front.append(i)
+    return front
+
+
+# history: [(params, metrics)] 에서 좋은 그룹 / 나머지 그룹 인덱스
+def split_good_bad(history, score_fn, gamma):
+    order = sorted(range(len(history)), key=lambda i: score_fn(history[i][1]), reverse=True)
+    n_good = max(1, int(math.ceil(len(history) * gamma)))
+    good = set(order[:n_good])
+    good.update(pareto_front([m for _, m in history]))
+    bad = [i for i in range(len(history)) if i not in good]
+    return sorted(good), bad
+
+
+# 파라미터별 값 빈도(라플라스 스무딩) -> 확률
+def value_probs(grid, rows):
+    probs = {}
+    for k, values in grid.items():
+        counts = {v: 1.0 for v in values}
+        for params in rows:
+            counts[params[k]] += 1.0
+        total = sum(counts.values())
+        probs[k] = {v: c / total for v, c in counts.items()}
+    return probs
+
+
+def tpe_suggest(grid, history, n, rng, score_fn, seen, gamma=0.25, n_candidates=24):
+    if len(history) < 4:
+        out = []
+        for _ in range(n * 20):
+            p = random_params(grid, rng)
+            t = params_tuple(grid, p)
+            if t not in seen:
+                seen.add(t)
+                out.append(p)
+            if len(out) >= n:
+                break
+        return out
+
+    good, bad = split_good_bad(history, score_fn, gamma)
+    l_probs = value_probs(grid, [history[i][0] for i in good])
+    g_probs = value_probs(grid, [history[i][0] for i in bad])
+
+    out = []
+    for _ in range(n):
+        best = None
+        best_ratio = -1.0
+        for _ in range(n_candidates):
+            p = {k: rng.choices(list(l_probs[k].keys()), weights=list(l_probs[k].values()))[0] for k in grid}
+            t = params_tuple(grid, p)
+            if t in seen:
+                continue
+            ratio = 1.0
+            for k in grid:
+                ratio *= l_probs[k][p[k]] / g_probs[k][p[k]]
+            if ratio > best_ratio:
+                best, best_ratio = p, ratio
+        if best is None:
+            best = random_params(grid, rng)
+            if params_tuple(grid, best) in seen:
+                continue
+        seen.add(params_tuple(grid, best))
+        out.append(best)
+    return out
+
+
+# evaluate(params_list, frac) -> [(params, metrics or None)]  frac: 최근 몇 비율의 기간으로 돌릴지 (1.0 = 전체)
+# 전체 기간으로 평가된 [(params, metrics)] 를 리턴
+def adaptive_search(grid, evaluate, score_fn, rounds=4, batch=54, fractions=(0.25, 0.5, 1.0), eta=3, seed=42):
+    rng = random.Random(seed)
+    seen = set()
+    history = []
+
+    for rnd in range(1, rounds + 1):
+        candidates = tpe_suggest(grid, history, batch, rng, score_fn, seen)
+        if not candidates:
+            break
+
+        for ri, frac in enumerate(fractions):
+            evaluated = [(p, m) for p, m in evaluate(candidates, frac) if m is not None]
+            print(f"[SEARCH] round {rnd}/{rounds} rung {ri + 1}/{len(fractions)} frac={frac} evaluated={len(evaluated)}")
+
+            if frac >= 1.0:
+                history.extend(evaluated)
+                break
+
+            # 다음 단계로 올릴 후보: score 상위 1/eta + 파레토 프론트 (최대 2배까지)
+            keep = max(1, len(evaluated) // eta)
+            order = sorted(range(len(evaluated)), key=lambda i: score_fn(evaluated[i][1]), reverse=True)
+            promoted = order[:keep]
+            for i in pareto_front([m for _, m in evaluated]):
+                if i not in promoted and len(promoted) < keep * 2:
+                    promoted.append(i)
+            candidates = [evaluated[i][0] for i in promoted]
+
+        if history:
+            best = max(history, key=lambda x: score_fn(x[1]))
+            print(f"[SEARCH] round {rnd} best score={score_fn(best[1]):.2f} params={best[0]}")
+
+    return history
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import tune_env  # 튜닝 공통 환경값 (Kosdaqpi_Test_v3 보다 먼저 import)
+import Kosdaqpi_Test_v3 as Backtest
+import tune_sweep
+
+
+# 튜닝 결과 DB. 중간에 끊겨도 다시 돌리면 이미 계산한 조합은 건너뛴다
+TUNE_RESULTS_DB = os.environ.get("TUNE_RESULTS_DB", "./tune_results.sqlite3")
+
+
+def open_results_db(path=None):
+    conn = sqlite3.connect(path or TUNE_RESULTS_DB)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS results (
+            tag TEXT NOT NULL,
+            params TEXT NOT NULL,
+            fold INTEGER,
+            revenue REAL,
+            mdd REAL,
+            cagr REAL,
+            score REAL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (tag, params)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_tag_score ON results (tag, score)")
+    conn.commit()
+    return conn
+
+
+# 기간(BACKTEST_START/END) 까지 포함한 파라미터 전체가 키
+def params_key(params):
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+# 결과를 계산한 데이터(유니버스/LIMIT_BARS/마지막 봉 날짜)가 바뀌면 다른 태그로 저장된다
+def data_tag(tag, data):
+    return f"{tag}@{Backtest.data_fingerprint(data)}"
+
+
+# BACKTEST_END 가 비어 있으면(끝까지) 데이터 마지막 날짜로 채운 파라미터 (키에 실제 끝 날짜가 들어가게)
+def resolve_params(params, data):
+    if Backtest.make_params(params)["BACKTEST_END"]:
+        return params
+    p = dict(params)
+    p["BACKTEST_END"] = pd.to_datetime(data["dates"][-1]).strftime("%Y-%m-%d")
+    return p
+
+
+# {params_key: metrics 또는 None(기간 부족)} - 예외로 끝난 건 다시 돌리도록 빼고 읽는다
+def load_results(conn, tag):
+    done = {}
+    rows = conn.execute(
+        "SELECT params, revenue, mdd, cagr, error FROM results WHERE tag = ?", (tag,)
+    )
+    for params, revenue, mdd, cagr, error in rows:
+        if error:
+            continue
+        done[params] = None if revenue is None else {"revenue": revenue, "mdd": mdd, "cagr": cagr}
+    return done
+
+
+def save_result(conn, tag, params, metrics, error=None, score=None, fold=None):
+    m = metrics or {}
+    conn.execute(
+        "INSERT OR REPLACE INTO results (tag, params, fold, revenue, mdd, cagr, score, error, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            tag,
+            params_key(params),
+            fold,
+            m.get("revenue"),
+            m.get("mdd"),
+            m.get("cagr"),
+            score,
+            error,
+            time.time(),
+        ),
+    )
+    conn.commit()
+
+
+# 저장된 (key, params) 는 결과를 바로 돌려주고 나머지만 run_sweep 으로 돌린다
+# data 를 넘기면 빈 BACKTEST_END 를 데이터 마지막 날짜로 채운 파라미터로 찾는다
+def split_tasks(tasks, done, data=None):
+    cached = []
+    pending = []
+    for key, params in tasks:
+        pk = params_key(resolve_params(params, data) if data is not None else params)
+        if pk in done:
+            cached.append((key, params, done[pk], None))
+        else:
+            pending.append((key, params))
+    return cached, pending
+
+
+# 저장된 건 그대로 내보내고 나머지는 돌리면서 하나 끝날 때마다 DB에 바로 기록한다
+# score_fn(metrics) -> 점수, fold_of(key) -> 폴드 번호 (둘 다 조회용으로만 저장)
+# 태그에는 데이터 지문이 붙으니 새 거래일이 붙거나 유니버스/LIMIT_BARS 가 바뀌면 처음부터 다시 계산한다
+def run_sweep_cached(conn, tag, tasks, data, workers=None, score_fn=None, fold_of=None):
+    tag = data_tag(tag, data)
+    cached, pending = split_tasks(tasks, load_results(conn, tag), data)
+    print(f"[INFO] {tag} cached: {len(cached)} pending: {len(pending)}")
+
+    for item in cached:
+        yield item
+
+    for key, params, metrics, error in tune_sweep.run_sweep(pending, data, workers):
+        score = score_fn(metrics) if (metrics is not None and score_fn is not None) else None
+        fold = fold_of(key) if fold_of is not None else None
+        save_result(conn, tag, resolve_params(params, data), metrics, error, score, fold)
+        yield key, params, metrics, error
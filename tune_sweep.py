@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import atexit
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import tune_env  # 튜닝 공통 환경값 (Kosdaqpi_Test_v3 보다 먼저 import)
+
+import Kosdaqpi_Test_v3 as Backtest
+
+
+# 워커 수 (기본: 코어 수)
+SWEEP_WORKERS = int(os.environ.get("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+
+# 워커 프로세스마다 한번만 붙여 두는 백테스트 데이터
+_WORKER_DATA = None
+
+# 같은 데이터로 여러 번 run_sweep 을 부르면 (폴드 train/test, 탐색 라운드) mmap 파일과 풀을 재사용한다
+_POOL = None
+_POOL_KEY = None
+_POOL_DIR = None
+
+
+# load_backtest_data() 결과를 종목별 .npy(숫자 컬럼) + meta.pkl(인덱스/컬럼/이름)로 저장한다
+# 워커들은 이걸 mmap으로 열어서 같은 페이지 캐시를 공유한다 (조합마다 데이터를 피클로 넘기지 않음)
+def save_data_memmap(data, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = {"names": data["names"], "dates": data["dates"], "codes": {}}
+    for code, df in data["data_map"].items():
+        num_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+        np.save(os.path.join(cache_dir, f"{code}.npy"), df[num_cols].to_numpy(dtype=float))
+        meta["codes"][code] = {"index": df.index, "columns": num_cols}
+    with open(os.path.join(cache_dir, "meta.pkl"), "wb") as f:
+        pickle.dump(meta, f)
+
+
+def load_data_memmap(cache_dir):
+    with open(os.path.join(cache_dir, "meta.pkl"), "rb") as f:
+        meta = pickle.load(f)
+    data_map = {}
+    for code, info in meta["codes"].items():
+        arr = np.load(os.path.join(cache_dir, f"{code}.npy"), mmap_mode="r")
+        data_map[code] = pd.DataFrame(arr, index=info["index"], columns=info["columns"], copy=False)
+    return {"data_map": data_map, "names": meta["names"], "dates": meta["dates"]}
+
+
+def _init_worker(cache_dir):
+    global _WORKER_DATA
+    _WORKER_DATA = load_data_memmap(cache_dir)
+
+
+def _eval_params(params, with_curve=False):
+    m = Backtest.run_backtest(params, _WORKER_DATA)
+    return None if m is None else m.as_dict(with_curve)
+
+
+# (key, params) 목록을 프로세스 풀로 돌리고 끝나는 순서대로 (key, params, metrics, error)를 내보낸다
+# metrics: {"revenue", "mdd", "cagr"(, "equity")} 또는 기간 부족이면 None / error: 예외 문자열 또는 None
+def run_sweep(tasks, data, workers=None, with_curve=False):
+    workers = max(1, workers or SWEEP_WORKERS)
+
+    if workers == 1:
+        for key, params in tasks:
+            try:
+                m = Backtest.run_backtest(params, data)
+                yield key, params, (None if m is None else m.as_dict(with_curve)), None
+            except Exception as e:
+                yield key, params, None, f"{type(e).__name__}: {e}"
+        return
+
+    ex = get_pool(data, workers)
+    future_map = {ex.submit(_eval_params, params, with_curve): (key, params) for key, params in tasks}
+    for fut in as_completed(future_map):
+        key, params = future_map[fut]
+        try:
+            yield key, params, fut.result(), None
+        except Exception as e:
+            yield key, params, None, f"{type(e).__name__}: {e}"
+
+
+def get_pool(data, workers):
+    global _POOL, _POOL_KEY, _POOL_DIR
+    # id(data) 는 데이터가 해제되면 다른 데이터에 다시 쓰일 수 있어서 내용 지문으로 비교한다
+    pool_key = (Backtest.data_fingerprint(data), workers)
+    if _POOL is not None and _POOL_KEY == pool_key:
+        return _POOL
+
+    close_pool()
+    _POOL_DIR = tempfile.mkdtemp(prefix="kosdaqpi_sweep_")
+    save_data_memmap(data, _POOL_DIR)
+    _POOL = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_POOL_DIR,))
+    _POOL_KEY = pool_key
+    return _POOL
+
+
+def close_pool():
+    global _POOL, _POOL_KEY, _POOL_DIR
+    if _POOL is not None:
+        _POOL.shutdown(wait=True, cancel_futures=True)
+    if _POOL_DIR is not None:
+        shutil.rmtree(_POOL_DIR, ignore_errors=True)
+    _POOL = None
+    _POOL_KEY = None
+    _POOL_DIR = None
+
+
+atexit.register(close_pool)